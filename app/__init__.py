@@ -3,25 +3,40 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from app.config import Config
-import cloudinary
-import os
+from app.startup import BootProfile
+from app import db_routing
 
 # Khởi tạo extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': db_routing.RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 
 
 def create_app(config_class=Config):
     """Factory function để tạo Flask app"""
+    boot = BootProfile()
     app = Flask(__name__)
     app.config.from_object(config_class)
+    boot.mark('config')
 
-    # Khởi tạo extensions với app
+    # Khởi tạo extensions với app (pool + replica cấu hình trước khi tạo engine)
+    db_routing.configure_engines(app)
     db.init_app(app)
+    db_routing.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
 
+    # Đếm câu SQL mỗi request (đăng ký trước các before_request khác để tính đủ)
+    from app import query_budget
+    query_budget.init_app(app)
+
+    # Jinja: bytecode cache trên đĩa + đo thời gian render + thẻ {% cache %} (trước khi render template nào)
+    from app import cache, fragments, templating
+    cache.init_app(app)
+    templating.init_app(app)
+    fragments.init_app(app)
+    boot.mark('extensions')
+
     # ✅ ========== BẮT ĐẦU CODE MỚI ==========
     # Inject get_setting vào tất cả templates
     from app.models import get_setting
@@ -59,14 +74,44 @@ def create_app(config_class=Config):
     from app.chatbot import chatbot_bp
     app.register_blueprint(chatbot_bp)
 
-    # Khởi tạo Gemini sau khi app được tạo
-    with app.app_context():
-        from app.chatbot.routes import init_gemini
-        init_gemini()
+    # Catalog JSON API (app mobile, feed đối tác)
+    from app.api import api_bp
+    app.register_blueprint(api_bp)
+    # Gemini được khởi tạo ở tin nhắn chatbot đầu tiên (app/lazy.py), không chạy lúc boot
+    boot.mark('blueprints')
 
     # Khởi tạo cấu hình
     config_class.init_app(app)
 
+    # Bộ đếm thống kê + nội dung liên quan + chỉ mục chỗ dùng media + bus xóa cache + facet + cache read-model / trang + index gợi ý tìm kiếm + xu hướng + worker outbox / xóa media + lệnh CLI
+    from app import counters
+    counters.init_app(app)
+    from app import related
+    related.init_app(app)
+    from app import media_refs
+    media_refs.init_app(app)
+    from app import invalidation
+    invalidation.init_app(app)
+    from app import facets
+    facets.init_app(app)
+    from app import entity_cache
+    entity_cache.init_app(app)
+    from app import page_cache
+    page_cache.init_app(app)
+    from app.api import catalog
+    catalog.init_app(app)
+    from app import search_index
+    search_index.init_app(app)
+    from app import trending
+    trending.init_app(app)
+    from app import outbox, media_cleanup
+    outbox.init_app(app)
+    media_cleanup.init_app(app)
+
+    from app.commands import register_commands
+    register_commands(app)
+    boot.mark('counters_commands')
+
     # ==================== CONTEXT PROCESSOR - BIẾN TOÀN CỤC ====================
     @app.context_processor
     def inject_globals():
@@ -79,11 +124,19 @@ def create_app(config_class=Config):
         """
         from app.models import Category, get_setting as db_get_setting
         from datetime import datetime
+        from flask import g
+        from werkzeug.local import LocalProxy
+
+        def active_categories():
+            # Chỉ query khi template thực sự dùng, 1 lần / request
+            if 'all_categories' not in g:
+                g.all_categories = Category.query.filter_by(is_active=True).all()
+            return g.all_categories
 
         return {
             'get_setting': db_get_setting,  # ✅ THÊM FUNCTION get_setting
             'site_name': app.config.get('SITE_NAME', 'Hoangvn'),
-            'all_categories': Category.query.filter_by(is_active=True).all(),
+            'all_categories': LocalProxy(active_categories),
             'current_year': datetime.now().year  # ✅ Lấy năm động thay vì hardcode
         }
 
@@ -102,12 +155,8 @@ def create_app(config_class=Config):
             return ''
         return text.replace('\n', '<br>\n')
 
-    # ==================== CẤU HÌNH CLOUDINARY ====================
-    cloudinary.config(
-        cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
-        api_key=os.getenv('CLOUDINARY_API_KEY'),
-        api_secret=os.getenv('CLOUDINARY_API_SECRET'),
-        secure=True
-    )
+    # Cloudinary được cấu hình khi SDK nạp lần đầu (app/lazy.py)
+    boot.mark('template_filters')
+    app.extensions['startup_profile'] = boot
 
     return app
\ No newline at end of file
@@ -3,13 +3,21 @@ from flask import Blueprint, render_template, request, flash, redirect, url_for,
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.utils import secure_filename
 from app import db
-from app.models import User, Product, Category, Banner, Blog, FAQ, Contact, Media, Project, Job, Settings, get_setting, set_setting
-from app.models_rbac import Role, Permission
+from sqlalchemy.orm import joinedload, undefer_group
+from app.models import (User, Product, Category, Banner, Blog, FAQ, Contact, Media, Project, Job, Settings,
+                        get_setting, get_settings, save_settings)
+from app.models_rbac import Role, Permission, permission_counts_by_role, role_counts_by_permission
 from app.forms import (LoginForm, CategoryForm, ProductForm, BannerForm,
                        BlogForm, FAQForm, UserForm, ProjectForm, JobForm,
                        RoleForm, PermissionForm, SettingsForm)
-from app.utils import save_upload_file, delete_file, get_albums, optimize_image
+from app.utils import save_upload_file, get_albums, optimize_image
 from app.decorators import permission_required, role_required
+from app.counters import get_counters, get_counters_by_prefix, add_to_counters, wake_reconciler
+from app.trending import daily_views, top_trending, recent_views
+from app.media_library import (picker_page, list_albums, create_album as create_album_entry,
+                               delete_album as delete_album_entry)
+from app.media_cleanup import bulk_delete_media as bulk_delete_media_rows
+from app.media_refs import where_used
 import shutil
 import re
 from html import unescape
@@ -473,6 +481,13 @@ def get_image_from_form(form_image_field, field_name='image', folder='uploads'):
     return None
 
 
+def save_gallery_from_form(entity, form_gallery_field):
+    """Ghi gallery từ textarea (mỗi dòng 1 URL) - chỉ thay khi danh sách URL đổi, giữ alt/title riêng của ảnh"""
+    urls = [line.strip() for line in (form_gallery_field.data or '').splitlines() if line.strip()]
+    if urls != entity.get_gallery_images():
+        entity.set_gallery_images(urls)
+
+
 # ==================== LOGIN & LOGOUT ====================
 
 @admin_bp.route('/login', methods=['GET', 'POST'])
@@ -612,21 +627,32 @@ def dashboard():
     if not current_user.has_any_permission('manage_users', 'manage_products', 'manage_categories'):
         return redirect(url_for('admin.welcome'))
 
-    # Dashboard cho Admin/Editor
-    total_products = Product.query.count()
-    total_categories = Category.query.count()
-    total_blogs = Blog.query.count()
-    total_contacts = Contact.query.filter_by(is_read=False).count()
+    # Dashboard cho Admin/Editor - đọc bộ đếm tính sẵn (1 query)
+    wake_reconciler()
+    counters = get_counters('products', 'categories', 'blogs', 'contacts_unread')
+    total_products = counters['products']
+    total_categories = counters['categories']
+    total_blogs = counters['blogs']
+    total_contacts = counters['contacts_unread']
     recent_products = Product.query.order_by(Product.created_at.desc()).limit(5).all()
     recent_contacts = Contact.query.order_by(Contact.created_at.desc()).limit(5).all()
 
+    # Lượt xem theo ngày từ rollup (1 query) + nội dung xu hướng
+    view_days = daily_views()
+    view_max = max((sum(views.values()) for _day, views in view_days), default=0)
+    trending = {item_type: [(item, recent_views(item.trending_score)) for item in top_trending(item_type)]
+                for item_type in ('product', 'blog')}
+
     return render_template('admin/dashboard.html',
                            total_products=total_products,
                            total_categories=total_categories,
                            total_blogs=total_blogs,
                            total_contacts=total_contacts,
                            recent_products=recent_products,
-                           recent_contacts=recent_contacts)
+                           recent_contacts=recent_contacts,
+                           view_days=view_days,
+                           view_max=view_max,
+                           trending=trending)
 
 # ==================== WELCOME USER ====================
 @admin_bp.route('/welcome')
@@ -640,7 +666,7 @@ def welcome():
     # Lấy số liên hệ chưa đọc (nếu có quyền xem)
     total_contacts = 0
     if current_user.has_any_permission('view_contacts', 'manage_contacts'):
-        total_contacts = Contact.query.filter_by(is_read=False).count()
+        total_contacts = get_counters('contacts_unread')['contacts_unread']
 
     return render_template('admin/welcome.html', total_contacts=total_contacts)
 
@@ -654,7 +680,8 @@ def categories():
     categories = Category.query.order_by(Category.created_at.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
-    return render_template('admin/categories.html', categories=categories)
+    category_counts = get_counters_by_prefix('category_products:')
+    return render_template('admin/categories.html', categories=categories, category_counts=category_counts)
 
 
 @admin_bp.route('/categories/add', methods=['GET', 'POST'])
@@ -735,7 +762,8 @@ def delete_category(id):
 def products():
     """Danh sách sản phẩm"""
     page = request.args.get('page', 1, type=int)
-    products = Product.query.order_by(Product.created_at.desc()).paginate(
+    # Tên danh mục mỗi dòng: JOIN sẵn thay vì 1 query / sản phẩm
+    products = Product.query.options(joinedload(Product.category)).order_by(Product.created_at.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
     return render_template('admin/products.html', products=products)
@@ -761,6 +789,7 @@ def add_product():
             is_featured=form.is_featured.data,
             is_active=form.is_active.data
         )
+        save_gallery_from_form(product, form.gallery)
 
         db.session.add(product)
         db.session.commit()
@@ -791,15 +820,65 @@ def edit_product(id):
         product.category_id = form.category_id.data
         product.is_featured = form.is_featured.data
         product.is_active = form.is_active.data
+        save_gallery_from_form(product, form.gallery)
 
         db.session.commit()
 
         flash('Đã cập nhật sản phẩm thành công!', 'success')
         return redirect(url_for('admin.products'))
 
+    if request.method == 'GET':
+        form.gallery.data = '\n'.join(product.get_gallery_images())
+
     return render_template('admin/product_form.html', form=form, title='Sửa sản phẩm')
 
 
+@admin_bp.route('/products/export')
+@permission_required('view_products')  # ✅ Xem sản phẩm
+def export_products():
+    """Xuất sản phẩm (CSV/XLSX/JSONL) - lọc date_from, date_to, category, is_active"""
+    from app.exporter import export_response
+    return export_response('products', request.args.get('format', 'csv'), request.args)
+
+
+@admin_bp.route('/products/import', methods=['GET', 'POST'])
+@permission_required('manage_products')  # ✅ Quản lý sản phẩm
+def import_products():
+    """Import sản phẩm hàng loạt từ file CSV / XLSX / JSONL"""
+    from app.importer import import_products as run_import, detect_format
+
+    report = None
+
+    if request.method == 'POST':
+        file = request.files.get('file')
+        mode = request.form.get('mode', 'insert')
+        dry_run = request.form.get('dry_run') == 'on'
+
+        if not file or not file.filename:
+            flash('Vui lòng chọn file để import!', 'warning')
+            return redirect(url_for('admin.import_products'))
+
+        fmt = detect_format(file.filename)
+        if not fmt:
+            flash('Chỉ hỗ trợ file .csv, .xlsx, .jsonl', 'danger')
+            return redirect(url_for('admin.import_products'))
+
+        try:
+            report = run_import(file.stream, fmt, mode=mode if mode in ('insert', 'upsert') else 'insert',
+                                dry_run=dry_run)
+        except Exception as e:
+            flash(f'Lỗi import: {str(e)}', 'danger')
+            return redirect(url_for('admin.import_products'))
+
+        if dry_run:
+            flash(f'Kiểm tra xong {report["total"]} dòng: {report["failed"]} dòng lỗi (chưa ghi dữ liệu)', 'info')
+        else:
+            flash(f'✓ Đã import {report["created"]} sản phẩm mới, cập nhật {report["updated"]}, '
+                  f'{report["failed"]} dòng lỗi', 'success' if not report['failed'] else 'warning')
+
+    return render_template('admin/product_import.html', report=report)
+
+
 @admin_bp.route('/products/delete/<int:id>')
 @permission_required('manage_products')  # ✅ Quản lý sản phẩm
 def delete_product(id):
@@ -946,7 +1025,7 @@ def add_blog():
 @permission_required('edit_all_blogs')  # ✅ Sửa tất cả blog
 def edit_blog(id):
     """Sửa blog với SEO optimization"""
-    blog = Blog.query.get_or_404(id)
+    blog = Blog.query.options(undefer_group('content')).get_or_404(id)
     form = BlogForm(obj=blog)
 
     if form.validate_on_submit():
@@ -1082,14 +1161,16 @@ def users():
     """Danh sách người dùng với filter theo role"""
     role_filter = request.args.get('role', '')
 
-    query = User.query
+    query = User.query.options(joinedload(User.role_obj))
     if role_filter:
         role_obj = Role.query.filter_by(name=role_filter).first()
         if role_obj:
             query = query.filter_by(role_id=role_obj.id)
 
     users = query.order_by(User.created_at.desc()).all()
-    return render_template('admin/users.html', users=users)
+    # Số quyền theo role (1 query) thay vì user.get_permissions() mỗi dòng
+    permission_counts = permission_counts_by_role(active_only=True)
+    return render_template('admin/users.html', users=users, permission_counts=permission_counts)
 
 
 @admin_bp.route('/users/add', methods=['GET', 'POST'])
@@ -1171,6 +1252,14 @@ def contacts():
     return render_template('admin/contacts.html', contacts=contacts)
 
 
+@admin_bp.route('/contacts/export')
+@permission_required('view_contacts')  # ✅ Xem liên hệ
+def export_contacts():
+    """Xuất liên hệ (CSV/XLSX/JSONL) - lọc date_from, date_to, is_read"""
+    from app.exporter import export_response
+    return export_response('contacts', request.args.get('format', 'csv'), request.args)
+
+
 @admin_bp.route('/contacts/view/<int:id>')
 @permission_required('view_contacts')  # ✅ Xem liên hệ
 def view_contact(id):
@@ -1232,9 +1321,10 @@ def media():
             media_with_seo = [m for m in media_with_seo if m['seo']['score'] < 50]
 
     albums = get_albums()
-    total_files = Media.query.count()
-    total_size = db.session.query(db.func.sum(Media.file_size)).scalar() or 0
-    total_size_mb = round(total_size / (1024 * 1024), 2)
+    wake_reconciler()
+    counters = get_counters('media', 'media_size')
+    total_files = counters['media']
+    total_size_mb = round(counters['media_size'] / (1024 * 1024), 2)
 
     all_media = Media.query.all()
     seo_stats = {
@@ -1257,6 +1347,14 @@ def media():
     )
 
 
+@admin_bp.route('/media/export')
+@permission_required('view_media')  # ✅ Xem thư viện media
+def export_media():
+    """Xuất metadata media (CSV/XLSX/JSONL) - lọc date_from, date_to, album"""
+    from app.exporter import export_response
+    return export_response('media', request.args.get('format', 'csv'), request.args)
+
+
 @admin_bp.route('/media/upload', methods=['GET', 'POST'])
 @permission_required('upload_media')  # ✅ Upload media
 def upload_media():
@@ -1341,16 +1439,13 @@ def create_album():
         flash('Vui lòng nhập tên album!', 'warning')
         return redirect(url_for('admin.media'))
 
-    album_path = os.path.join(
-        current_app.config['UPLOAD_FOLDER'],
-        'albums',
-        secure_filename(album_name)
-    )
-
     try:
-        os.makedirs(album_path, exist_ok=True)
-        flash(f'Đã tạo album "{album_name}" thành công!', 'success')
+        if create_album_entry(album_name):
+            flash(f'Đã tạo album "{album_name}" thành công!', 'success')
+        else:
+            flash(f'Album "{album_name}" đã tồn tại!', 'warning')
     except Exception as e:
+        db.session.rollback()
         flash(f'Lỗi tạo album: {str(e)}', 'danger')
 
     return redirect(url_for('admin.media'))
@@ -1359,59 +1454,44 @@ def create_album():
 @admin_bp.route('/media/delete/<int:id>')
 @permission_required('delete_media')  # ✅ Xóa media
 def delete_media(id):
-    """Xóa media file (Cloudinary + local + DB)"""
-    from app.utils import delete_file
-    import logging
-
-    logging.basicConfig(level=logging.INFO)
-    def safe_print(*args):
-        try:
-            print(*args)
-        except Exception:
-            pass
-
+    """Xóa media (DB ngay, file trên Cloudinary/local xóa ở nền)"""
     media = Media.query.get_or_404(id)
     album_name = media.album
 
     try:
-        if media.filepath and "res.cloudinary.com" in media.filepath:
-            safe_print(f"[Delete Cloudinary Start]: {repr(media.filepath)}")
-            res = delete_file(media.filepath)
-            safe_print(f"[Delete Cloudinary Result]: {res}")
-        else:
-            safe_print("[Delete Cloudinary]: Bỏ qua (không phải URL Cloudinary)")
-
-        if media.filepath and media.filepath.startswith('/static/'):
-            file_path = media.filepath.replace('/static/', '')
-            full_path = os.path.join(current_app.config['UPLOAD_FOLDER'], '..', file_path)
-            abs_path = os.path.abspath(full_path)
-
-            if os.path.exists(abs_path):
-                os.remove(abs_path)
-                safe_print(f"[Delete Local]: Đã xóa {abs_path}")
-            else:
-                safe_print(f"[Delete Local]: Không tìm thấy {abs_path}")
-
-    except Exception as e:
-        safe_print(f"[Delete Error]: {e}")
-        logging.exception(e)
-
-    try:
-        db.session.delete(media)
-        db.session.commit()
+        bulk_delete_media_rows(ids=[media.id])
         flash('🗑️ Đã xóa ảnh khỏi hệ thống', 'success')
-        safe_print("[DB Delete]: Media record removed successfully.")
     except Exception as e:
-        db.session.rollback()
         flash(f'Lỗi khi xóa khỏi cơ sở dữ liệu: {e}', 'danger')
-        safe_print(f"[DB Delete Error]: {e}")
-        logging.exception(e)
 
     if album_name:
         return redirect(url_for('admin.media', album=album_name))
     return redirect(url_for('admin.media'))
 
 
+@admin_bp.route('/media/bulk-delete', methods=['POST'])
+@permission_required('delete_media')  # ✅ Xóa media
+def bulk_delete_media():
+    """Xóa nhiều media (media_ids[]) hoặc toàn bộ file của 1 album (album) - trả về JSON"""
+    media_ids = request.form.getlist('media_ids[]')
+    album_name = request.form.get('album', '').strip()
+
+    if not media_ids and not album_name:
+        return jsonify({'success': False, 'message': 'Chưa chọn file nào'})
+
+    try:
+        if media_ids:
+            deleted = bulk_delete_media_rows(ids=media_ids)
+        else:
+            deleted = bulk_delete_media_rows(album=album_name)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Danh sách file không hợp lệ'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Lỗi khi xóa: {e}'}), 500
+
+    return jsonify({'success': True, 'deleted': deleted, 'message': f'Đã xóa {deleted} file'})
+
+
 @admin_bp.route('/media/delete-album/<album_name>')
 @permission_required('manage_albums')  # ✅ Quản lý albums
 def delete_album(album_name):
@@ -1429,8 +1509,10 @@ def delete_album(album_name):
     )
 
     try:
+        # Thư mục album cũ (trước khi có bảng albums) nếu còn
         if os.path.exists(album_path):
             shutil.rmtree(album_path)
+        delete_album_entry(album_name)
         flash(f'Đã xóa album "{album_name}" thành công!', 'success')
     except Exception as e:
         flash(f'Lỗi khi xóa album "{album_name}": {str(e)}', 'danger')
@@ -1461,7 +1543,8 @@ def edit_media(id):
                                    media=media,
                                    form=form,
                                    albums=albums,
-                                   seo_result=seo_result)
+                                   seo_result=seo_result,
+                                   usages=where_used(media))
 
         if len(media.alt_text) < 10:
             flash('Alt Text quá ngắn! Nên từ 30-125 ký tự.', 'warning')
@@ -1491,7 +1574,8 @@ def edit_media(id):
                            media=media,
                            form=form,
                            albums=albums,
-                           seo_result=seo_result)
+                           seo_result=seo_result,
+                           usages=where_used(media))
 
 
 @admin_bp.route('/media/bulk-edit', methods=['POST'])
@@ -1523,10 +1607,23 @@ def bulk_edit_media():
 
     elif action == 'set_album':
         album_name = request.form.get('album_name', '')
+
+        # Bulk update bỏ qua ORM events -> tự cập nhật bộ đếm album
+        album_deltas = {}
+        old_albums = db.session.query(Media.album, db.func.count(Media.id)).filter(
+            Media.id.in_(media_ids)
+        ).group_by(Media.album).all()
+        for old_album, count in old_albums:
+            if old_album:
+                album_deltas[f'album_media:{old_album}'] = album_deltas.get(f'album_media:{old_album}', 0) - count
+            if album_name:
+                album_deltas[f'album_media:{album_name}'] = album_deltas.get(f'album_media:{album_name}', 0) + count
+
         updated = Media.query.filter(Media.id.in_(media_ids)).update(
             {Media.album: album_name},
             synchronize_session=False
         )
+        add_to_counters(album_deltas)
         db.session.commit()
         return jsonify({'success': True, 'message': f'Đã chuyển {updated} file vào album "{album_name}"'})
 
@@ -1546,20 +1643,21 @@ def check_media_seo(id):
 @admin_bp.route('/api/media')
 @permission_required('view_media')  # ✅ Xem thư viện media
 def api_media():
-    """API trả về danh sách media với đường dẫn chuẩn hóa"""
-    album = request.args.get('album', '')
-    search = request.args.get('search', '')
-
-    query = Media.query
-    if album:
-        query = query.filter_by(album=album)
-    if search:
-        query = query.filter(Media.original_filename.ilike(f'%{search}%'))
+    """
+    API media picker: phân trang cursor, tìm theo tiền tố tên file / alt text, có ETag
 
-    media_list = query.order_by(Media.created_at.desc()).limit(100).all()
+    Query: album, search (hoặc q), cursor, limit
+    Trả về: media, next_cursor, albums (chỉ ở trang đầu)
+    """
+    album = request.args.get('album', '')
+    search = request.args.get('search', '') or request.args.get('q', '')
+    cursor = request.args.get('cursor') or None
 
-    albums_data = get_albums()
-    album_names = [a['name'] if isinstance(a, dict) else a for a in albums_data]
+    try:
+        media_list, next_cursor = picker_page(album=album, search=search, cursor=cursor,
+                                              limit=request.args.get('limit', type=int))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     def normalize_filepath(media):
         """Chuẩn hóa filepath để đảm bảo có thể hiển thị được"""
@@ -1582,7 +1680,7 @@ def api_media():
 
         return filepath
 
-    return jsonify({
+    payload = {
         'media': [{
             'id': m.id,
             'filename': m.filename,
@@ -1592,8 +1690,16 @@ def api_media():
             'height': m.height or 0,
             'album': m.album or ''
         } for m in media_list],
-        'albums': album_names
-    })
+        'next_cursor': next_cursor,
+    }
+    if not cursor:
+        payload['albums'] = list_albums()
+
+    # ETag theo nội dung -> mở lại picker khi thư viện không đổi chỉ nhận 304
+    response = jsonify(payload)
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
 
 
 # ==================== QUẢN LÝ DỰ ÁN ====================
@@ -1632,6 +1738,7 @@ def add_project():
             is_featured=form.is_featured.data,
             is_active=form.is_active.data
         )
+        save_gallery_from_form(project, form.gallery)
 
         db.session.add(project)
         db.session.commit()
@@ -1646,7 +1753,7 @@ def add_project():
 @permission_required('manage_projects')  # ✅ Quản lý dự án
 def edit_project(id):
     """Sửa dự án"""
-    project = Project.query.get_or_404(id)
+    project = Project.query.options(undefer_group('content')).get_or_404(id)
     form = ProjectForm(obj=project)
 
     if form.validate_on_submit():
@@ -1666,12 +1773,16 @@ def edit_project(id):
         project.products_used = form.products_used.data
         project.is_featured = form.is_featured.data
         project.is_active = form.is_active.data
+        save_gallery_from_form(project, form.gallery)
 
         db.session.commit()
 
         flash('Đã cập nhật dự án thành công!', 'success')
         return redirect(url_for('admin.projects'))
 
+    if request.method == 'GET':
+        form.gallery.data = '\n'.join(project.get_gallery_images())
+
     return render_template('admin/project_form.html', form=form, title='Sửa dự án', project=project)
 
 
@@ -1785,14 +1896,19 @@ def roles():
     """Danh sách roles"""
     roles = Role.query.order_by(Role.priority.desc()).all()
 
+    wake_reconciler()
+    counters = get_counters('roles', 'permissions', 'users', 'roles_active')
     stats = {
-        'total_roles': Role.query.count(),
-        'total_permissions': Permission.query.count(),
-        'total_users': User.query.count(),
-        'active_roles': Role.query.filter_by(is_active=True).count()
+        'total_roles': counters['roles'],
+        'total_permissions': counters['permissions'],
+        'total_users': counters['users'],
+        'active_roles': counters['roles_active']
     }
+    role_users = get_counters_by_prefix('role_users:')
+    role_permissions = permission_counts_by_role()
 
-    return render_template('admin/roles.html', roles=roles, stats=stats)
+    return render_template('admin/roles.html', roles=roles, stats=stats, role_users=role_users,
+                           role_permissions=role_permissions)
 
 
 @admin_bp.route('/roles/add', methods=['GET', 'POST'])
@@ -1927,7 +2043,8 @@ def permissions():
             perms_by_category[cat] = []
         perms_by_category[cat].append(perm)
 
-    return render_template('admin/permissions.html', perms_by_category=perms_by_category)
+    return render_template('admin/permissions.html', perms_by_category=perms_by_category,
+                           permission_roles=role_counts_by_permission())
 
 
 @admin_bp.route('/permissions/add', methods=['GET', 'POST'])
@@ -1961,6 +2078,8 @@ def add_permission():
 
 
 # ==================== MANAGE_SETTING ====================
+# Thay đổi các key này -> tạo lại sitemap.xml / robots.txt
+SEO_FILE_KEYS = {'main_url'}
 
 
 @admin_bp.route('/settings', methods=['GET', 'POST'])
@@ -1968,16 +2087,20 @@ def add_permission():
 def settings():
     """Quản lý cài đặt hệ thống"""
     form = SettingsForm()
+    current = get_settings()  # Toàn bộ settings - 1 query
 
     if form.validate_on_submit():
+        # {key: (value, group, description)} - lưu 1 lần ở cuối, chỉ ghi key thay đổi
+        values = {}
+
         # ==================== GENERAL SETTINGS ====================
-        set_setting('website_name', form.website_name.data, 'general', 'Tên website')
-        set_setting('slogan', form.slogan.data, 'general', 'Slogan của website')
-        set_setting('address', form.address.data, 'general', 'Địa chỉ công ty')
-        set_setting('email', form.email.data, 'general', 'Email chính')
-        set_setting('hotline', form.hotline.data, 'general', 'Số hotline')
-        set_setting('main_url', form.main_url.data, 'general', 'URL chính của website')
-        set_setting('company_info', form.company_info.data, 'general', 'Thông tin công ty')
+        values['website_name'] = (form.website_name.data, 'general', 'Tên website')
+        values['slogan'] = (form.slogan.data, 'general', 'Slogan của website')
+        values['address'] = (form.address.data, 'general', 'Địa chỉ công ty')
+        values['email'] = (form.email.data, 'general', 'Email chính')
+        values['hotline'] = (form.hotline.data, 'general', 'Số hotline')
+        values['main_url'] = (form.main_url.data, 'general', 'URL chính của website')
+        values['company_info'] = (form.company_info.data, 'general', 'Thông tin công ty')
 
         # ==================== THEME/UI SETTINGS ====================
         # ✅ Xử lý logo upload
@@ -1985,227 +2108,237 @@ def settings():
             logo_path = save_upload_file(form.logo.data, 'logos')
             if isinstance(logo_path, tuple):
                 logo_path = logo_path[0]
-            set_setting('logo_url', logo_path, 'theme', 'URL logo website')
+            values['logo_url'] = (logo_path, 'theme', 'URL logo website')
 
         # ✅ Xử lý logo chatbot upload
         if form.logo_chatbot.data:
             chatbot_logo_path = save_upload_file(form.logo_chatbot.data, 'logos')
             if isinstance(chatbot_logo_path, tuple):
                 chatbot_logo_path = chatbot_logo_path[0]
-            set_setting('logo_chatbot_url', chatbot_logo_path, 'theme', 'URL logo chatbot')
+            values['logo_chatbot_url'] = (chatbot_logo_path, 'theme', 'URL logo chatbot')
 
-        set_setting('primary_color', form.primary_color.data, 'theme', 'Màu chủ đạo')
+        values['primary_color'] = (form.primary_color.data, 'theme', 'Màu chủ đạo')
 
         # ==================== SEO & META DEFAULTS ====================
-        set_setting('meta_title', form.meta_title.data, 'seo', 'Meta title mặc định')
-        set_setting('meta_description', form.meta_description.data, 'seo', 'Meta description mặc định')
-        set_setting('meta_keywords', form.meta_keywords.data, 'seo', 'Meta keywords mặc định')
+        values['meta_title'] = (form.meta_title.data, 'seo', 'Meta title mặc định')
+        values['meta_description'] = (form.meta_description.data, 'seo', 'Meta description mặc định')
+        values['meta_keywords'] = (form.meta_keywords.data, 'seo', 'Meta keywords mặc định')
 
         # 1. Favicon .ico
         if form.favicon_ico.data:
             favicon_ico_path = save_upload_file(form.favicon_ico.data, 'favicons')
             if isinstance(favicon_ico_path, tuple):
                 favicon_ico_path = favicon_ico_path[0]
-            set_setting('favicon_ico_url', favicon_ico_path, 'seo', 'Favicon .ico')
+            values['favicon_ico_url'] = (favicon_ico_path, 'seo', 'Favicon .ico')
 
         # 2. Favicon PNG 96x96
         if form.favicon_png.data:
             favicon_png_path = save_upload_file(form.favicon_png.data, 'favicons')
             if isinstance(favicon_png_path, tuple):
                 favicon_png_path = favicon_png_path[0]
-            set_setting('favicon_png_url', favicon_png_path, 'seo', 'Favicon PNG 96x96')
+            values['favicon_png_url'] = (favicon_png_path, 'seo', 'Favicon PNG 96x96')
 
         # 3. Favicon SVG
         if form.favicon_svg.data:
             favicon_svg_path = save_upload_file(form.favicon_svg.data, 'favicons')
             if isinstance(favicon_svg_path, tuple):
                 favicon_svg_path = favicon_svg_path[0]
-            set_setting('favicon_svg_url', favicon_svg_path, 'seo', 'Favicon SVG')
+            values['favicon_svg_url'] = (favicon_svg_path, 'seo', 'Favicon SVG')
 
         # 4. Apple Touch Icon
         if form.apple_touch_icon.data:
             apple_icon_path = save_upload_file(form.apple_touch_icon.data, 'favicons')
             if isinstance(apple_icon_path, tuple):
                 apple_icon_path = apple_icon_path[0]
-            set_setting('apple_touch_icon_url', apple_icon_path, 'seo', 'Apple Touch Icon')
+            values['apple_touch_icon_url'] = (apple_icon_path, 'seo', 'Apple Touch Icon')
 
         # ✅ Xử lý favicon upload
         if form.favicon.data:
             favicon_path = save_upload_file(form.favicon.data, 'favicons')
             if isinstance(favicon_path, tuple):
                 favicon_path = favicon_path[0]
-            set_setting('favicon_url', favicon_path, 'seo', 'URL favicon')
+            values['favicon_url'] = (favicon_path, 'seo', 'URL favicon')
 
         # ✅ Xử lý default share image upload
         if form.default_share_image.data:
             share_image_path = save_upload_file(form.default_share_image.data, 'share_images')
             if isinstance(share_image_path, tuple):
                 share_image_path = share_image_path[0]
-            set_setting('default_share_image', share_image_path, 'seo', 'Ảnh chia sẻ mặc định')
+            values['default_share_image'] = (share_image_path, 'seo', 'Ảnh chia sẻ mặc định')
 
         # Open Graph settings
-        set_setting('og_title', form.meta_title.data, 'seo', 'OG title mặc định')
-        set_setting('og_description', form.meta_description.data, 'seo', 'OG description mặc định')
-        set_setting('og_image', get_setting('default_share_image', ''), 'seo', 'OG image mặc định')
+        values['og_title'] = (form.meta_title.data, 'seo', 'OG title mặc định')
+        values['og_description'] = (form.meta_description.data, 'seo', 'OG description mặc định')
+        share_image = values['default_share_image'][0] if 'default_share_image' in values else None
+        values['og_image'] = (share_image or current.get('default_share_image', ''), 'seo', 'OG image mặc định')
 
         # Page-specific meta descriptions
-        set_setting('index_meta_description', form.index_meta_description.data, 'seo', 'Meta description trang chủ')
-        set_setting('about_meta_description', form.about_meta_description.data, 'seo',
-                    'Meta description trang giới thiệu')
-        set_setting('contact_meta_description', form.contact_meta_description.data, 'seo',
-                    'Meta description trang liên hệ')
-        set_setting('products_meta_description', form.products_meta_description.data, 'seo',
-                    'Meta description trang sản phẩm')
-        set_setting('product_meta_description', form.product_meta_description.data, 'seo',
-                    'Meta description chi tiết sản phẩm')
-        set_setting('blog_meta_description', form.blog_meta_description.data, 'seo', 'Meta description trang blog')
-        set_setting('careers_meta_description', form.careers_meta_description.data, 'seo',
-                    'Meta description trang tuyển dụng')
-        set_setting('faq_meta_description', form.faq_meta_description.data, 'seo', 'Meta description trang FAQ')
-        set_setting('projects_meta_description', form.projects_meta_description.data, 'seo',
-                    'Meta description trang dự án')
+        values['index_meta_description'] = (form.index_meta_description.data, 'seo', 'Meta description trang chủ')
+        values['about_meta_description'] = (form.about_meta_description.data, 'seo',
+                                            'Meta description trang giới thiệu')
+        values['contact_meta_description'] = (form.contact_meta_description.data, 'seo',
+                                              'Meta description trang liên hệ')
+        values['products_meta_description'] = (form.products_meta_description.data, 'seo',
+                                               'Meta description trang sản phẩm')
+        values['product_meta_description'] = (form.product_meta_description.data, 'seo',
+                                              'Meta description chi tiết sản phẩm')
+        values['blog_meta_description'] = (form.blog_meta_description.data, 'seo', 'Meta description trang blog')
+        values['careers_meta_description'] = (form.careers_meta_description.data, 'seo',
+                                              'Meta description trang tuyển dụng')
+        values['faq_meta_description'] = (form.faq_meta_description.data, 'seo', 'Meta description trang FAQ')
+        values['projects_meta_description'] = (form.projects_meta_description.data, 'seo',
+                                               'Meta description trang dự án')
 
         # ==================== CONTACT & SOCIAL SETTINGS ====================
-        set_setting('contact_email', form.contact_email.data, 'contact', 'Email liên hệ')
-        set_setting('facebook_url', form.facebook_url.data, 'contact', 'URL Facebook')
-        set_setting('facebook_messenger_url', form.facebook_messenger_url.data, 'contact', 'Facebook Messenger URL')
-        set_setting('zalo_url', form.zalo_url.data, 'contact', 'URL Zalo')
-        set_setting('tiktok_url', form.tiktok_url.data, 'contact', 'URL TikTok')
-        set_setting('youtube_url', form.youtube_url.data, 'contact', 'URL YouTube')
-        set_setting('google_maps', form.google_maps.data, 'contact', 'Mã nhúng Google Maps')
-        set_setting('hotline_north', form.hotline_north.data, 'contact', 'Hotline miền Bắc')
-        set_setting('hotline_central', form.hotline_central.data, 'contact', 'Hotline miền Trung')
-        set_setting('hotline_south', form.hotline_south.data, 'contact', 'Hotline miền Nam')
-        set_setting('working_hours', form.working_hours.data, 'contact', 'Giờ làm việc')
-        set_setting('branch_addresses', form.branch_addresses.data, 'contact', 'Danh sách địa chỉ chi nhánh')
+        values['contact_email'] = (form.contact_email.data, 'contact', 'Email liên hệ')
+        values['facebook_url'] = (form.facebook_url.data, 'contact', 'URL Facebook')
+        values['facebook_messenger_url'] = (form.facebook_messenger_url.data, 'contact', 'Facebook Messenger URL')
+        values['zalo_url'] = (form.zalo_url.data, 'contact', 'URL Zalo')
+        values['tiktok_url'] = (form.tiktok_url.data, 'contact', 'URL TikTok')
+        values['youtube_url'] = (form.youtube_url.data, 'contact', 'URL YouTube')
+        values['google_maps'] = (form.google_maps.data, 'contact', 'Mã nhúng Google Maps')
+        values['hotline_north'] = (form.hotline_north.data, 'contact', 'Hotline miền Bắc')
+        values['hotline_central'] = (form.hotline_central.data, 'contact', 'Hotline miền Trung')
+        values['hotline_south'] = (form.hotline_south.data, 'contact', 'Hotline miền Nam')
+        values['working_hours'] = (form.working_hours.data, 'contact', 'Giờ làm việc')
+        values['branch_addresses'] = (form.branch_addresses.data, 'contact', 'Danh sách địa chỉ chi nhánh')
 
         # ==================== SYSTEM & SECURITY SETTINGS ====================
-        set_setting('login_attempt_limit', str(form.login_attempt_limit.data), 'system', 'Giới hạn đăng nhập sai')
-        set_setting('cache_time', str(form.cache_time.data), 'system', 'Thời gian cache (giây)')
+        values['login_attempt_limit'] = (str(form.login_attempt_limit.data), 'system', 'Giới hạn đăng nhập sai')
+        values['cache_time'] = (str(form.cache_time.data), 'system', 'Thời gian cache (giây)')
 
         # ==================== INTEGRATION SETTINGS ====================
-        set_setting('cloudinary_api_key', form.cloudinary_api_key.data, 'integration', 'API Key Cloudinary')
-        set_setting('gemini_api_key', form.gemini_api_key.data, 'integration', 'API Key Gemini/OpenAI')
-        set_setting('google_analytics', form.google_analytics.data, 'integration', 'Google Analytics ID')
-        set_setting('shopee_api', form.shopee_api.data, 'integration', 'Shopee Integration')
-        set_setting('tiktok_api', form.tiktok_api.data, 'integration', 'TikTok Integration')
-        set_setting('zalo_oa', form.zalo_oa.data, 'integration', 'Zalo OA')
+        values['cloudinary_api_key'] = (form.cloudinary_api_key.data, 'integration', 'API Key Cloudinary')
+        values['gemini_api_key'] = (form.gemini_api_key.data, 'integration', 'API Key Gemini/OpenAI')
+        values['google_analytics'] = (form.google_analytics.data, 'integration', 'Google Analytics ID')
+        values['shopee_api'] = (form.shopee_api.data, 'integration', 'Shopee Integration')
+        values['tiktok_api'] = (form.tiktok_api.data, 'integration', 'TikTok Integration')
+        values['zalo_oa'] = (form.zalo_oa.data, 'integration', 'Zalo OA')
 
         # ==================== CONTENT DEFAULTS ====================
-        set_setting('terms_of_service', form.terms_of_service.data, 'content', 'Điều khoản dịch vụ')
-        set_setting('shipping_policy', form.shipping_policy.data, 'content', 'Chính sách vận chuyển')
-        set_setting('return_policy', form.return_policy.data, 'content', 'Chính sách đổi trả')
-        set_setting('warranty_policy', form.warranty_policy.data, 'content', 'Chính sách bảo hành')
-        set_setting('privacy_policy', form.privacy_policy.data, 'content', 'Chính sách bảo mật')
-        set_setting('contact_form', form.contact_form.data, 'content', 'Form liên hệ mặc định')
-        set_setting('default_posts_per_page', str(form.default_posts_per_page.data), 'content',
-                    'Số lượng bài viết mặc định')
-
-        # ==================== GENERATE SEO FILES ====================
+        values['terms_of_service'] = (form.terms_of_service.data, 'content', 'Điều khoản dịch vụ')
+        values['shipping_policy'] = (form.shipping_policy.data, 'content', 'Chính sách vận chuyển')
+        values['return_policy'] = (form.return_policy.data, 'content', 'Chính sách đổi trả')
+        values['warranty_policy'] = (form.warranty_policy.data, 'content', 'Chính sách bảo hành')
+        values['privacy_policy'] = (form.privacy_policy.data, 'content', 'Chính sách bảo mật')
+        values['contact_form'] = (form.contact_form.data, 'content', 'Form liên hệ mặc định')
+        values['default_posts_per_page'] = (str(form.default_posts_per_page.data), 'content',
+                                            'Số lượng bài viết mặc định')
+
+        # Upload lỗi (None) -> giữ giá trị cũ
+        values = {key: value for key, value in values.items() if value[0] is not None}
+
         try:
-            generate_sitemap()
-            generate_robots_txt()
+            changed = save_settings(values)
         except Exception as e:
-            flash(f'Cảnh báo: Không thể tạo sitemap/robots.txt - {str(e)}', 'warning')
+            flash(f'Lỗi khi lưu cài đặt: {str(e)}', 'danger')
+            changed = None
+
+        if changed is not None:
+            # ==================== GENERATE SEO FILES ====================
+            # Chỉ tạo lại khi key liên quan thay đổi (hoặc chưa có file)
+            seo_files_missing = not all(os.path.exists(os.path.join(current_app.static_folder, name))
+                                        for name in ('sitemap.xml', 'robots.txt'))
+            if changed & SEO_FILE_KEYS or seo_files_missing:
+                try:
+                    generate_sitemap()
+                    generate_robots_txt()
+                except Exception as e:
+                    flash(f'Cảnh báo: Không thể tạo sitemap/robots.txt - {str(e)}', 'warning')
 
-        flash('✅ Cài đặt đã được lưu thành công!', 'success')
+            if changed:
+                flash(f'✅ Cài đặt đã được lưu thành công! ({len(changed)} mục thay đổi)', 'success')
+            else:
+                flash('Không có thay đổi nào.', 'info')
 
-        # ✅ QUAN TRỌNG: SAU KHI LƯU, LOAD LẠI TẤT CẢ PREVIEW TỪ DATABASE
-        # Để hiển thị ảnh preview sau khi submit
-        form.logo_url = get_setting('logo_url', '')
-        form.logo_chatbot_url = get_setting('logo_chatbot_url', '')
-        form.favicon_ico_url = get_setting('favicon_ico_url', '')
-        form.favicon_png_url = get_setting('favicon_png_url', '')
-        form.favicon_svg_url = get_setting('favicon_svg_url', '')
-        form.apple_touch_icon_url = get_setting('apple_touch_icon_url', '')
-        form.favicon_url = get_setting('favicon_url', '/static/img/favicon.ico')
-        form.default_share_image_url = get_setting('default_share_image', '/static/img/default-share.jpg')
+            # Load lại giá trị vừa lưu để hiển thị preview
+            current = get_settings()
 
     # ==================== LOAD DỮ LIỆU VÀO FORM (CHO CẢ GET VÀ POST) ====================
     # ✅ LUÔN LOAD PREVIEW - BẤT KỂ GET HAY POST
 
     # General Settings
-    form.website_name.data = get_setting('website_name', 'Hoangvn')
-    form.slogan.data = get_setting('slogan', '')
-    form.address.data = get_setting('address', '982/l98/a1 Tân Bình, Tân Phú Nhà Bè')
-    form.email.data = get_setting('email', 'info@hoang.vn')
-    form.hotline.data = get_setting('hotline', '098.422.6602')
-    form.main_url.data = get_setting('main_url', request.url_root)
-    form.company_info.data = get_setting('company_info',
+    form.website_name.data = current.get('website_name', 'Hoangvn')
+    form.slogan.data = current.get('slogan', '')
+    form.address.data = current.get('address', '982/l98/a1 Tân Bình, Tân Phú Nhà Bè')
+    form.email.data = current.get('email', 'info@hoang.vn')
+    form.hotline.data = current.get('hotline', '098.422.6602')
+    form.main_url.data = current.get('main_url', request.url_root)
+    form.company_info.data = current.get('company_info',
                                          'Chúng tôi là công ty hàng đầu trong lĩnh vực thương mại điện tử.')
 
     # ✅ Theme/UI Settings - LOAD PREVIEW IMAGES
-    form.primary_color.data = get_setting('primary_color', '#007bff')
-    form.logo_url = get_setting('logo_url', '')
-    form.logo_chatbot_url = get_setting('logo_chatbot_url', '')
+    form.primary_color.data = current.get('primary_color', '#007bff')
+    form.logo_url = current.get('logo_url', '')
+    form.logo_chatbot_url = current.get('logo_chatbot_url', '')
 
     # SEO & Meta Defaults
-    form.meta_title.data = get_setting('meta_title', 'Hoangvn - Website doanh nghiệp chuyên nghiệp')
-    form.meta_description.data = get_setting('meta_description',
+    form.meta_title.data = current.get('meta_title', 'Hoangvn - Website doanh nghiệp chuyên nghiệp')
+    form.meta_description.data = current.get('meta_description',
                                              'Website doanh nghiệp chuyên nghiệp cung cấp sản phẩm và dịch vụ chất lượng cao.')
-    form.meta_keywords.data = get_setting('meta_keywords', 'thiết kế web, hoangvn, thương mại điện tử')
+    form.meta_keywords.data = current.get('meta_keywords', 'thiết kế web, hoangvn, thương mại điện tử')
 
     # ✅ SEO - LOAD PREVIEW IMAGES
-    form.favicon_ico_url = get_setting('favicon_ico_url', '/static/img/favicon.ico')
-    form.favicon_png_url = get_setting('favicon_png_url', '/static/img/favicon-96x96.png')
-    form.favicon_svg_url = get_setting('favicon_svg_url', '/static/img/favicon.svg')
-    form.apple_touch_icon_url = get_setting('apple_touch_icon_url', '/static/img/apple-touch-icon.png')
-    form.favicon_url = get_setting('favicon_url', '/static/img/favicon.ico')
-    form.default_share_image_url = get_setting('default_share_image', '/static/img/default-share.jpg')
+    form.favicon_ico_url = current.get('favicon_ico_url', '/static/img/favicon.ico')
+    form.favicon_png_url = current.get('favicon_png_url', '/static/img/favicon-96x96.png')
+    form.favicon_svg_url = current.get('favicon_svg_url', '/static/img/favicon.svg')
+    form.apple_touch_icon_url = current.get('apple_touch_icon_url', '/static/img/apple-touch-icon.png')
+    form.favicon_url = current.get('favicon_url', '/static/img/favicon.ico')
+    form.default_share_image_url = current.get('default_share_image', '/static/img/default-share.jpg')
 
     # Page-specific meta descriptions
-    form.index_meta_description.data = get_setting('index_meta_description',
+    form.index_meta_description.data = current.get('index_meta_description',
                                                    'Khám phá các sản phẩm và dịch vụ chất lượng cao từ Hoangvn.')
-    form.about_meta_description.data = get_setting('about_meta_description',
+    form.about_meta_description.data = current.get('about_meta_description',
                                                    'Giới thiệu về Hoangvn - Công ty hàng đầu trong thương mại điện tử.')
-    form.contact_meta_description.data = get_setting('contact_meta_description',
+    form.contact_meta_description.data = current.get('contact_meta_description',
                                                      'Liên hệ với Hoangvn để được tư vấn và hỗ trợ nhanh chóng.')
-    form.products_meta_description.data = get_setting('products_meta_description',
+    form.products_meta_description.data = current.get('products_meta_description',
                                                       'Khám phá danh sách sản phẩm chất lượng cao từ Hoangvn.')
-    form.product_meta_description.data = get_setting('product_meta_description',
+    form.product_meta_description.data = current.get('product_meta_description',
                                                      'Mua sản phẩm chất lượng cao từ Hoangvn với giá tốt nhất.')
-    form.blog_meta_description.data = get_setting('blog_meta_description', 'Tin tức và kiến thức hữu ích từ Hoangvn.')
-    form.careers_meta_description.data = get_setting('careers_meta_description',
+    form.blog_meta_description.data = current.get('blog_meta_description', 'Tin tức và kiến thức hữu ích từ Hoangvn.')
+    form.careers_meta_description.data = current.get('careers_meta_description',
                                                      'Cơ hội nghề nghiệp tại Hoangvn với môi trường làm việc chuyên nghiệp.')
-    form.faq_meta_description.data = get_setting('faq_meta_description',
+    form.faq_meta_description.data = current.get('faq_meta_description',
                                                  'Câu hỏi thường gặp về sản phẩm và dịch vụ của Hoangvn.')
-    form.projects_meta_description.data = get_setting('projects_meta_description',
+    form.projects_meta_description.data = current.get('projects_meta_description',
                                                       'Các dự án tiêu biểu đã được Hoangvn thực hiện thành công.')
 
     # Contact & Social Settings
-    form.contact_email.data = get_setting('contact_email', 'contact@example.com')
-    form.facebook_url.data = get_setting('facebook_url', '')
-    form.facebook_messenger_url.data = get_setting('facebook_messenger_url', '')
-    form.zalo_url.data = get_setting('zalo_url', '')
-    form.tiktok_url.data = get_setting('tiktok_url', '')
-    form.youtube_url.data = get_setting('youtube_url', '')
-    form.google_maps.data = get_setting('google_maps', '')
-    form.hotline_north.data = get_setting('hotline_north', '(024) 2222 2222')
-    form.hotline_central.data = get_setting('hotline_central', '(024) 1111 1113')
-    form.hotline_south.data = get_setting('hotline_south', '(028) 1111 1111')
-    form.working_hours.data = get_setting('working_hours', '8h - 17h30 (Thứ 2 - Thứ 7)')
-    form.branch_addresses.data = get_setting('branch_addresses',
+    form.contact_email.data = current.get('contact_email', 'contact@example.com')
+    form.facebook_url.data = current.get('facebook_url', '')
+    form.facebook_messenger_url.data = current.get('facebook_messenger_url', '')
+    form.zalo_url.data = current.get('zalo_url', '')
+    form.tiktok_url.data = current.get('tiktok_url', '')
+    form.youtube_url.data = current.get('youtube_url', '')
+    form.google_maps.data = current.get('google_maps', '')
+    form.hotline_north.data = current.get('hotline_north', '(024) 2222 2222')
+    form.hotline_central.data = current.get('hotline_central', '(024) 1111 1113')
+    form.hotline_south.data = current.get('hotline_south', '(028) 1111 1111')
+    form.working_hours.data = current.get('working_hours', '8h - 17h30 (Thứ 2 - Thứ 7)')
+    form.branch_addresses.data = current.get('branch_addresses',
         '982/l98/a1 Tân Bình, Tân Phú, Nhà Bè\n123 Đường ABC, Quận 1, TP.HCM\n456 Đường XYZ, Quận 3, TP.HCM')
 
     # System & Security Settings
-    form.login_attempt_limit.data = int(get_setting('login_attempt_limit', '5'))
-    form.cache_time.data = int(get_setting('cache_time', '3600'))
+    form.login_attempt_limit.data = int(current.get('login_attempt_limit', '5'))
+    form.cache_time.data = int(current.get('cache_time', '3600'))
 
     # Integration Settings
-    form.cloudinary_api_key.data = get_setting('cloudinary_api_key', '')
-    form.gemini_api_key.data = get_setting('gemini_api_key', '')
-    form.google_analytics.data = get_setting('google_analytics', '')
-    form.shopee_api.data = get_setting('shopee_api', '')
-    form.tiktok_api.data = get_setting('tiktok_api', '')
-    form.zalo_oa.data = get_setting('zalo_oa', '')
+    form.cloudinary_api_key.data = current.get('cloudinary_api_key', '')
+    form.gemini_api_key.data = current.get('gemini_api_key', '')
+    form.google_analytics.data = current.get('google_analytics', '')
+    form.shopee_api.data = current.get('shopee_api', '')
+    form.tiktok_api.data = current.get('tiktok_api', '')
+    form.zalo_oa.data = current.get('zalo_oa', '')
 
     # Content Defaults
-    form.shipping_policy.data = get_setting('shipping_policy', '')
-    form.return_policy.data = get_setting('return_policy', '')
-    form.warranty_policy.data = get_setting('warranty_policy', '')
-    form.privacy_policy.data = get_setting('privacy_policy', '')
-    form.contact_form.data = get_setting('contact_form', '')
-    form.default_posts_per_page.data = int(get_setting('default_posts_per_page', '12'))
+    form.shipping_policy.data = current.get('shipping_policy', '')
+    form.return_policy.data = current.get('return_policy', '')
+    form.warranty_policy.data = current.get('warranty_policy', '')
+    form.privacy_policy.data = current.get('privacy_policy', '')
+    form.contact_form.data = current.get('contact_form', '')
+    form.default_posts_per_page.data = int(current.get('default_posts_per_page', '12'))
 
     return render_template('admin/settings.html', form=form)
 
@@ -2268,10 +2401,12 @@ def generate_sitemap():
         ET.SubElement(url, 'changefreq').text = 'weekly'
         ET.SubElement(url, 'priority').text = '0.8'
 
-    # Ghi file sitemap.xml
+    # Ghi file sitemap.xml (file tạm rồi đổi tên: request đang đọc không thấy file ghi dở)
     sitemap_path = os.path.join(current_app.static_folder, 'sitemap.xml')
     tree = ET.ElementTree(sitemap)
-    tree.write(sitemap_path)
+    tmp_path = f'{sitemap_path}.{os.getpid()}.tmp'
+    tree.write(tmp_path)
+    os.replace(tmp_path, sitemap_path)
 
 
 def generate_robots_txt():
@@ -0,0 +1,256 @@
+"""
+Nguồn dữ liệu cho catalog JSON API (chỉ đọc)
+
+- RESOURCES: mỗi loại (products, categories, blogs, projects, jobs) khai báo
+  các field được phép (cột / biểu thức SQL) + field mặc định (không gồm HTML
+  dài: content, requirements...). ?fields= chọn field -> chỉ SELECT đúng các
+  cột đó (như app/listings.py), không nạp object ORM
+- Phân trang cursor theo (updated_at, id) trên index ix_<bảng>_updated_at_id:
+  trang nào cũng nhanh như trang đầu, không OFFSET
+- Delta sync: ?since=<ISO 8601> -> bản ghi có updated_at >= since, kể cả đã
+  ẩn (trả {"id", "slug", "deleted": true}) + bản ghi đã xóa hẳn (bảng
+  catalog_tombstones, ghi bằng mapper event after_delete)
+- since chỉ hợp lệ trong API_SYNC_HORIZON_DAYS ngày: tombstone cũ hơn mốc đó
+  (+ API_SYNC_OVERLAP) bị xóa bằng purge_tombstones() -> bảng không phình mãi
+- Version mỗi loại = số dòng + updated_at lớn nhất (1 query aggregate) ->
+  ETag + key cache của trang kết quả: dữ liệu đổi thì version đổi, không cần xóa
+- Field lấy từ bảng khác (slug danh mục của sản phẩm): loại đó khai báo
+  depends_on -> version gồm cả version bảng kia, delta sync trả lại cả bản
+  ghi có bản ghi liên quan đổi từ since (đổi slug danh mục -> sản phẩm thuộc danh mục)
+- Chi tiết theo slug: read-model của trang HTML (app/entity_cache.py)
+"""
+import base64
+from datetime import datetime, timedelta, timezone
+from types import FunctionType
+
+from flask import current_app
+from sqlalchemy import and_, event, func, insert, or_, select
+
+from app import db
+from app.entity_cache import get_entity
+from app.listings import ProductCard
+from app.models import Product, Category, Blog, Project, Job, CatalogTombstone
+
+
+def _columns(model, *names):
+    return {name: getattr(model, name) for name in names}
+
+
+# Loại -> model, loại read-model trang chi tiết (None: không có API chi tiết),
+# field được phép (tên -> cột / hàm trả biểu thức SQL), field mặc định,
+# depends_on: loại khác có field được trả kèm -> cột khóa ngoại trỏ tới loại đó
+RESOURCES = {
+    'products': {
+        'model': Product,
+        'entity': 'product',
+        'fields': {
+            **_columns(Product, 'id', 'slug', 'name', 'description', 'price', 'old_price', 'image',
+                       'is_featured', 'category_id'),
+            'category': ProductCard.expressions['category_slug'],  # slug danh mục
+            **_columns(Product, 'created_at', 'updated_at'),
+        },
+        'default_fields': ('id', 'slug', 'name', 'description', 'price', 'old_price', 'image',
+                           'is_featured', 'category', 'updated_at'),
+        'depends_on': {'categories': Product.category_id},
+    },
+    'categories': {
+        'model': Category,
+        'entity': None,
+        'fields': _columns(Category, 'id', 'slug', 'name', 'description', 'image', 'created_at', 'updated_at'),
+        'default_fields': ('id', 'slug', 'name', 'description', 'image', 'updated_at'),
+    },
+    'blogs': {
+        'model': Blog,
+        'entity': 'blog',
+        'fields': _columns(Blog, 'id', 'slug', 'title', 'excerpt', 'content', 'image', 'author',
+                           'is_featured', 'created_at', 'updated_at'),
+        'default_fields': ('id', 'slug', 'title', 'excerpt', 'image', 'author', 'created_at', 'updated_at'),
+    },
+    'projects': {
+        'model': Project,
+        'entity': 'project',
+        'fields': _columns(Project, 'id', 'slug', 'title', 'client', 'location', 'year', 'description',
+                           'content', 'image', 'project_type', 'area', 'products_used', 'is_featured',
+                           'created_at', 'updated_at'),
+        'default_fields': ('id', 'slug', 'title', 'client', 'location', 'year', 'description', 'image',
+                           'project_type', 'area', 'updated_at'),
+    },
+    'jobs': {
+        'model': Job,
+        'entity': 'job',
+        'fields': _columns(Job, 'id', 'slug', 'title', 'department', 'location', 'job_type', 'level',
+                           'salary', 'experience', 'description', 'requirements', 'benefits', 'deadline',
+                           'contact_email', 'is_urgent', 'created_at', 'updated_at'),
+        'default_fields': ('id', 'slug', 'title', 'department', 'location', 'job_type', 'level', 'salary',
+                           'experience', 'deadline', 'is_urgent', 'updated_at'),
+    },
+}
+
+MODEL_RESOURCES = {source['model']: name for name, source in RESOURCES.items()}
+
+
+# ==================== THAM SỐ ====================
+def parse_fields(resource, raw):
+    """?fields=a,b -> tuple field (rỗng: field mặc định); field lạ -> ValueError"""
+    source = RESOURCES[resource]
+    if not raw:
+        return source['default_fields']
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in source['fields']]
+    if unknown:
+        raise ValueError(f"Field không hợp lệ: {', '.join(unknown)} "
+                         f"(cho phép: {', '.join(source['fields'])})")
+    return fields or source['default_fields']
+
+
+def parse_since(raw):
+    """ISO 8601 (có / không múi giờ) -> datetime UTC không tz như cột updated_at; sai -> ValueError"""
+    if not raw:
+        return None
+    try:
+        value = datetime.fromisoformat(raw.strip().replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError('since không hợp lệ (cần ISO 8601, VD: 2026-01-31T08:00:00Z)')
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(updated_at, entity_id):
+    raw = f'{updated_at.isoformat()}|{entity_id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Cursor -> (updated_at, id); cursor sai định dạng -> ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        updated_at, entity_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(updated_at), int(entity_id)
+    except Exception:
+        raise ValueError('Cursor không hợp lệ')
+
+
+def to_json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat() + 'Z'  # Cột lưu giờ UTC
+    return value
+
+
+# ==================== ĐỌC ====================
+def version(resource):
+    """Version hiện tại của loại: đổi khi thêm / sửa / ẩn / xóa bất kỳ bản ghi nào (kể cả của depends_on)"""
+    source = RESOURCES[resource]
+    model = source['model']
+    count, last_updated = db.session.query(func.count(model.id), func.max(model.updated_at)).one()
+    current = f'{count}@{last_updated.isoformat() if last_updated else ""}'
+    for dependency in source.get('depends_on', {}):
+        current += f'+{version(dependency)}'
+    return current
+
+
+def page(resource, fields, cursor=None, since=None, limit=50):
+    """
+    1 trang theo (updated_at, id) tăng dần
+
+    Returns:
+        dict: data, next_cursor (None: hết), deleted (chỉ trang đầu của delta sync)
+    """
+    source = RESOURCES[resource]
+    model = source['model']
+    columns = []
+    for name in fields:
+        column = source['fields'][name]
+        columns.append((column() if isinstance(column, FunctionType) else column).label(name))
+    query = db.session.query(
+        *columns, model.id.label('row_id'), model.slug.label('row_slug'),
+        model.updated_at.label('row_updated_at'), model.is_active.label('row_active')
+    ).select_from(model)
+
+    if since is None:
+        query = query.filter(model.is_active == True)
+    else:
+        changed = [model.updated_at >= since]
+        for dependency, foreign_key in source.get('depends_on', {}).items():
+            related = RESOURCES[dependency]['model']
+            changed.append(foreign_key.in_(select(related.id).where(related.updated_at >= since)))
+        query = query.filter(or_(*changed))
+    if cursor:
+        updated_at, entity_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            model.updated_at > updated_at,
+            and_(model.updated_at == updated_at, model.id > entity_id)
+        ))
+
+    rows = query.order_by(model.updated_at, model.id).limit(limit + 1).all()
+    data = []
+    for row in rows[:limit]:
+        if row.row_active:
+            data.append({name: to_json_value(getattr(row, name)) for name in fields})
+        else:
+            # Delta sync: bản ghi đã ẩn -> đối tác gỡ khỏi catalog
+            data.append({'id': row.row_id, 'slug': row.row_slug, 'deleted': True,
+                         'updated_at': to_json_value(row.row_updated_at)})
+
+    result = {'data': data, 'next_cursor': None}
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        result['next_cursor'] = encode_cursor(last.row_updated_at, last.row_id)
+    if since is not None and not cursor:
+        result['deleted'] = [
+            {'id': entity_id, 'slug': slug, 'deleted_at': to_json_value(deleted_at)}
+            for entity_id, slug, deleted_at in db.session.query(
+                CatalogTombstone.entity_id, CatalogTombstone.slug, CatalogTombstone.deleted_at
+            ).filter(CatalogTombstone.resource == resource, CatalogTombstone.deleted_at >= since)
+            .order_by(CatalogTombstone.deleted_at)
+        ]
+    return result
+
+
+def detail(resource, slug, fields=None):
+    """
+    1 bản ghi active theo slug từ read-model trang HTML (cache -> DB), không có -> None
+    Mặc định trả mọi field + gallery (sản phẩm / dự án)
+    """
+    source = RESOURCES[resource]
+    entity = get_entity(source['entity'], slug)
+    if entity is None:
+        return None
+
+    item = {}
+    for name in fields or source['fields']:
+        if name == 'category':
+            category = entity.category
+            item[name] = category.slug if category is not None else None
+        else:
+            item[name] = to_json_value(getattr(entity, name))
+    if not fields and hasattr(entity, 'gallery_images'):
+        item['gallery'] = [{'url': image.url, **image.get_seo_info()} for image in entity.gallery_images]
+    return item
+
+
+# ==================== GHI NHẬN BẢN GHI ĐÃ XÓA ====================
+def _record_tombstone(mapper, connection, target):
+    connection.execute(insert(CatalogTombstone.__table__).values(
+        resource=MODEL_RESOURCES[type(target)], entity_id=target.id, slug=target.slug,
+        deleted_at=datetime.utcnow()))
+
+
+def sync_horizon():
+    """since cũ hơn mốc này bị từ chối: tombstone trước đó có thể đã bị xóa"""
+    return datetime.utcnow() - timedelta(days=current_app.config.get('API_SYNC_HORIZON_DAYS', 30))
+
+
+def purge_tombstones():
+    """Xóa tombstone cũ hơn sync_horizon() - API_SYNC_OVERLAP (không client hợp lệ nào còn cần) - trả về số dòng"""
+    cutoff = sync_horizon() - timedelta(seconds=current_app.config.get('API_SYNC_OVERLAP', 60))
+    count = CatalogTombstone.query.filter(CatalogTombstone.deleted_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+def init_app(app):
+    """Ghi catalog_tombstones khi xóa hẳn bản ghi (delta sync cần biết để xóa theo)"""
+    for model in MODEL_RESOURCES:
+        if not event.contains(model, 'after_delete', _record_tombstone):
+            event.listen(model, 'after_delete', _record_tombstone)
@@ -0,0 +1,136 @@
+"""
+Catalog JSON API v1 (chỉ đọc) cho app mobile / feed đối tác
+
+    GET /api/v1/<loại>                  products, categories, blogs, projects, jobs
+        ?fields=id,name,price           chỉ trả (và chỉ SELECT) các field này
+        ?limit=50&cursor=...            phân trang cursor (next_cursor trong kết quả)
+        ?since=2026-01-31T08:00:00Z     delta sync: chỉ bản ghi đổi / ẩn / xóa từ thời điểm đó
+    GET /api/v1/<loại>/<slug>           chi tiết (read-model dùng chung với trang HTML)
+
+- ETag (weak) + If-None-Match -> 304: danh sách chỉ cần 1 query version, không
+  chạy query trang; kết quả trang được cache theo version (app/cache.py)
+- gzip khi client gửi Accept-Encoding: gzip và body đủ lớn
+- Lần đồng bộ sau: gọi lại với since = synced_at của lần trước; since cũ hơn
+  API_SYNC_HORIZON_DAYS ngày -> 410 (bản ghi đã xóa có thể không còn ghi nhận),
+  client đồng bộ lại toàn bộ (bỏ since)
+"""
+import gzip
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, jsonify, request
+
+from app.api import api_bp
+from app.api import catalog
+from app.cache import get_or_set
+
+
+def _error(message, status=400):
+    return jsonify({'error': message}), status
+
+
+def _etag(*parts):
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def _not_modified(etag):
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        _cache_headers(response, etag)
+        return response
+    return None
+
+
+def _cache_headers(response, etag):
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config.get('API_MAX_AGE', 60)}"
+    response.vary.add('Accept-Encoding')
+
+
+def _encode(payload):
+    """JSON gọn (không khoảng trắng) + bản gzip nếu đủ lớn: (body, gzip body hoặc None)"""
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if len(body) < current_app.config.get('API_GZIP_MIN_BYTES', 1024):
+        return body, None
+    return body, gzip.compress(body, compresslevel=current_app.config.get('API_GZIP_LEVEL', 6))
+
+
+def _json_response(encoded, etag):
+    body, gzipped = encoded
+    response = Response(mimetype='application/json')
+    if gzipped is not None and request.accept_encodings['gzip']:
+        response.set_data(gzipped)
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response.set_data(body)
+    _cache_headers(response, etag)
+    return response
+
+
+# ==================== DANH SÁCH ====================
+@api_bp.route('/<resource>')
+def items(resource):
+    """Danh sách 1 loại: sparse fieldset + cursor + delta sync"""
+    if resource not in catalog.RESOURCES:
+        return _error(f'Không có loại {resource}', 404)
+
+    config = current_app.config
+    try:
+        fields = catalog.parse_fields(resource, request.args.get('fields'))
+        since = catalog.parse_since(request.args.get('since'))
+        cursor = request.args.get('cursor') or None
+        if cursor:
+            catalog.decode_cursor(cursor)
+    except ValueError as e:
+        return _error(str(e))
+    if since is not None and since < catalog.sync_horizon():
+        return _error(f"since cũ hơn {config.get('API_SYNC_HORIZON_DAYS', 30)} ngày: đồng bộ lại toàn bộ (bỏ since)", 410)
+    limit = max(1, min(request.args.get('limit', config.get('API_PAGE_SIZE', 50), type=int),
+                       config.get('API_MAX_PAGE_SIZE', 200)))
+
+    version = catalog.version(resource)
+    etag = _etag(resource, version, ','.join(fields), cursor, since, limit)
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    # Lùi API_SYNC_OVERLAP giây: bản ghi của transaction commit muộn vẫn lọt vào lần đồng bộ sau
+    synced_at = datetime.utcnow() - timedelta(seconds=config.get('API_SYNC_OVERLAP', 60))
+
+    def compute():
+        payload = catalog.page(resource, fields, cursor=cursor, since=since, limit=limit)
+        if since is not None:
+            payload['synced_at'] = catalog.to_json_value(synced_at)
+        return _encode(payload)
+
+    # Key gồm version: dữ liệu đổi -> key mới, bản cũ tự hết hạn
+    encoded = get_or_set(f'api:{resource}', (version, etag), compute, ttl=config.get('API_CACHE_TTL', 300))
+    return _json_response(encoded, etag)
+
+
+# ==================== CHI TIẾT ====================
+@api_bp.route('/<resource>/<slug>')
+def item(resource, slug):
+    """1 bản ghi active theo slug"""
+    source = catalog.RESOURCES.get(resource)
+    if source is None or source['entity'] is None:
+        return _error(f'Không có API chi tiết cho {resource}', 404)
+
+    fields = None  # Mặc định: mọi field + gallery
+    if request.args.get('fields'):
+        try:
+            fields = catalog.parse_fields(resource, request.args['fields'])
+        except ValueError as e:
+            return _error(str(e))
+
+    data = catalog.detail(resource, slug, fields)
+    if data is None:
+        return _error('Không tìm thấy', 404)
+
+    encoded = _encode({'data': data})
+    etag = _etag(resource, hashlib.sha1(encoded[0]).hexdigest())
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+    return _json_response(encoded, etag)
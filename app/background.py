@@ -0,0 +1,102 @@
+"""
+Worker nền dạng thread cho hàng đợi lưu trong DB (tombstone xóa media, outbox...)
+
+- Mỗi process có 1 thread / worker, tạo khi được đánh thức lần đầu (an toàn
+  sau fork của gunicorn: thread của master không theo sang worker)
+- Thread xử lý tới khi hàng đợi trống, chờ tới hạn retry gần nhất rồi chạy
+  tiếp; hết việc thì tự dừng, lần wake() sau tạo lại
+- Mỗi vòng chạy trong app context mới (session riêng, không đụng session
+  của request)
+- wake_on_start(app): đánh thức ở request đầu tiên của mỗi process -> việc
+  đang chờ retry trong DB chạy tiếp sau khi worker gunicorn bị tái chế
+  (max_requests, RSS) hoặc sau deploy, không phải chờ lần ghi mới
+
+    worker = BackgroundWorker('outbox', process=dispatch_pending, next_due=next_due_at)
+    worker.wake_on_start(app)
+    worker.wake()
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app, request
+
+from app import db
+
+# Key trong WSGI environ của request làm nóng (app/server.py, chạy trong master
+# của gunicorn trước khi fork) - không đánh thức worker nền
+WARMUP_ENVIRON_KEY = 'hoangvn.warmup'
+
+
+class BackgroundWorker:
+    def __init__(self, name, process, next_due, async_config=None, error_delay=30):
+        """
+        Args:
+            process: hàm xử lý hết việc đến hạn (chạy trong app context)
+            next_due: hàm trả về datetime việc gần nhất đến hạn (None nếu hết việc)
+            async_config: key config bật/tắt chạy nền (False -> process() chạy ngay khi wake)
+            error_delay: số giây chờ trước khi chạy lại sau lỗi
+        """
+        self.name = name
+        self.process = process
+        self.next_due = next_due
+        self.async_config = async_config
+        self.error_delay = error_delay
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._started_pid = None  # Process đã được đánh thức lúc khởi động
+
+    def _run(self, app):
+        while True:
+            with app.app_context():
+                try:
+                    self.process()
+                    due = self.next_due()
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception('Lỗi worker nền %s', self.name)
+                    due = datetime.utcnow() + timedelta(seconds=self.error_delay)
+                finally:
+                    db.session.remove()
+
+            with self._lock:
+                if due is None and not self._event.is_set():
+                    self._thread = None
+                    return
+
+            wait = max((due - datetime.utcnow()).total_seconds(), 0) if due else 0
+            self._event.wait(timeout=wait)
+            self._event.clear()
+
+    def wake(self, app=None):
+        """Đánh thức worker của process hiện tại (tạo mới nếu chưa có / sau khi fork)"""
+        app = app or current_app._get_current_object()
+        if self.async_config and not app.config.get(self.async_config, True):
+            self.process()
+            return
+
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                self._event.set()
+                return
+            self._event.clear()
+            self._thread = threading.Thread(target=self._run, args=(app,), name=self.name, daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def wake_on_start(self, app):
+        """
+        Đánh thức worker ở request đầu tiên của mỗi process (1 lần kiểm tra pid / request)
+        Chế độ đồng bộ (async_config = False) thì bỏ qua: không có thread để chạy retry
+        """
+        def wake_first_request():
+            if self._started_pid == os.getpid() or request.environ.get(WARMUP_ENVIRON_KEY):
+                return
+            self._started_pid = os.getpid()
+            if self.async_config and not app.config.get(self.async_config, True):
+                return
+            self.wake(app)
+
+        app.before_request(wake_first_request)
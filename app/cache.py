@@ -0,0 +1,216 @@
+"""
+Cache chia theo namespace: trong bộ nhớ từng process (TTL + LRU) hoặc Redis dùng chung
+
+- Mỗi namespace có version: invalidate(namespace) tăng version -> mọi key cũ
+  của namespace đó hết hiệu lực ngay (bị LRU / TTL dọn dần)
+- Dùng cho dữ liệu đọc nhiều, tính tốn kém (facet counts, fragment template,
+  read-model sản phẩm/bài viết...) - delete(namespace, key) xóa đúng 1 key
+- Backend dùng chung: đặt CACHE_REDIS_URL -> mọi worker đọc/ghi cùng 1 Redis
+  (cần cài gói `redis`); bỏ trống -> LocalCache của từng process
+- get_or_set(): single-flight (mỗi key chỉ 1 caller tính lại) + stale-while-revalidate
+  (trong stale_ttl: caller khác nhận ngay giá trị cũ). Khóa theo backend:
+  LocalCache -> giữa các thread của process (process khác có cache riêng,
+  chờ cũng không dùng được kết quả); RedisCache -> thêm khóa theo key trên Redis
+- Giá trị được lưu luôn tính trên primary (use_primary): replica đang chậm
+  không bị giữ lại trong cache tới hết TTL (app/db_routing.py)
+
+    counts = get_or_set('facets:products', key, compute, ttl=300, stale_ttl=60)
+    invalidate('facets:products')
+    get_backend().get('fragments', key)     # backend theo cấu hình app
+"""
+import hashlib
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context
+
+from app.db_routing import use_primary
+from app.singleflight import single_flight, wait_for_lock
+
+_MISSING = object()
+
+
+class LocalCache:
+    """Dict TTL + LRU, an toàn với nhiều thread (gthread)"""
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key, default=None, stale=False):
+        """stale=True: nhận cả giá trị đã bị invalidate (chưa hết TTL) - cho stale-while-revalidate"""
+        with self._lock:
+            full_key = (namespace, key)
+            entry = self._data.get(full_key, _MISSING)
+            if entry is _MISSING:
+                return default
+            version, expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._data[full_key]
+                return default
+            if version != self._versions.get(namespace, 0) and not stale:
+                return default
+            self._data.move_to_end(full_key)
+            return value
+
+    def set(self, namespace, key, value, ttl=None):
+        with self._lock:
+            expires_at = time.monotonic() + ttl if ttl else None
+            full_key = (namespace, key)
+            self._data[full_key] = (self._versions.get(namespace, 0), expires_at, value)
+            self._data.move_to_end(full_key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def invalidate(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class RedisCache:
+    """
+    Cùng interface với LocalCache, lưu trên Redis (pickle)
+    Version namespace là 1 key INCR -> invalidate() có hiệu lực với mọi worker
+    """
+    # Khóa single-flight tự hết hạn sau chừng này giây (worker chết khi đang tính)
+    lock_ttl = 60
+
+    # Chỉ xóa khóa nếu vẫn là của mình (có thể đã hết hạn và bị caller khác giành)
+    _UNLOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def __init__(self, url, prefix='hoangvn:'):
+        from app.lazy import redis
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _version_key(self, namespace):
+        return f'{self.prefix}v:{namespace}'
+
+    def _key(self, namespace, key, version_offset=0):
+        version = int(self._client.get(self._version_key(namespace)) or 0) + version_offset
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return f'{self.prefix}{namespace}:{version}:{digest}'
+
+    def get(self, namespace, key, default=None, stale=False):
+        """stale=True: không có ở version hiện tại thì thử version ngay trước (vừa invalidate)"""
+        raw = self._client.get(self._key(namespace, key))
+        if raw is None and stale:
+            raw = self._client.get(self._key(namespace, key, version_offset=-1))
+        return pickle.loads(raw) if raw is not None else default
+
+    def set(self, namespace, key, value, ttl=None):
+        self._client.set(self._key(namespace, key), pickle.dumps(value), ex=int(ttl) if ttl else None)
+
+    def delete(self, namespace, key):
+        self._client.delete(self._key(namespace, key))
+
+    def invalidate(self, namespace):
+        self._client.incr(self._version_key(namespace))
+
+    def clear(self):
+        for key in self._client.scan_iter(f'{self.prefix}*'):
+            self._client.delete(key)
+
+    @contextmanager
+    def lock(self, name, blocking, deadline):
+        """Khóa single-flight theo key giữa mọi worker dùng chung Redis (SET NX + hết hạn)"""
+        lock_key = f"{self.prefix}lock:{hashlib.sha1(name.encode('utf-8')).hexdigest()}"
+        token = uuid.uuid4().hex
+
+        def try_acquire():
+            return bool(self._client.set(lock_key, token, nx=True, ex=self.lock_ttl))
+
+        acquired = False
+        try:
+            acquired = wait_for_lock(try_acquire, blocking, deadline)
+            yield acquired
+        finally:
+            if acquired:
+                self._client.eval(self._UNLOCK_SCRIPT, 1, lock_key, token)
+
+
+cache = LocalCache()
+
+
+def init_app(app):
+    """Chọn backend dùng chung theo CACHE_REDIS_URL (không có -> cache của process)"""
+    url = app.config.get('CACHE_REDIS_URL')
+    app.extensions['cache_backend'] = RedisCache(url) if url else cache
+
+
+def get_backend():
+    """Backend của app hiện tại (ngoài app context -> cache của process)"""
+    if has_app_context():
+        return current_app.extensions.get('cache_backend', cache)
+    return cache
+
+
+def _fresh(entry):
+    return entry is not _MISSING and (entry[0] is None or entry[0] > time.time())
+
+
+def _recompute(backend, namespace, key, compute, ttl, stale_ttl):
+    # Caller khác có thể vừa tính xong trong lúc chờ khóa
+    entry = backend.get(namespace, key, _MISSING)
+    if _fresh(entry):
+        return entry[1]
+    with use_primary():
+        value = compute()
+    fresh_until = time.time() + ttl if ttl else None
+    backend.set(namespace, key, (fresh_until, value), ttl + stale_ttl if ttl else None)
+    return value
+
+
+def get_or_set(namespace, key, compute, ttl=None, stale_ttl=0, backend=None, timeout=None):
+    """
+    Lấy từ cache, chưa có (hoặc hết hạn) thì compute() rồi lưu lại
+
+    - Single-flight: mỗi key chỉ 1 caller compute() tại 1 thời điểm (app/singleflight.py)
+      - caller khác chờ rồi dùng kết quả vừa tính; giữa các process chỉ khi backend
+      dùng chung (RedisCache.lock)
+    - stale_ttl: hết ttl nhưng chưa quá stale_ttl giây (hoặc namespace vừa bị
+      invalidate) -> 1 caller tính lại, các caller đồng thời nhận ngay giá trị cũ
+    - Chờ quá timeout (mặc định SINGLEFLIGHT_TIMEOUT) -> tự compute, không treo request
+
+    Args:
+        backend: LocalCache / RedisCache (mặc định: cache của process)
+    """
+    backend = backend or cache
+    entry = backend.get(namespace, key, _MISSING)
+    if _fresh(entry):
+        return entry[1]
+
+    lock_name = f'{namespace}:{key!r}'
+    # Cache của process -> chỉ khóa giữa các thread; backend dùng chung -> khóa trên chính backend
+    process_lock = getattr(backend, 'lock', False)
+    if stale_ttl:
+        stale = entry if entry is not _MISSING else backend.get(namespace, key, _MISSING, stale=True)
+        if stale is not _MISSING:
+            with single_flight(lock_name, blocking=False, process_lock=process_lock) as acquired:
+                if not acquired:
+                    return stale[1]  # đang có caller khác tính lại
+                return _recompute(backend, namespace, key, compute, ttl, stale_ttl)
+
+    with single_flight(lock_name, timeout=timeout, process_lock=process_lock) as acquired:
+        if not acquired:
+            return compute()  # Không lưu -> đọc replica như request thường
+        return _recompute(backend, namespace, key, compute, ttl, stale_ttl)
+
+
+def invalidate(*namespaces):
+    for namespace in namespaces:
+        cache.invalidate(namespace)
@@ -1,6 +1,6 @@
 from flask import request, jsonify, session, current_app
 from . import chatbot_bp
-import google.generativeai as genai
+from app.lazy import genai
 from datetime import datetime
 import json
 import os
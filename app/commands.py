@@ -0,0 +1,274 @@
+"""
+Các lệnh Flask CLI của ứng dụng
+VD: flask reconcile-counters, flask import-products products.csv
+"""
+import click
+
+
+def register_commands(app):
+    """Đăng ký lệnh CLI vào app"""
+
+    @app.cli.command('reconcile-counters')
+    def reconcile_counters_command():
+        """Tính lại toàn bộ bộ đếm thống kê (chạy định kỳ bằng cron)"""
+        from app.counters import reconcile_counters
+
+        totals = reconcile_counters()
+        click.echo(f"✓ Đã tính lại {len(totals)} bộ đếm")
+        for key in sorted(totals):
+            click.echo(f"  {key}: {totals[key]}")
+
+    @app.cli.command('import-products')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'xlsx', 'jsonl']),
+                  help='Định dạng file (mặc định đoán theo phần mở rộng)')
+    @click.option('--mode', type=click.Choice(['insert', 'upsert']), default='insert',
+                  help='insert: luôn tạo mới | upsert: cập nhật nếu slug đã tồn tại (PostgreSQL / SQLite)')
+    @click.option('--chunk-size', type=int, default=None, help='Số dòng mỗi lô ghi DB')
+    @click.option('--dry-run', is_flag=True, help='Chỉ kiểm tra dữ liệu, không ghi DB')
+    def import_products_command(path, fmt, mode, chunk_size, dry_run):
+        """Import sản phẩm hàng loạt từ file CSV / XLSX / JSONL"""
+        from app.importer import import_products, detect_format
+
+        fmt = fmt or detect_format(path)
+        if not fmt:
+            raise click.UsageError('Không đoán được định dạng file, hãy dùng --format')
+
+        with open(path, 'rb') as f:
+            try:
+                report = import_products(f, fmt, mode=mode, chunk_size=chunk_size, dry_run=dry_run)
+            except ValueError as e:
+                raise click.ClickException(str(e))
+
+        for item in report['errors']:
+            click.echo(f"  Dòng {item['line']}: {'; '.join(item['errors'])}", err=True)
+
+        click.echo(f"✓ Tổng {report['total']} dòng: {report['created']} thêm mới, "
+                   f"{report['updated']} cập nhật, {report['failed']} lỗi"
+                   + (' (dry-run, chưa ghi DB)' if dry_run else ''))
+
+    @app.cli.command('rebuild-related')
+    @click.option('--type', 'item_types', multiple=True,
+                  type=click.Choice(['product', 'blog', 'project']),
+                  help='Loại nội dung (mặc định: tất cả)')
+    def rebuild_related_command(item_types):
+        """Tính lại toàn bộ nội dung liên quan (chạy định kỳ bằng cron)"""
+        from app.related import RELATED_SOURCES, rebuild_related
+
+        for item_type in item_types or RELATED_SOURCES:
+            count = rebuild_related(item_type)
+            click.echo(f"✓ {item_type}: đã tính lại {count} mục")
+
+    @app.cli.command('media-cleanup')
+    @click.option('--retry-failed', is_flag=True, help='Đưa các file xóa lỗi về hàng đợi trước khi chạy')
+    @click.option('--purge-days', type=int, default=None, help='Xóa tombstone đã xong quá số ngày này')
+    def media_cleanup_command(retry_failed, purge_days):
+        """Xóa file media còn tồn đọng trên storage + đối soát tombstone (chạy định kỳ bằng cron)"""
+        from app import media_cleanup
+
+        if retry_failed:
+            click.echo(f"↻ Thử lại {media_cleanup.retry_failed()} file lỗi")
+
+        done, failed = media_cleanup.process_pending()
+        click.echo(f"✓ Đã xóa {done} file, {failed} lượt lỗi")
+
+        if purge_days is not None:
+            click.echo(f"✓ Đã dọn {media_cleanup.purge_done(purge_days)} tombstone cũ")
+
+        stats = media_cleanup.tombstone_stats()
+        click.echo(f"  pending: {stats['pending']} | done: {stats['done']} | failed: {stats['failed']}")
+
+    @app.cli.command('api-purge-tombstones')
+    def api_purge_tombstones_command():
+        """Xóa catalog_tombstones quá API_SYNC_HORIZON_DAYS ngày (chạy định kỳ bằng cron)"""
+        from app.api.catalog import purge_tombstones
+
+        click.echo(f"✓ Đã dọn {purge_tombstones()} tombstone catalog cũ")
+
+    @app.cli.command('media-gc')
+    @click.option('--min-age-days', type=int, default=7, help='Chỉ xóa media tạo trước số ngày này')
+    @click.option('--batch-size', type=int, default=500, help='Số media mỗi lô xóa')
+    @click.option('--dry-run', is_flag=True, help='Chỉ liệt kê media mồ côi, không xóa')
+    def media_gc_command(min_age_days, batch_size, dry_run):
+        """Dựng lại chỉ mục chỗ dùng media + xóa media không còn được dùng ở đâu"""
+        from app.media_cleanup import process_pending
+        from app.media_refs import collect_orphans
+
+        orphans, deleted = collect_orphans(min_age_days=min_age_days, batch_size=batch_size, dry_run=dry_run)
+        total_mb = sum(size or 0 for _id, _path, size in orphans) / (1024 * 1024)
+        click.echo(f"{len(orphans)} media mồ côi ({total_mb:.1f} MB)")
+        if dry_run:
+            for media_id, filepath, _size in orphans:
+                click.echo(f"  #{media_id} {filepath}")
+        else:
+            done, failed = process_pending()
+            click.echo(f"✓ Đã xóa {deleted} media, {done} file trên storage ({failed} lượt lỗi sẽ thử lại)")
+
+    @app.cli.command('outbox-dispatch')
+    @click.option('--retry-failed', is_flag=True, help='Đưa các thông báo gửi lỗi về hàng đợi trước khi chạy')
+    def outbox_dispatch_command(retry_failed):
+        """Gửi các thông báo còn tồn trong outbox (chạy định kỳ bằng cron)"""
+        from app import outbox
+
+        if retry_failed:
+            click.echo(f"↻ Thử lại {outbox.retry_failed()} thông báo lỗi")
+
+        sent, failed = outbox.dispatch_pending()
+        click.echo(f"✓ Đã gửi {sent} thông báo, {failed} lượt lỗi")
+
+        stats = outbox.outbox_stats()
+        click.echo(f"  pending: {stats['pending']} | sent: {stats['sent']} | failed: {stats['failed']}")
+
+    @app.cli.command('templates-compile')
+    @click.option('--top', type=int, default=10, help='Số template compile chậm nhất hiển thị')
+    @click.option('--rebuild', is_flag=True, help='Xóa bytecode cache cũ, compile lại từ đầu')
+    def templates_compile_command(top, rebuild):
+        """Compile sẵn toàn bộ template vào bytecode cache (chạy lúc build/deploy)"""
+        from app.templating import compile_templates
+
+        # Bỏ template đã nạp trong process (wsgi.py warm_up) để đo đúng thời gian nạp/compile
+        if app.jinja_env.cache is not None:
+            app.jinja_env.cache.clear()
+        if rebuild and app.jinja_env.bytecode_cache is not None:
+            app.jinja_env.bytecode_cache.clear()
+
+        compiled, errors = compile_templates(app)
+        cache_dir = getattr(app.jinja_env.bytecode_cache, 'directory', None)
+        click.echo(f"Đã compile {len(compiled)} template "
+                   f"({sum(ms for _name, ms in compiled):.0f} ms) -> {cache_dir or 'không có bytecode cache'}")
+        for name, ms in compiled[:top]:
+            click.echo(f"  {ms:>8.1f} ms  {name}")
+        for name, error in errors:
+            click.echo(f"  ✗ {name}: {error}", err=True)
+        if errors:
+            raise click.ClickException(f'{len(errors)} template lỗi')
+
+    @app.cli.command('template-profile')
+    @click.option('--path', 'paths', multiple=True, help='Trang cần đo (mặc định WARMUP_PATHS), lặp lại được')
+    @click.option('--repeat', type=int, default=5, help='Số lần gọi mỗi trang')
+    @click.option('--top', type=int, default=20, help='Số template/block hiển thị')
+    def template_profile_command(paths, repeat, top):
+        """Gọi thử các trang và in thời gian render từng template / block / include"""
+        from app.templating import process_timings, reset_process_timings
+
+        if not app.config.get('TEMPLATE_TIMING'):
+            raise click.ClickException('TEMPLATE_TIMING đang tắt')
+
+        paths = paths or app.config.get('WARMUP_PATHS', ())
+        client = app.test_client()
+        for path in paths:
+            client.get(path)  # Lần đầu: compile + cache, không tính
+        reset_process_timings()
+        for _ in range(repeat):
+            for path in paths:
+                response = client.get(path)
+                if response.status_code != 200:
+                    click.echo(f"⚠ {path}: HTTP {response.status_code}", err=True)
+
+        click.echo(f"{len(paths)} trang x {repeat} lần - sắp theo self (không tính template con):")
+        click.echo(f"  {'self ms/lần':>12} {'tổng ms/lần':>12} {'max ms':>8} {'số lần':>7}  template")
+        for name, count, total_ms, self_ms, max_ms in process_timings()[:top]:
+            click.echo(f"  {self_ms / count:>12.2f} {total_ms / count:>12.2f} {max_ms:>8.1f} {count:>7}  {name}")
+
+    @app.cli.command('query-budget')
+    @click.option('--path', 'paths', multiple=True,
+                  help='Trang cần kiểm tra (mặc định các endpoint trong QUERY_BUDGETS không cần tham số), lặp lại được')
+    @click.option('--user', 'username', help='Đăng nhập bằng user này để kiểm tra cả trang admin')
+    @click.option('--verbose', is_flag=True, help='In các câu SQL lặp lại nhiều nhất của mỗi trang')
+    def query_budget_command(paths, username, verbose):
+        """Gọi thử các trang lúc cache trống, so số câu SQL với QUERY_BUDGETS"""
+        from flask import url_for
+        from werkzeug.exceptions import HTTPException
+        from app.invalidation import reset_local
+        from app.models import User
+        from app.query_budget import count_queries, describe
+
+        budgets = app.config.get('QUERY_BUDGETS', {})
+        if not paths:
+            with app.test_request_context():
+                paths = [url_for(rule.endpoint) for rule in app.url_map.iter_rules()
+                         if rule.endpoint in budgets and not rule.arguments and 'GET' in rule.methods
+                         and (username or not rule.endpoint.startswith('admin.'))]
+
+        client = app.test_client()
+        if username:
+            user = User.query.filter_by(username=username).first()
+            if user is None:
+                raise click.ClickException(f'Không có user {username}')
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user.id)
+                session['_fresh'] = True
+
+        adapter = app.url_map.bind('localhost')
+        page_cache = app.config.get('PAGE_CACHE')
+        app.config['PAGE_CACHE'] = False  # Đo lúc phải render (cache trang trống)
+        over = []
+        try:
+            for path in sorted(set(paths)):
+                try:
+                    endpoint = adapter.match(path.split('?')[0])[0]
+                except HTTPException:
+                    endpoint = None
+                reset_local()
+                # App context riêng mỗi lần gọi: g (settings, quyền... nạp theo request) không dùng lại
+                with app.app_context(), count_queries() as statements:
+                    try:
+                        response = client.get(path)
+                    except Exception as e:
+                        over.append(path)
+                        click.echo(f"  ✗ {path}: {e!r}", err=True)
+                        continue
+                limit = budgets.get(endpoint)
+                status = '✗' if limit is not None and len(statements) > limit else '✓'
+                if status == '✗':
+                    over.append(path)
+                click.echo(f"  {status} {len(statements):>4} / {limit if limit is not None else '-':>4}  "
+                           f"HTTP {response.status_code}  {path}")
+                if verbose or status == '✗':
+                    click.echo(describe(statements))
+        finally:
+            app.config['PAGE_CACHE'] = page_cache
+
+        if over:
+            raise click.ClickException(f'{len(over)} trang lỗi / vượt ngân sách SQL')
+
+    @app.cli.command('trending-rebuild')
+    def trending_rebuild_command():
+        """Tính lại toàn bộ điểm xu hướng từ rollup lượt xem (sau khi đổi TRENDING_HALF_LIFE_HOURS)"""
+        from app import db
+        from app.trending import flush_views, refresh_scores
+
+        flushed = flush_views()
+        count = refresh_scores()
+        db.session.commit()
+        click.echo(f"✓ Đã ghi {flushed} lượt xem trong bộ đệm, tính lại điểm cho {count} mục")
+
+    @app.cli.command('startup-profile')
+    @click.option('--top', type=int, default=20, help='Số module import chậm nhất hiển thị')
+    @click.option('--json', 'as_json', is_flag=True, help='In kết quả dạng JSON (để lưu/so sánh)')
+    @click.option('--max-ms', type=float, default=None,
+                  help='Thoát với mã lỗi nếu tổng thời gian khởi động vượt ngưỡng (ms)')
+    def startup_profile_command(top, as_json, max_ms):
+        """Đo thời gian import từng module + từng giai đoạn của create_app()"""
+        import json
+        from app.startup import profile_startup
+
+        report = profile_startup()
+        slowest = sorted(report['modules'], key=lambda m: m[2], reverse=True)[:top]
+
+        if as_json:
+            click.echo(json.dumps({**report, 'modules': slowest}, ensure_ascii=False, indent=2))
+        else:
+            click.echo(f"Tổng: {report['total_ms']:.1f} ms "
+                       f"(import app {report['import_ms']:.1f} ms, create_app {report['create_app_ms']:.1f} ms)")
+            click.echo('Giai đoạn create_app:')
+            for name, ms in report['phases'].items():
+                click.echo(f"  {ms:>9.1f} ms  {name}")
+            click.echo(f'{len(slowest)} module import chậm nhất (cumulative / self):')
+            for name, self_ms, cumulative_ms in slowest:
+                click.echo(f"  {cumulative_ms:>9.1f} ms {self_ms:>8.1f} ms  {name}")
+            if report['heavy_modules_loaded']:
+                click.echo(f"⚠ SDK nặng bị nạp lúc khởi động: {', '.join(report['heavy_modules_loaded'])}")
+
+        if max_ms is not None and report['total_ms'] > max_ms:
+            raise click.ClickException(f"Khởi động {report['total_ms']:.1f} ms vượt ngưỡng {max_ms:.0f} ms")
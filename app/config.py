@@ -21,6 +21,18 @@ class Config:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # ========== CONNECTION POOL + READ REPLICA (app/db_routing.py) ==========
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')  # Bỏ trống = chỉ dùng primary
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 280))  # < timeout idle của Render/PgBouncer
+    DB_POOL_PRE_PING = True
+    # Endpoint ngoài main_bp được đọc từ replica (chỉ request GET)
+    DB_REPLICA_ENDPOINTS = ('admin.api_media', 'admin.dashboard', 'admin.welcome')
+    # Sau request ghi, client đọc từ primary trong khoảng này (giây)
+    DB_READ_YOUR_WRITES_SECONDS = 10
+
     # Cấu hình upload file
     BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
@@ -42,6 +54,137 @@ class Config:
     CHATBOT_REQUEST_WINDOW = 7200  # 1 giờ (tính bằng giây)
     CHATBOT_ENABLED = True  # Bật/tắt chatbot
 
+    # ========== BỘ ĐẾM THỐNG KÊ (stat_counters) ==========
+    # Tự tính lại toàn bộ bộ đếm nếu lần reconcile gần nhất đã quá khoảng này (giây)
+    COUNTERS_RECONCILE_INTERVAL = int(os.environ.get('COUNTERS_RECONCILE_INTERVAL', 6 * 3600))
+    # Worker nền trong mỗi process tự reconcile theo khoảng trên (False: chỉ chạy `flask reconcile-counters`)
+    COUNTERS_RECONCILE_BACKGROUND = os.environ.get('COUNTERS_RECONCILE_BACKGROUND', 'true').lower() in ('1', 'true', 'yes')
+
+    # ========== IMPORT SẢN PHẨM ==========
+    PRODUCT_IMPORT_CHUNK_SIZE = 500  # Số dòng mỗi lô executemany
+
+    # ========== XUẤT DỮ LIỆU ==========
+    EXPORT_BATCH_SIZE = 1000  # Số dòng mỗi lô đọc từ DB (yield_per)
+
+    # ========== NỘI DUNG LIÊN QUAN ==========
+    RELATED_TOP_N = 8  # Số nội dung liên quan lưu sẵn cho mỗi item
+    RELATED_WEIGHT_TEXT = 0.6  # Trọng số độ giống nội dung (TF-IDF)
+    RELATED_WEIGHT_GROUP = 0.25  # Trọng số cùng danh mục / loại dự án
+    RELATED_WEIGHT_COVIEW = 0.15  # Trọng số được xem cùng phiên
+    RELATED_REFRESH_ASYNC = True  # Tính lại sau commit trong worker nền của process (False: ngay sau commit)
+    # Giây giữa 2 lần đọc lại toàn bộ corpus TF-IDF của process (giữa 2 lần chỉ đọc các nội dung thay đổi)
+    RELATED_CORPUS_REFRESH = int(os.environ.get('RELATED_CORPUS_REFRESH', 3600))
+
+    # ========== XÓA MEDIA HÀNG LOẠT (app/media_cleanup.py) ==========
+    MEDIA_DELETE_ASYNC = True  # Xóa file trên storage trong thread nền (False: xóa ngay trong request)
+    MEDIA_DELETE_BATCH_SIZE = 500  # Số tombstone mỗi lô
+    MEDIA_DELETE_MAX_ATTEMPTS = 5  # Quá số lần thử -> failed (đối soát bằng flask media-cleanup)
+    MEDIA_DELETE_RETRY_BASE_SECONDS = 30  # Backoff: 30s, 60s, 120s... (tối đa 1 giờ)
+    MEDIA_DELETE_LEASE_SECONDS = 300  # Tombstone đang xử lý bị giữ chỗ tối đa chừng này
+
+    # ========== THÔNG BÁO LIÊN HỆ MỚI (app/outbox.py) ==========
+    # Danh sách email nhận thông báo, phân cách bằng dấu phẩy (bỏ trống = không gửi)
+    CONTACT_NOTIFY_EMAILS = [email.strip() for email in os.environ.get('CONTACT_NOTIFY_EMAILS', '').split(',')
+                             if email.strip()]
+    MAIL_SERVER = os.environ.get('MAIL_SERVER')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT', 587))
+    MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'no-reply@localhost')
+    MAIL_TIMEOUT = 10  # Giây
+    OUTBOX_ASYNC = True  # Gửi trong thread nền (False: gửi ngay sau commit, trong request)
+    OUTBOX_BATCH_SIZE = 100  # Số thông báo mỗi lô (1 kết nối SMTP / lô)
+    OUTBOX_MAX_ATTEMPTS = 8  # Quá số lần thử -> failed (flask outbox-dispatch --retry-failed)
+    OUTBOX_RETRY_BASE_SECONDS = 60  # Backoff: 60s, 120s, 240s... (tối đa 1 giờ)
+    OUTBOX_LEASE_SECONDS = 300
+
+    # ========== LỌC NHIỀU TIÊU CHÍ (app/facets.py) ==========
+    # Số lượng theo facet cache trong từng process, tự xóa khi sản phẩm/dự án/tin tuyển dụng thay đổi
+    FACET_CACHE_TTL = int(os.environ.get('FACET_CACHE_TTL', 300))
+    FACET_CACHE_STALE = int(os.environ.get('FACET_CACHE_STALE', 60))  # Giây dùng số cũ trong lúc 1 request đếm lại
+
+    # ========== CACHE READ-MODEL TRANG CHI TIẾT (app/entity_cache.py) ==========
+    # Sản phẩm / bài viết / dự án / tin tuyển dụng theo slug, xóa theo mapper event khi dữ liệu đổi
+    ENTITY_CACHE = os.environ.get('ENTITY_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    ENTITY_CACHE_TTL = int(os.environ.get('ENTITY_CACHE_TTL', 600))  # Lưới an toàn cho thao tác bulk
+
+    # ========== BUS XÓA CACHE GIỮA CÁC WORKER (app/invalidation.py) ==========
+    # auto: PostgreSQL -> LISTEN/NOTIFY, DB khác -> bảng cache_invalidations; off: chỉ xóa trong process
+    INVALIDATION_BUS = os.environ.get('INVALIDATION_BUS', 'auto')  # auto / notify / table / off
+    INVALIDATION_POLL_INTERVAL = float(os.environ.get('INVALIDATION_POLL_INTERVAL', 0))  # Giây giữa 2 lần đọc bảng (0: mỗi request)
+    INVALIDATION_RETENTION = 3600  # Giây giữ sự kiện trong bảng cache_invalidations
+
+    # ========== SINGLE-FLIGHT + CACHE TRANG (app/singleflight.py, app/page_cache.py) ==========
+    # Mỗi key cache chỉ 1 request tính lại: cache trong process khóa giữa các thread, cache Redis khóa trên Redis
+    # Khóa giữa các process cho kết quả ghi ra đĩa (sitemap.xml): auto (PostgreSQL -> advisory, còn lại -> file) / file / advisory / none
+    SINGLEFLIGHT_LOCK = os.environ.get('SINGLEFLIGHT_LOCK', 'auto')
+    SINGLEFLIGHT_LOCK_DIR = os.environ.get('SINGLEFLIGHT_LOCK_DIR')  # None: instance/locks
+    SINGLEFLIGHT_TIMEOUT = 10  # Giây chờ request khác tính xong, quá hạn thì tự tính
+    # HTML trang chủ / sản phẩm / tin tức cho khách chưa đăng nhập
+    PAGE_CACHE = os.environ.get('PAGE_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL', 60))
+    PAGE_CACHE_STALE = int(os.environ.get('PAGE_CACHE_STALE', 300))  # Giây phục vụ bản cũ trong lúc 1 request render lại
+
+    # ========== CATALOG JSON API (app/api) ==========
+    API_PAGE_SIZE = 50
+    API_MAX_PAGE_SIZE = 200
+    API_MAX_AGE = int(os.environ.get('API_MAX_AGE', 60))  # Cache-Control max-age (client / CDN)
+    API_CACHE_TTL = int(os.environ.get('API_CACHE_TTL', 300))  # Giây giữ 1 trang kết quả (key theo version dữ liệu)
+    API_GZIP_MIN_BYTES = 1024  # Body nhỏ hơn thì không nén
+    API_GZIP_LEVEL = 6
+    API_SYNC_OVERLAP = 60  # Giây synced_at lùi lại so với lúc trả (delta sync không lỡ transaction commit muộn)
+    # Delta sync chỉ nhận since trong N ngày gần nhất (cũ hơn -> 410, client đồng bộ lại toàn bộ);
+    # tombstone cũ hơn N ngày + API_SYNC_OVERLAP bị xóa (`flask api-purge-tombstones`)
+    API_SYNC_HORIZON_DAYS = int(os.environ.get('API_SYNC_HORIZON_DAYS', 30))
+
+    # ========== GỢI Ý TÌM KIẾM (app/search_index.py) ==========
+    SEARCH_SUGGEST_MIN_CHARS = 2  # Từ khóa (đã bỏ dấu) ngắn hơn thì không gợi ý
+    SEARCH_SUGGEST_LIMIT = 8
+    # Giây giữa 2 lần nạp lại toàn bộ index (lượt xem thay đổi không phát sự kiện)
+    SEARCH_INDEX_REFRESH = int(os.environ.get('SEARCH_INDEX_REFRESH', 600))
+
+    # ========== XU HƯỚNG / THỐNG KÊ LƯỢT XEM (app/trending.py) ==========
+    TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 24))  # Đổi -> flask trending-rebuild
+    TRENDING_FLUSH_INTERVAL = int(os.environ.get('TRENDING_FLUSH_INTERVAL', 30))  # Giây tối đa lượt xem nằm trong bộ đệm
+    TRENDING_FLUSH_SIZE = 500  # Bộ đệm đủ số dòng (loại, id, giờ) này thì ghi ngay
+    TRENDING_HOURLY_RETENTION_DAYS = 14  # Rollup theo giờ cũ hơn bị xóa (điểm dùng rollup theo ngày)
+    TRENDING_ASYNC = True  # Ghi bộ đệm trong thread nền (False: ghi ngay trong request khi đến hạn)
+    VIEW_STATS_UTC_OFFSET = 7  # Ngày thống kê theo giờ Việt Nam
+    VIEW_STATS_DAYS = 30  # Số ngày trên biểu đồ dashboard
+
+    # ========== NGÂN SÁCH SỐ CÂU SQL (app/query_budget.py) ==========
+    # Endpoint -> số câu SQL tối đa / request, không phụ thuộc số dòng hiển thị (N+1 -> vượt ngay)
+    QUERY_BUDGETS = {
+        'main.index': 14, 'main.products': 12, 'main.product_detail': 12,
+        'main.blog': 10, 'main.blog_detail': 12, 'main.projects': 10, 'main.project_detail': 12,
+        'main.careers': 8, 'main.job_detail': 8, 'main.about': 6, 'main.faq': 6,
+        'admin.products': 10, 'admin.categories': 10, 'admin.blogs': 10,
+        'admin.projects': 10, 'admin.jobs': 10, 'admin.contacts': 10, 'admin.permissions': 10, 'admin.users': 10,
+        'admin.dashboard': 12, 'admin.roles': 12,
+        'api.items': 8, 'api.item': 8, 'main.search_suggest': 6,
+    }
+    # Vượt ngân sách: None = raise khi TESTING, log cảnh báo khi chạy thật
+    QUERY_BUDGET_STRICT = None
+
+    # ========== TEMPLATE (app/templating.py) ==========
+    # Thư mục bytecode cache của Jinja, dùng chung giữa các worker / lần deploy
+    # (mặc định instance/jinja_cache, chuỗi rỗng = tắt)
+    TEMPLATE_CACHE_DIR = os.environ.get('TEMPLATE_CACHE_DIR')
+    # Đo thời gian render từng template / block / include -> header Server-Timing
+    TEMPLATE_TIMING = os.environ.get('TEMPLATE_TIMING', 'true').lower() in ('1', 'true', 'yes')
+    TEMPLATE_TIMING_HEADER_LIMIT = 8  # Số template chậm nhất ghi vào Server-Timing
+    TEMPLATE_SLOW_MS = int(os.environ.get('TEMPLATE_SLOW_MS', 200))  # Log cảnh báo khi render vượt ngưỡng
+    # Thẻ {% cache %} (app/fragments.py): key theo version settings/danh mục, TTL chỉ là lưới an toàn
+    FRAGMENT_CACHE = os.environ.get('FRAGMENT_CACHE', 'true').lower() in ('1', 'true', 'yes')
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 3600))
+    # Redis dùng chung cho cache (fragment...) giữa các worker - bỏ trống = cache trong từng process
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+    # ========== KHỞI ĐỘNG PRODUCTION (gunicorn preload) ==========
+    # Các trang được gọi thử trong master trước khi fork worker (làm nóng template, cache SQL)
+    WARMUP_PATHS = ('/', '/san-pham', '/tin-tuc', '/du-an')
+
     @staticmethod
     def init_app(app):
         """Khởi tạo cấu hình cho app"""
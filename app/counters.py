@@ -0,0 +1,372 @@
+"""
+Bộ đếm thống kê tính sẵn (materialized counters)
+
+- Mỗi lần flush, các thay đổi insert/update/delete trên Product, Category, Blog,
+  Contact, Media, User, Role, Permission được quy đổi thành delta và ghi vào
+  bảng stat_counters TRONG CÙNG transaction (rollback thì bộ đếm cũng rollback)
+- Dashboard chỉ cần 1 câu SELECT theo key thay vì nhiều COUNT(*) / SUM()
+- reconcile_counters() tính lại toàn bộ từ dữ liệu gốc trên primary (chạy định
+  kỳ bằng `flask reconcile-counters`, hoặc worker nền tự chạy khi quá
+  COUNTERS_RECONCILE_INTERVAL) - không chạy trong request
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event, func, insert, select, text, update
+from sqlalchemy.orm import Session, attributes
+
+from app import db
+from app.background import BackgroundWorker
+from app.db_routing import use_primary
+from app.models import Product, Category, Blog, Contact, Media, User, StatCounter
+from app.models_rbac import Role, Permission
+from app.utils import dialect_insert
+
+# Key đặc biệt lưu thời điểm reconcile gần nhất (epoch seconds)
+RECONCILED_AT_KEY = '__reconciled_at'
+
+# Khóa giữa reconcile (độc quyền) và các transaction ghi delta (dùng chung) - PostgreSQL advisory lock
+COUNTERS_LOCK_ID = 0x636F756E74  # 'count'
+
+# Các key luôn có mặt (kể cả khi bằng 0)
+BASE_KEYS = ('products', 'categories', 'blogs', 'contacts', 'contacts_unread',
+             'media', 'media_size', 'users', 'roles', 'roles_active', 'permissions')
+
+_UNKNOWN = object()
+
+
+# ==================== ĐỊNH NGHĨA BỘ ĐẾM ====================
+def _product_keys(v):
+    keys = [('products', 1)]
+    if v['category_id']:
+        keys.append((f"category_products:{v['category_id']}", 1))
+        if v['is_active']:
+            keys.append((f"category_active_products:{v['category_id']}", 1))
+    return keys
+
+
+def _contact_keys(v):
+    keys = [('contacts', 1)]
+    if not v['is_read']:
+        keys.append(('contacts_unread', 1))
+    return keys
+
+
+def _media_keys(v):
+    keys = [('media', 1), ('media_size', v['file_size'] or 0)]
+    if v['album']:
+        keys.append((f"album_media:{v['album']}", 1))
+    return keys
+
+
+def _user_keys(v):
+    keys = [('users', 1)]
+    if v['role_id'] and v['is_active']:
+        keys.append((f"role_users:{v['role_id']}", 1))
+    return keys
+
+
+def _role_keys(v):
+    keys = [('roles', 1)]
+    if v['is_active']:
+        keys.append(('roles_active', 1))
+    return keys
+
+
+# model -> (các cột ảnh hưởng bộ đếm, hàm sinh danh sách (key, amount))
+COUNTER_SPECS = {
+    Product: (('category_id', 'is_active'), _product_keys),
+    Category: ((), lambda v: [('categories', 1)]),
+    Blog: ((), lambda v: [('blogs', 1)]),
+    Contact: (('is_read',), _contact_keys),
+    Media: (('album', 'file_size'), _media_keys),
+    User: (('role_id', 'is_active'), _user_keys),
+    Role: (('is_active',), _role_keys),
+    Permission: ((), lambda v: [('permissions', 1)]),
+}
+
+
+# ==================== GHI DELTA ====================
+def _upsert_delta(connection, key, delta):
+    """Cộng delta vào 1 key (tạo mới nếu chưa có)"""
+    table = StatCounter.__table__
+    now = datetime.utcnow()
+    stmt = dialect_insert(table, bind=connection)
+
+    if hasattr(stmt, 'on_conflict_do_update'):
+        stmt = stmt.values(key=key, value=delta, updated_at=now).on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={'value': table.c.value + delta, 'updated_at': now}
+        )
+        connection.execute(stmt)
+        return
+
+    result = connection.execute(
+        update(table).where(table.c.key == key).values(value=table.c.value + delta, updated_at=now)
+    )
+    if result.rowcount == 0:
+        connection.execute(insert(table).values(key=key, value=delta, updated_at=now))
+
+
+def _mark_stale(connection):
+    """Đánh dấu cần reconcile (khi không xác định được giá trị cũ)"""
+    table = StatCounter.__table__
+    connection.execute(
+        update(table).where(table.c.key == RECONCILED_AT_KEY).values(value=0)
+    )
+
+
+def _lock_counters(connection, exclusive):
+    """
+    Reconcile (exclusive) không chạy xen với transaction đang ghi delta (shared)
+
+    - PostgreSQL: advisory lock theo transaction - nhiều writer giữ shared cùng
+      lúc, reconcile chờ mọi writer đang mở commit xong và chặn writer mới tới
+      khi reconcile commit (kể cả key chưa có dòng, SELECT ... FOR UPDATE không khóa được)
+    - SQLite: chỉ 1 transaction ghi tại 1 thời điểm -> reconcile ghi ngay câu đầu
+      tiên để giữ khóa ghi của database trước khi đếm; writer không cần làm gì
+    - DB khác: khóa các dòng stat_counters đang có (key mới chưa có dòng vẫn có
+      thể lệch tới lần reconcile sau)
+    """
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        function = 'pg_advisory_xact_lock' if exclusive else 'pg_advisory_xact_lock_shared'
+        connection.execute(text(f'SELECT {function}(:id)'), {'id': COUNTERS_LOCK_ID})
+    elif not exclusive:
+        return
+    elif dialect == 'sqlite':
+        table = StatCounter.__table__
+        connection.execute(update(table).where(table.c.key == RECONCILED_AT_KEY).values(value=table.c.value))
+    else:
+        connection.execute(select(StatCounter.__table__.c.key).with_for_update()).all()
+
+
+def add_to_counters(deltas, connection=None):
+    """
+    Cộng nhiều delta cùng lúc - dùng cho các thao tác bulk bỏ qua ORM events
+    (VD: Media.query.filter(...).update(...))
+
+    Args:
+        deltas (dict): {key: delta}
+    """
+    from app.media_library import ALBUM_KEY_PREFIX, apply_album_deltas
+
+    connection = connection or db.session.connection()
+    _lock_counters(connection, exclusive=False)
+    for key, delta in deltas.items():
+        if delta:
+            _upsert_delta(connection, key, delta)
+
+    # Số file của album lưu thêm ở bảng albums (danh mục album cho media picker)
+    album_deltas = {key[len(ALBUM_KEY_PREFIX):]: delta for key, delta in deltas.items()
+                    if key.startswith(ALBUM_KEY_PREFIX) and delta}
+    if album_deltas:
+        apply_album_deltas(connection, album_deltas)
+
+
+def _values(obj, attrs, old):
+    """Lấy giá trị cũ/mới của các cột - trả về _UNKNOWN nếu không xác định được"""
+    values = {}
+    for attr in attrs:
+        hist = attributes.get_history(obj, attr, passive=attributes.PASSIVE_NO_INITIALIZE)
+        if old:
+            if hist.deleted:
+                values[attr] = hist.deleted[0]
+            elif hist.unchanged:
+                values[attr] = hist.unchanged[0]
+            elif not hist.added:
+                values[attr] = None
+            else:
+                return _UNKNOWN
+        else:
+            values[attr] = getattr(obj, attr)
+    return values
+
+
+def _collect(deltas, key_fn, values, sign):
+    for key, amount in key_fn(values):
+        deltas[key] += sign * amount
+
+
+def _after_flush(session, flush_context):
+    """Quy đổi thay đổi của lần flush thành delta và ghi vào stat_counters"""
+    deltas = defaultdict(int)
+    stale = False
+
+    for obj in session.new:
+        spec = COUNTER_SPECS.get(type(obj))
+        if spec:
+            _collect(deltas, spec[1], _values(obj, spec[0], old=False), 1)
+
+    for obj in session.deleted:
+        spec = COUNTER_SPECS.get(type(obj))
+        if spec:
+            values = _values(obj, spec[0], old=True)
+            if values is _UNKNOWN:
+                stale = True
+                continue
+            _collect(deltas, spec[1], values, -1)
+
+    for obj in session.dirty:
+        spec = COUNTER_SPECS.get(type(obj))
+        if not spec or not spec[0] or not session.is_modified(obj):
+            continue
+        old_values = _values(obj, spec[0], old=True)
+        if old_values is _UNKNOWN:
+            stale = True
+            continue
+        new_values = _values(obj, spec[0], old=False)
+        if old_values != new_values:
+            _collect(deltas, spec[1], old_values, -1)
+            _collect(deltas, spec[1], new_values, 1)
+
+    if not deltas and not stale:
+        return
+
+    connection = session.connection()
+    add_to_counters(deltas, connection=connection)
+    if stale:
+        _mark_stale(connection)
+
+
+# ==================== ĐỌC BỘ ĐẾM ====================
+def get_counter(key, default=0):
+    """Đọc 1 bộ đếm"""
+    value = db.session.query(StatCounter.value).filter_by(key=key).scalar()
+    return value if value is not None else default
+
+
+def get_counters(*keys):
+    """Đọc nhiều bộ đếm trong 1 query - trả về dict {key: value}"""
+    result = dict.fromkeys(keys, 0)
+    rows = db.session.query(StatCounter.key, StatCounter.value).filter(StatCounter.key.in_(keys)).all()
+    result.update(dict(rows))
+    return result
+
+
+def get_counters_by_prefix(prefix):
+    """
+    Đọc nhóm bộ đếm theo prefix
+    VD: get_counters_by_prefix('album_media:') -> {'Tin_tuc': 12, ...}
+    """
+    rows = db.session.query(StatCounter.key, StatCounter.value).filter(
+        StatCounter.key.startswith(prefix, autoescape=True)
+    ).all()
+    return {key[len(prefix):]: value for key, value in rows}
+
+
+# ==================== RECONCILE ====================
+def compute_counters():
+    """Tính lại toàn bộ bộ đếm từ dữ liệu gốc (GROUP BY theo từng model)"""
+    totals = dict.fromkeys(BASE_KEYS, 0)
+
+    for model, (attrs, key_fn) in COUNTER_SPECS.items():
+        columns = [getattr(model, attr) for attr in attrs]
+        query = db.session.query(*columns, func.count(model.id))
+        if columns:
+            query = query.group_by(*columns)
+
+        for row in query.all():
+            values = dict(zip(attrs, row[:-1]))
+            count = row[-1]
+            if not count:
+                continue
+            for key, amount in key_fn(values):
+                totals[key] = totals.get(key, 0) + amount * count
+
+    return totals
+
+
+def _set_values(values, now):
+    """Ghi giá trị tuyệt đối cho từng key (upsert, không xóa bảng)"""
+    table = StatCounter.__table__
+    rows = [{'key': key, 'value': value, 'updated_at': now} for key, value in values.items()]
+    stmt = dialect_insert(table)
+
+    if hasattr(stmt, 'on_conflict_do_update'):
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={'value': stmt.excluded.value, 'updated_at': stmt.excluded.updated_at}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = db.session.execute(
+            update(table).where(table.c.key == row['key']).values(value=row['value'], updated_at=now)
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**row))
+
+
+def reconcile_counters():
+    """
+    Ghi đè bộ đếm (+ số file của bảng albums) bằng số liệu tính lại - trả về dict bộ đếm
+
+    - Đọc trên primary (replica có thể trễ)
+    - Giữ khóa reconcile trước khi đếm (_lock_counters): transaction khác đang
+      ghi delta phải chờ tới khi reconcile commit, delta của nó cộng vào số mới
+      -> không mất
+    - Upsert từng key; key không còn dữ liệu gốc (danh mục / album đã xóa...) về 0
+    """
+    from app.media_library import reconcile_albums
+
+    table = StatCounter.__table__
+    try:
+        with use_primary():
+            _lock_counters(db.session.connection(), exclusive=True)
+            totals = compute_counters()
+            now = datetime.utcnow()
+            _set_values({**totals, RECONCILED_AT_KEY: int(time.time())}, now)
+            db.session.execute(
+                update(table).where(table.c.key.notin_([*totals, RECONCILED_AT_KEY]), table.c.value != 0)
+                .values(value=0, updated_at=now)
+            )
+            reconcile_albums()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return totals
+
+
+def reconcile_if_stale():
+    """Reconcile khi chưa có dữ liệu hoặc đã quá COUNTERS_RECONCILE_INTERVAL giây (worker nền / CLI)"""
+    interval = current_app.config.get('COUNTERS_RECONCILE_INTERVAL', 6 * 3600)
+    with use_primary():
+        last = get_counter(RECONCILED_AT_KEY, None)
+    if last is None or time.time() - last > interval:
+        reconcile_counters()
+
+
+def next_reconcile_at():
+    """Lúc lần reconcile kế tiếp đến hạn (worker nền ngủ tới lúc đó)"""
+    with use_primary():
+        last = get_counter(RECONCILED_AT_KEY, None)
+    if last is None:
+        return datetime.utcnow()
+    interval = current_app.config.get('COUNTERS_RECONCILE_INTERVAL', 6 * 3600)
+    return datetime.utcfromtimestamp(last) + timedelta(seconds=interval)
+
+
+reconciler = BackgroundWorker('counters', process=reconcile_if_stale, next_due=next_reconcile_at,
+                              error_delay=300)
+
+
+def wake_reconciler(app=None):
+    """
+    Đánh thức worker reconcile của process hiện tại (không query, không chờ)
+    COUNTERS_RECONCILE_BACKGROUND = False -> chỉ reconcile bằng `flask reconcile-counters`
+    """
+    app = app or current_app._get_current_object()
+    if app.config.get('COUNTERS_RECONCILE_BACKGROUND', True):
+        reconciler.wake(app)
+
+
+def init_app(app):
+    """Đăng ký listener ghi delta sau mỗi lần flush"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
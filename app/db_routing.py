@@ -0,0 +1,149 @@
+"""
+Định tuyến đọc/ghi database: primary + read replica
+
+- Request GET của main_bp, api_bp và các endpoint trong DB_REPLICA_ENDPOINTS được
+  đánh dấu read-only -> câu SELECT đi sang bind 'replica'
+- Mọi câu ghi (flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE) đi về
+  primary; sau khi ghi, session bị ghim vào primary tới hết transaction
+- Read-your-writes: client vừa gửi request ghi (POST...) thì các request
+  trong DB_READ_YOUR_WRITES_SECONDS giây tiếp theo đọc từ primary
+- Không cấu hình DATABASE_REPLICA_URL -> mọi thứ đi primary như cũ
+- Job nền / CLI (không có request) luôn dùng primary
+- Giá trị ghi vào cache (get_or_set, read-model, fragment) được tính trên
+  primary dù request đang đọc replica: cookie read-your-writes chỉ bảo vệ
+  người vừa ghi, bản cũ của replica lọt vào cache thì mọi khách thấy tới hết
+  TTL dù bus đã xóa key lúc commit
+
+Dùng primary chủ động trong 1 đoạn code:
+    with use_primary():
+        ...
+"""
+import time
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+REPLICA_BIND_KEY = 'replica'
+
+# Key trong session.info: transaction hiện tại đã ghi -> chỉ đọc từ primary
+PIN_PRIMARY_KEY = 'db_pin_primary'
+
+# Key trong cookie session: đọc từ primary tới thời điểm này (epoch)
+PRIMARY_UNTIL_KEY = '_db_primary_until'
+
+
+class RoutingSession(Session):
+    """Session chọn engine primary / replica cho từng câu lệnh"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _can_use_replica(self, clause):
+            engine = self._db.engines.get(REPLICA_BIND_KEY)
+            if engine is not None:
+                return engine
+
+        if clause is not None and getattr(clause, 'is_dml', False):
+            _mark_write(self)
+
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _can_use_replica(session, clause):
+    if session._flushing or session.info.get(PIN_PRIMARY_KEY):
+        return False
+    if clause is None or not getattr(clause, 'is_select', False):
+        return False
+    if getattr(clause, '_for_update_arg', None) is not None:
+        return False
+    return has_request_context() and g.get('db_read_only', False)
+
+
+def _mark_write(session):
+    session.info[PIN_PRIMARY_KEY] = True
+    if has_request_context():
+        g.db_wrote = True
+
+
+@contextmanager
+def use_primary():
+    """Buộc mọi câu lệnh trong khối with dùng primary"""
+    previous = g.get('db_read_only', False) if has_request_context() else False
+    if previous:
+        g.db_read_only = False
+    try:
+        yield
+    finally:
+        if previous:
+            g.db_read_only = previous
+
+
+# ==================== CẤU HÌNH ENGINE ====================
+def _normalize_url(url):
+    if url and url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+
+def _engine_options(app, url):
+    """pool_pre_ping + recycle cho mọi DB, pool_size/max_overflow cho DB có connection pool thật"""
+    options = {
+        'pool_pre_ping': app.config['DB_POOL_PRE_PING'],
+        'pool_recycle': app.config['DB_POOL_RECYCLE'],
+    }
+    if url and not url.startswith('sqlite'):
+        options.update({
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+        })
+    return options
+
+
+def configure_engines(app):
+    """Điền SQLALCHEMY_ENGINE_OPTIONS + bind replica (gọi trước db.init_app)"""
+    primary_options = _engine_options(app, app.config.get('SQLALCHEMY_DATABASE_URI'))
+    primary_options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = primary_options
+
+    replica_url = _normalize_url(app.config.get('DATABASE_REPLICA_URL'))
+    if replica_url:
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        binds.setdefault(REPLICA_BIND_KEY, {'url': replica_url, **_engine_options(app, replica_url)})
+        app.config['SQLALCHEMY_BINDS'] = binds
+
+
+# ==================== GẮN VÀO REQUEST ====================
+def _before_request():
+    read_only = request.method in ('GET', 'HEAD') and (
+        request.blueprint in ('main', 'api')
+        or request.endpoint in current_app.config.get('DB_REPLICA_ENDPOINTS', ())
+    )
+    if read_only and flask_session.get(PRIMARY_UNTIL_KEY, 0) > time.time():
+        read_only = False
+    g.db_read_only = read_only
+
+
+def _after_request(response):
+    if g.get('db_wrote') and request.method not in ('GET', 'HEAD'):
+        flask_session[PRIMARY_UNTIL_KEY] = time.time() + current_app.config.get('DB_READ_YOUR_WRITES_SECONDS', 10)
+    return response
+
+
+def _after_flush(session, flush_context):
+    _mark_write(session)
+
+
+def _end_transaction(session, *args):
+    session.info.pop(PIN_PRIMARY_KEY, None)
+
+
+def init_app(app):
+    """Đăng ký hook đánh dấu request read-only + ghim primary sau khi ghi"""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    for name, listener in (('after_flush', _after_flush),
+                           ('after_commit', _end_transaction),
+                           ('after_soft_rollback', _end_transaction)):
+        if not event.contains(RoutingSession, name, listener):
+            event.listen(RoutingSession, name, listener)
@@ -0,0 +1,253 @@
+"""
+Cache read-model theo slug cho trang chi tiết (sản phẩm, bài viết, dự án, tin tuyển dụng)
+
+- Read-model = bản chụp các cột của bản ghi + quan hệ cần cho trang chi tiết
+  (danh mục, gallery kèm alt/title từ Media) + kết quả các method tra Media
+  (get_media_seo_info) -> trang chi tiết không cần query lại bản ghi / Media
+- Đọc qua cache (read-through): có trong cache -> trả luôn, chưa có -> query
+  1 lần trên primary (eager load quan hệ), chụp lại rồi lưu với ENTITY_CACHE_TTL giây
+- Xóa đúng key bị ảnh hưởng bằng mapper event after_insert/after_update/after_delete:
+    + bản ghi đổi / xóa / đổi slug -> key slug cũ + mới
+    + Category đổi -> các sản phẩm thuộc danh mục
+    + ảnh gallery đổi -> sản phẩm / dự án chủ sở hữu
+    + Media đổi (alt/title...) -> các chỗ đang dùng ảnh (chỉ mục media_references)
+  Key được xóa sau commit ở mọi worker (bus app/invalidation.py), rollback -> bỏ
+- Thao tác bulk bỏ qua ORM (increment_counter...) không phát event: read-model
+  cũ tồn tại tối đa ENTITY_CACHE_TTL giây - trừ xóa media hàng loạt
+  (app/media_cleanup.py gọi mark_media_stale()) và import sản phẩm
+  (app/importer.py gọi mark_stale()) trong transaction ghi
+
+    product = get_entity_or_404('product', slug)
+"""
+import copy
+import inspect
+import types
+
+from flask import abort, current_app
+from sqlalchemy import event, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import attributes, joinedload, object_session, selectinload, undefer_group
+
+from app.cache import get_backend
+from app.db_routing import use_primary
+from app.invalidation import publish
+from app.models import (Product, Blog, Project, Job, Category, Media, MediaReference,
+                        ProductImage, ProjectImage)
+
+# Loại nội dung -> model, quan hệ chụp kèm (tên -> method tính sẵn của bản ghi con),
+# method tính sẵn của bản ghi (kết quả lưu trong read-model)
+ENTITY_SOURCES = {
+    'product': {
+        'model': Product,
+        'relations': {'category': (), 'gallery_images': ('get_seo_info',)},
+        'methods': ('get_media_seo_info',),
+    },
+    'blog': {
+        'model': Blog,
+        'relations': {},
+        'methods': ('get_media_seo_info',),
+    },
+    'project': {
+        'model': Project,
+        'relations': {'gallery_images': ('get_seo_info',)},
+        'methods': ('get_media_seo_info',),
+    },
+    'job': {
+        'model': Job,
+        'relations': {},
+        'methods': (),
+    },
+}
+
+MODEL_TYPES = {source['model']: entity_type for entity_type, source in ENTITY_SOURCES.items()}
+
+# Bảng gallery -> (loại nội dung chủ sở hữu, cột id chủ sở hữu)
+GALLERY_OWNERS = {
+    ProductImage: ('product', 'product_id'),
+    ProjectImage: ('project', 'project_id'),
+}
+
+# Số media_key mỗi câu IN (...) khi tra chỗ dùng ảnh của thao tác bulk
+MEDIA_KEYS_CHUNK_SIZE = 500
+
+_MODELS = {model.__name__: model for model in
+           (Product, Blog, Project, Job, Category, ProductImage, ProjectImage)}
+
+
+def _namespace(entity_type):
+    return f'entities:{entity_type}'
+
+
+# ==================== READ-MODEL ====================
+class CachedEntity:
+    """
+    Read-model chỉ đọc của 1 bản ghi, dùng thay object ORM trong template
+    - Thuộc tính: các cột + quan hệ đã chụp (CachedEntity / list CachedEntity)
+    - Method đã tính sẵn lúc chụp trả lại kết quả đã lưu
+    - Method thuần khác của model (is_expired, get_gallery_images...) chạy trên dữ liệu đã chụp
+    """
+
+    def __init__(self, model_name, data, results=None):
+        self.__dict__.update(data)
+        self._model_name = model_name
+        self._results = results or {}
+
+    @property
+    def __model__(self):
+        return _MODELS[self._model_name]
+
+    def __getattr__(self, name):
+        # Chỉ gọi khi không có thuộc tính; bỏ qua tên private (pickle / copy tìm __setstate__...)
+        if name.startswith('_'):
+            raise AttributeError(name)
+        results = self.__dict__.get('_results', {})
+        if name in results:
+            value = results[name]
+            return lambda: value
+        func = getattr(_MODELS[self.__dict__['_model_name']], name, None)
+        if inspect.isfunction(func):
+            return types.MethodType(func, self)
+        raise AttributeError(f"{self._model_name} (cache) không có thuộc tính '{name}'")
+
+    def __repr__(self):
+        return f"<CachedEntity {self._model_name} #{self.__dict__.get('id')}>"
+
+
+def snapshot(obj, relations=None, methods=()):
+    """Chụp 1 object ORM thành CachedEntity (cột + quan hệ + kết quả method)"""
+    mapper = sa_inspect(type(obj))
+    data = {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+    for name, child_methods in (relations or {}).items():
+        value = getattr(obj, name)
+        if isinstance(value, (list, tuple)):
+            data[name] = [snapshot(child, methods=child_methods) for child in value]
+        else:
+            data[name] = snapshot(value, methods=child_methods) if value is not None else None
+    results = {name: getattr(obj, name)() for name in methods}
+    return CachedEntity(type(obj).__name__, data, results)
+
+
+def _load(entity_type, slug):
+    source = ENTITY_SOURCES[entity_type]
+    model = source['model']
+    options = [undefer_group('content')]  # cột Text lớn deferred ở model - trang chi tiết cần
+    for name in source['relations']:
+        relationship = sa_inspect(model).relationships[name]
+        loader = selectinload if relationship.uselist else joinedload
+        options.append(loader(getattr(model, name)))
+    return model.query.options(*options).filter_by(slug=slug, is_active=True).first()
+
+
+# ==================== ĐỌC ====================
+def get_entity(entity_type, slug):
+    """
+    Read-model của bản ghi đang active theo slug (cache -> DB), không có -> None
+    ENTITY_CACHE tắt -> trả object ORM như cũ
+    """
+    if not current_app.config.get('ENTITY_CACHE', True):
+        return _load(entity_type, slug)
+
+    backend = get_backend()
+    entity = backend.get(_namespace(entity_type), slug)
+    if entity is None:
+        # Bản lưu cache đọc từ primary: bản cũ của replica đang chậm không sống tới hết TTL
+        with use_primary():
+            obj = _load(entity_type, slug)
+            if obj is None:
+                return None
+            source = ENTITY_SOURCES[entity_type]
+            entity = snapshot(obj, source['relations'], source['methods'])
+        backend.set(_namespace(entity_type), slug, entity, current_app.config.get('ENTITY_CACHE_TTL'))
+    # Bản sao nông: route được sửa thuộc tính (lượt xem +1) mà không đụng bản trong cache
+    return copy.copy(entity)
+
+
+def get_entity_or_404(entity_type, slug):
+    entity = get_entity(entity_type, slug)
+    if entity is None:
+        abort(404)
+    return entity
+
+
+# ==================== XÓA KHI DỮ LIỆU THAY ĐỔI ====================
+def mark_stale(session, entity_type, slugs=None):
+    """
+    Publish key read-model theo slug trong transaction của session (dùng cho cả thao tác bulk)
+    slugs None: xóa mọi read-model của loại nội dung
+    """
+    if slugs is None:
+        publish(session, _namespace(entity_type))
+        return
+    for slug in slugs:
+        if slug:
+            publish(session, _namespace(entity_type), slug)
+
+
+def _mark_stale(target, entity_type, slugs):
+    session = object_session(target)
+    if session is not None:
+        mark_stale(session, entity_type, slugs)
+
+
+def _entity_changed(mapper, connection, target):
+    """Bản ghi thêm / sửa / xóa: key theo slug hiện tại + slug cũ (nếu đổi slug)"""
+    history = attributes.get_history(target, 'slug')
+    _mark_stale(target, MODEL_TYPES[type(target)], [target.slug, *history.deleted])
+
+
+def _category_changed(mapper, connection, target):
+    slugs = connection.execute(select(Product.slug).where(Product.category_id == target.id)).scalars()
+    _mark_stale(target, 'product', slugs)
+
+
+def _gallery_changed(mapper, connection, target):
+    entity_type, owner_column = GALLERY_OWNERS[type(target)]
+    owner_id = getattr(target, owner_column)
+    if owner_id is None:
+        return
+    model = ENTITY_SOURCES[entity_type]['model']
+    slugs = connection.execute(select(model.slug).where(model.id == owner_id)).scalars()
+    _mark_stale(target, entity_type, slugs)
+
+
+def _media_users(connection, keys):
+    """(loại nội dung, list slug) đang dùng các media_key (theo media_references)"""
+    for entity_type, source in ENTITY_SOURCES.items():
+        model = source['model']
+        owner_ids = select(MediaReference.owner_id).where(
+            MediaReference.media_key.in_(keys), MediaReference.owner_type == entity_type)
+        yield entity_type, connection.execute(select(model.slug).where(model.id.in_(owner_ids))).scalars()
+
+
+def _media_changed(mapper, connection, target):
+    """Media đổi: các sản phẩm / bài viết / dự án đang dùng ảnh"""
+    from app.media_refs import media_key
+    key = media_key(target.filepath)
+    if not key:
+        return
+    for entity_type, slugs in _media_users(connection, [key]):
+        _mark_stale(target, entity_type, slugs)
+
+
+def mark_media_stale(session, filepaths):
+    """
+    Media xóa / sửa bằng câu lệnh bulk (không qua mapper event): publish key
+    read-model của các nội dung đang dùng ảnh, trong transaction của session
+    """
+    from app.media_refs import media_key
+    keys = sorted({media_key(filepath) for filepath in filepaths} - {None})
+    connection = session.connection()
+    for start in range(0, len(keys), MEDIA_KEYS_CHUNK_SIZE):
+        for entity_type, slugs in _media_users(connection, keys[start:start + MEDIA_KEYS_CHUNK_SIZE]):
+            mark_stale(session, entity_type, slugs)
+
+
+def init_app(app):
+    """Đăng ký mapper event xóa read-model khi nội dung / danh mục / gallery / Media thay đổi"""
+    listeners = [(model, _entity_changed) for model in MODEL_TYPES]
+    listeners += [(Category, _category_changed), (Media, _media_changed)]
+    listeners += [(model, _gallery_changed) for model in GALLERY_OWNERS]
+    for model, listener in listeners:
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            if not event.contains(model, name, listener):
+                event.listen(model, name, listener)
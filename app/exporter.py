@@ -0,0 +1,241 @@
+"""
+Xuất dữ liệu (liên hệ, sản phẩm, media) ra CSV / JSONL dạng streaming, XLSX qua file tạm
+
+- Query chạy với yield_per -> server-side cursor trên PostgreSQL, chỉ giữ
+  1 lô bản ghi trong bộ nhớ
+- CSV / JSONL: response là generator trả về từng khối byte -> client nhận dữ
+  liệu ngay, bộ nhớ worker không phụ thuộc số dòng
+- XLSX: file zip, phải ghi xong toàn bộ workbook ra file tạm (đĩa, không phải
+  RAM) rồi mới gửi byte đầu tiên -> client chờ tới khi query chạy hết
+- Chuỗi bắt đầu bằng = + - @ tab CR (dữ liệu khách nhập: liên hệ, alt media...)
+  được thêm dấu ' phía trước ở CSV / XLSX -> Excel không chạy như công thức
+- Bộ lọc (khoảng ngày, is_read, album, danh mục) dùng các cột đã đánh index
+"""
+import csv
+import io
+import json
+import tempfile
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy import select
+
+from app import db
+from app.models import Contact, Product, Category, Media
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Kích thước khối byte gửi ra client
+CHUNK_BYTES = 64 * 1024
+
+# Ký tự đầu khiến Excel / LibreOffice hiểu ô là công thức (CSV injection)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+# ==================== ĐỊNH NGHĨA DỮ LIỆU XUẤT ====================
+EXPORT_COLUMNS = {
+    'contacts': [
+        ('id', Contact.id),
+        ('name', Contact.name),
+        ('email', Contact.email),
+        ('phone', Contact.phone),
+        ('subject', Contact.subject),
+        ('message', Contact.message),
+        ('is_read', Contact.is_read),
+        ('created_at', Contact.created_at),
+    ],
+    'products': [
+        ('id', Product.id),
+        ('name', Product.name),
+        ('slug', Product.slug),
+        ('category_slug', Category.slug),
+        ('price', Product.price),
+        ('old_price', Product.old_price),
+        ('image', Product.image),
+        ('is_featured', Product.is_featured),
+        ('is_active', Product.is_active),
+        ('views', Product.views),
+        ('created_at', Product.created_at),
+        ('updated_at', Product.updated_at),
+    ],
+    'media': [
+        ('id', Media.id),
+        ('filename', Media.filename),
+        ('original_filename', Media.original_filename),
+        ('filepath', Media.filepath),
+        ('file_type', Media.file_type),
+        ('file_size', Media.file_size),
+        ('width', Media.width),
+        ('height', Media.height),
+        ('alt_text', Media.alt_text),
+        ('title', Media.title),
+        ('caption', Media.caption),
+        ('album', Media.album),
+        ('created_at', Media.created_at),
+    ],
+}
+
+
+def _parse_date(value):
+    """'YYYY-MM-DD' -> datetime, sai định dạng -> None"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+
+def build_export_query(dataset, filters):
+    """
+    Tạo câu SELECT cho từng loại dữ liệu xuất
+
+    Args:
+        dataset: 'contacts' | 'products' | 'media'
+        filters: dict (thường là request.args) gồm date_from, date_to, is_read,
+                 album, category, is_active
+    """
+    columns = EXPORT_COLUMNS[dataset]
+    stmt = select(*[col.label(name) for name, col in columns])
+
+    model = {'contacts': Contact, 'products': Product, 'media': Media}[dataset]
+    if dataset == 'products':
+        stmt = stmt.select_from(Product).outerjoin(Category, Product.category_id == Category.id)
+
+    date_from = _parse_date(filters.get('date_from'))
+    date_to = _parse_date(filters.get('date_to'))
+    if date_from:
+        stmt = stmt.where(model.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(model.created_at < date_to + timedelta(days=1))
+
+    if dataset == 'contacts' and filters.get('is_read') in ('0', '1'):
+        stmt = stmt.where(Contact.is_read == (filters.get('is_read') == '1'))
+
+    if dataset == 'media' and filters.get('album'):
+        stmt = stmt.where(Media.album == filters.get('album'))
+
+    if dataset == 'products':
+        if filters.get('category'):
+            stmt = stmt.where(Category.slug == filters.get('category'))
+        if filters.get('is_active') in ('0', '1'):
+            stmt = stmt.where(Product.is_active == (filters.get('is_active') == '1'))
+
+    return stmt.order_by(model.created_at.desc(), model.id.desc())
+
+
+# ==================== GHI THEO ĐỊNH DẠNG ====================
+def _neutralize(value):
+    """Chuỗi có thể bị hiểu là công thức -> thêm ' phía trước (hiển thị như văn bản)"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return 1 if value else 0
+    return _neutralize(value)
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _iter_rows(stmt):
+    """Đọc kết quả theo lô với yield_per (server-side cursor)"""
+    batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        for row in partition:
+            yield row
+
+
+def iter_csv(stmt, headers):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write('\ufeff')  # BOM để Excel đọc đúng tiếng Việt
+    writer.writerow(headers)
+
+    for row in _iter_rows(stmt):
+        writer.writerow([_csv_value(v) for v in row])
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_jsonl(stmt, headers):
+    lines = []
+    size = 0
+    for row in _iter_rows(stmt):
+        line = json.dumps({h: _json_value(v) for h, v in zip(headers, row)}, ensure_ascii=False) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield ''.join(lines).encode('utf-8')
+            lines = []
+            size = 0
+
+    if lines:
+        yield ''.join(lines).encode('utf-8')
+
+
+def iter_xlsx(stmt, headers):
+    """
+    XLSX là file zip nên không ghi nối tiếp được: dùng workbook write_only
+    (không giữ các dòng trong RAM), lưu ra file tạm rồi mới gửi file đó
+    -> byte đầu tiên chỉ đi sau khi đã đọc hết kết quả query
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise RuntimeError('Cần cài openpyxl để xuất file XLSX (pip install openpyxl)')
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    for row in _iter_rows(stmt):
+        sheet.append([_neutralize(v) for v in row])
+
+    with tempfile.TemporaryFile() as tmp:
+        workbook.save(tmp)
+        tmp.seek(0)
+        while True:
+            data = tmp.read(CHUNK_BYTES)
+            if not data:
+                break
+            yield data
+
+
+WRITERS = {'csv': iter_csv, 'jsonl': iter_jsonl, 'xlsx': iter_xlsx}
+
+
+def export_response(dataset, fmt, filters):
+    """Tạo Response streaming cho 1 loại dữ liệu"""
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'csv'
+
+    stmt = build_export_query(dataset, filters)
+    headers = [name for name, _ in EXPORT_COLUMNS[dataset]]
+    filename = f"{dataset}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{fmt}"
+
+    generator = WRITERS[fmt](stmt, headers)
+    return Response(
+        stream_with_context(generator),
+        content_type=EXPORT_FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no',  # Tắt buffer của proxy để dữ liệu đi ngay
+        }
+    )
@@ -0,0 +1,234 @@
+"""
+Lọc nhiều tiêu chí (faceted navigation) cho sản phẩm, dự án, tuyển dụng
+
+- Mỗi facet cho phép chọn nhiều giá trị (?category=a&category=b): các giá trị
+  trong 1 facet là OR, giữa các facet là AND
+- Số lượng của 1 facet được đếm với bộ lọc của MỌI facet khác (trừ chính nó)
+  -> chọn 1 danh mục vẫn thấy số lượng các danh mục còn lại
+- Toàn bộ số lượng (+ tổng số kết quả) tính trong 1 câu UNION ALL, cache theo
+  bộ lọc (FACET_CACHE_TTL giây) và xóa khi nội dung liên quan thay đổi (ở mọi
+  worker, qua bus app/invalidation.py); hết hạn / vừa xóa -> 1 request đếm lại,
+  request đồng thời dùng số cũ trong FACET_CACHE_STALE giây
+- Danh sách kết quả phân trang không cần COUNT(*) riêng (dùng tổng ở trên)
+  -> 2 query: số lượng + kết quả
+
+    selected = PRODUCT_FACETS.parse(request.args)
+    counts = PRODUCT_FACETS.counts(selected)
+    query = PRODUCT_FACETS.apply(Product.query, selected)
+"""
+from flask import current_app, request, url_for
+from sqlalchemy import String, case, cast, event, func, literal, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from app import db
+from app.cache import get_or_set
+from app.invalidation import publish
+from app.models import Product, Category, Project, Job
+
+TOTAL_KEY = '_total'
+
+# (giá trị, nhãn, giá từ (>=), giá đến (<)) - giá 0 / trống là "Liên hệ"
+PRICE_BUCKETS = [
+    ('lien-he', 'Liên hệ báo giá', None, None),
+    ('duoi-500k', 'Dưới 500.000đ', 0, 500000),
+    ('500k-2tr', '500.000đ - 2.000.000đ', 500000, 2000000),
+    ('2tr-5tr', '2.000.000đ - 5.000.000đ', 2000000, 5000000),
+    ('tren-5tr', 'Trên 5.000.000đ', 5000000, None),
+]
+
+
+def _price_bucket_expr():
+    whens = [(or_(Product.price.is_(None), Product.price <= 0), 'lien-he')]
+    for value, _label, _low, high in PRICE_BUCKETS[1:-1]:
+        whens.append((Product.price < high, value))
+    return case(*whens, else_=PRICE_BUCKETS[-1][0])
+
+
+class Facet:
+    def __init__(self, name, column, param=None, options=None):
+        """
+        Args:
+            name: tên facet (key trong kết quả counts)
+            column: biểu thức SQL dùng để nhóm / lọc
+            param: tên tham số trên URL (mặc định = name)
+            options: danh sách (giá trị, nhãn) cố định - None: lấy theo dữ liệu
+        """
+        self.name = name
+        self.column = column
+        self.param = param or name
+        self.options = options
+
+    def condition(self, values):
+        return self.column.in_(values)
+
+
+class FacetSet:
+    def __init__(self, name, model, base_conditions, facets, joins=()):
+        self.name = name
+        self.model = model
+        self.base_conditions = base_conditions
+        self.facets = facets
+        self.joins = joins  # (target, onclause) cần outerjoin để lọc/nhóm
+        self.namespace = f'facets:{name}'
+
+    def parse(self, args):
+        """Tham số URL -> {facet: [giá trị đã chọn]}"""
+        selected = {}
+        for facet in self.facets:
+            values = sorted({value.strip() for value in args.getlist(facet.param) if value and value.strip()})
+            if facet.options is not None:
+                allowed = {value for value, _label in facet.options}
+                values = [value for value in values if value in allowed]
+            if values:
+                selected[facet.name] = values
+        return selected
+
+    def _conditions(self, selected, extra_conditions, exclude=None):
+        conditions = list(self.base_conditions()) + list(extra_conditions)
+        for facet in self.facets:
+            if facet.name != exclude and selected.get(facet.name):
+                conditions.append(facet.condition(selected[facet.name]))
+        return conditions
+
+    def _select(self, *columns):
+        stmt = select(*columns).select_from(self.model)
+        for target, onclause in self.joins:
+            stmt = stmt.outerjoin(target, onclause)
+        return stmt
+
+    def _compute(self, selected, extra_conditions):
+        parts = [self._select(literal(TOTAL_KEY).label('facet'), literal('').label('value'),
+                              func.count().label('count'))
+                 .where(*self._conditions(selected, extra_conditions))]
+        for facet in self.facets:
+            parts.append(
+                self._select(literal(facet.name).label('facet'), cast(facet.column, String).label('value'),
+                             func.count().label('count'))
+                .where(*self._conditions(selected, extra_conditions, exclude=facet.name))
+                .group_by(facet.column)
+            )
+
+        counts = {facet.name: {} for facet in self.facets}
+        counts[TOTAL_KEY] = 0
+        for facet_name, value, count in db.session.execute(union_all(*parts)):
+            if facet_name == TOTAL_KEY:
+                counts[TOTAL_KEY] = count
+            elif value not in (None, ''):
+                counts[facet_name][value] = count
+        return counts
+
+    def counts(self, selected, extra_conditions=(), cache_key=()):
+        """
+        Số lượng theo từng giá trị của mọi facet + tổng số kết quả (1 query, có cache)
+
+        Args:
+            extra_conditions: điều kiện lọc ngoài facet (VD: tìm kiếm) - phải khớp cache_key
+            cache_key: giá trị phân biệt extra_conditions trong cache
+
+        Returns:
+            dict {facet: {giá trị: số lượng}, '_total': tổng}
+        """
+        key = (tuple((name, tuple(values)) for name, values in sorted(selected.items())), tuple(cache_key))
+        config = current_app.config
+        return get_or_set(self.namespace, key, lambda: self._compute(selected, extra_conditions),
+                          ttl=config.get('FACET_CACHE_TTL', 300), stale_ttl=config.get('FACET_CACHE_STALE', 0))
+
+    def apply(self, query, selected, extra_conditions=()):
+        """Áp bộ lọc đã chọn vào query kết quả"""
+        for target, onclause in self.joins:
+            query = query.outerjoin(target, onclause)
+        return query.filter(*self._conditions(selected, extra_conditions))
+
+    def options(self, facet_name, counts, selected=None, labels=None):
+        """
+        Danh sách lựa chọn để hiển thị: [{'value', 'label', 'count', 'selected'}]
+        Facet có options cố định giữ thứ tự khai báo, còn lại sắp theo nhãn
+        (giá trị đang chọn luôn có mặt kể cả khi số lượng = 0)
+        """
+        chosen = set((selected or {}).get(facet_name, []))
+        facet = next(facet for facet in self.facets if facet.name == facet_name)
+        facet_counts = counts.get(facet_name, {})
+        if facet.options is not None:
+            items = [(value, label) for value, label in facet.options]
+        else:
+            labels = labels or {}
+            items = sorted(((value, labels.get(value, value)) for value in set(facet_counts) | chosen),
+                           key=lambda item: str(item[1]).lower())
+        return [{'value': value, 'label': label, 'count': facet_counts.get(value, 0), 'selected': value in chosen}
+                for value, label in items]
+
+
+# ==================== ĐỊNH NGHĨA FACET ====================
+PRODUCT_FACETS = FacetSet(
+    'products', Product,
+    base_conditions=lambda: [Product.is_active.is_(True)],
+    joins=[(Category, Category.id == Product.category_id)],
+    facets=[
+        Facet('category', Category.slug),
+        Facet('price', _price_bucket_expr(),
+              options=[(value, label) for value, label, _low, _high in PRICE_BUCKETS]),
+    ],
+)
+
+PROJECT_FACETS = FacetSet(
+    'projects', Project,
+    base_conditions=lambda: [Project.is_active.is_(True)],
+    facets=[
+        Facet('type', Project.project_type),
+        Facet('year', cast(Project.year, String)),
+    ],
+)
+
+JOB_FACETS = FacetSet(
+    'jobs', Job,
+    base_conditions=lambda: [Job.is_active.is_(True)],
+    facets=[
+        Facet('department', Job.department, param='dept'),
+        Facet('location', Job.location, param='loc'),
+    ],
+)
+
+# Model thay đổi -> các bộ facet cần xóa cache
+INVALIDATES = {
+    Product: (PRODUCT_FACETS,),
+    Category: (PRODUCT_FACETS,),
+    Project: (PROJECT_FACETS,),
+    Job: (JOB_FACETS,),
+}
+
+
+# ==================== URL CHO TEMPLATE ====================
+def facet_url(endpoint=None, **changes):
+    """
+    URL trang hiện tại với tham số thay đổi, giữ nguyên các bộ lọc khác
+    VD: facet_url(page=2), facet_url(toggle=('category', 'son-nuoc'))
+    """
+    args = request.args.to_dict(flat=False)
+    toggle = changes.pop('toggle', None)
+    if toggle:
+        param, value = toggle
+        values = args.get(param, [])
+        args[param] = [v for v in values if v != value] if value in values else values + [value]
+        args.pop('page', None)
+    for param, value in changes.items():
+        if value is None:
+            args.pop(param, None)
+        else:
+            args[param] = value
+    view_args = dict(request.view_args or {})
+    return url_for(endpoint or request.endpoint, **view_args, **args)
+
+
+# ==================== XÓA CACHE KHI NỘI DUNG THAY ĐỔI ====================
+def _after_flush(session, flush_context):
+    # Xóa sau commit, ở mọi worker (bus app/invalidation.py)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        for facet_set in INVALIDATES.get(type(obj), ()):
+            publish(session, facet_set.namespace)
+
+
+def init_app(app):
+    """Đăng ký listener xóa cache facet + hàm facet_url cho template"""
+    app.add_template_global(facet_url)
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
@@ -90,6 +90,7 @@ class ProductForm(FlaskForm):
     image = FileField('Hình ảnh chính', validators=[
         FileAllowed(['jpg', 'png', 'jpeg', 'gif', 'webp'], 'Chỉ chấp nhận ảnh!')
     ])
+    gallery = TextAreaField('Ảnh gallery (mỗi dòng 1 URL)', validators=[Optional()])
     is_featured = BooleanField('Sản phẩm nổi bật')
     is_active = BooleanField('Kích hoạt', default=True)
     submit = SubmitField('Lưu sản phẩm')
@@ -338,6 +339,7 @@ class ProjectForm(FlaskForm):
 
     area = StringField('Diện tích')
     products_used = TextAreaField('Sản phẩm sử dụng')
+    gallery = TextAreaField('Ảnh gallery (mỗi dòng 1 URL)', validators=[Optional()])
 
     is_featured = BooleanField('Dự án nổi bật')
     is_active = BooleanField('Kích hoạt', default=True)
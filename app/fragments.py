@@ -0,0 +1,98 @@
+"""
+Cache fragment template: {% cache %} ... {% endcache %}
+
+    {% cache 'footer', 'settings' %} ... {% endcache %}
+    {% cache 'header', 'settings', vary=request.endpoint %} ... {% endcache %}
+
+- Đối số đầu: tên fragment; các đối số sau: nguồn dữ liệu fragment phụ thuộc
+  (VERSION_SOURCES: 'settings', 'categories'); vary=: giá trị thay đổi theo
+  request (trang đang active...) được thêm vào key
+- Key = tên + version hiện tại của từng nguồn + vary + host -> settings /
+  danh mục thay đổi thì version đổi, fragment cũ tự bị bỏ qua (không cần xóa)
+- Version của mọi nguồn đọc bằng 1 query / request (nhớ trong g) -> mọi worker
+  thấy thay đổi ngay ở request kế tiếp
+- Lưu trên backend của app/cache.py (Redis dùng chung nếu có CACHE_REDIS_URL)
+- Chỉ bọc phần không phụ thuộc người dùng (không CSRF token, flash message,
+  request.url...) -> trang không cache được cả trang vẫn dùng được fragment
+"""
+from flask import current_app, g, has_request_context, request
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import func, select
+
+from app import db
+from app.cache import get_backend
+from app.db_routing import use_primary
+from app.models import Category, Settings, SETTINGS_VERSION_KEY
+
+NAMESPACE = 'fragments'
+
+# Nguồn dữ liệu -> biểu thức SQL (scalar) thay đổi mỗi khi dữ liệu thay đổi
+VERSION_SOURCES = {
+    'settings': lambda: select(Settings.value).where(Settings.key == SETTINGS_VERSION_KEY).scalar_subquery(),
+    'categories': lambda: select(func.count(Category.id).cast(db.String) + '@'
+                                 + func.coalesce(func.max(Category.updated_at).cast(db.String), '')).scalar_subquery(),
+}
+
+
+def content_versions():
+    """Version hiện tại của mọi nguồn trong VERSION_SOURCES (1 query, nhớ trong request)"""
+    if has_request_context() and 'content_versions' in g:
+        return g.content_versions
+
+    names = list(VERSION_SOURCES)
+    row = db.session.execute(select(*(VERSION_SOURCES[name]().label(name) for name in names))).one()
+    versions = {name: value or '' for name, value in zip(names, row)}
+    if has_request_context():
+        g.content_versions = versions
+    return versions
+
+
+def fragment_key(name, deps, vary=None):
+    versions = content_versions()
+    unknown = [dep for dep in deps if dep not in versions]
+    if unknown:
+        raise ValueError(f"Fragment '{name}': không có nguồn version {', '.join(unknown)}")
+    host = request.host_url if has_request_context() else ''
+    return (name, tuple((dep, versions[dep]) for dep in deps), vary, host)
+
+
+class FragmentCacheExtension(Extension):
+    """Thẻ {% cache tên, nguồn..., vary=... %} ... {% endcache %}"""
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        name = parser.parse_expression()
+        deps = []
+        vary = nodes.Const(None)
+        while parser.stream.skip_if('comma'):
+            if parser.stream.current.test('name:vary') and parser.stream.look().test('assign'):
+                next(parser.stream)
+                next(parser.stream)
+                vary = parser.parse_expression()
+            else:
+                deps.append(parser.parse_expression())
+
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [name, nodes.List(deps), vary])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, deps, vary, caller):
+        if not current_app.config.get('FRAGMENT_CACHE', True):
+            return caller()
+
+        backend = get_backend()
+        key = fragment_key(name, deps, vary)
+        html = backend.get(NAMESPACE, key)
+        if html is None:
+            with use_primary():  # Nội dung được lưu -> không lấy từ replica đang chậm
+                html = str(caller())
+            backend.set(NAMESPACE, key, html, current_app.config.get('FRAGMENT_CACHE_TTL'))
+        return Markup(html)
+
+
+def init_app(app):
+    """Thêm thẻ {% cache %} vào Jinja"""
+    app.jinja_env.add_extension(FragmentCacheExtension)
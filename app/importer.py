@@ -0,0 +1,328 @@
+"""
+Import sản phẩm hàng loạt từ file CSV / XLSX / JSONL
+
+- Đọc file theo từng dòng (generator) -> bộ nhớ không phụ thuộc kích thước file
+- Validate bằng chính các field/validator của ProductForm
+- Danh mục tra theo slug, slug sản phẩm sinh bằng slugify() và kiểm tra trùng
+  với tập slug đã nạp sẵn (không query từng dòng)
+- Ghi theo lô (executemany) với INSERT hoặc UPSERT theo slug (UPSERT cần
+  PostgreSQL / SQLite - dialect khác báo lỗi ngay, không ghi gì)
+- Ghi bằng Core không qua ORM events -> tự phát sự kiện xóa cache (facet, trang,
+  read-model, index gợi ý tìm kiếm), đánh dấu tính lại nội dung liên quan
+  trong cùng transaction và tính lại bộ đếm sau commit
+- Trả về báo cáo lỗi theo từng dòng
+
+Cột hỗ trợ: name, slug, description, price, old_price, category_slug (hoặc category),
+            image, is_featured, is_active
+"""
+import csv
+import io
+import json
+import os
+
+from flask import current_app
+from sqlalchemy import select
+from werkzeug.datastructures import MultiDict
+from wtforms import Form
+
+from app import db
+from app.forms import ProductForm
+from app.models import Product, Category
+from app.utils import slugify, dialect_insert
+
+IMPORT_FORMATS = ('csv', 'xlsx', 'jsonl')
+
+# Giới hạn số lỗi lưu lại trong báo cáo (tránh báo cáo phình to với file lỗi toàn bộ)
+MAX_REPORTED_ERRORS = 1000
+
+# Quá số sản phẩm này -> xóa cả namespace cache thay vì phát từng key
+MAX_PUBLISHED_KEYS = 500
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'x', 'có', 'co'}
+
+# Form rút gọn dùng lại đúng các field + validators của ProductForm (không CSRF, không query danh mục)
+ProductRowForm = type('ProductRowForm', (Form,), {
+    field: getattr(ProductForm, field)
+    for field in ('name', 'slug', 'description', 'price', 'old_price')
+})
+
+
+# ==================== ĐỌC FILE ====================
+def detect_format(filename):
+    """Đoán định dạng từ phần mở rộng file"""
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if ext == 'json':
+        ext = 'jsonl'
+    return ext if ext in IMPORT_FORMATS else None
+
+
+def _cell_to_str(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def iter_rows(stream, fmt):
+    """
+    Đọc từng dòng của file -> yield (số dòng, dict cột -> chuỗi)
+
+    Args:
+        stream: file object dạng binary (FileStorage.stream, open(..., 'rb'))
+        fmt: 'csv' | 'xlsx' | 'jsonl'
+    """
+    if fmt == 'csv':
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        reader = csv.DictReader(text)
+        for line_no, row in enumerate(reader, start=2):
+            yield line_no, {(k or '').strip().lower(): _cell_to_str(v) for k, v in row.items()}
+
+    elif fmt == 'jsonl':
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig')
+        for line_no, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_no, {'__error__': f'JSON không hợp lệ: {e.msg}'}
+                continue
+            if not isinstance(data, dict):
+                yield line_no, {'__error__': 'Mỗi dòng phải là 1 object JSON'}
+                continue
+            yield line_no, {str(k).strip().lower(): _cell_to_str(v) for k, v in data.items()}
+
+    elif fmt == 'xlsx':
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError('Cần cài openpyxl để import file XLSX (pip install openpyxl)')
+
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = next(rows, None)
+            if not header:
+                return
+            columns = [_cell_to_str(c).lower() for c in header]
+            for line_no, values in enumerate(rows, start=2):
+                if values is None or all(v is None for v in values):
+                    continue
+                yield line_no, {col: _cell_to_str(v) for col, v in zip(columns, values) if col}
+        finally:
+            workbook.close()
+
+    else:
+        raise ValueError(f'Định dạng không hỗ trợ: {fmt}')
+
+
+# ==================== VALIDATE ====================
+def _parse_bool(value, default):
+    if value == '':
+        return default
+    return value.strip().lower() in TRUE_VALUES
+
+
+def unique_slug(base, taken_slugs):
+    """Sinh slug không trùng với tập slug đã có (thêm -2, -3, ...)"""
+    base = base[:190] or 'san-pham'
+    slug = base
+    n = 2
+    while slug in taken_slugs:
+        slug = f'{base}-{n}'
+        n += 1
+    return slug
+
+
+def validate_row(row, categories):
+    """
+    Validate 1 dòng theo rule của ProductForm
+
+    Returns:
+        (dict dữ liệu sạch, None) hoặc (None, list lỗi)
+    """
+    if '__error__' in row:
+        return None, [row['__error__']]
+
+    formdata = MultiDict({k: v for k, v in row.items()
+                          if k in ('name', 'slug', 'description', 'price', 'old_price') and v != ''})
+    if 'slug' not in formdata and formdata.get('name'):
+        formdata['slug'] = slugify(formdata['name'])
+
+    form = ProductRowForm(formdata=formdata)
+    errors = []
+    if not form.validate():
+        for field, field_errors in form.errors.items():
+            errors.extend(f'{field}: {e}' for e in field_errors)
+
+    category_slug = row.get('category_slug') or row.get('category', '')
+    category_id = categories.get(category_slug)
+    if not category_slug:
+        errors.append('category_slug: Vui lòng chọn danh mục')
+    elif category_id is None:
+        errors.append(f'category_slug: Không tìm thấy danh mục "{category_slug}"')
+
+    if errors:
+        return None, errors
+
+    return {
+        'name': form.name.data.strip(),
+        'slug': slugify(form.slug.data),
+        'description': form.description.data or None,
+        'price': form.price.data,
+        'old_price': form.old_price.data,
+        'category_id': category_id,
+        'image': row.get('image') or None,
+        'is_featured': _parse_bool(row.get('is_featured', ''), False),
+        'is_active': _parse_bool(row.get('is_active', ''), True),
+    }, None
+
+
+# ==================== GHI DB ====================
+def _write_chunk(rows, mode):
+    """Ghi 1 lô bằng executemany (INSERT hoặc UPSERT theo slug)"""
+    if not rows:
+        return
+
+    table = Product.__table__
+    stmt = dialect_insert(table)
+
+    if mode == 'upsert':
+        update_columns = ('name', 'description', 'price', 'old_price', 'category_id',
+                          'image', 'is_featured', 'is_active', 'updated_at')
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.slug],
+            set_={col: stmt.excluded[col] for col in update_columns}
+        )
+
+    db.session.execute(stmt, rows)
+
+
+def _publish_changes(slugs, updated_slugs, chunk_size):
+    """
+    Phát các sự kiện mà mapper event sẽ phát nếu ghi qua ORM (gọi trước commit)
+    Sản phẩm mới không cần xóa read-model (cache không lưu kết quả "không có")
+    """
+    from app import page_cache
+    from app.entity_cache import mark_stale
+    from app.facets import PRODUCT_FACETS
+    from app.invalidation import publish, send_pending
+    from app.related import mark_dirty
+    from app.search_index import mark_changed
+
+    session = db.session
+    publish(session, PRODUCT_FACETS.namespace)
+    publish(session, page_cache.NAMESPACE)
+
+    slugs = sorted(slugs)
+    ids = []
+    for start in range(0, len(slugs), chunk_size):
+        ids += session.execute(select(Product.id).where(Product.slug.in_(slugs[start:start + chunk_size]))).scalars()
+    mark_dirty(session, 'product', ids)
+
+    if len(slugs) > MAX_PUBLISHED_KEYS:
+        mark_stale(session, 'product')
+        mark_changed(session, 'product')
+    else:
+        mark_stale(session, 'product', updated_slugs)
+        mark_changed(session, 'product', ids)
+    send_pending(session)
+
+
+def import_products(stream, fmt, mode='insert', chunk_size=None, dry_run=False):
+    """
+    Import sản phẩm từ file
+
+    Args:
+        stream: file object binary
+        fmt: 'csv' | 'xlsx' | 'jsonl'
+        mode: 'insert' (luôn tạo mới, tự đổi slug nếu trùng)
+              'upsert' (slug đã tồn tại -> cập nhật sản phẩm đó; chỉ PostgreSQL / SQLite)
+        chunk_size: số dòng mỗi lô ghi DB (mặc định PRODUCT_IMPORT_CHUNK_SIZE)
+        dry_run: chỉ validate, không ghi DB
+
+    Returns:
+        dict báo cáo: total, created, updated, failed, errors [{line, errors}]
+
+    Raises:
+        ValueError: mode 'upsert' trên dialect không có INSERT ... ON CONFLICT
+    """
+    from datetime import datetime
+    from app.counters import reconcile_counters
+
+    chunk_size = chunk_size or current_app.config.get('PRODUCT_IMPORT_CHUNK_SIZE', 500)
+    if mode == 'upsert' and not hasattr(dialect_insert(Product.__table__), 'on_conflict_do_update'):
+        # Không âm thầm INSERT thay cho UPDATE (trùng slug -> lỗi unique giữa chừng)
+        raise ValueError(f'Chế độ upsert không hỗ trợ database {db.session.get_bind().dialect.name}')
+
+    categories = {slug: cid for cid, slug in db.session.query(Category.id, Category.slug)
+                  .filter_by(is_active=True)}
+    existing_slugs = {slug for (slug,) in db.session.query(Product.slug)}
+    file_slugs = set()
+    updated_slugs = set()
+    taken_slugs = set(existing_slugs)  # existing_slugs + file_slugs, cập nhật dần (không tạo lại set mỗi dòng)
+
+    report = {'total': 0, 'created': 0, 'updated': 0, 'failed': 0, 'errors': []}
+    chunk = []
+
+    def add_error(line_no, errors):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line_no, 'errors': errors})
+
+    try:
+        for line_no, row in iter_rows(stream, fmt):
+            report['total'] += 1
+            data, errors = validate_row(row, categories)
+            if errors:
+                add_error(line_no, errors)
+                continue
+
+            if data['slug'] in file_slugs:
+                if mode == 'upsert':
+                    add_error(line_no, [f'slug: "{data["slug"]}" bị trùng trong file'])
+                    continue
+                data['slug'] = unique_slug(data['slug'], taken_slugs)
+                report['created'] += 1
+            elif data['slug'] in existing_slugs:
+                if mode == 'upsert':
+                    report['updated'] += 1
+                    updated_slugs.add(data['slug'])
+                else:
+                    data['slug'] = unique_slug(data['slug'], taken_slugs)
+                    report['created'] += 1
+            else:
+                report['created'] += 1
+
+            file_slugs.add(data['slug'])
+            taken_slugs.add(data['slug'])
+
+            now = datetime.utcnow()
+            data['created_at'] = now
+            data['updated_at'] = now
+            data['views'] = 0
+            chunk.append(data)
+
+            if len(chunk) >= chunk_size:
+                if not dry_run:
+                    _write_chunk(chunk, mode)
+                chunk = []
+
+        if not dry_run:
+            _write_chunk(chunk, mode)
+            if file_slugs:
+                _publish_changes(file_slugs, updated_slugs, chunk_size)
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Ghi bằng Core (executemany) không qua ORM events -> tính lại bộ đếm
+    if not dry_run and (report['created'] or report['updated']):
+        reconcile_counters()
+
+    return report
@@ -0,0 +1,318 @@
+"""
+Bus xóa cache giữa các worker gunicorn
+
+Cache trong bộ nhớ từng process (LocalCache: facet, read-model trang chi
+tiết...) không biết process khác vừa sửa dữ liệu. Bus truyền sự kiện
+"topic (+ key) đã thay đổi" tới mọi worker:
+
+- Phát: listener SQLAlchemy gọi publish(session, topic, key) trong lúc flush;
+  sự kiện được ghi CÙNG transaction (rollback -> không phát gì) và áp dụng
+  ở process hiện tại ngay sau commit
+- Truyền (INVALIDATION_BUS):
+    + PostgreSQL: pg_notify trong transaction, mỗi worker có 1 thread LISTEN
+      -> worker khác nhận sau commit vài ms
+    + DB khác (SQLite...): bảng cache_invalidations, mỗi worker đọc các dòng
+      mới tối đa 1 lần / request (1 query theo primary key)
+- Nhận: key None -> invalidate cả namespace, có key -> xóa đúng key trong
+  LocalCache của process + gọi các hàm đã subscribe(topic, handler)
+- Worker có thể đã lỡ sự kiện (vừa fork, mất kết nối LISTEN, lâu không đọc
+  bảng) -> bỏ toàn bộ LocalCache thay vì đoán
+
+    publish(session, 'facets:products')               # cả namespace
+    publish(session, 'entities:product', 'son-nuoc')  # 1 key
+"""
+import json
+import os
+import select as select_module
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context, request
+from sqlalchemy import delete, event, func, insert, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app import db
+from app.background import WARMUP_ENVIRON_KEY
+from app.cache import cache, get_backend
+from app.models import CacheInvalidation
+
+CHANNEL = 'cache_invalidation'
+NOTIFY_PAYLOAD_LIMIT = 7000  # pg_notify giới hạn payload 8000 byte
+
+# Key trong session.info: sự kiện chờ ghi / đã ghi trong transaction hiện tại
+PENDING_KEY = 'invalidation_pending'
+SENT_KEY = 'invalidation_sent'
+
+_subscribers = {}
+
+
+def _source():
+    """Định danh worker (host:pid) - đổi sau fork"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+# ==================== NHẬN ====================
+def subscribe(topic, handler):
+    """Đăng ký hàm handler(key) chạy khi topic thay đổi (key None: cả topic)"""
+    _subscribers.setdefault(topic, []).append(handler)
+
+
+def apply(items, shared=False):
+    """
+    Xóa cache của process theo list (topic, key)
+    shared: xóa cả trên backend dùng chung (Redis) - chỉ worker phát cần làm
+    """
+    backends = [cache]
+    if shared and has_app_context():
+        backend = get_backend()
+        if backend is not cache:
+            backends.append(backend)
+
+    for topic, key in items:
+        for backend in backends:
+            if key is None:
+                backend.invalidate(topic)
+            else:
+                backend.delete(topic, key)
+        for handler in _subscribers.get(topic, ()):
+            handler(key)
+
+
+def reset_local():
+    """Có thể đã lỡ sự kiện -> bỏ toàn bộ cache trong bộ nhớ của process"""
+    cache.clear()
+    for handlers in _subscribers.values():
+        for handler in handlers:
+            handler(None)
+
+
+# ==================== TRUYỀN ====================
+class TableTransport:
+    """
+    Bảng cache_invalidations: ghi cùng transaction, worker đọc các dòng có id
+    lớn hơn id đã đọc. Id tăng theo thứ tự commit khi chỉ có 1 writer (SQLite);
+    DB nhiều writer nên dùng NotifyTransport
+    """
+
+    def __init__(self, app):
+        self.poll_interval = app.config.get('INVALIDATION_POLL_INTERVAL', 0)
+        self.retention = app.config.get('INVALIDATION_RETENTION', 3600)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._last_id = None
+        self._last_poll = 0.0
+        self._last_purge = 0.0
+
+    def send(self, connection, items):
+        now, source = datetime.utcnow(), _source()
+        connection.execute(insert(CacheInvalidation.__table__),
+                           [{'topic': topic, 'key': key, 'source': source, 'created_at': now}
+                            for topic, key in items])
+
+    def poll(self):
+        """Đọc sự kiện mới của worker khác (gọi đầu request)"""
+        now = time.monotonic()
+        if self._pid == os.getpid() and now - self._last_poll < self.poll_interval:
+            return
+        if not self._lock.acquire(blocking=False):
+            return  # thread khác của worker đang đọc
+
+        try:
+            table = CacheInvalidation.__table__
+            with db.engine.connect() as connection:
+                if self._pid != os.getpid() or self._last_id is None or now - self._last_poll > self.retention / 2:
+                    # Lần đầu / sau fork / quá lâu chưa đọc (dòng cũ có thể đã bị dọn)
+                    self._last_id = connection.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+                    self._pid = os.getpid()
+                    reset_local()
+                else:
+                    rows = connection.execute(
+                        select(table.c.id, table.c.topic, table.c.key, table.c.source)
+                        .where(table.c.id > self._last_id).order_by(table.c.id)
+                    ).all()
+                    if rows:
+                        self._last_id = rows[-1].id
+                        source = _source()
+                        apply([(row.topic, row.key) for row in rows if row.source != source])
+
+                if now - self._last_purge > self.retention / 4:
+                    cutoff = datetime.utcnow() - timedelta(seconds=self.retention)
+                    connection.execute(delete(table).where(table.c.created_at < cutoff))
+                    connection.commit()
+                    self._last_purge = now
+            self._last_poll = now
+        finally:
+            self._lock.release()
+
+
+class NotifyTransport:
+    """
+    PostgreSQL LISTEN/NOTIFY: pg_notify trong transaction (chỉ gửi khi commit),
+    mỗi worker 1 thread giữ 1 kết nối riêng LISTEN kênh CHANNEL
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def send(self, connection, items):
+        source = _source()
+        batch, size = [], 0
+        for topic, key in items:
+            item_size = len(topic) + len(key or '') + 10
+            if batch and size + item_size > NOTIFY_PAYLOAD_LIMIT:
+                self._notify(connection, source, batch)
+                batch, size = [], 0
+            batch.append((topic, key))
+            size += item_size
+        if batch:
+            self._notify(connection, source, batch)
+
+    def _notify(self, connection, source, batch):
+        payload = json.dumps({'s': source, 'i': batch}, ensure_ascii=False)
+        connection.execute(text('SELECT pg_notify(:channel, :payload)'), {'channel': CHANNEL, 'payload': payload})
+
+    def poll(self):
+        """Không đọc gì trong request - chỉ đảm bảo thread LISTEN của worker đang chạy (sau fork)"""
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._listen, args=(db.engine,),
+                                            name='cache-invalidation', daemon=True)
+            self._thread.start()
+
+    def _listen(self, engine):
+        delay = 1
+        while True:
+            connection = None
+            try:
+                # Kết nối riêng, tách khỏi pool (giữ suốt đời worker)
+                fairy = engine.raw_connection()
+                fairy.detach()
+                connection = fairy.dbapi_connection
+                connection.autocommit = True
+                connection.cursor().execute(f'LISTEN {CHANNEL}')
+                reset_local()  # sự kiện trước lúc LISTEN có thể đã lỡ
+                delay = 1
+
+                source = _source()
+                while True:
+                    if select_module.select([connection], [], [], 60) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        message = json.loads(connection.notifies.pop(0).payload)
+                        if message.get('s') != source:
+                            apply([tuple(item) for item in message.get('i', [])])
+            except Exception:
+                self.app.logger.exception('Mất kết nối LISTEN %s, thử lại sau %ss', CHANNEL, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+            finally:
+                if connection is not None:
+                    try:
+                        connection.close()
+                    except Exception:
+                        pass
+
+
+def _transport():
+    if has_app_context():
+        return current_app.extensions.get('invalidation_bus')
+    return None
+
+
+# ==================== PHÁT ====================
+def publish(session, topic, key=None):
+    """
+    Báo topic (+ key) đã thay đổi trong transaction của session
+    Gọi trong listener flush / mapper event: ghi cùng transaction khi flush xong
+    """
+    session.info.setdefault(PENDING_KEY, set()).add((topic, key))
+
+
+def _send_pending(session, connection):
+    pending = session.info.pop(PENDING_KEY, None)
+    if not pending:
+        return
+    sent = session.info.setdefault(SENT_KEY, set())
+    items = [item for item in pending if item not in sent]
+    sent.update(items)
+    transport = _transport()
+    if items and transport is not None:
+        transport.send(connection, items)
+
+
+def send_pending(session):
+    """
+    Ghi ngay các sự kiện đã publish() vào transaction hiện tại của session
+    Dùng sau câu lệnh bulk (không có flush ORM nào để ghi kèm)
+    """
+    _send_pending(session, session.connection())
+
+
+def _after_flush_postexec(session, flush_context):
+    # Sau mọi after_flush (facet...) -> gom được sự kiện của cả lần flush
+    _send_pending(session, session.connection())
+
+
+def _after_commit(session):
+    if session.info.get(PENDING_KEY):
+        # publish() ngoài flush: gửi bằng kết nối riêng (không còn cùng transaction)
+        transport = _transport()
+        if transport is not None:
+            with db.engine.begin() as connection:
+                _send_pending(session, connection)
+        else:
+            session.info.setdefault(SENT_KEY, set()).update(session.info.pop(PENDING_KEY))
+
+    sent = session.info.pop(SENT_KEY, None)
+    if sent:
+        apply(sent, shared=True)
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
+    session.info.pop(SENT_KEY, None)
+
+
+def _poll():
+    # Warm-up trong master gunicorn (trước fork): không mở thread LISTEN / kết nối tách khỏi pool
+    # (worker sau fork đọc lại từ đầu: poll() thấy pid đổi)
+    if request.environ.get(WARMUP_ENVIRON_KEY):
+        return
+    transport = _transport()
+    if transport is not None:
+        try:
+            transport.poll()
+        except Exception:
+            current_app.logger.exception('Không đọc được sự kiện xóa cache')
+
+
+def init_app(app):
+    """
+    Chọn cách truyền theo INVALIDATION_BUS (auto: PostgreSQL -> notify, còn lại -> table)
+    Listener commit luôn được đăng ký: 'off' vẫn xóa cache của process hiện tại
+    """
+    mode = app.config.get('INVALIDATION_BUS', 'auto')
+    if mode == 'auto':
+        backend = make_url(app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+        mode = 'notify' if backend == 'postgresql' else 'table'
+    if mode in ('notify', 'table'):
+        transport_class = NotifyTransport if mode == 'notify' else TableTransport
+        app.extensions['invalidation_bus'] = transport_class(app)
+        app.before_request(_poll)
+
+    for name, listener in (('after_flush_postexec', _after_flush_postexec),
+                           ('after_commit', _after_commit),
+                           ('after_soft_rollback', _after_rollback)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
@@ -0,0 +1,63 @@
+"""
+Facade nạp SDK nặng khi dùng lần đầu (Gemini, Cloudinary, Pillow)
+
+Import google.generativeai / cloudinary / PIL mất hàng trăm ms và vài chục MB
+RAM. Worker không phục vụ chatbot hay upload thì không cần nạp chúng:
+    from app.lazy import genai, cloudinary_uploader, cloudinary_api, Image
+    genai.GenerativeModel(...)      # import thật ở dòng này (lần đầu)
+"""
+import importlib
+import os
+import threading
+
+
+class LazyModule:
+    """Proxy module: chỉ import khi truy cập thuộc tính đầu tiên"""
+
+    def __init__(self, name, on_load=None):
+        self._name = name
+        self._on_load = on_load
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_load:
+                        self._on_load(module)
+                    self._module = module
+        return self._module
+
+    @property
+    def is_loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.is_loaded else 'not loaded'
+        return f'<LazyModule {self._name} ({state})>'
+
+
+def _configure_cloudinary(module):
+    """Cấu hình Cloudinary từ biến môi trường ngay khi SDK được nạp"""
+    import cloudinary
+    cloudinary.config(
+        cloud_name=os.getenv('CLOUDINARY_CLOUD_NAME'),
+        api_key=os.getenv('CLOUDINARY_API_KEY'),
+        api_secret=os.getenv('CLOUDINARY_API_SECRET'),
+        secure=True
+    )
+
+
+genai = LazyModule('google.generativeai')
+cloudinary_uploader = LazyModule('cloudinary.uploader', on_load=_configure_cloudinary)
+cloudinary_api = LazyModule('cloudinary.api', on_load=_configure_cloudinary)
+Image = LazyModule('PIL.Image')
+redis = LazyModule('redis')  # Tùy chọn: chỉ cần khi đặt CACHE_REDIS_URL
+
+# SDK nặng - dùng để kiểm tra không bị nạp lúc khởi động (flask startup-profile)
+HEAVY_MODULES = ('google.generativeai', 'cloudinary', 'PIL')
@@ -0,0 +1,111 @@
+"""
+Read-model cho card trong trang danh sách (sản phẩm, bài viết, dự án)
+
+- Chỉ SELECT các cột card hiển thị: không nạp nội dung HTML dài (Blog.content,
+  Project.content...) chỉ để in tiêu đề / tóm tắt
+- Mỗi dòng là object __slots__ nhẹ, không phải instance ORM (không identity
+  map, không theo dõi thay đổi, không lazy load ngầm)
+- Alt/title ảnh (get_media_seo_info) của cả trang nạp trước bằng 1 query
+  Media (prefetch_media) thay vì 1-2 query / card
+- Các cột Text lớn của model khai báo deferred(group='content') nên query ORM
+  thông thường cũng không nạp; trang chi tiết / form sửa undefer_group('content')
+
+    query = ProductCard.query().filter(Product.is_active.is_(True))
+    pagination = query.paginate(...)
+    pagination.items = ProductCard.wrap(pagination.items)
+"""
+from sqlalchemy import func, select
+
+from app import db
+from app.models import (Product, Blog, Project, Category, prefetch_media,
+                        product_get_media_seo_info, blog_get_media_seo_info, project_get_media_seo_info)
+
+# Số ký tự đầu của Blog.content nạp cho card (blog.html: tóm tắt = content[:150] khi không có excerpt)
+CONTENT_PREVIEW_CHARS = 150
+
+
+class CategoryRef:
+    """Danh mục của card: chỉ tên + slug"""
+    __slots__ = ('name', 'slug')
+
+    def __init__(self, name, slug):
+        self.name = name
+        self.slug = slug
+
+
+class CardRow:
+    """
+    Dòng card chỉ đọc - lớp con khai báo:
+        __slots__: các thuộc tính, mặc định = cột cùng tên của model
+        model: model nguồn
+        expressions: thuộc tính không phải cột -> hàm trả về biểu thức SQL
+    """
+    __slots__ = ()
+    model = None
+    expressions = {}
+
+    def __init__(self, row):
+        for name, value in zip(self.__slots__, row):
+            setattr(self, name, value)
+
+    @classmethod
+    def columns(cls):
+        return [cls.expressions[name]().label(name) if name in cls.expressions else getattr(cls.model, name)
+                for name in cls.__slots__]
+
+    @classmethod
+    def query(cls):
+        """Query chỉ gồm cột của card (lọc / sắp xếp / paginate như query ORM)"""
+        return db.session.query(*cls.columns()).select_from(cls.model)
+
+    @classmethod
+    def wrap(cls, rows):
+        cards = [cls(row) for row in rows]
+        prefetch_media(card.image for card in cards)
+        return cards
+
+    @classmethod
+    def all(cls, query):
+        return cls.wrap(query.all())
+
+    def __repr__(self):
+        return f"<{type(self).__name__} #{getattr(self, 'id', None)}>"
+
+
+# Subquery theo khóa chính; correlate_except: query ngoài có thể đã join categories (facet)
+def _category_name():
+    return select(Category.name).where(Category.id == Product.category_id).correlate_except(Category).scalar_subquery()
+
+
+def _category_slug():
+    return select(Category.slug).where(Category.id == Product.category_id).correlate_except(Category).scalar_subquery()
+
+
+class ProductCard(CardRow):
+    __slots__ = ('id', 'name', 'slug', 'description', 'price', 'old_price', 'image', 'is_featured',
+                 'category_id', 'image_alt_text', 'image_title', 'image_caption', 'category_name', 'category_slug')
+    model = Product
+    expressions = {'category_name': _category_name, 'category_slug': _category_slug}
+
+    get_media_seo_info = product_get_media_seo_info
+
+    @property
+    def category(self):
+        return CategoryRef(self.category_name, self.category_slug) if self.category_id else None
+
+
+class BlogCard(CardRow):
+    __slots__ = ('id', 'title', 'slug', 'excerpt', 'content', 'image', 'author', 'is_featured', 'views',
+                 'created_at', 'updated_at', 'image_alt_text', 'image_title', 'image_caption')
+    model = Blog
+    expressions = {'content': lambda: func.substr(Blog.content, 1, CONTENT_PREVIEW_CHARS)}
+
+    get_media_seo_info = blog_get_media_seo_info
+
+
+class ProjectCard(CardRow):
+    __slots__ = ('id', 'title', 'slug', 'client', 'location', 'year', 'description', 'image',
+                 'project_type', 'is_featured')
+    model = Project
+
+    get_media_seo_info = project_get_media_seo_info
@@ -1,9 +1,19 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_from_directory, current_app, abort
+from flask import Blueprint, render_template, request, flash, redirect, url_for, send_from_directory, current_app, abort, jsonify
 from app import db
-from app.models import Product, Category, Banner, Blog, FAQ, Contact, Project, Job
+from app.models import Product, Category, Banner, Blog, FAQ, Contact, Project, Job, prefetch_media
 from app.forms import ContactForm
 from sqlalchemy import or_
 from app.project_config import PROJECT_TYPES
+from app.facets import PRODUCT_FACETS, PROJECT_FACETS, JOB_FACETS, TOTAL_KEY
+from app.outbox import enqueue_contact_notification, wake_dispatcher
+from app.entity_cache import get_entity_or_404
+from app.listings import ProductCard, BlogCard, ProjectCard
+from app.page_cache import cached_page
+from app.singleflight import single_flight
+from app.related import get_related, record_view
+from app.utils import increment_counter
+from app.search_index import suggest
+from app.trending import track_view
 import os
 
 # Tạo Blueprint cho frontend
@@ -12,30 +22,33 @@ main_bp = Blueprint('main', __name__)
 
 # ==================== TRANG CHỦ ====================
 @main_bp.route('/')
+@cached_page
 def index():
     """Trang chủ"""
     # Lấy banners đang active
     banners = Banner.query.filter_by(is_active=True).order_by(Banner.order).all()
 
+    # Card chỉ nạp cột hiển thị (listings.py)
     # Lấy sản phẩm nổi bật (featured)
-    featured_products = Product.query.filter_by(
-        is_featured=True,
-        is_active=True
-    ).limit(8).all()
+    featured_products = ProductCard.all(ProductCard.query().filter(
+        Product.is_featured == True,
+        Product.is_active == True
+    ).limit(8))
 
     # Lấy sản phẩm mới nhất
-    latest_products = Product.query.filter_by(
-        is_active=True
-    ).order_by(Product.created_at.desc()).limit(8).all()
+    latest_products = ProductCard.all(ProductCard.query().filter(
+        Product.is_active == True
+    ).order_by(Product.created_at.desc()).limit(8))
 
     # Lấy tin tức nổi bật
-    featured_blogs = Blog.query.filter_by(
-        is_featured=True,
-        is_active=True
-    ).limit(3).all()
+    featured_blogs = BlogCard.all(BlogCard.query().filter(
+        Blog.is_featured == True,
+        Blog.is_active == True
+    ).limit(3))
 
-    featured_projects = Project.query.filter_by(is_featured=True, is_active=True).order_by(
-        Project.created_at.desc()).all()
+    featured_projects = ProjectCard.all(ProjectCard.query().filter(
+        Project.is_featured == True, Project.is_active == True
+    ).order_by(Project.created_at.desc()))
 
     return render_template('index.html',
                            banners=banners,
@@ -55,6 +68,7 @@ def about():
 # ==================== SẢN PHẨM ====================
 @main_bp.route('/san-pham')
 @main_bp.route('/loai-san-pham/<category_slug>')
+@cached_page
 def products(category_slug=None):
     """Trang danh sách sản phẩm với filter"""
     page = request.args.get('page', 1, type=int)
@@ -97,21 +111,22 @@ def products(category_slug=None):
                                     page=page if page > 1 else None),
                             code=301)
 
-    # Query cơ bản
-    query = Product.query.filter_by(is_active=True)
+    # Bộ lọc nhiều tiêu chí: danh mục trên path tính như 1 danh mục đã chọn
     current_category = None
-
-    # Filter theo danh mục slug
+    selected = PRODUCT_FACETS.parse(request.args)
     if category_slug:
         current_category = Category.query.filter_by(
             slug=category_slug,
             is_active=True
         ).first_or_404()
-        query = query.filter_by(category_id=current_category.id)
+        selected['category'] = sorted(set(selected.get('category', [])) | {category_slug})
 
     # Search theo tên
-    if search:
-        query = query.filter(Product.name.ilike(f'%{search}%'))
+    extra_conditions = [Product.name.ilike(f'%{search}%')] if search else []
+
+    # Số lượng theo danh mục / khoảng giá + tổng kết quả (1 query, có cache)
+    facet_counts = PRODUCT_FACETS.counts(selected, extra_conditions, cache_key=(search,))
+    query = PRODUCT_FACETS.apply(ProductCard.query(), selected, extra_conditions)
 
     # Sắp xếp
     if sort == 'latest':
@@ -121,26 +136,34 @@ def products(category_slug=None):
     elif sort == 'price_desc':
         query = query.order_by(Product.price.desc())
     elif sort == 'popular':
-        query = query.order_by(Product.views.desc())
+        # Xu hướng (lượt xem gần đây, app/trending.py), cùng điểm thì theo tổng lượt xem
+        query = query.order_by(Product.trending_score.desc(), Product.views.desc())
 
-    # Phân trang
+    # Phân trang - tổng đã có trong facet_counts, không COUNT lại
     from app.models import get_setting
     per_page = int(get_setting('default_posts_per_page', '12'))
 
     pagination = query.paginate(
         page=page,
         per_page=per_page,
-        error_out=False
+        error_out=False,
+        count=False
     )
+    pagination.total = facet_counts[TOTAL_KEY]
+    pagination.items = ProductCard.wrap(pagination.items)
 
     products = pagination.items
     categories = Category.query.filter_by(is_active=True).all()
+    category_counts = facet_counts['category']
 
     return render_template('products.html',
                            products=products,
                            categories=categories,
+                           category_counts=category_counts,
                            pagination=pagination,
                            current_category=current_category,
+                           selected_facets=selected,
+                           price_options=PRODUCT_FACETS.options('price', facet_counts, selected),
                            current_search=search,
                            current_sort=sort)
 
@@ -151,25 +174,33 @@ from datetime import datetime, timedelta
 @main_bp.route('/san-pham/<slug>')
 def product_detail(slug):
     """Trang chi tiết sản phẩm"""
-    product = Product.query.filter_by(slug=slug, is_active=True).first_or_404()
-
-    # Tăng lượt xem
-    product.views += 1
-    db.session.commit()
-
-    # Lấy sản phẩm liên quan (cùng danh mục)
-    related_products = Product.query.filter(
-        Product.category_id == product.category_id,
-        Product.id != product.id,
-        Product.is_active == True
-    ).limit(4).all()
-
-    return render_template('product_detail.html',
+    # Read-model trong cache (danh mục + gallery + alt/title từ Media chụp sẵn)
+    product = get_entity_or_404('product', slug)
+
+    # Sản phẩm liên quan đã tính sẵn, chưa có thì lấy cùng danh mục
+    related_products = get_related('product', product.id, limit=4)
+    if not related_products:
+        related_products = Product.query.filter(
+            Product.category_id == product.category_id,
+            Product.id != product.id,
+            Product.is_active == True
+        ).limit(4).all()
+    prefetch_media(item.image for item in related_products)
+
+    html = render_template('product_detail.html',
                            product=product,
                            related_products=related_products,
                            now=datetime.now(),
                            timedelta=timedelta)
 
+    # Tăng lượt xem + ghi co-view sau khi render: UPDATE đặt cuối để không giữ khóa dòng
+    # trong lúc render. Lượt xem cho điểm xu hướng chỉ vào bộ đệm (ghi nền)
+    increment_counter(product, 'views')
+    record_view('product', product.id)
+    db.session.commit()
+    track_view('product', product.id)
+    return html
+
 
 # Route cũ redirect sang mới
 @main_bp.route('/product/<slug>')
@@ -180,13 +211,14 @@ def old_product_detail(slug):
 
 # ==================== TIN TỨC / BLOG ====================
 @main_bp.route('/tin-tuc')
+@cached_page
 def blog():
     """Trang danh sách blog"""
     page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
 
-    # Query
-    query = Blog.query.filter_by(is_active=True)
+    # Query - card không nạp toàn bộ content
+    query = BlogCard.query().filter(Blog.is_active == True)
 
     # Search
     if search:
@@ -210,13 +242,14 @@ def blog():
         error_out=False
     )
 
+    pagination.items = BlogCard.wrap(pagination.items)
     blogs = pagination.items
 
     # Bài viết nổi bật sidebar
-    featured_blogs = Blog.query.filter_by(
-        is_featured=True,
-        is_active=True
-    ).limit(5).all()
+    featured_blogs = BlogCard.all(BlogCard.query().filter(
+        Blog.is_featured == True,
+        Blog.is_active == True
+    ).limit(5))
 
     return render_template('blog.html',
                            blogs=blogs,
@@ -228,17 +261,22 @@ def blog():
 @main_bp.route('/tin-tuc/<slug>')
 def blog_detail(slug):
     """Trang chi tiết blog"""
-    blog = Blog.query.filter_by(slug=slug, is_active=True).first_or_404()
+    blog = get_entity_or_404('blog', slug)
 
-    # Tăng lượt xem
-    blog.views += 1
+    # Tăng lượt xem + ghi co-view + điểm xu hướng
+    increment_counter(blog, 'views')
+    record_view('blog', blog.id)
     db.session.commit()
+    track_view('blog', blog.id)
 
-    # Bài viết liên quan
-    related_blogs = Blog.query.filter(
-        Blog.id != blog.id,
-        Blog.is_active == True
-    ).order_by(Blog.created_at.desc()).limit(3).all()
+    # Bài viết liên quan đã tính sẵn, chưa có thì lấy bài mới nhất
+    related_blogs = get_related('blog', blog.id, limit=3)
+    if not related_blogs:
+        related_blogs = Blog.query.filter(
+            Blog.id != blog.id,
+            Blog.is_active == True
+        ).order_by(Blog.created_at.desc()).limit(3).all()
+    prefetch_media(item.image for item in related_blogs)
 
     return render_template('blog_detail.html',
                            blog=blog,
@@ -274,8 +312,13 @@ def contact():
             message=form.message.data
         )
 
+        # Contact + thông báo (outbox) ghi trong 1 transaction, gửi email ở nền
         db.session.add(contact)
+        db.session.flush()
+        queued = enqueue_contact_notification(contact)
         db.session.commit()
+        if queued:
+            wake_dispatcher()
 
         flash('Cảm ơn bạn đã liên hệ! Chúng tôi sẽ phản hồi sớm nhất.', 'success')
         return redirect(url_for('main.contact'))
@@ -349,6 +392,26 @@ def search():
                            blogs=blogs)
 
 
+# Loại gợi ý -> URL trang đích
+SUGGEST_URLS = {
+    'product': lambda slug: url_for('main.product_detail', slug=slug),
+    'category': lambda slug: url_for('main.products', category_slug=slug),
+    'blog': lambda slug: url_for('main.blog_detail', slug=slug),
+    'project': lambda slug: url_for('main.project_detail', slug=slug),
+}
+
+
+@main_bp.route('/tim-kiem/goi-y')
+def search_suggest():
+    """Gợi ý khi đang gõ (JSON) - từ index trong bộ nhớ (app/search_index.py), không query DB"""
+    keyword = request.args.get('q', '')
+    items = [{'type': item['type'], 'title': item['title'], 'url': SUGGEST_URLS[item['type']](item['slug'])}
+             for item in suggest(keyword)]
+    response = jsonify({'q': keyword, 'items': items})
+    response.headers['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
 # Route cũ redirect sang mới
 @main_bp.route('/search')
 def old_search():
@@ -362,46 +425,57 @@ def old_search():
 def projects():
     """Trang danh sách dự án"""
     page = request.args.get('page', 1, type=int)
-    project_type = request.args.get('type', '')
-
-    query = Project.query.filter_by(is_active=True)
 
-    if project_type:
-        query = query.filter_by(project_type=project_type)
+    # Lọc nhiều loại dự án / năm - số lượng mỗi lựa chọn tính theo bộ lọc hiện tại
+    selected = PROJECT_FACETS.parse(request.args)
+    facet_counts = PROJECT_FACETS.counts(selected)
 
-    projects = query.order_by(Project.year.desc()).paginate(
-        page=page, per_page=12, error_out=False
+    projects = PROJECT_FACETS.apply(ProjectCard.query(), selected).order_by(Project.year.desc()).paginate(
+        page=page, per_page=12, error_out=False, count=False
     )
+    projects.total = facet_counts[TOTAL_KEY]
+    projects.items = ProjectCard.wrap(projects.items)
 
-    featured_projects = Project.query.filter_by(is_featured=True, is_active=True).limit(6).all()
+    featured_projects = ProjectCard.all(ProjectCard.query().filter(
+        Project.is_featured == True, Project.is_active == True
+    ).limit(6))
 
     return render_template('projects.html',
                            projects=projects,
                            featured_projects=featured_projects,
                            project_types=PROJECT_TYPES,
-                           current_type=project_type)
+                           type_counts=facet_counts['type'],
+                           year_options=sorted(PROJECT_FACETS.options('year', facet_counts, selected),
+                                               key=lambda option: option['value'], reverse=True),
+                           selected_facets=selected)
 
 
 @main_bp.route('/du-an/<slug>')
 def project_detail(slug):
     """Trang chi tiết dự án"""
-    project = Project.query.filter_by(slug=slug, is_active=True).first_or_404()
-
-    # Tăng lượt xem
-    project.view_count += 1
-    db.session.commit()
-
-    # Dự án liên quan
-    related = Project.query.filter(
-        Project.id != project.id,
-        Project.project_type == project.project_type,
-        Project.is_active == True
-    ).limit(4).all()
-
-    return render_template('project_detail.html',
+    project = get_entity_or_404('project', slug)
+
+    # Dự án liên quan đã tính sẵn, chưa có thì lấy cùng loại
+    related = get_related('project', project.id, limit=4)
+    if not related:
+        related = Project.query.filter(
+            Project.id != project.id,
+            Project.project_type == project.project_type,
+            Project.is_active == True
+        ).limit(4).all()
+    prefetch_media(item.image for item in related)
+
+    html = render_template('project_detail.html',
                            project=project,
                            related=related)
 
+    # Tăng lượt xem + ghi co-view sau khi render (như product_detail)
+    increment_counter(project, 'view_count')
+    record_view('project', project.id)
+    db.session.commit()
+    track_view('project', project.id)
+    return html
+
 
 # Route cũ redirect sang mới
 @main_bp.route('/projects')
@@ -420,35 +494,26 @@ def old_project_detail(slug):
 @main_bp.route('/tuyen-dung')
 def careers():
     """Trang tuyển dụng"""
-    department = request.args.get('dept', '')
-    location = request.args.get('loc', '')
+    # Lọc nhiều phòng ban / địa điểm - danh sách lựa chọn kèm số lượng lấy từ facet
+    selected = JOB_FACETS.parse(request.args)
+    facet_counts = JOB_FACETS.counts(selected)
 
-    query = Job.query.filter_by(is_active=True)
-
-    if department:
-        query = query.filter_by(department=department)
-    if location:
-        query = query.filter_by(location=location)
-
-    jobs = query.order_by(Job.is_urgent.desc(), Job.created_at.desc()).all()
-
-    # Lấy danh sách phòng ban và địa điểm unique
-    departments = db.session.query(Job.department).filter_by(is_active=True).distinct().all()
-    locations = db.session.query(Job.location).filter_by(is_active=True).distinct().all()
+    jobs = JOB_FACETS.apply(Job.query, selected).order_by(Job.is_urgent.desc(), Job.created_at.desc()).all()
 
     return render_template('careers.html',
                            jobs=jobs,
-                           departments=[d[0] for d in departments if d[0]],
-                           locations=[l[0] for l in locations if l[0]])
+                           departments=JOB_FACETS.options('department', facet_counts, selected),
+                           locations=JOB_FACETS.options('location', facet_counts, selected),
+                           selected_facets=selected)
 
 
 @main_bp.route('/tuyen-dung/<slug>')
 def job_detail(slug):
     """Trang chi tiết tuyển dụng"""
-    job = Job.query.filter_by(slug=slug, is_active=True).first_or_404()
+    job = get_entity_or_404('job', slug)
 
     # Tăng lượt xem
-    job.view_count += 1
+    increment_counter(job, 'view_count')
     db.session.commit()
 
     # Các vị trí khác
@@ -480,6 +545,16 @@ def old_job_detail(slug):
 def sitemap():
     """Phục vụ file sitemap.xml"""
     sitemap_path = os.path.join(current_app.static_folder, 'sitemap.xml')
+    if not os.path.exists(sitemap_path):
+        # Chưa có file: 1 request tạo, các request đồng thời chờ rồi dùng chung file
+        from app.admin.routes import generate_sitemap
+        with single_flight('sitemap.xml') as acquired:
+            if acquired and not os.path.exists(sitemap_path):
+                try:
+                    generate_sitemap()
+                except Exception:
+                    current_app.logger.exception('Không tạo được sitemap.xml')
+
     if os.path.exists(sitemap_path):
         return send_from_directory(current_app.static_folder, 'sitemap.xml', mimetype='application/xml')
     else:
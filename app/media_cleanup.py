@@ -0,0 +1,292 @@
+"""
+Xóa media hàng loạt + dọn file trên storage ở nền
+
+- bulk_delete_media(): xóa nhiều dòng Media (theo id hoặc cả album) trong 1
+  transaction, cùng transaction đó ghi tombstone cho từng file, trừ bộ đếm và
+  phát sự kiện xóa read-model (entities:*) của các nội dung đang dùng ảnh
+- Worker nền (thread trong từng process) xóa file theo lô bằng API xóa nhiều
+  của storage: Cloudinary delete_resources (tối đa 100 public_id / lần gọi),
+  local xóa file trong thư mục static
+- Lỗi -> thử lại với backoff lũy thừa; quá MEDIA_DELETE_MAX_ATTEMPTS lần thì
+  đánh dấu failed để đối soát (`flask media-cleanup --retry-failed`)
+- Tombstone được "giữ chỗ" (lease) trước khi gọi storage: process chết giữa
+  chừng thì tombstone tự đến hạn lại sau MEDIA_DELETE_LEASE_SECONDS
+
+Thay storage (VD: thư mục tạm thay Cloudinary khi kiểm thử):
+    register_storage(app, 'cloudinary', LocalStorage('/tmp/fake-cloud'))
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import func, insert
+
+from app import db
+from app.background import BackgroundWorker
+from app.lazy import cloudinary_api
+from app.models import Media, MediaTombstone
+from app.utils import local_static_path, parse_storage_path
+
+# Cloudinary Admin API: tối đa 100 public_id mỗi lần delete_resources
+CLOUDINARY_BATCH_SIZE = 100
+
+# Số id mỗi câu DELETE ... WHERE id IN (...)
+DELETE_CHUNK_SIZE = 500
+
+
+# ==================== STORAGE ====================
+class CloudinaryStorage:
+    """Xóa nhiều file trên Cloudinary bằng delete_resources"""
+    batch_size = CLOUDINARY_BATCH_SIZE
+
+    def delete_many(self, keys):
+        """
+        Returns:
+            dict {public_id: None nếu đã xóa (hoặc không còn tồn tại) / chuỗi lỗi}
+        """
+        result = cloudinary_api.delete_resources(list(keys))
+        deleted = result.get('deleted', {})
+        return {key: None if deleted.get(key) in ('deleted', 'not_found') else f"Cloudinary: {deleted.get(key)}"
+                for key in keys}
+
+
+class LocalStorage:
+    """File trong thư mục static (hoặc thư mục root bất kỳ - dùng làm storage giả khi kiểm thử)"""
+    batch_size = 500
+
+    def __init__(self, root=None):
+        self.root = root
+
+    def delete_many(self, keys):
+        root = self.root or current_app.static_folder
+        results = {}
+        for key in keys:
+            abs_path = local_static_path(key, static_dir=root)
+            if not abs_path:
+                results[key] = 'Đường dẫn nằm ngoài thư mục cho phép'
+                continue
+            try:
+                if os.path.exists(abs_path):
+                    os.remove(abs_path)
+                results[key] = None
+            except OSError as e:
+                results[key] = str(e)
+        return results
+
+
+DEFAULT_STORAGES = {
+    'cloudinary': CloudinaryStorage(),
+    'local': LocalStorage(),
+}
+
+
+def register_storage(app, name, storage):
+    """Thay storage cho 1 app (storage cần có batch_size + delete_many(keys))"""
+    app.extensions.setdefault('media_storages', {})[name] = storage
+
+
+def get_storage(name):
+    return current_app.extensions.get('media_storages', {}).get(name) or DEFAULT_STORAGES[name]
+
+
+# ==================== XÓA HÀNG LOẠT ====================
+def bulk_delete_media(ids=None, album=None):
+    """
+    Xóa nhiều media trong 1 transaction (file trên storage xóa sau, ở nền)
+
+    Args:
+        ids (list): danh sách id media
+        album (str): hoặc xóa toàn bộ file trong album
+
+    Returns:
+        int: số media đã xóa
+    """
+    from app.counters import add_to_counters
+    from app.entity_cache import mark_media_stale
+    from app.invalidation import send_pending
+
+    query = db.session.query(Media.id, Media.filepath, Media.album, Media.file_size)
+    if ids is not None:
+        ids = [int(media_id) for media_id in ids]
+        if not ids:
+            return 0
+        query = query.filter(Media.id.in_(ids))
+    elif album:
+        query = query.filter(Media.album == album)
+    else:
+        raise ValueError('Cần danh sách id hoặc tên album')
+
+    rows = query.all()
+    if not rows:
+        return 0
+
+    now = datetime.utcnow()
+    tombstones = []
+    deltas = defaultdict(int)
+    for media_id, filepath, media_album, file_size in rows:
+        storage, key = parse_storage_path(filepath)
+        if storage:
+            tombstones.append({'media_id': media_id, 'filepath': filepath, 'storage': storage,
+                               'storage_key': key, 'status': 'pending', 'attempts': 0,
+                               'next_attempt_at': now, 'created_at': now})
+        else:
+            current_app.logger.warning('Bỏ qua file không nhận dạng được storage: %s', filepath)
+
+        # Xóa bulk bỏ qua ORM events -> tự trừ bộ đếm
+        deltas['media'] -= 1
+        deltas['media_size'] -= file_size or 0
+        if media_album:
+            deltas[f'album_media:{media_album}'] -= 1
+
+    try:
+        media_ids = [row[0] for row in rows]
+        for start in range(0, len(media_ids), DELETE_CHUNK_SIZE):
+            chunk = media_ids[start:start + DELETE_CHUNK_SIZE]
+            Media.query.filter(Media.id.in_(chunk)).delete(synchronize_session=False)
+        if tombstones:
+            db.session.execute(insert(MediaTombstone), tombstones)
+        add_to_counters(deltas)
+        # Xóa bulk bỏ qua mapper event của Media -> tự xóa read-model đang dùng các ảnh này
+        mark_media_stale(db.session, [row[1] for row in rows])
+        send_pending(db.session)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if tombstones:
+        wake_worker()
+    return len(rows)
+
+
+# ==================== XỬ LÝ TOMBSTONE ====================
+def _backoff(attempts):
+    """Thời gian chờ trước lần thử tiếp theo: base * 2^(n-1), tối đa 1 giờ"""
+    base = current_app.config.get('MEDIA_DELETE_RETRY_BASE_SECONDS', 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def _claim(limit):
+    """Lấy các tombstone đến hạn và giữ chỗ (lease) để process khác không xử lý trùng"""
+    now = datetime.utcnow()
+    items = (MediaTombstone.query
+             .filter(MediaTombstone.status == 'pending', MediaTombstone.next_attempt_at <= now)
+             .order_by(MediaTombstone.next_attempt_at)
+             .limit(limit)
+             .with_for_update(skip_locked=True)
+             .all())
+
+    lease = timedelta(seconds=current_app.config.get('MEDIA_DELETE_LEASE_SECONDS', 300))
+    for item in items:
+        item.attempts += 1
+        item.next_attempt_at = now + lease
+    db.session.commit()
+    return items
+
+
+def process_batch(limit=None):
+    """
+    Xóa 1 lô file đến hạn
+
+    Returns:
+        (số file đã xóa, số file lỗi)
+    """
+    limit = limit or current_app.config.get('MEDIA_DELETE_BATCH_SIZE', 500)
+    max_attempts = current_app.config.get('MEDIA_DELETE_MAX_ATTEMPTS', 5)
+    items = _claim(limit)
+
+    by_storage = defaultdict(list)
+    for item in items:
+        by_storage[item.storage].append(item)
+
+    done = failed = 0
+    for name, group in by_storage.items():
+        storage = get_storage(name)
+        for start in range(0, len(group), storage.batch_size):
+            batch = group[start:start + storage.batch_size]
+            try:
+                errors = storage.delete_many([item.storage_key for item in batch])
+            except Exception as e:
+                errors = {item.storage_key: str(e) for item in batch}
+
+            now = datetime.utcnow()
+            for item in batch:
+                error = errors.get(item.storage_key, 'Không có kết quả xóa')
+                if error is None:
+                    item.status = 'done'
+                    item.deleted_at = now
+                    item.last_error = None
+                    done += 1
+                    continue
+
+                item.last_error = error[:500]
+                if item.attempts >= max_attempts:
+                    item.status = 'failed'
+                else:
+                    item.next_attempt_at = now + _backoff(item.attempts)
+                failed += 1
+            db.session.commit()
+
+    return done, failed
+
+
+def process_pending():
+    """Xử lý tới khi hết tombstone đến hạn - trả về (đã xóa, lỗi)"""
+    total_done = total_failed = 0
+    while True:
+        done, failed = process_batch()
+        total_done += done
+        total_failed += failed
+        if not done and not failed:
+            return total_done, total_failed
+
+
+def next_due_at():
+    """Thời điểm tombstone pending gần nhất đến hạn (None nếu hết)"""
+    return db.session.query(func.min(MediaTombstone.next_attempt_at)).filter(
+        MediaTombstone.status == 'pending'
+    ).scalar()
+
+
+def tombstone_stats():
+    """Số tombstone theo trạng thái"""
+    rows = db.session.query(MediaTombstone.status, func.count(MediaTombstone.id)).group_by(
+        MediaTombstone.status
+    ).all()
+    return {'pending': 0, 'done': 0, 'failed': 0, **dict(rows)}
+
+
+def retry_failed():
+    """Đưa các file xóa lỗi về hàng đợi - trả về số tombstone"""
+    count = MediaTombstone.query.filter_by(status='failed').update(
+        {'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return count
+
+
+def purge_done(days):
+    """Xóa tombstone đã xử lý xong quá `days` ngày - trả về số dòng"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    count = MediaTombstone.query.filter(
+        MediaTombstone.status == 'done', MediaTombstone.deleted_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+# ==================== WORKER NỀN ====================
+worker = BackgroundWorker('media-cleanup', process=process_pending, next_due=next_due_at,
+                          async_config='MEDIA_DELETE_ASYNC')
+
+
+def wake_worker(app=None):
+    """Đánh thức worker xóa file của process hiện tại"""
+    worker.wake(app)
+
+
+def init_app(app):
+    """Xóa tiếp các file đang chờ retry khi process khởi động (request đầu tiên)"""
+    worker.wake_on_start(app)
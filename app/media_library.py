@@ -0,0 +1,174 @@
+"""
+Danh mục album + API media picker
+
+- Bảng albums là nguồn danh sách album (không còn GROUP BY media / os.listdir
+  mỗi lần mở picker). media_count được cộng/trừ cùng transaction với bộ đếm
+  album_media:<tên> và tính lại khi reconcile_counters()
+- Picker phân trang bằng cursor (created_at, id) trên index
+  ix_media_created_at / ix_media_album_created_at -> mọi trang đều nhanh như
+  trang đầu, không OFFSET
+- Tìm kiếm: tiền tố lower(original_filename) / lower(alt_text) (có index),
+  PostgreSQL thêm full-text (GIN, từ điển 'simple', khớp tiền tố từng từ)
+"""
+import base64
+import os
+import re
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import and_, func, insert, or_, select, text, update
+
+from app import db
+from app.models import Album, Media
+from app.utils import dialect_insert
+
+ALBUM_KEY_PREFIX = 'album_media:'
+
+PICKER_PAGE_SIZE = 60
+PICKER_MAX_PAGE_SIZE = 200
+
+# Phải khớp đúng biểu thức của index ix_media_search_fts (migration) để PostgreSQL dùng được index
+MEDIA_TSVECTOR_SQL = ("to_tsvector('simple', coalesce(media.original_filename, '') || ' ' || "
+                      "coalesce(media.alt_text, '') || ' ' || coalesce(media.title, ''))")
+
+
+# ==================== DANH MỤC ALBUM ====================
+def apply_album_deltas(connection, deltas):
+    """
+    Cộng delta số file cho từng album (tạo album nếu chưa có)
+
+    Args:
+        deltas (dict): {tên album: delta}
+    """
+    table = Album.__table__
+    now = datetime.utcnow()
+    for name, delta in deltas.items():
+        if not name or not delta:
+            continue
+        stmt = dialect_insert(table, bind=connection)
+        if hasattr(stmt, 'on_conflict_do_update'):
+            connection.execute(stmt.values(name=name, media_count=max(delta, 0), created_at=now, updated_at=now)
+                               .on_conflict_do_update(index_elements=[table.c.name],
+                                                      set_={'media_count': table.c.media_count + delta,
+                                                            'updated_at': now}))
+            continue
+
+        result = connection.execute(update(table).where(table.c.name == name)
+                                    .values(media_count=table.c.media_count + delta, updated_at=now))
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(name=name, media_count=max(delta, 0),
+                                                    created_at=now, updated_at=now))
+
+
+def _album_folders():
+    """Thư mục album cũ trong uploads/albums (trước khi có bảng albums)"""
+    albums_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'albums')
+    if not os.path.isdir(albums_path):
+        return []
+    return [name for name in os.listdir(albums_path) if os.path.isdir(os.path.join(albums_path, name))]
+
+
+def reconcile_albums(connection=None):
+    """Tính lại media_count của mọi album từ bảng media (không commit)"""
+    connection = connection or db.session.connection()
+    table = Album.__table__
+    now = datetime.utcnow()
+
+    counts = dict(connection.execute(
+        select(Media.album, func.count(Media.id)).where(Media.album.isnot(None), Media.album != '')
+        .group_by(Media.album)
+    ).all())
+    existing = set(connection.execute(select(table.c.name)).scalars())
+
+    for name in existing:
+        connection.execute(update(table).where(table.c.name == name)
+                           .values(media_count=counts.get(name, 0), updated_at=now))
+
+    new_names = (set(counts) | set(_album_folders())) - existing
+    if new_names:
+        connection.execute(insert(table), [{'name': name, 'media_count': counts.get(name, 0),
+                                            'created_at': now, 'updated_at': now} for name in new_names])
+
+
+def list_albums():
+    """Danh sách album [{'name', 'count'}] - 1 query trên bảng albums"""
+    rows = db.session.query(Album.name, Album.media_count).order_by(Album.name).all()
+    return [{'name': name, 'count': count} for name, count in rows]
+
+
+def create_album(name):
+    """Đăng ký album mới - trả về False nếu đã tồn tại"""
+    if Album.query.filter_by(name=name).first():
+        return False
+    db.session.add(Album(name=name, media_count=0))
+    db.session.commit()
+    return True
+
+
+def delete_album(name):
+    """Xóa album khỏi danh mục (caller kiểm tra album rỗng trước)"""
+    Album.query.filter_by(name=name).delete(synchronize_session=False)
+    db.session.commit()
+
+
+# ==================== MEDIA PICKER ====================
+def encode_cursor(media):
+    raw = f'{media.created_at.isoformat()}|{media.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Cursor -> (created_at, id); cursor sai định dạng -> ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, media_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(media_id)
+    except Exception:
+        raise ValueError('Cursor không hợp lệ')
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def search_condition(search):
+    """Điều kiện tìm kiếm theo tiền tố (có index) + full-text trên PostgreSQL"""
+    term = search.strip().lower()
+    prefix = _escape_like(term) + '%'
+    conditions = [
+        func.lower(Media.original_filename).like(prefix, escape='\\'),
+        func.lower(Media.alt_text).like(prefix, escape='\\'),
+    ]
+
+    words = re.findall(r'\w+', term)
+    if words and db.session.get_bind().dialect.name == 'postgresql':
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        conditions.append(text(f"{MEDIA_TSVECTOR_SQL} @@ to_tsquery('simple', :media_tsquery)")
+                          .bindparams(media_tsquery=tsquery))
+
+    return or_(*conditions)
+
+
+def picker_page(album='', search='', cursor=None, limit=PICKER_PAGE_SIZE):
+    """
+    1 trang media cho picker, mới nhất trước
+
+    Returns:
+        (list Media, next_cursor hoặc None)
+    """
+    limit = max(1, min(limit or PICKER_PAGE_SIZE, PICKER_MAX_PAGE_SIZE))
+    query = Media.query
+    if album:
+        query = query.filter(Media.album == album)
+    if search and search.strip():
+        query = query.filter(search_condition(search))
+    if cursor:
+        created_at, media_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Media.created_at < created_at,
+            and_(Media.created_at == created_at, Media.id < media_id)
+        ))
+
+    items = query.order_by(Media.created_at.desc(), Media.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else None
+    return items[:limit], next_cursor
@@ -0,0 +1,272 @@
+"""
+Chỉ mục chỗ dùng media (media_references) + dọn media mồ côi
+
+- URL ảnh được copy dạng chuỗi vào Product.image, Blog.image / content (HTML),
+  Project.image / content, Banner.image, Category.image, Settings.value (logo,
+  favicon...) và các bảng gallery product_images / project_images
+- Mỗi lần flush, các cột trên của bản ghi mới/sửa/xóa được quét lại và ghi vào
+  media_references TRONG CÙNG transaction (ảnh gallery ghi dưới tên chủ sở
+  hữu: owner product/project, field 'gallery')
+- "Ảnh này đang dùng ở đâu" = 1 query trên index media_key
+- GC: media không còn chỗ dùng (và đủ cũ) được xóa theo lô bằng
+  bulk_delete_media() -> file trên storage xóa ở nền (app/media_cleanup.py)
+
+Thao tác bulk bỏ qua ORM (import sản phẩm...) không cập nhật chỉ mục ->
+`flask media-gc` luôn dựng lại chỉ mục trước khi tìm media mồ côi.
+"""
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.orm import Session, attributes
+
+from app import db
+from app.models import (Product, Blog, Project, Banner, Category, Settings, Media, MediaReference,
+                        ProductImage, ProjectImage)
+from app.utils import parse_storage_path
+
+# model -> (owner_type, các cột có thể chứa URL ảnh)
+REFERENCE_SOURCES = {
+    Product: ('product', ('image',)),
+    Blog: ('blog', ('image', 'content')),
+    Project: ('project', ('image', 'content')),
+    Banner: ('banner', ('image',)),
+    Category: ('category', ('image',)),
+    Settings: ('setting', ('value',)),
+}
+
+# bảng gallery -> (owner_type, cột id chủ sở hữu) - ghi với field GALLERY_FIELD
+GALLERY_SOURCES = {
+    ProductImage: ('product', 'product_id'),
+    ProjectImage: ('project', 'project_id'),
+}
+GALLERY_FIELD = 'gallery'
+
+# owner_type -> (endpoint trang sửa, cột tên hiển thị)
+OWNER_ADMIN = {
+    'product': ('admin.edit_product', 'name'),
+    'blog': ('admin.edit_blog', 'title'),
+    'project': ('admin.edit_project', 'title'),
+    'banner': ('admin.edit_banner', 'title'),
+    'category': ('admin.edit_category', 'name'),
+    'setting': ('admin.settings', 'key'),
+}
+
+# URL Cloudinary hoặc đường dẫn /static/... (có thể kèm domain) trong text / HTML / JSON
+MEDIA_URL_RE = re.compile(
+    r'''https?://res\.cloudinary\.com/[^\s"'<>)\\]+'''
+    r'''|(?:https?://[^\s"'<>/]+)?/static/[^\s"'<>)\\]+'''
+)
+
+INSERT_CHUNK_SIZE = 1000
+
+
+# ==================== TRÍCH URL ====================
+def media_key(url):
+    """URL / đường dẫn ảnh -> media_key ('cloudinary:<public_id>' / 'local:<path>') hoặc None"""
+    if not url:
+        return None
+    url = url.strip()
+    if url.startswith('uploads/') or url.startswith('/uploads/'):
+        url = '/static/' + url.lstrip('/')
+    elif '/static/' in url and 'res.cloudinary.com' not in url:
+        url = url[url.index('/static/'):]
+
+    storage, key = parse_storage_path(url)
+    return f'{storage}:{key}' if storage else None
+
+
+def extract_keys(value):
+    """Tất cả media_key xuất hiện trong 1 giá trị (URL đơn, JSON list, HTML)"""
+    if not value or not isinstance(value, str):
+        return set()
+
+    keys = {media_key(match) for match in MEDIA_URL_RE.findall(value)}
+    if not keys and ' ' not in value.strip():
+        keys.add(media_key(value))
+    keys.discard(None)
+    return keys
+
+
+def _references(owner_type, owner_id, fields, values):
+    return [{'media_key': key[:500], 'owner_type': owner_type, 'owner_id': owner_id, 'field': field}
+            for field, value in zip(fields, values)
+            for key in sorted(extract_keys(value))]
+
+
+# ==================== CẬP NHẬT KHI LƯU ====================
+def _changed_fields(obj, fields):
+    return [field for field in fields
+            if attributes.get_history(obj, field, passive=attributes.PASSIVE_NO_INITIALIZE).has_changes()]
+
+
+def _after_flush(session, flush_context):
+    """Quét lại cột chứa ảnh của bản ghi vừa thêm/sửa/xóa và ghi media_references"""
+    table = MediaReference.__table__
+    removals = []  # (owner_type, owner_id, fields hoặc None = tất cả)
+    rows = []
+
+    for obj in session.new:
+        source = REFERENCE_SOURCES.get(type(obj))
+        if source:
+            owner_type, fields = source
+            rows += _references(owner_type, obj.id, fields, [getattr(obj, field) for field in fields])
+
+    for obj in session.dirty:
+        source = REFERENCE_SOURCES.get(type(obj))
+        if not source or not session.is_modified(obj):
+            continue
+        owner_type, fields = source
+        changed = _changed_fields(obj, fields)
+        if changed:
+            removals.append((owner_type, obj.id, changed))
+            rows += _references(owner_type, obj.id, changed, [getattr(obj, field) for field in changed])
+
+    for obj in session.deleted:
+        source = REFERENCE_SOURCES.get(type(obj))
+        if source:
+            removals.append((source[0], obj.id, None))
+
+    # Gallery: chủ sở hữu có ảnh thêm/sửa/xóa -> quét lại cả gallery từ DB (đã flush)
+    galleries = defaultdict(set)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        source = GALLERY_SOURCES.get(type(obj))
+        if source:
+            owner_id = getattr(obj, source[1])
+            if owner_id is None:
+                # Ảnh bị gỡ khỏi gallery (delete-orphan): lấy id chủ cũ từ lịch sử thay đổi
+                owner_id = next(iter(attributes.get_history(obj, source[1]).deleted or ()), None)
+            if owner_id is not None:
+                galleries[type(obj)].add(owner_id)
+
+    if not removals and not rows and not galleries:
+        return
+
+    connection = session.connection()
+    for model, owner_ids in galleries.items():
+        owner_type, owner_column = GALLERY_SOURCES[model]
+        removals += [(owner_type, owner_id, [GALLERY_FIELD]) for owner_id in owner_ids]
+        for owner_id, url in connection.execute(
+                select(getattr(model, owner_column), model.url).where(getattr(model, owner_column).in_(owner_ids))):
+            rows += _references(owner_type, owner_id, [GALLERY_FIELD], [url])
+
+    for owner_type, owner_id, fields in removals:
+        stmt = delete(table).where(table.c.owner_type == owner_type, table.c.owner_id == owner_id)
+        if fields:
+            stmt = stmt.where(table.c.field.in_(fields))
+        connection.execute(stmt)
+    if rows:
+        connection.execute(insert(table), rows)
+
+
+def init_app(app):
+    """Đăng ký listener cập nhật chỉ mục chỗ dùng media"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+
+# ==================== DỰNG LẠI / TRA CỨU ====================
+def rebuild_references():
+    """Dựng lại toàn bộ media_references từ dữ liệu gốc - trả về số dòng"""
+    table = MediaReference.__table__
+    db.session.execute(delete(table))
+
+    # (owner_type, tên field, cột id chủ sở hữu + các cột chứa URL)
+    sources = [(owner_type, fields, [model.id] + [getattr(model, field) for field in fields])
+               for model, (owner_type, fields) in REFERENCE_SOURCES.items()]
+    sources += [(owner_type, (GALLERY_FIELD,), [getattr(model, owner_column), model.url])
+                for model, (owner_type, owner_column) in GALLERY_SOURCES.items()]
+
+    total = 0
+    for owner_type, fields, columns in sources:
+        batch = []
+        for row in db.session.execute(select(*columns).execution_options(yield_per=INSERT_CHUNK_SIZE)):
+            batch += _references(owner_type, row[0], fields, row[1:])
+            if len(batch) >= INSERT_CHUNK_SIZE:
+                db.session.execute(insert(table), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(insert(table), batch)
+            total += len(batch)
+
+    db.session.commit()
+    return total
+
+
+def where_used(media):
+    """
+    Những chỗ đang dùng 1 media
+
+    Returns:
+        list dict {owner_type, owner_id, field, label, endpoint}
+    """
+    key = media_key(media.filepath)
+    if not key:
+        return []
+
+    refs = MediaReference.query.filter_by(media_key=key).order_by(
+        MediaReference.owner_type, MediaReference.owner_id
+    ).all()
+
+    # Tên hiển thị: 1 query cho mỗi loại nội dung
+    owner_ids = defaultdict(set)
+    for ref in refs:
+        owner_ids[ref.owner_type].add(ref.owner_id)
+    labels = {}
+    for model, (owner_type, _fields) in REFERENCE_SOURCES.items():
+        if owner_ids.get(owner_type):
+            label_column = getattr(model, OWNER_ADMIN[owner_type][1])
+            for owner_id, label in db.session.query(model.id, label_column).filter(
+                    model.id.in_(owner_ids[owner_type])):
+                labels[(owner_type, owner_id)] = label
+
+    return [{'owner_type': ref.owner_type, 'owner_id': ref.owner_id, 'field': ref.field,
+             'label': labels.get((ref.owner_type, ref.owner_id)) or f'#{ref.owner_id}',
+             'endpoint': OWNER_ADMIN[ref.owner_type][0]}
+            for ref in refs]
+
+
+def find_orphans(min_age_days=7):
+    """
+    Media không còn chỗ dùng và tạo trước `min_age_days` ngày
+    (để chừa thời gian cho ảnh vừa upload chưa kịp gắn vào nội dung)
+
+    Returns:
+        list (id, filepath, file_size)
+    """
+    referenced = set(db.session.execute(select(MediaReference.media_key).distinct()).scalars())
+    cutoff = datetime.utcnow() - timedelta(days=min_age_days)
+
+    orphans = []
+    rows = db.session.execute(
+        select(Media.id, Media.filepath, Media.file_size).where(Media.created_at < cutoff)
+        .execution_options(yield_per=INSERT_CHUNK_SIZE)
+    )
+    for media_id, filepath, file_size in rows:
+        key = media_key(filepath)
+        if key and key not in referenced:
+            orphans.append((media_id, filepath, file_size))
+    return orphans
+
+
+def collect_orphans(min_age_days=7, batch_size=500, dry_run=False):
+    """
+    Dựng lại chỉ mục rồi xóa media mồ côi theo lô
+
+    Returns:
+        (danh sách media mồ côi, số media đã xóa)
+    """
+    from app.media_cleanup import bulk_delete_media
+
+    rebuild_references()
+    orphans = find_orphans(min_age_days)
+    if dry_run:
+        return orphans, 0
+
+    deleted = 0
+    ids = [media_id for media_id, _filepath, _size in orphans]
+    for start in range(0, len(ids), batch_size):
+        deleted += bulk_delete_media(ids=ids[start:start + batch_size])
+    return orphans, deleted
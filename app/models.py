@@ -2,6 +2,7 @@
 # ==================== THAY ĐỔI CLASS USER TRONG app/models.py ====================
 
 from flask_login import UserMixin
+from sqlalchemy.orm import deferred
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
 from datetime import datetime
@@ -142,6 +143,9 @@ def load_user(user_id):
 class Category(db.Model):
     """Model danh mục sản phẩm"""
     __tablename__ = 'categories'
+    __table_args__ = (
+        db.Index('ix_categories_updated_at_id', 'updated_at', 'id'),  # API: cursor + delta sync
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -150,6 +154,7 @@ class Category(db.Model):
     image = db.Column(db.String(255))
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Version cho fragment cache
 
     # Relationship với Product
     products = db.relationship('Product', backref='category', lazy='dynamic')
@@ -162,6 +167,11 @@ class Category(db.Model):
 class Product(db.Model):
     """Model sản phẩm"""
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_created_at', 'created_at'),
+        db.Index('ix_products_updated_at_id', 'updated_at', 'id'),  # API: cursor + delta sync
+        db.Index('ix_products_trending_score', 'trending_score'),  # Sắp xếp "phổ biến"
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -170,10 +180,10 @@ class Product(db.Model):
     price = db.Column(db.Float, default=0)
     old_price = db.Column(db.Float)
     image = db.Column(db.String(255))
-    images = db.Column(db.Text)  # JSON string chứa nhiều ảnh
     is_featured = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
     views = db.Column(db.Integer, default=0)
+    trending_score = db.Column(db.Float, default=0, nullable=False, server_default='0')  # app/trending.py
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -181,9 +191,21 @@ class Product(db.Model):
     image_title = db.Column(db.String(255))
     image_caption = db.Column(db.Text)
 
+    # Gallery ảnh (bảng product_images) - trang danh sách dùng selectinload(Product.gallery_images)
+    gallery_images = db.relationship('ProductImage', back_populates='product', order_by='ProductImage.position',
+                                     cascade='all, delete-orphan')
+
     def __repr__(self):
         return f'<Product {self.name}>'
 
+    def get_gallery_images(self):
+        """Danh sách URL ảnh gallery theo thứ tự"""
+        return [image.url for image in self.gallery_images]
+
+    def set_gallery_images(self, items):
+        """Thay toàn bộ gallery (list URL hoặc dict {url, alt_text, title})"""
+        self.gallery_images = build_gallery_images(ProductImage, items)
+
 
 # ==================== BANNER MODEL ====================
 class Banner(db.Model):
@@ -209,12 +231,16 @@ class Banner(db.Model):
 class Blog(db.Model):
     """Model tin tức / blog với SEO optimization"""
     __tablename__ = 'blogs'
+    __table_args__ = (
+        db.Index('ix_blogs_updated_at_id', 'updated_at', 'id'),  # API: cursor + delta sync
+        db.Index('ix_blogs_trending_score', 'trending_score'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     slug = db.Column(db.String(200), unique=True, nullable=False)
     excerpt = db.Column(db.Text)
-    content = db.Column(db.Text, nullable=False)
+    content = deferred(db.Column(db.Text, nullable=False), group='content')  # HTML dài: chỉ nạp khi cần (listings.py)
     image = db.Column(db.String(255))
 
     # ✅ Thêm dòng này
@@ -224,6 +250,7 @@ class Blog(db.Model):
     is_featured = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
     views = db.Column(db.Integer, default=0)
+    trending_score = db.Column(db.Float, default=0, nullable=False, server_default='0')  # app/trending.py
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -313,6 +340,11 @@ class FAQ(db.Model):
 class Contact(db.Model):
     """Model lưu thông tin liên hệ từ khách hàng"""
     __tablename__ = 'contacts'
+    __table_args__ = (
+        # Phục vụ lọc/xuất liên hệ theo trạng thái đọc + khoảng ngày
+        db.Index('ix_contacts_created_at', 'created_at'),
+        db.Index('ix_contacts_is_read_created_at', 'is_read', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -331,6 +363,13 @@ class Contact(db.Model):
 class Media(db.Model):
     """Model quản lý hình ảnh/media files với SEO optimization"""
     __tablename__ = 'media'
+    __table_args__ = (
+        db.Index('ix_media_created_at', 'created_at'),
+        db.Index('ix_media_album_created_at', 'album', 'created_at'),
+        # Tìm kiếm theo tiền tố trong media picker (PostgreSQL: varchar_pattern_ops + GIN full-text, xem migration)
+        db.Index('ix_media_original_filename_lower', db.text('lower(original_filename)')),
+        db.Index('ix_media_alt_text_lower', db.text('lower(alt_text)')),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(255), nullable=False)
@@ -405,6 +444,10 @@ class Media(db.Model):
 class Project(db.Model):
     """Model cho Dự án tiêu biểu"""
     __tablename__ = 'projects'
+    __table_args__ = (
+        db.Index('ix_projects_updated_at_id', 'updated_at', 'id'),  # API: cursor + delta sync
+        db.Index('ix_projects_trending_score', 'trending_score'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -414,41 +457,46 @@ class Project(db.Model):
     year = db.Column(db.Integer)  # Năm thực hiện
 
     description = db.Column(db.Text)  # Mô tả ngắn
-    content = db.Column(db.Text)  # Nội dung chi tiết
+    content = deferred(db.Column(db.Text), group='content')  # Nội dung chi tiết (chỉ nạp khi cần)
 
     image = db.Column(db.String(300))  # Ảnh đại diện
-    gallery = db.Column(db.Text)  # JSON array các ảnh gallery
 
     # Thông tin dự án
     project_type = db.Column(db.String(100))  # Loại dự án: Nhà ở, Văn phòng, Khách sạn...
     area = db.Column(db.String(100))  # Diện tích
-    products_used = db.Column(db.Text)  # Sản phẩm đã sử dụng
+    products_used = deferred(db.Column(db.Text), group='content')  # Sản phẩm đã sử dụng
 
     is_featured = db.Column(db.Boolean, default=False)
     is_active = db.Column(db.Boolean, default=True)
     view_count = db.Column(db.Integer, default=0)
+    trending_score = db.Column(db.Float, default=0, nullable=False, server_default='0')  # app/trending.py
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Gallery ảnh (bảng project_images)
+    gallery_images = db.relationship('ProjectImage', back_populates='project', order_by='ProjectImage.position',
+                                     cascade='all, delete-orphan')
+
     def __repr__(self):
         return f'<Project {self.title}>'
 
     def get_gallery_images(self):
-        """Parse gallery JSON"""
-        if self.gallery:
-            import json
-            try:
-                return json.loads(self.gallery)
-            except:
-                return []
-        return []
+        """Danh sách URL ảnh gallery theo thứ tự"""
+        return [image.url for image in self.gallery_images]
+
+    def set_gallery_images(self, items):
+        """Thay toàn bộ gallery (list URL hoặc dict {url, alt_text, title})"""
+        self.gallery_images = build_gallery_images(ProjectImage, items)
 
 # ==================== TUYỂN DỤNG ====================
 
 class Job(db.Model):
     """Model cho Tuyển dụng"""
     __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_updated_at_id', 'updated_at', 'id'),  # API: cursor + delta sync
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -543,8 +591,13 @@ def get_media_by_image_url(image_url):
     if not image_url:
         return None
 
+    # Đã nạp trước cùng cả danh sách (prefetch_media) trong request này
+    from flask import g, has_request_context
+    if has_request_context() and image_url in g.get('media_by_url', {}):
+        return g.media_by_url[image_url]
+
     # Case 1: URL Cloudinary đầy đủ - tìm theo filepath
-    if image_url.startswith('http://') or image_url.startswith('https://'):
+    if _is_remote_url(image_url):
         return Media.query.filter_by(filepath=image_url).first()
 
     # Case 2: Local path - tìm theo filename
@@ -558,6 +611,15 @@ def get_media_by_image_url(image_url):
         return media
 
     # Case 3: Nếu không tìm thấy, thử chuẩn hóa path và tìm lại
+    return Media.query.filter_by(filepath=_normalize_media_path(image_url)).first()
+
+
+def _is_remote_url(image_url):
+    return image_url.startswith('http://') or image_url.startswith('https://')
+
+
+def _normalize_media_path(image_url):
+    """uploads/a.jpg, /uploads/a.jpg → /static/uploads/a.jpg"""
     normalized_path = image_url
     if not normalized_path.startswith('/'):
         normalized_path = '/' + normalized_path
@@ -566,8 +628,44 @@ def get_media_by_image_url(image_url):
             normalized_path = '/static' + normalized_path
         else:
             normalized_path = '/static/' + normalized_path.lstrip('/')
+    return normalized_path
 
-    return Media.query.filter_by(filepath=normalized_path).first()
+
+def prefetch_media(image_urls):
+    """
+    Nạp Media của cả danh sách ảnh (card sản phẩm / bài viết / dự án) bằng 1 query
+    get_media_by_image_url() trong cùng request dùng lại kết quả thay vì 1-2 query / ảnh
+    Gọi sau commit cuối của request (object Media hết hạn khi commit)
+    """
+    from flask import g, has_request_context
+    if not has_request_context():
+        return
+
+    found = g.setdefault('media_by_url', {})
+    urls = {url for url in image_urls if url and url not in found}
+    if not urls:
+        return
+
+    filepaths, filenames = set(), set()
+    for url in urls:
+        if _is_remote_url(url):
+            filepaths.add(url)
+        else:
+            filenames.add(url.split('/')[-1])
+            filepaths.add(_normalize_media_path(url))
+
+    by_path, by_name = {}, {}
+    for media in Media.query.filter(
+            db.or_(Media.filepath.in_(filepaths), Media.filename.in_(filenames))).order_by(Media.id):
+        by_path.setdefault(media.filepath, media)
+        by_name.setdefault(media.filename, media)
+
+    # Cùng thứ tự ưu tiên với get_media_by_image_url
+    for url in urls:
+        if _is_remote_url(url):
+            found[url] = by_path.get(url)
+        else:
+            found[url] = by_name.get(url.split('/')[-1]) or by_path.get(_normalize_media_path(url))
 
 
 # ==================== CẬP NHẬT METHOD CHO PRODUCT ====================
@@ -721,35 +819,455 @@ class Settings(db.Model):
         return f'<Settings {self.key}: {self.value}>'
 
 # Helper function để get/set settings
+# Tăng mỗi lần có setting thay đổi - cache (template, fragment...) so version để biết khi nào cần làm mới
+SETTINGS_VERSION_KEY = 'settings_version'
+
+
 def get_setting(key, default=None):
-    """Lấy giá trị setting từ DB"""
+    """
+    Lấy giá trị setting
+    Trong request: nạp toàn bộ settings 1 lần (1 query) rồi đọc từ bộ nhớ -
+    template gọi get_setting() hàng chục lần không sinh hàng chục query
+    """
+    from flask import g, has_request_context
+
+    if has_request_context():
+        if 'settings_snapshot' not in g:
+            g.settings_snapshot = get_settings()
+        return g.settings_snapshot.get(key, default)
+
     setting = Settings.query.filter_by(key=key).first()
     return setting.value if setting else default
 
 
+def get_settings():
+    """Toàn bộ settings dạng dict {key: value} - 1 query"""
+    return dict(db.session.query(Settings.key, Settings.value).all())
+
+
+def get_settings_version():
+    """Version hiện tại của settings (0 nếu chưa lưu lần nào)"""
+    return int(get_setting(SETTINGS_VERSION_KEY, '0') or 0)
+
+
+def _setting_value(value):
+    """
+    Chuẩn hóa giá trị setting thành string
+    Sửa lỗi tuple/dict: Nếu value là tuple (URL, metadata), chỉ lưu URL string
+    Returns: (value string, metadata hoặc None)
+    """
+    metadata = None
+    if isinstance(value, tuple):
+        if len(value) > 1 and isinstance(value[1], dict):
+            metadata = value[1]
+        value = value[0] if value else ''
+    if value is None:
+        value = ''
+    return (value if isinstance(value, str) else str(value)), metadata
+
+
+def _bump_settings_version():
+    """
+    Tăng version settings bằng 1 câu lệnh trên DB (value = value + 1), không
+    đọc-rồi-ghi: 2 admin lưu cùng lúc vẫn được 2 version khác nhau
+    """
+    from sqlalchemy import Integer, String, cast, insert, update
+    from app.utils import dialect_insert
+
+    table = Settings.__table__
+    next_value = cast(cast(table.c.value, Integer) + 1, String)
+    now = datetime.utcnow()
+    stmt = dialect_insert(table)
+    if hasattr(stmt, 'on_conflict_do_update'):
+        # Chưa có dòng version (lần lưu đầu) -> tạo với 1, đã có -> + 1
+        db.session.execute(stmt.values(
+            key=SETTINGS_VERSION_KEY, value='1', group='system',
+            description='Version settings (tự tăng khi lưu)', updated_at=now
+        ).on_conflict_do_update(index_elements=[table.c.key], set_={'value': next_value, 'updated_at': now}))
+        return
+
+    result = db.session.execute(
+        update(table).where(table.c.key == SETTINGS_VERSION_KEY).values(value=next_value, updated_at=now)
+    )
+    if result.rowcount == 0:
+        db.session.execute(insert(table).values(key=SETTINGS_VERSION_KEY, value='1', group='system',
+                                                description='Version settings (tự tăng khi lưu)', updated_at=now))
+
+
+def save_settings(values):
+    """
+    Lưu nhiều setting trong 1 transaction - chỉ ghi các key có giá trị thay đổi
+
+    Args:
+        values (dict): {key: (value, group, description)}
+
+    Returns:
+        set: các key đã thay đổi (rỗng -> không ghi gì, version giữ nguyên)
+    """
+    existing = {setting.key: setting for setting in Settings.query.filter(Settings.key.in_(list(values))).all()}
+
+    changed = set()
+    for key, (value, group, description) in values.items():
+        value, metadata = _setting_value(value)
+        if metadata:
+            # Metadata (dict) lưu vào description
+            description = f"{description} | Metadata: {metadata}"
+
+        setting = existing.get(key)
+        if setting is None:
+            db.session.add(Settings(key=key, value=value, group=group, description=description))
+            changed.add(key)
+        elif setting.value != value:
+            setting.value = value
+            setting.group = group
+            setting.description = description
+            changed.add(key)
+
+    if not changed:
+        return changed
+
+    try:
+        _bump_settings_version()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Request hiện tại đọc lại settings / version mới (get_setting, fragment cache)
+    from flask import g, has_request_context
+    if has_request_context():
+        g.pop('settings_snapshot', None)
+        g.pop('content_versions', None)
+    return changed
+
+
 def set_setting(key, value, group='general', description=''):
-    """Lưu hoặc cập nhật setting"""
-    setting = Settings.query.filter_by(key=key).first()
-    if setting:
-        setting.value = value
-        setting.group = group
-        setting.description = description
-    else:
-        setting = Settings(key=key, value=value, group=group, description=description)
-        db.session.add(setting)
-
-    # Sửa lỗi tuple/dict: Nếu value là tuple (URL, metadata), chỉ lưu URL string
-    if isinstance(setting.value, tuple):
-        if len(setting.value) >= 1:
-            setting.value = str(setting.value[0])  # Lưu URL string
-            # Metadata (dict) có thể lưu vào description nếu cần
-            if len(setting.value) > 1 and isinstance(setting.value[1], dict):
-                setting.description += f" | Metadata: {setting.value[1]}"  # Optional: lưu metadata vào description
-        else:
-            setting.value = str(setting.value)  # Fallback
+    """Lưu hoặc cập nhật 1 setting (nhiều setting cùng lúc: save_settings)"""
+    save_settings({key: (value, group, description)})
+    return Settings.query.filter_by(key=key).first()
+
+# ==================== BỘ ĐẾM THỐNG KÊ ====================
+class StatCounter(db.Model):
+    """
+    Bảng bộ đếm tính sẵn (materialized counters)
+    Được cập nhật trong cùng transaction bởi app/counters.py
+    VD key: 'products', 'contacts_unread', 'category_products:3', 'album_media:Tin_tuc'
+    """
+    __tablename__ = 'stat_counters'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(150), unique=True, nullable=False, index=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StatCounter {self.key}: {self.value}>'
+
+
+# ==================== NỘI DUNG LIÊN QUAN ====================
+class RelatedItem(db.Model):
+    """
+    Top-N nội dung liên quan đã tính sẵn cho product / blog / project
+    Được tính offline bởi app/related.py (TF-IDF + cùng danh mục/loại + co-view)
+    """
+    __tablename__ = 'related_items'
+    __table_args__ = (
+        db.Index('ix_related_items_lookup', 'item_type', 'item_id', 'rank'),
+        db.Index('ix_related_items_reverse', 'item_type', 'related_id'),
+        db.UniqueConstraint('item_type', 'item_id', 'related_id', name='uq_related_items_pair'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_type = db.Column(db.String(20), nullable=False)  # product, blog, project
+    item_id = db.Column(db.Integer, nullable=False)
+    related_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Float, default=0)
+    rank = db.Column(db.Integer, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<RelatedItem {self.item_type} {self.item_id} -> {self.related_id}>'
+
+
+class CoView(db.Model):
+    """Số lần 2 nội dung cùng loại được xem trong cùng phiên (tín hiệu co-view)"""
+    __tablename__ = 'co_views'
+    __table_args__ = (
+        db.UniqueConstraint('item_type', 'item_id', 'other_id', name='uq_co_views_pair'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_type = db.Column(db.String(20), nullable=False)
+    item_id = db.Column(db.Integer, nullable=False)
+    other_id = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, default=0)
+
+    def __repr__(self):
+        return f'<CoView {self.item_type} {self.item_id} & {self.other_id}: {self.count}>'
+
+
+# ==================== ALBUM ====================
+class Album(db.Model):
+    """
+    Danh mục album media với số file tính sẵn
+    media_count được cập nhật cùng transaction với bộ đếm album_media:<tên> (app/counters.py)
+    """
+    __tablename__ = 'albums'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False, index=True)
+    media_count = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Album {self.name}: {self.media_count}>'
+
+
+# ==================== XÓA FILE MEDIA (TOMBSTONE) ====================
+class MediaTombstone(db.Model):
+    """
+    File của media đã xóa khỏi DB nhưng chưa (chắc chắn) xóa khỏi storage
+    Worker nền xóa theo lô (app/media_cleanup.py); file lỗi được thử lại với backoff
+    """
+    __tablename__ = 'media_tombstones'
+    __table_args__ = (
+        db.Index('ix_media_tombstones_due', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    media_id = db.Column(db.Integer)  # id cũ, chỉ để tra cứu
+    filepath = db.Column(db.String(500), nullable=False)
+    storage = db.Column(db.String(20), nullable=False)  # cloudinary / local
+    storage_key = db.Column(db.String(500), nullable=False)  # public_id hoặc đường dẫn tương đối trong static
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending / done / failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.String(500))
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    deleted_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<MediaTombstone {self.storage}:{self.storage_key} {self.status}>'
+
+
+# ==================== CHỖ DÙNG MEDIA (REFERENCE INDEX) ====================
+class MediaReference(db.Model):
+    """
+    1 lần ảnh được dùng trong nội dung (ảnh sản phẩm, ảnh trong bài viết, logo...)
+    Cập nhật mỗi khi lưu nội dung nguồn (app/media_refs.py)
+    media_key: 'cloudinary:<public_id>' hoặc 'local:<đường dẫn trong static>'
+    """
+    __tablename__ = 'media_references'
+    __table_args__ = (
+        db.Index('ix_media_references_owner', 'owner_type', 'owner_id'),
+    )
 
-    # Đảm bảo value là string
-    setting.value = str(setting.value) if not isinstance(setting.value, str) else setting.value
+    id = db.Column(db.Integer, primary_key=True)
+    media_key = db.Column(db.String(500), nullable=False, index=True)
+    owner_type = db.Column(db.String(30), nullable=False)  # product / blog / project / banner / category / setting
+    owner_id = db.Column(db.Integer, nullable=False)
+    field = db.Column(db.String(50), nullable=False)
+
+    def __repr__(self):
+        return f'<MediaReference {self.media_key} <- {self.owner_type}:{self.owner_id}.{self.field}>'
+
+
+# ==================== OUTBOX THÔNG BÁO ====================
+class OutboxMessage(db.Model):
+    """
+    Thông báo chờ gửi (email...) - ghi cùng transaction với dữ liệu gốc (VD: Contact)
+    Dispatcher nền gửi theo lô, thử lại với backoff (app/outbox.py)
+    """
+    __tablename__ = 'outbox_messages'
+    __table_args__ = (
+        db.Index('ix_outbox_messages_due', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    idempotency_key = db.Column(db.String(150), unique=True, nullable=False)  # VD: contact:12:email:a@b.c
+    channel = db.Column(db.String(20), nullable=False)  # email
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255))
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending / sent / failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.String(500))
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<OutboxMessage {self.idempotency_key} {self.status}>'
+
+
+# ==================== BUS XÓA CACHE ====================
+class CacheInvalidation(db.Model):
+    """
+    1 sự kiện "topic (+ key) đã thay đổi" cho cache trong bộ nhớ của các worker
+    Dùng khi DB không phải PostgreSQL (không có LISTEN/NOTIFY) - app/invalidation.py
+    """
+    __tablename__ = 'cache_invalidations'
+
+    id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(100), nullable=False)  # namespace cache: facets:products, entities:product...
+    key = db.Column(db.String(255))  # None: cả namespace
+    source = db.Column(db.String(100))  # host:pid của worker phát (worker đó bỏ qua sự kiện của chính mình)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<CacheInvalidation {self.topic} {self.key}>'
+
+
+# ==================== API CATALOG: BẢN GHI ĐÃ XÓA ====================
+class CatalogTombstone(db.Model):
+    """
+    Sản phẩm / danh mục / bài viết / dự án / tin tuyển dụng đã xóa hẳn khỏi DB
+    API delta sync (?since=) trả về để đối tác xóa theo (app/api/catalog.py)
+    """
+    __tablename__ = 'catalog_tombstones'
+    __table_args__ = (
+        db.Index('ix_catalog_tombstones_resource_deleted_at', 'resource', 'deleted_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    resource = db.Column(db.String(20), nullable=False)  # products / categories / blogs / projects / jobs
+    entity_id = db.Column(db.Integer, nullable=False)
+    slug = db.Column(db.String(200))
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<CatalogTombstone {self.resource}:{self.entity_id}>'
+
+
+# ==================== THỐNG KÊ LƯỢT XEM ====================
+class ViewRollupHourly(db.Model):
+    """
+    Lượt xem sản phẩm / bài viết / dự án theo giờ (UTC) - tính điểm xu hướng (app/trending.py)
+    Chỉ giữ TRENDING_HOURLY_RETENTION_DAYS ngày gần nhất, cũ hơn dùng ViewRollupDaily
+    """
+    __tablename__ = 'view_rollups_hourly'
+    __table_args__ = (
+        db.UniqueConstraint('item_type', 'item_id', 'hour', name='uq_view_rollups_hourly_item_hour'),
+        db.Index('ix_view_rollups_hourly_hour', 'hour'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_type = db.Column(db.String(20), nullable=False)  # product / blog / project
+    item_id = db.Column(db.Integer, nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)  # Đầu giờ, UTC
+    views = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<ViewRollupHourly {self.item_type}:{self.item_id} {self.hour}: {self.views}>'
 
-    db.session.commit()
-    return setting
\ No newline at end of file
+
+class ViewRollupDaily(db.Model):
+    """Lượt xem theo ngày (giờ địa phương, VIEW_STATS_UTC_OFFSET) - biểu đồ dashboard, giữ lâu dài"""
+    __tablename__ = 'view_rollups_daily'
+    __table_args__ = (
+        db.UniqueConstraint('item_type', 'item_id', 'day', name='uq_view_rollups_daily_item_day'),
+        db.Index('ix_view_rollups_daily_day', 'day', 'item_type'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_type = db.Column(db.String(20), nullable=False)
+    item_id = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Date, nullable=False)
+    views = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<ViewRollupDaily {self.item_type}:{self.item_id} {self.day}: {self.views}>'
+
+
+# ==================== GALLERY ẢNH ====================
+class ProductImage(db.Model):
+    """
+    1 ảnh trong gallery sản phẩm (thay cho cột JSON products.images)
+    media: Media tương ứng (alt/title SEO) - join sẵn khi load gallery
+    """
+    __tablename__ = 'product_images'
+    __table_args__ = (
+        db.Index('ix_product_images_product_position', 'product_id', 'position'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    media_id = db.Column(db.Integer, db.ForeignKey('media.id', ondelete='SET NULL'), index=True)
+    url = db.Column(db.String(500), nullable=False)
+    position = db.Column(db.Integer, default=0, nullable=False)
+    alt_text = db.Column(db.String(255))  # Ghi đè alt của Media cho riêng sản phẩm này
+    title = db.Column(db.String(255))
+
+    product = db.relationship('Product', back_populates='gallery_images')
+    media = db.relationship('Media', lazy='joined')
+
+    def __repr__(self):
+        return f'<ProductImage {self.product_id}#{self.position}>'
+
+    def get_seo_info(self):
+        return gallery_image_seo_info(self, self.product.name if self.product else '')
+
+
+class ProjectImage(db.Model):
+    """1 ảnh trong gallery dự án (thay cho cột JSON projects.gallery)"""
+    __tablename__ = 'project_images'
+    __table_args__ = (
+        db.Index('ix_project_images_project_position', 'project_id', 'position'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, db.ForeignKey('projects.id', ondelete='CASCADE'), nullable=False)
+    media_id = db.Column(db.Integer, db.ForeignKey('media.id', ondelete='SET NULL'), index=True)
+    url = db.Column(db.String(500), nullable=False)
+    position = db.Column(db.Integer, default=0, nullable=False)
+    alt_text = db.Column(db.String(255))
+    title = db.Column(db.String(255))
+
+    project = db.relationship('Project', back_populates='gallery_images')
+    media = db.relationship('Media', lazy='joined')
+
+    def __repr__(self):
+        return f'<ProjectImage {self.project_id}#{self.position}>'
+
+    def get_seo_info(self):
+        return gallery_image_seo_info(self, self.project.title if self.project else '')
+
+
+def gallery_image_seo_info(image, fallback):
+    """
+    Alt/title/caption của 1 ảnh gallery
+
+    Priority:
+    1. alt/title riêng của ảnh trong gallery
+    2. Media Library
+    3. Tên sản phẩm / dự án
+    """
+    media = image.media
+    return {
+        'alt_text': image.alt_text or (media.alt_text if media else None) or fallback,
+        'title': image.title or (media.title if media else None) or fallback,
+        'caption': media.caption if media else None
+    }
+
+
+def build_gallery_images(model, items):
+    """
+    Tạo các dòng gallery (ProductImage / ProjectImage) theo thứ tự từ list URL
+    hoặc dict {url, alt_text, title} - Media khớp filepath được gắn media_id (1 query)
+    """
+    entries = []
+    for item in items or []:
+        if isinstance(item, str):
+            item = {'url': item}
+        url = (item.get('url') or item.get('src') or '').strip()
+        if url:
+            entries.append((url, item))
+
+    urls = {url for url, _item in entries}
+    media_ids = dict(db.session.query(Media.filepath, Media.id).filter(Media.filepath.in_(urls))) if urls else {}
+
+    return [model(url=url[:500], media_id=media_ids.get(url), position=position,
+                  alt_text=(item.get('alt_text') or item.get('alt') or '')[:255] or None,
+                  title=(item.get('title') or '')[:255] or None)
+            for position, (url, item) in enumerate(entries)]
@@ -1,3 +1,6 @@
+from flask import g, has_app_context
+from sqlalchemy import func
+
 from app import db
 from datetime import datetime
 
@@ -36,17 +39,40 @@ class Role(db.Model):
 
     def has_permission(self, permission_name):
         """Kiểm tra role có permission cụ thể không"""
+        return permission_name in self.permission_names()
+
+    def permission_names(self):
+        """
+        Tên các permission đang active của role
+        Nạp 1 lần / request: menu admin + decorator kiểm tra hàng chục quyền mỗi trang
+        """
+        names_by_role = g.setdefault('role_permission_names', {}) if has_app_context() else {}
+        names = names_by_role.get(self.id)
+        if names is None:
+            names = {name for (name,) in self.permissions.filter_by(is_active=True).with_entities(Permission.name)}
+            if self.id is not None:
+                names_by_role[self.id] = names
+        return names
+
+    def _forget_permission_names(self):
+        if has_app_context():
+            g.get('role_permission_names', {}).pop(self.id, None)
+
+    def _has_permission_row(self, permission_name):
+        # Đọc thẳng DB (không qua bộ nhớ của request) khi sửa danh sách quyền
         return self.permissions.filter_by(name=permission_name, is_active=True).first() is not None
 
     def add_permission(self, permission):
         """Thêm permission vào role"""
-        if not self.has_permission(permission.name):
+        if not self._has_permission_row(permission.name):
             self.permissions.append(permission)
+            self._forget_permission_names()
 
     def remove_permission(self, permission):
         """Xóa permission khỏi role"""
-        if self.has_permission(permission.name):
+        if self._has_permission_row(permission.name):
             self.permissions.remove(permission)
+            self._forget_permission_names()
 
     def get_permissions_by_category(self):
         """Lấy permissions nhóm theo category"""
@@ -89,6 +115,21 @@ class Permission(db.Model):
 
 
 # ==================== HELPER FUNCTIONS ====================
+def permission_counts_by_role(active_only=False):
+    """Số permission của từng role (1 query GROUP BY thay vì role.permissions.count() mỗi dòng): {role_id: số}"""
+    query = db.session.query(role_permissions.c.role_id, func.count())
+    if active_only:
+        query = query.join(Permission, Permission.id == role_permissions.c.permission_id).filter(
+            Permission.is_active == True)
+    return dict(query.group_by(role_permissions.c.role_id).all())
+
+
+def role_counts_by_permission():
+    """Số role có từng permission (thay perm.role_count mỗi dòng): {permission_id: số}"""
+    return dict(db.session.query(role_permissions.c.permission_id, func.count())
+                .group_by(role_permissions.c.permission_id).all())
+
+
 def init_default_roles():
     """Khởi tạo roles mặc định (gọi trong seed script)"""
     roles_data = [
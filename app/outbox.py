@@ -0,0 +1,256 @@
+"""
+Outbox thông báo (transactional outbox) + dispatcher nền
+
+- enqueue() chỉ thêm dòng outbox_messages vào session hiện tại -> được ghi
+  cùng transaction với dữ liệu gốc (Contact...): rollback thì thông báo cũng
+  không tồn tại, commit thì chắc chắn có thông báo để gửi
+- Sau commit, caller gọi wake_dispatcher(): dispatcher nền
+  (app/background.py) gửi thông báo, request không chờ SMTP
+- Dispatcher gửi theo lô (1 kết nối SMTP / lô), lỗi thì thử lại với backoff
+  lũy thừa, quá OUTBOX_MAX_ATTEMPTS lần -> failed
+- idempotency_key là unique: cùng 1 sự kiện không sinh 2 thông báo; email
+  dùng Message-ID suy ra từ key nên gửi lại sau sự cố không tạo thư mới ở
+  phía người nhận (client mail gộp theo Message-ID)
+
+Kiểm thử với SMTP sink local: MAIL_SERVER=localhost MAIL_PORT=1025 MAIL_USE_TLS=false
+"""
+import hashlib
+import smtplib
+from collections import defaultdict
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formatdate
+
+from flask import current_app, url_for
+from sqlalchemy import func
+
+from app import db
+from app.background import BackgroundWorker
+from app.models import OutboxMessage
+
+
+# ==================== KÊNH GỬI ====================
+class EmailChannel:
+    """Gửi email qua SMTP - 1 kết nối cho cả lô"""
+    batch_size = 50
+
+    def _build(self, message, sender):
+        email = EmailMessage()
+        email['From'] = sender
+        email['To'] = message.recipient
+        email['Subject'] = message.subject or ''
+        email['Date'] = formatdate(localtime=True)
+        digest = hashlib.sha1(message.idempotency_key.encode()).hexdigest()
+        email['Message-ID'] = f"<{digest}@{sender.rsplit('@', 1)[-1].strip('>')}>"
+        email.set_content(message.body)
+        return email
+
+    def send_many(self, messages):
+        """
+        Returns:
+            dict {message.id: None nếu gửi được / chuỗi lỗi}
+        """
+        config = current_app.config
+        if not config.get('MAIL_SERVER'):
+            return {message.id: 'MAIL_SERVER chưa được cấu hình' for message in messages}
+
+        results = {}
+        try:
+            with smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=config['MAIL_TIMEOUT']) as smtp:
+                if config.get('MAIL_USE_TLS'):
+                    smtp.starttls()
+                if config.get('MAIL_USERNAME'):
+                    smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+
+                for message in messages:
+                    try:
+                        email = self._build(message, config['MAIL_DEFAULT_SENDER'])
+                    except (ValueError, TypeError) as e:
+                        # Header không hợp lệ (xuống dòng trong tiêu đề / địa chỉ...): chỉ lỗi thư này
+                        results[message.id] = f'Email không hợp lệ: {e}'
+                        continue
+                    try:
+                        smtp.send_message(email)
+                        results[message.id] = None
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+                            smtplib.SMTPSenderRefused) as e:
+                        results[message.id] = f'SMTP: {e}'
+        except (OSError, smtplib.SMTPException) as e:
+            # Lỗi kết nối: các thông báo chưa gửi trong lô thử lại sau
+            for message in messages:
+                results.setdefault(message.id, f'SMTP: {e}')
+        return results
+
+
+DEFAULT_CHANNELS = {
+    'email': EmailChannel(),
+}
+
+
+def register_channel(app, name, channel):
+    """Thêm/thay kênh gửi cho 1 app (kênh cần có batch_size + send_many(messages))"""
+    app.extensions.setdefault('outbox_channels', {})[name] = channel
+
+
+def get_channel(name):
+    return current_app.extensions.get('outbox_channels', {}).get(name) or DEFAULT_CHANNELS.get(name)
+
+
+# ==================== GHI OUTBOX ====================
+def enqueue(idempotency_key, channel, recipient, subject, body):
+    """
+    Thêm thông báo vào session hiện tại (không commit - commit cùng dữ liệu gốc)
+    Tiêu đề gộp về 1 dòng: CR/LF từ dữ liệu khách nhập không thành header mới
+    """
+    subject = ' '.join((subject or '').split())
+    message = OutboxMessage(idempotency_key=idempotency_key[:150], channel=channel, recipient=recipient,
+                            subject=subject[:255], body=body, status='pending', attempts=0,
+                            next_attempt_at=datetime.utcnow())
+    db.session.add(message)
+    return message
+
+
+def enqueue_contact_notification(contact):
+    """Thông báo liên hệ mới cho các email trong CONTACT_NOTIFY_EMAILS (contact cần có id - đã flush)"""
+    recipients = current_app.config.get('CONTACT_NOTIFY_EMAILS') or []
+    if not recipients:
+        return []
+
+    subject = f"[Liên hệ mới] {contact.subject or contact.name}"
+    body = '\n'.join([
+        f"Họ tên: {contact.name}",
+        f"Email: {contact.email}",
+        f"Điện thoại: {contact.phone or '-'}",
+        f"Chủ đề: {contact.subject or '-'}",
+        '',
+        contact.message,
+        '',
+        f"Xem trong trang quản trị: {url_for('admin.contacts', _external=True)}",
+    ])
+    return [enqueue(f'contact:{contact.id}:email:{recipient}', 'email', recipient, subject, body)
+            for recipient in recipients]
+
+
+# ==================== DISPATCHER ====================
+def _backoff(attempts):
+    """Thời gian chờ trước lần thử tiếp theo: base * 2^(n-1), tối đa 1 giờ"""
+    base = current_app.config.get('OUTBOX_RETRY_BASE_SECONDS', 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def _claim(limit):
+    """Lấy các thông báo đến hạn và giữ chỗ (lease) để process khác không gửi trùng"""
+    now = datetime.utcnow()
+    messages = (OutboxMessage.query
+                .filter(OutboxMessage.status == 'pending', OutboxMessage.next_attempt_at <= now)
+                .order_by(OutboxMessage.next_attempt_at)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+                .all())
+
+    lease = timedelta(seconds=current_app.config.get('OUTBOX_LEASE_SECONDS', 300))
+    for message in messages:
+        message.attempts += 1
+        message.next_attempt_at = now + lease
+    db.session.commit()
+    return messages
+
+
+def dispatch_batch(limit=None):
+    """
+    Gửi 1 lô thông báo đến hạn
+
+    Returns:
+        (số đã gửi, số lỗi)
+    """
+    limit = limit or current_app.config.get('OUTBOX_BATCH_SIZE', 100)
+    max_attempts = current_app.config.get('OUTBOX_MAX_ATTEMPTS', 8)
+    messages = _claim(limit)
+
+    by_channel = defaultdict(list)
+    for message in messages:
+        by_channel[message.channel].append(message)
+
+    sent = failed = 0
+    for name, group in by_channel.items():
+        channel = get_channel(name)
+        batch_size = channel.batch_size if channel else len(group)
+        for start in range(0, len(group), batch_size):
+            batch = group[start:start + batch_size]
+            if channel is None:
+                errors = {message.id: f'Kênh {name} không tồn tại' for message in batch}
+            else:
+                try:
+                    errors = channel.send_many(batch)
+                except Exception as e:
+                    errors = {message.id: str(e) for message in batch}
+
+            now = datetime.utcnow()
+            for message in batch:
+                error = errors.get(message.id, 'Không có kết quả gửi')
+                if error is None:
+                    message.status = 'sent'
+                    message.sent_at = now
+                    message.last_error = None
+                    sent += 1
+                    continue
+
+                message.last_error = error[:500]
+                if message.attempts >= max_attempts:
+                    message.status = 'failed'
+                else:
+                    message.next_attempt_at = now + _backoff(message.attempts)
+                failed += 1
+            db.session.commit()
+
+    return sent, failed
+
+
+def dispatch_pending():
+    """Gửi tới khi hết thông báo đến hạn - trả về (đã gửi, lỗi)"""
+    total_sent = total_failed = 0
+    while True:
+        sent, failed = dispatch_batch()
+        total_sent += sent
+        total_failed += failed
+        if not sent and not failed:
+            return total_sent, total_failed
+
+
+def next_due_at():
+    """Thời điểm thông báo pending gần nhất đến hạn (None nếu hết)"""
+    return db.session.query(func.min(OutboxMessage.next_attempt_at)).filter(
+        OutboxMessage.status == 'pending'
+    ).scalar()
+
+
+def outbox_stats():
+    """Số thông báo theo trạng thái"""
+    rows = db.session.query(OutboxMessage.status, func.count(OutboxMessage.id)).group_by(
+        OutboxMessage.status
+    ).all()
+    return {'pending': 0, 'sent': 0, 'failed': 0, **dict(rows)}
+
+
+def retry_failed():
+    """Đưa các thông báo gửi lỗi về hàng đợi - trả về số thông báo"""
+    count = OutboxMessage.query.filter_by(status='failed').update(
+        {'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.utcnow()},
+        synchronize_session=False
+    )
+    db.session.commit()
+    return count
+
+
+dispatcher = BackgroundWorker('outbox', process=dispatch_pending, next_due=next_due_at,
+                              async_config='OUTBOX_ASYNC')
+
+
+def wake_dispatcher(app=None):
+    """Đánh thức dispatcher (gọi SAU khi commit transaction chứa thông báo)"""
+    dispatcher.wake(app)
+
+
+def init_app(app):
+    """Gửi tiếp các thông báo đang chờ retry khi process khởi động (request đầu tiên)"""
+    dispatcher.wake_on_start(app)
@@ -0,0 +1,90 @@
+"""
+Cache HTML cả trang cho các trang công khai đọc nhiều (trang chủ, sản phẩm, tin tức)
+
+- Chỉ cache GET của khách chưa đăng nhập, không có flash message đang chờ;
+  view trả redirect / response (không phải HTML) thì không cache
+- Key: host + path + query string (bộ lọc, trang...)
+- Nội dung hiển thị thay đổi (PAGE_MODELS) -> bus app/invalidation.py xóa
+  cache trang ở mọi worker
+- Single-flight + stale-while-revalidate (cache.get_or_set): cache hết hạn /
+  vừa bị xóa sau khi admin sửa -> 1 request render lại, các request đồng thời
+  nhận bản cũ (tối đa PAGE_CACHE_STALE giây) thay vì cùng query + render
+
+    @main_bp.route('/')
+    @cached_page
+    def index(): ...
+"""
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.cache import LocalCache, get_or_set
+from app.invalidation import publish, subscribe
+from app.models import Product, Category, Banner, Blog, Project, Job, Settings
+
+NAMESPACE = 'pages'
+
+# Model hiển thị trên các trang được cache (kể cả layout: settings, danh mục)
+PAGE_MODELS = (Product, Category, Banner, Blog, Project, Job, Settings)
+
+# Cache riêng: HTML lớn, không chiếm chỗ của facet / read-model
+pages = LocalCache(max_entries=500)
+
+
+class _Uncacheable(Exception):
+    """View trả response không phải HTML (redirect...) -> trả nguyên, không lưu"""
+
+    def __init__(self, response):
+        self.response = response
+
+
+def _cacheable():
+    return (current_app.config.get('PAGE_CACHE', True)
+            and request.method == 'GET'
+            and '_flashes' not in session
+            and not current_user.is_authenticated)
+
+
+def cached_page(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _cacheable():
+            return view(*args, **kwargs)
+
+        def render():
+            result = view(*args, **kwargs)
+            if not isinstance(result, str):
+                raise _Uncacheable(result)
+            return result
+
+        config = current_app.config
+        try:
+            return get_or_set(NAMESPACE, (request.host_url, request.full_path), render,
+                              ttl=config.get('PAGE_CACHE_TTL', 60), stale_ttl=config.get('PAGE_CACHE_STALE', 0),
+                              backend=pages)
+        except _Uncacheable as e:
+            return e.response
+
+    return wrapper
+
+
+# ==================== XÓA KHI NỘI DUNG THAY ĐỔI ====================
+def _after_flush(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, PAGE_MODELS):
+            publish(session, NAMESPACE)
+            return
+
+
+def _invalidate(key):
+    pages.invalidate(NAMESPACE)
+
+
+def init_app(app):
+    """Đăng ký listener xóa cache trang (mọi worker nhận qua bus)"""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+        subscribe(NAMESPACE, _invalidate)
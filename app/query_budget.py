@@ -0,0 +1,122 @@
+"""
+Ngân sách số câu SQL theo endpoint - chặn N+1 quay lại
+
+- Đếm mọi câu lệnh SQL chạy trong thread của request (listener
+  before_cursor_execute trên mọi engine, kể cả replica)
+- QUERY_BUDGETS: endpoint -> số câu tối đa của 1 request (tính cả lúc cache
+  trống: nạp settings, người dùng đăng nhập, đọc bus xóa cache...)
+    + vượt -> log cảnh báo kèm các câu lặp lại nhiều nhất
+    + QUERY_BUDGET_STRICT (mặc định = TESTING) -> raise QueryBudgetExceeded
+- Header Server-Timing `sql;desc="N queries"` khi DEBUG / TESTING
+- `flask query-budget` gọi thử các trang và so với ngân sách
+- Trong test / shell:
+
+    with assert_max_queries(6):
+        client.get('/san-pham')
+
+    with count_queries() as statements:
+        ...
+    print(len(statements))
+"""
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+# Số câu lặp lại hiển thị trong thông báo vượt ngân sách
+REPORT_LIMIT = 5
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Số câu SQL vượt ngân sách"""
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for statements in getattr(_local, 'active', ()):
+        statements.append(statement)
+
+
+# ==================== ĐẾM ====================
+@contextmanager
+def count_queries():
+    """Ghi lại các câu SQL chạy trong thread hiện tại (lồng nhau được): yield list câu lệnh"""
+    statements = []
+    _local.__dict__.setdefault('active', []).append(statements)
+    try:
+        yield statements
+    finally:
+        _deactivate(statements)
+
+
+def _deactivate(statements):
+    # So sánh theo identity: 2 list rỗng bằng nhau theo ==
+    active = getattr(_local, 'active', [])
+    for index, item in enumerate(active):
+        if item is statements:
+            del active[index]
+            return
+
+
+def describe(statements, limit=REPORT_LIMIT):
+    """Các câu lặp lại nhiều nhất (dấu hiệu N+1) - dùng trong log / thông báo lỗi"""
+    lines = []
+    for statement, count in Counter(' '.join(s.split()) for s in statements).most_common(limit):
+        lines.append(f'  {count} x {statement[:200]}')
+    return '\n'.join(lines)
+
+
+@contextmanager
+def assert_max_queries(limit, label='block'):
+    """Raise QueryBudgetExceeded nếu đoạn code chạy quá `limit` câu SQL"""
+    with count_queries() as statements:
+        yield statements
+    if len(statements) > limit:
+        raise QueryBudgetExceeded(f'{label}: {len(statements)} câu SQL (tối đa {limit})\n{describe(statements)}')
+
+
+# ==================== THEO REQUEST ====================
+def _start():
+    statements = []
+    _local.__dict__.setdefault('active', []).append(statements)
+    g.sql_statements = statements
+
+
+def _check(response):
+    statements = g.get('sql_statements')
+    if statements is None:
+        return response
+
+    config = current_app.config
+    if config.get('DEBUG') or config.get('TESTING'):
+        response.headers.add('Server-Timing', f'sql;desc="{len(statements)} queries"')
+
+    limit = config.get('QUERY_BUDGETS', {}).get(request.endpoint)
+    if limit is not None and len(statements) > limit:
+        message = f'{request.endpoint} ({request.full_path}): {len(statements)} câu SQL, ngân sách {limit}'
+        strict = config.get('QUERY_BUDGET_STRICT')
+        if strict is None:
+            strict = config.get('TESTING')
+        if strict:
+            raise QueryBudgetExceeded(f'{message}\n{describe(statements)}')
+        current_app.logger.warning('Vượt ngân sách SQL %s\n%s', message, describe(statements))
+    return response
+
+
+def _stop(exc):
+    statements = g.pop('sql_statements', None)
+    if statements is not None:
+        _deactivate(statements)
+
+
+def init_app(app):
+    """Đếm câu SQL mỗi request, so với QUERY_BUDGETS"""
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    app.before_request(_start)
+    app.after_request(_check)
+    app.teardown_request(_stop)
@@ -0,0 +1,562 @@
+"""
+Engine nội dung liên quan cho sản phẩm, bài viết, dự án
+
+Điểm tương đồng (tính offline, không tính trong request):
+    score = RELATED_WEIGHT_TEXT   * cosine TF-IDF (tên/tiêu đề + mô tả + nội dung)
+          + RELATED_WEIGHT_GROUP  * cùng danh mục (product) / cùng loại dự án (project)
+          + RELATED_WEIGHT_COVIEW * tỉ lệ co-view (được xem cùng phiên)
+
+- Văn bản tiếng Việt được chuẩn hóa bằng slugify() (bỏ dấu, bỏ HTML), dùng
+  unigram + bigram để giữ được từ ghép ("son nuoc", "chong tham")
+- Top-N kết quả lưu ở bảng related_items, trang chi tiết chỉ cần 1 query có index
+- Khi 1 nội dung thay đổi: chỉ tính lại nội dung đó + các nội dung bị ảnh hưởng
+  (sau commit, gom vào hàng đợi của 1 worker nền / process). `flask rebuild-related`
+  tính lại toàn bộ.
+- Corpus TF-IDF giữ trong bộ nhớ process: mỗi lần tính lại chỉ đọc + tách từ
+  các nội dung đã đổi (báo qua bus app/invalidation.py, kể cả từ worker khác);
+  đọc lại toàn bộ sau RELATED_CORPUS_REFRESH giây (idf của tài liệu không đổi
+  được cập nhật lúc đó)
+"""
+import heapq
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from html import unescape
+
+from flask import current_app, session as flask_session
+from sqlalchemy import and_, event, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, attributes
+
+from app import db
+from app.background import BackgroundWorker
+from app.invalidation import publish, subscribe
+from app.models import Product, Blog, Project, RelatedItem, CoView
+from app.utils import slugify, dialect_insert
+
+# Nguồn dữ liệu cho từng loại nội dung
+RELATED_SOURCES = {
+    'product': {
+        'model': Product,
+        'title': 'name',
+        'text': ('description',),
+        'group': 'category_id',
+    },
+    'blog': {
+        'model': Blog,
+        'title': 'title',
+        'text': ('excerpt', 'content', 'meta_keywords'),
+        'group': None,
+    },
+    'project': {
+        'model': Project,
+        'title': 'title',
+        'text': ('description', 'content', 'location', 'products_used'),
+        'group': 'project_type',
+    },
+}
+
+MODEL_TYPES = {source['model']: item_type for item_type, source in RELATED_SOURCES.items()}
+
+# Từ dừng tiếng Việt (đã bỏ dấu)
+STOPWORDS = {
+    'va', 'cua', 'cac', 'la', 'co', 'cho', 'voi', 'trong', 'nhung', 'mot', 'duoc', 'nay',
+    'de', 'the', 'khi', 'tu', 'den', 'ra', 'vao', 'nhu', 'theo', 'tai', 'tren', 'duoi',
+    'nhieu', 'rat', 'cung', 'da', 'se', 'dang', 'hay', 'hoac', 'neu', 'thi', 'ma', 'nen',
+    'bi', 'boi', 've', 'o', 'con', 'khong', 'chi', 'moi', 'nhat', 'hon', 'lai', 'san',
+}
+
+# Term xuất hiện ở quá nhiều tài liệu thì bỏ qua (ít giá trị phân biệt, làm chậm)
+MAX_DF_RATIO = 0.5
+
+# Số bài xem gần nhất trong session dùng để ghi co-view
+COVIEW_HISTORY = 5
+
+# Topic trên bus (app/invalidation.py): key '<loại>:<id>' nội dung cần đọc lại vào corpus
+TOPIC = 'related_corpus'
+
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+# ==================== CHUẨN HÓA VĂN BẢN ====================
+def tokenize(text):
+    """Chuẩn hóa văn bản tiếng Việt -> danh sách unigram + bigram"""
+    if not text:
+        return []
+    text = unescape(_TAG_RE.sub(' ', text))
+    words = [w for w in slugify(text).split('-') if len(w) > 1 and w not in STOPWORDS]
+    bigrams = [f'{a} {b}' for a, b in zip(words, words[1:])]
+    return words + bigrams
+
+
+class CorpusIndex:
+    """
+    Vector TF-IDF (đã chuẩn hóa L2) + inverted index cho 1 loại nội dung
+
+    update() thay vector của các tài liệu thay đổi tại chỗ (idf theo df hiện
+    tại); vector của tài liệu khác giữ idf cũ tới lần nạp lại toàn bộ
+    """
+
+    def __init__(self, docs):
+        """
+        Args:
+            docs: dict {id: (tokens, group)}
+        """
+        self.groups = {}
+        self.group_members = defaultdict(set)
+        self.term_counts = {}
+        self.df = Counter()
+        self.vectors = {}
+        self.postings = defaultdict(dict)  # term -> {doc_id: weight}
+
+        for doc_id, (tokens, group) in docs.items():
+            counts = Counter(tokens)
+            self.term_counts[doc_id] = counts
+            self.df.update(counts.keys())
+            self._set_group(doc_id, group)
+        # idf cần df của cả corpus -> tính vector sau khi đã đếm hết
+        for doc_id, counts in self.term_counts.items():
+            self._set_vector(doc_id, counts)
+
+    def _idf(self, term):
+        """idf theo df hiện tại, None nếu term quá phổ biến (bỏ qua)"""
+        n_docs = len(self.term_counts)
+        freq = self.df[term]
+        if freq > max(2, int(n_docs * MAX_DF_RATIO)):
+            return None
+        return math.log((n_docs + 1) / (freq + 1)) + 1
+
+    def _set_group(self, doc_id, group):
+        self.groups[doc_id] = group
+        if group not in (None, ''):
+            self.group_members[group].add(doc_id)
+
+    def _set_vector(self, doc_id, counts):
+        total = sum(counts.values()) or 1
+        vector = {}
+        for term, count in counts.items():
+            idf = self._idf(term)
+            if idf is not None:
+                vector[term] = (count / total) * idf
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1
+        vector = {term: w / norm for term, w in vector.items()}
+        self.vectors[doc_id] = vector
+        for term, weight in vector.items():
+            self.postings[term][doc_id] = weight
+
+    def _remove(self, doc_id):
+        counts = self.term_counts.pop(doc_id, None)
+        if counts is None:
+            return
+        for term in counts:
+            self.df[term] -= 1
+            if not self.df[term]:
+                del self.df[term]
+        for term in self.vectors.pop(doc_id):
+            self.postings[term].pop(doc_id, None)
+            if not self.postings[term]:
+                del self.postings[term]
+        group = self.groups.pop(doc_id)
+        if group not in (None, ''):
+            self.group_members[group].discard(doc_id)
+
+    def update(self, docs, removed=()):
+        """
+        Áp thay đổi tại chỗ
+
+        Args:
+            docs: dict {id: (tokens, group)} của tài liệu mới / đã sửa
+            removed: id không còn hiển thị (ẩn / xóa)
+        """
+        for doc_id in set(docs) | set(removed):
+            self._remove(doc_id)
+        for doc_id, (tokens, group) in docs.items():
+            counts = Counter(tokens)
+            self.term_counts[doc_id] = counts
+            self.df.update(counts.keys())
+            self._set_group(doc_id, group)
+        for doc_id in docs:
+            self._set_vector(doc_id, self.term_counts[doc_id])
+
+    def __contains__(self, doc_id):
+        return doc_id in self.vectors
+
+    def text_scores(self, doc_id):
+        """Cosine similarity của doc_id với các tài liệu khác (qua inverted index)"""
+        scores = defaultdict(float)
+        for term, weight in self.vectors.get(doc_id, {}).items():
+            for other_id, other_weight in self.postings[term].items():
+                if other_id != doc_id:
+                    scores[other_id] += weight * other_weight
+        return scores
+
+    def same_group(self, doc_id):
+        group = self.groups.get(doc_id)
+        if group in (None, ''):
+            return set()
+        return self.group_members[group] - {doc_id}
+
+
+def load_docs(item_type, ids=None):
+    """Đọc (chỉ các cột cần thiết) của nội dung đang hiển thị -> {id: (tokens, group)} (ids None: tất cả)"""
+    source = RELATED_SOURCES[item_type]
+    model = source['model']
+    columns = [model.id, getattr(model, source['title'])] + [getattr(model, c) for c in source['text']]
+    if source['group']:
+        columns.append(getattr(model, source['group']))
+
+    query = db.session.query(*columns).filter(model.is_active == True)
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
+
+    docs = {}
+    for row in query:
+        title = row[1] or ''
+        texts = row[2:2 + len(source['text'])]
+        group = row[-1] if source['group'] else None
+        # Tiêu đề lặp 2 lần để có trọng số cao hơn nội dung
+        tokens = tokenize(title) * 2 + tokenize(' '.join(t for t in texts if t))
+        docs[row[0]] = (tokens, group)
+    return docs
+
+
+def load_corpus(item_type):
+    """Đọc toàn bộ nội dung đang hiển thị -> CorpusIndex mới"""
+    return CorpusIndex(load_docs(item_type))
+
+
+class _Corpus:
+    """CorpusIndex đã nạp của process theo loại nội dung + id cần đọc lại (sự kiện từ bus)"""
+
+    def __init__(self):
+        self.indexes = {}
+        self.built_at = {}
+        self.pending = defaultdict(set)
+        self.lock = threading.RLock()
+
+
+_corpus = _Corpus()
+
+
+def _on_corpus_change(key):
+    if key is None:
+        _corpus.built_at.clear()  # Có thể đã lỡ sự kiện -> lần sau đọc lại toàn bộ
+        return
+    item_type, _sep, item_id = key.partition(':')
+    if item_type in RELATED_SOURCES and item_id.isdigit():
+        _corpus.pending[item_type].add(int(item_id))
+
+
+def get_corpus(item_type, changed_ids=()):
+    """
+    CorpusIndex của process (gọi khi giữ _corpus.lock)
+
+    Lần đầu / quá RELATED_CORPUS_REFRESH giây: đọc lại toàn bộ; còn lại chỉ đọc
+    các nội dung đã đổi (changed_ids + sự kiện từ worker khác) rồi cập nhật tại chỗ
+    """
+    refresh = current_app.config.get('RELATED_CORPUS_REFRESH', 3600)
+    pending = _corpus.pending.pop(item_type, set()) | set(changed_ids)
+    index = _corpus.indexes.get(item_type)
+    if index is None or time.monotonic() - _corpus.built_at.get(item_type, 0) > refresh:
+        index = load_corpus(item_type)
+        _corpus.indexes[item_type] = index
+        _corpus.built_at[item_type] = time.monotonic()
+    elif pending:
+        docs = load_docs(item_type, pending)
+        index.update(docs, removed=pending - set(docs))
+    return index
+
+
+def load_coviews(item_type, item_ids=None):
+    """Đọc co-view -> dict {item_id: {other_id: count}}"""
+    query = db.session.query(CoView.item_id, CoView.other_id, CoView.count).filter(CoView.item_type == item_type)
+    if item_ids is not None:
+        query = query.filter(CoView.item_id.in_(item_ids))
+
+    coviews = defaultdict(dict)
+    for item_id, other_id, count in query:
+        coviews[item_id][other_id] = count
+    return coviews
+
+
+# ==================== TÍNH ĐIỂM ====================
+def _weights():
+    config = current_app.config
+    return (config.get('RELATED_WEIGHT_TEXT', 0.6),
+            config.get('RELATED_WEIGHT_GROUP', 0.25),
+            config.get('RELATED_WEIGHT_COVIEW', 0.15))
+
+
+def compute_neighbours(index, doc_id, coviews, top_n):
+    """Tính top-N nội dung liên quan của 1 tài liệu -> list (score, related_id)"""
+    w_text, w_group, w_coview = _weights()
+
+    scores = defaultdict(float)
+    for other_id, score in index.text_scores(doc_id).items():
+        scores[other_id] += w_text * score
+    for other_id in index.same_group(doc_id):
+        scores[other_id] += w_group
+
+    doc_coviews = coviews.get(doc_id, {})
+    if doc_coviews:
+        max_count = max(doc_coviews.values())
+        for other_id, count in doc_coviews.items():
+            if other_id in index and other_id != doc_id:
+                scores[other_id] += w_coview * count / max_count
+
+    # Cùng điểm thì ưu tiên nội dung mới hơn (id lớn hơn)
+    return heapq.nlargest(top_n, ((score, other_id) for other_id, score in scores.items() if score > 0))
+
+
+def _rows_for(item_type, doc_id, neighbours, now):
+    return [{'item_type': item_type, 'item_id': doc_id, 'related_id': other_id,
+             'score': round(score, 6), 'rank': rank, 'updated_at': now}
+            for rank, (score, other_id) in enumerate(neighbours)]
+
+
+def rebuild_related(item_type):
+    """Tính lại toàn bộ nội dung liên quan của 1 loại - trả về số tài liệu"""
+    top_n = current_app.config.get('RELATED_TOP_N', 8)
+    coviews = load_coviews(item_type)
+    now = datetime.utcnow()
+
+    rows = []
+    with _corpus.lock:
+        _corpus.built_at.pop(item_type, None)  # Tính lại toàn bộ -> đọc lại toàn bộ corpus
+        index = get_corpus(item_type)
+        for doc_id in index.vectors:
+            rows.extend(_rows_for(item_type, doc_id, compute_neighbours(index, doc_id, coviews, top_n), now))
+
+    try:
+        db.session.query(RelatedItem).filter(RelatedItem.item_type == item_type).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(insert(RelatedItem), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(index.vectors)
+
+
+def refresh_related(item_type, changed_ids):
+    """
+    Cập nhật tăng dần khi một số nội dung thay đổi
+
+    Tính lại: các nội dung thay đổi + nội dung đang liệt kê chúng + nội dung mà
+    chúng có thể lọt vào top-N (điểm > điểm thấp nhất hiện tại)
+    Corpus lấy từ bộ nhớ của process, chỉ đọc lại + tách từ các nội dung thay đổi
+    """
+    top_n = current_app.config.get('RELATED_TOP_N', 8)
+    w_text, w_group, _ = _weights()
+    changed_ids = set(changed_ids)
+
+    with _corpus.lock:
+        index = get_corpus(item_type, changed_ids)
+
+        affected = {doc_id for doc_id in changed_ids if doc_id in index}
+
+        # Nội dung đang có changed_ids trong danh sách liên quan
+        affected.update(item_id for (item_id,) in db.session.query(RelatedItem.item_id).filter(
+            RelatedItem.item_type == item_type,
+            RelatedItem.related_id.in_(changed_ids)
+        ))
+
+        # Điểm thấp nhất hiện tại (hạng top_n - 1) của từng nội dung
+        thresholds = dict(db.session.query(RelatedItem.item_id, RelatedItem.score).filter(
+            RelatedItem.item_type == item_type,
+            RelatedItem.rank == top_n - 1
+        ))
+
+        for doc_id in changed_ids:
+            if doc_id not in index:
+                continue
+            candidates = defaultdict(float)
+            for other_id, score in index.text_scores(doc_id).items():
+                candidates[other_id] += w_text * score
+            for other_id in index.same_group(doc_id):
+                candidates[other_id] += w_group
+            affected.update(other_id for other_id, score in candidates.items()
+                            if score > thresholds.get(other_id, 0))
+
+        now = datetime.utcnow()
+        coviews = load_coviews(item_type, affected) if affected else {}
+        rows = []
+        for doc_id in affected:
+            if doc_id in index:
+                rows.extend(_rows_for(item_type, doc_id, compute_neighbours(index, doc_id, coviews, top_n), now))
+
+    stale_ids = affected | changed_ids
+    try:
+        if stale_ids:
+            db.session.query(RelatedItem).filter(
+                RelatedItem.item_type == item_type,
+                RelatedItem.item_id.in_(stale_ids)
+            ).delete(synchronize_session=False)
+        if rows:
+            db.session.execute(insert(RelatedItem), rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return len(affected)
+
+
+# ==================== ĐỌC KẾT QUẢ ====================
+def get_related(item_type, item_id, limit=4):
+    """Lấy nội dung liên quan đã tính sẵn (1 query theo index item_type, item_id, rank)"""
+    model = RELATED_SOURCES[item_type]['model']
+    return model.query.join(
+        RelatedItem,
+        and_(RelatedItem.related_id == model.id, RelatedItem.item_type == item_type)
+    ).filter(
+        RelatedItem.item_id == item_id,
+        model.is_active == True
+    ).order_by(RelatedItem.rank).limit(limit).all()
+
+
+# ==================== GHI CO-VIEW ====================
+def record_view(item_type, item_id):
+    """
+    Ghi tín hiệu co-view: nội dung đang xem + các nội dung cùng loại đã xem
+    gần đây trong session. Ghi chung transaction với lượt xem (caller commit).
+    """
+    recent = flask_session.get('recent_views', {})
+    previous = [i for i in recent.get(item_type, []) if i != item_id]
+
+    if previous:
+        table = CoView.__table__
+        stmt = dialect_insert(table)
+        if hasattr(stmt, 'on_conflict_do_update'):
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.item_type, table.c.item_id, table.c.other_id],
+                set_={'count': table.c.count + 1}
+            )
+            pairs = []
+            for other_id in previous:
+                pairs.append({'item_type': item_type, 'item_id': item_id, 'other_id': other_id, 'count': 1})
+                pairs.append({'item_type': item_type, 'item_id': other_id, 'other_id': item_id, 'count': 1})
+            db.session.execute(stmt, pairs)
+
+    recent[item_type] = ([item_id] + previous)[:COVIEW_HISTORY]
+    flask_session['recent_views'] = recent
+
+
+# ==================== CẬP NHẬT SAU KHI LƯU ====================
+def _content_changed(obj, item_type):
+    source = RELATED_SOURCES[item_type]
+    fields = (source['title'], 'is_active') + source['text'] + ((source['group'],) if source['group'] else ())
+    return any(attributes.get_history(obj, field, passive=attributes.PASSIVE_NO_INITIALIZE).has_changes()
+               for field in fields)
+
+
+def mark_dirty(session, item_type, ids):
+    """Đánh dấu cần tính lại sau commit (thao tác bulk bỏ qua flush ORM)"""
+    ids = list(ids)
+    session.info.setdefault('related_dirty', set()).update((item_type, item_id) for item_id in ids)
+    for item_id in ids:
+        publish(session, TOPIC, f'{item_type}:{item_id}')
+
+
+def _after_flush(session, flush_context):
+    dirty = session.info.setdefault('related_dirty', set())
+    changed = set()
+    for obj in list(session.new) + list(session.deleted):
+        item_type = MODEL_TYPES.get(type(obj))
+        if item_type:
+            changed.add((item_type, obj.id))
+    for obj in session.dirty:
+        item_type = MODEL_TYPES.get(type(obj))
+        if item_type and _content_changed(obj, item_type):
+            changed.add((item_type, obj.id))
+    dirty.update(changed)
+    # Worker khác đọc lại các tài liệu này vào corpus của mình
+    for item_type, item_id in changed:
+        publish(session, TOPIC, f'{item_type}:{item_id}')
+
+
+class _Pending:
+    """Hàng đợi {(loại, id)} cần tính lại của process: nhiều commit liên tiếp gộp thành 1 lần tính"""
+
+    def __init__(self):
+        self.items = set()
+        self.lock = threading.Lock()
+
+    def add(self, items):
+        with self.lock:
+            self.items.update(items)
+
+    def drain(self):
+        with self.lock:
+            items, self.items = self.items, set()
+            return items
+
+
+_pending = _Pending()
+
+
+def process_pending():
+    """
+    Tính lại các nội dung đang chờ (1 thread / process -> không chạy chồng nhau)
+    Process khác ghi cùng item_id cùng lúc -> vi phạm unique (item_type, item_id,
+    related_id): rollback, đưa lại vào hàng đợi, worker thử lại sau error_delay
+    """
+    by_type = defaultdict(set)
+    for item_type, item_id in _pending.drain():
+        by_type[item_type].add(item_id)
+
+    for item_type, ids in by_type.items():
+        try:
+            refresh_related(item_type, ids)
+        except IntegrityError:
+            _pending.add((item_type, item_id) for item_id in ids)
+            raise
+        except Exception as e:
+            current_app.logger.error(f"Related refresh error ({item_type}): {str(e)}")
+
+
+def next_due_at():
+    return datetime.utcnow() if _pending.items else None
+
+
+refresher = BackgroundWorker('related', process=process_pending, next_due=next_due_at, error_delay=5)
+
+
+def _after_commit(session):
+    dirty = session.info.pop('related_dirty', None)
+    if not dirty:
+        return
+    try:
+        app = current_app._get_current_object()
+    except RuntimeError:
+        return
+
+    _pending.add(dirty)
+    if app.config.get('RELATED_REFRESH_ASYNC', True):
+        refresher.wake(app)
+        return
+    # Không dùng lại session vừa commit: chạy trong app context mới (session mới)
+    with app.app_context():
+        try:
+            process_pending()
+        finally:
+            db.session.remove()
+
+
+def _after_rollback(session, previous_transaction):
+    session.info.pop('related_dirty', None)
+
+
+def init_app(app):
+    """Đăng ký listener đánh dấu nội dung cần tính lại sau khi commit + nhận thay đổi corpus qua bus"""
+    if event.contains(Session, 'after_flush', _after_flush):
+        return
+    for name, listener in (('after_flush', _after_flush),
+                           ('after_commit', _after_commit),
+                           ('after_soft_rollback', _after_rollback)):
+        event.listen(Session, name, listener)
+    subscribe(TOPIC, _on_corpus_change)
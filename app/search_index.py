@@ -0,0 +1,239 @@
+"""
+Gợi ý tìm kiếm (typeahead) từ index tiền tố trong bộ nhớ mỗi worker
+
+- Nguồn: tên sản phẩm, tên danh mục, tiêu đề bài viết, tiêu đề dự án (đang active)
+- Không phân biệt dấu: tiêu đề và từ khóa cùng được gấp bằng slugify()
+  ("Sơn chống thấm" ~ "son chong tham" ~ "son-chong-tham")
+- Index = mảng đã sắp xếp các key (hậu tố theo từ của tiêu đề: "son chong tham",
+  "chong tham", "tham") -> tìm bằng bisect + duyệt các key cùng tiền tố, khớp
+  được cả từ giữa tiêu đề; không query DB khi gợi ý
+- Xếp hạng: khớp từ đầu tiêu đề trước, rồi theo lượt xem (danh mục: tổng lượt
+  xem sản phẩm), rồi tiêu đề ngắn hơn
+- Cập nhật từng phần: mapper event after_insert/update/delete phát
+  'search_index' + '<loại>:<id>' qua bus (app/invalidation.py) -> mọi worker
+  nạp lại đúng bản ghi đó ở lần gợi ý kế tiếp (bản sao mới, request đang đọc
+  không bị ảnh hưởng). Lượt xem tăng bằng UPDATE thẳng (không có event) ->
+  nạp lại toàn bộ mỗi SEARCH_INDEX_REFRESH giây, trong lúc đó vẫn trả index cũ
+
+    suggest('son ch')  # [{'type': 'product', 'title': 'Sơn chống thấm', 'slug': ...}, ...]
+"""
+import bisect
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import object_session
+
+from app import db
+from app.db_routing import use_primary
+from app.invalidation import publish, subscribe
+from app.models import Product, Category, Blog, Project
+from app.utils import slugify
+
+TOPIC = 'search_index'
+
+# Giới hạn số key duyệt cho 1 tiền tố (tiền tố quá ngắn / quá phổ biến)
+SCAN_LIMIT = 2000
+
+# Key dài hơn thì cắt: gợi ý chỉ cần khớp phần đầu
+MAX_KEY_CHARS = 80
+
+
+def _category_weight():
+    return select(func.coalesce(func.sum(Product.views), 0)).where(
+        Product.category_id == Category.id, Product.is_active == True
+    ).correlate(Category).scalar_subquery()
+
+
+# Loại -> model, cột tiêu đề, biểu thức trọng số (lượt xem)
+SOURCES = {
+    'product': (Product, Product.name, lambda: Product.views),
+    'category': (Category, Category.name, _category_weight),
+    'blog': (Blog, Blog.title, lambda: Blog.views),
+    'project': (Project, Project.title, lambda: Project.view_count),
+}
+
+MODEL_TYPES = {model: entity_type for entity_type, (model, _title, _weight) in SOURCES.items()}
+
+
+def fold(text):
+    """Gấp dấu + chữ thường như slug, giữ khoảng trắng giữa các từ"""
+    return slugify(text or '').replace('-', ' ')
+
+
+# ==================== INDEX ====================
+class PrefixIndex:
+    """
+    Mảng key đã sắp xếp [(key, vị trí từ, entry_id)] + entries {entry_id: (loại, tiêu đề, slug, trọng số)}
+    Không sửa tại chỗ: with_entries() trả index mới (request đang đọc giữ bản cũ)
+    """
+
+    def __init__(self, keys=None, entries=None):
+        self.keys = keys or []
+        self.entries = entries or {}
+
+    @staticmethod
+    def _entry_keys(entry_id, title):
+        words = fold(title).split()
+        return [(' '.join(words[i:])[:MAX_KEY_CHARS], i, entry_id) for i in range(len(words))]
+
+    @classmethod
+    def build(cls, entries):
+        keys = []
+        for entry_id, entry in entries.items():
+            keys.extend(cls._entry_keys(entry_id, entry[1]))
+        keys.sort()
+        return cls(keys, dict(entries))
+
+    def with_entries(self, changed, removed=()):
+        """Index mới: thêm / thay các entry trong changed, bỏ các entry_id trong removed"""
+        dropped = set(removed) | set(changed)
+        keys = [item for item in self.keys if item[2] not in dropped]
+        entries = {entry_id: entry for entry_id, entry in self.entries.items() if entry_id not in dropped}
+        for entry_id, entry in changed.items():
+            entries[entry_id] = entry
+            for item in self._entry_keys(entry_id, entry[1]):
+                bisect.insort(keys, item)
+        return PrefixIndex(keys, entries)
+
+    def search(self, query, limit=8):
+        """Các entry có 1 từ bắt đầu bằng query (đã gấp dấu), xếp theo hạng"""
+        prefix = fold(query)
+        if not prefix:
+            return []
+
+        keys, entries = self.keys, self.entries
+        positions = {}  # entry_id -> vị trí từ khớp sớm nhất (0: khớp từ đầu tiêu đề)
+        start = bisect.bisect_left(keys, (prefix,))
+        for index in range(start, min(start + SCAN_LIMIT, len(keys))):
+            key, position, entry_id = keys[index]
+            if not key.startswith(prefix):
+                break
+            if position < positions.get(entry_id, position + 1):
+                positions[entry_id] = position
+
+        ranked = sorted(positions, key=lambda entry_id: (positions[entry_id] > 0, -entries[entry_id][3],
+                                                         len(entries[entry_id][1])))
+        return [entries[entry_id] for entry_id in ranked[:limit]]
+
+
+# ==================== NẠP TỪ DB ====================
+def _load(entity_type, ids=None):
+    """{entry_id: entry} của các bản ghi active (ids None: tất cả)"""
+    model, title, weight = SOURCES[entity_type]
+    query = db.session.query(model.id, title, model.slug, weight().label('weight')).filter(model.is_active == True)
+    if ids is not None:
+        query = query.filter(model.id.in_(ids))
+    return {f'{entity_type}:{row.id}': (entity_type, row[1], row.slug, row.weight or 0) for row in query}
+
+
+class _State:
+    def __init__(self):
+        self.index = None
+        self.built_at = 0.0
+        self.pending = set()  # entry_id cần nạp lại ('<loại>:<id>')
+        self.lock = threading.Lock()
+
+
+_state = _State()
+
+
+def _on_change(key):
+    if key is None:
+        _state.built_at = 0.0  # Có thể đã lỡ sự kiện -> nạp lại toàn bộ
+    else:
+        _state.pending.add(key)
+
+
+def _rebuild():
+    # Sự kiện đến trong lúc nạp được giữ lại, áp ở lần sau (áp lại 2 lần không sao)
+    pending = set(_state.pending)
+    entries = {}
+    for entity_type in SOURCES:
+        entries.update(_load(entity_type))
+    _state.index = PrefixIndex.build(entries)
+    _state.built_at = time.monotonic()
+    _state.pending -= pending
+
+
+def _apply_pending():
+    pending = set(_state.pending)
+    _state.pending -= pending
+    ids_by_type = {}
+    for entry_id in pending:
+        entity_type, _sep, entity_id = entry_id.partition(':')
+        if entity_type in SOURCES and entity_id.isdigit():
+            ids_by_type.setdefault(entity_type, []).append(int(entity_id))
+
+    changed = {}
+    for entity_type, ids in ids_by_type.items():
+        changed.update(_load(entity_type, ids))
+    # Không còn active (ẩn / xóa) -> bỏ khỏi index
+    _state.index = _state.index.with_entries(changed, removed=pending - set(changed))
+
+
+def get_index():
+    """Index hiện tại (nạp lần đầu / áp thay đổi đang chờ / làm mới định kỳ)"""
+    refresh = current_app.config.get('SEARCH_INDEX_REFRESH', 600)
+    stale = time.monotonic() - _state.built_at > refresh
+    if _state.index is not None and not stale and not _state.pending:
+        return _state.index
+
+    # Lần đầu: chờ nạp; sau đó: 1 thread cập nhật, các thread khác dùng index cũ
+    if not _state.lock.acquire(blocking=_state.index is None):
+        return _state.index
+    try:
+        # Index dùng tới lần nạp sau -> đọc primary (request GET công khai đang đọc replica có thể chậm)
+        with use_primary():
+            if _state.index is None or time.monotonic() - _state.built_at > refresh:
+                _rebuild()
+            elif _state.pending:
+                _apply_pending()
+    finally:
+        _state.lock.release()
+    return _state.index
+
+
+def suggest(query, limit=None):
+    """
+    Gợi ý cho từ khóa đang gõ
+
+    Returns:
+        list dict: type, title, slug (rỗng nếu từ khóa ngắn hơn SEARCH_SUGGEST_MIN_CHARS)
+    """
+    config = current_app.config
+    if len(fold(query)) < config.get('SEARCH_SUGGEST_MIN_CHARS', 2):
+        return []
+    limit = limit or config.get('SEARCH_SUGGEST_LIMIT', 8)
+    return [{'type': entity_type, 'title': title, 'slug': slug}
+            for entity_type, title, slug, _weight in get_index().search(query, limit)]
+
+
+# ==================== CẬP NHẬT KHI NỘI DUNG THAY ĐỔI ====================
+def mark_changed(session, entity_type, ids=None):
+    """
+    Publish các bản ghi cần nạp lại vào index (thao tác bulk bỏ qua mapper event)
+    ids None: mọi worker nạp lại toàn bộ index
+    """
+    if ids is None:
+        publish(session, TOPIC)
+        return
+    for entity_id in ids:
+        publish(session, TOPIC, f'{entity_type}:{entity_id}')
+
+
+def _content_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and target.id is not None:
+        mark_changed(session, MODEL_TYPES[type(target)], [target.id])
+
+
+def init_app(app):
+    """Đăng ký mapper event + nhận sự kiện qua bus (mọi worker cập nhật index của mình)"""
+    if event.contains(Product, 'after_insert', _content_changed):
+        return
+    for model in MODEL_TYPES:
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, _content_changed)
+    subscribe(TOPIC, _on_change)
@@ -0,0 +1,146 @@
+"""
+Hỗ trợ chạy production bằng gunicorn (xem gunicorn.conf.py, wsgi.py)
+
+- warm_up(): làm nóng app trong master trước khi fork (compile toàn bộ Jinja
+  template - nạp từ bytecode cache nếu đã có, cấu hình mapper SQLAlchemy, gọi
+  thử WARMUP_PATHS), sau đó đóng kết nối DB để worker không dùng chung socket
+  với master
+- freeze_heap(): gc.freeze() -> object đã tạo trong master không bị GC của
+  worker quét lại, trang bộ nhớ được chia sẻ copy-on-write giữa các worker
+- worker_counts(): chọn số worker/thread theo CPU và RAM (giới hạn cgroup)
+- rss_exceeded(): worker tự thoát khi RSS vượt ngưỡng
+"""
+import gc
+import logging
+import os
+import time
+
+logger = logging.getLogger('gunicorn.error')
+
+
+# ==================== TÀI NGUYÊN MÁY ====================
+def cpu_count():
+    """Số CPU được phép dùng (tính cả giới hạn cgroup / affinity)"""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(1, int(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memory_limit_mb():
+    """RAM tối đa của container (cgroup v2/v1), không có thì lấy RAM máy"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            # cgroup v1 không giới hạn trả về số rất lớn
+            if value != 'max' and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def current_rss_mb():
+    """RSS hiện tại của process (MB)"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def worker_counts(cpus=None, memory_mb=None, worker_memory_mb=None):
+    """
+    Chọn (workers, threads)
+
+    - workers = 2 * CPU + 1, nhưng không vượt quá số worker vừa RAM
+      (80% RAM / RAM mỗi worker)
+    - threads: mặc định 2, tăng lên 4 khi số worker bị RAM giới hạn
+      (request chủ yếu chờ DB/Cloudinary nên thread bù được phần thiếu)
+    - WEB_CONCURRENCY / GUNICORN_THREADS ghi đè
+    """
+    cpus = cpus or cpu_count()
+    memory_mb = memory_mb if memory_mb is not None else memory_limit_mb()
+    worker_memory_mb = worker_memory_mb or int(os.environ.get('WORKER_MEMORY_MB', 180))
+
+    workers = 2 * cpus + 1
+    memory_bound = False
+    if memory_mb:
+        fit = max(1, int(memory_mb * 0.8 // worker_memory_mb))
+        if fit < workers:
+            workers, memory_bound = fit, True
+
+    threads = 4 if memory_bound else 2
+
+    if os.environ.get('WEB_CONCURRENCY'):
+        workers = int(os.environ['WEB_CONCURRENCY'])
+    if os.environ.get('GUNICORN_THREADS'):
+        threads = int(os.environ['GUNICORN_THREADS'])
+
+    return workers, threads
+
+
+# ==================== LÀM NÓNG TRƯỚC KHI FORK ====================
+def warm_up(app):
+    """Làm nóng app trong master (gọi 1 lần sau create_app, trước khi fork)"""
+    from sqlalchemy.orm import configure_mappers
+    from app import db
+    from app.background import WARMUP_ENVIRON_KEY
+    from app.templating import compile_templates
+
+    start = time.perf_counter()
+
+    # Compile toàn bộ template vào cache của Jinja (+ bytecode cache trên đĩa)
+    compiled, errors = compile_templates(app)
+    for name, error in errors:
+        logger.warning(f"Warm-up: không compile được template {name}: {error}")
+
+    configure_mappers()
+
+    # Gọi thử các trang chính -> cache SQL đã compile, context processor, url_map
+    # (đánh dấu warm-up: worker nền chỉ được đánh thức trong worker sau khi fork)
+    client = app.test_client()
+    for path in app.config.get('WARMUP_PATHS', ()):
+        try:
+            client.get(path, environ_base={WARMUP_ENVIRON_KEY: True})
+        except Exception as e:
+            logger.warning(f"Warm-up: lỗi khi gọi {path}: {e}")
+
+    # Không để worker thừa kế kết nối DB đang mở của master
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+    logger.info(f"Warm-up xong: {len(compiled)} template, {len(app.config.get('WARMUP_PATHS', ()))} trang "
+                f"trong {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def freeze_heap():
+    """Dọn rác rồi đóng băng heap của master (Python 3.7+)"""
+    gc.collect()
+    if hasattr(gc, 'freeze'):
+        gc.freeze()
+        logger.info(f"gc.freeze(): {gc.get_freeze_count()} object được chia sẻ copy-on-write")
+
+
+# ==================== TÁI CHẾ WORKER ====================
+def rss_exceeded(limit_mb):
+    """True nếu RSS của process hiện tại vượt limit_mb"""
+    return bool(limit_mb) and current_rss_mb() > limit_mb
@@ -0,0 +1,173 @@
+"""
+Single-flight: mỗi key chỉ 1 caller tính lại tại 1 thời điểm
+
+- Trong process: khóa theo key giữa các thread (gthread)
+- Giữa các process (SINGLEFLIGHT_LOCK) - chỉ đáng khi kết quả dùng chung
+  được (file trên đĩa, cache Redis); kết quả nằm trong bộ nhớ của process
+  thì process khác chờ xong vẫn phải tự tính -> process_lock=False:
+    + file: flock trên file khóa trong SINGLEFLIGHT_LOCK_DIR - các worker cùng máy
+    + advisory: pg_try_advisory_lock của PostgreSQL - mọi máy dùng chung DB
+    + auto: PostgreSQL -> advisory, còn lại -> file; none: chỉ khóa trong process
+    + hoặc caller tự đưa khóa riêng (VD: RedisCache.lock - khóa theo từng key trên Redis)
+- Không giành được khóa trong thời gian chờ -> acquired = False, caller tự
+  quyết định (dùng giá trị cũ / tự tính) - không bao giờ treo request
+
+    with single_flight('pages:/san-pham', timeout=10) as acquired:
+        if acquired:
+            ...  # kiểm tra lại cache rồi mới tính
+"""
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ khóa trong process
+    fcntl = None
+
+# Số file khóa tối đa (key băm vào 1 trong các file) - key hiếm khi trùng file,
+# trùng thì 2 key chỉ phải tính lần lượt
+LOCK_FILE_BUCKETS = 1024
+
+POLL_INTERVAL = 0.02
+
+_registry_lock = threading.Lock()
+_thread_locks = {}  # tên -> [Lock, số caller đang dùng]
+
+
+def _digest(name):
+    return hashlib.sha1(name.encode('utf-8')).digest()
+
+
+# ==================== KHÓA TRONG PROCESS ====================
+@contextmanager
+def _thread_lock(name, blocking, timeout):
+    with _registry_lock:
+        entry = _thread_locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    acquired = False
+    try:
+        if not blocking:
+            acquired = entry[0].acquire(blocking=False)
+        else:
+            acquired = entry[0].acquire(timeout=timeout if timeout is not None else -1)
+        yield acquired
+    finally:
+        if acquired:
+            entry[0].release()
+        with _registry_lock:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _thread_locks.pop(name, None)
+
+
+# ==================== KHÓA GIỮA CÁC PROCESS ====================
+def wait_for_lock(try_acquire, blocking, deadline):
+    """Gọi try_acquire() tới khi được / hết hạn chờ (blocking=False: thử 1 lần)"""
+    while True:
+        if try_acquire():
+            return True
+        if not blocking or (deadline is not None and time.monotonic() >= deadline):
+            return False
+        time.sleep(POLL_INTERVAL)
+
+
+@contextmanager
+def _file_lock(name, blocking, deadline):
+    lock_dir = current_app.config.get('SINGLEFLIGHT_LOCK_DIR') or os.path.join(current_app.instance_path, 'locks')
+    os.makedirs(lock_dir, exist_ok=True)
+    bucket = int.from_bytes(_digest(name)[:4], 'big') % LOCK_FILE_BUCKETS
+    fd = os.open(os.path.join(lock_dir, f'{bucket:04d}.lock'), os.O_RDWR | os.O_CREAT, 0o644)
+
+    def try_acquire():
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    acquired = False
+    try:
+        acquired = wait_for_lock(try_acquire, blocking, deadline)
+        yield acquired
+    finally:
+        if acquired:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+@contextmanager
+def _advisory_lock(name, blocking, deadline):
+    from app import db
+
+    lock_id = int.from_bytes(_digest(name)[:8], 'big', signed=True)
+    # Kết nối riêng (không phải session của request) - giữ tới khi tính xong
+    with db.engine.connect() as connection:
+        def try_acquire():
+            acquired = connection.execute(text('SELECT pg_try_advisory_lock(:id)'), {'id': lock_id}).scalar()
+            connection.commit()
+            return acquired
+
+        acquired = False
+        try:
+            acquired = wait_for_lock(try_acquire, blocking, deadline)
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': lock_id})
+                connection.commit()
+
+
+def _process_lock_kind():
+    if not has_app_context():
+        return 'none'
+    kind = current_app.config.get('SINGLEFLIGHT_LOCK', 'auto')
+    if kind == 'auto':
+        backend = make_url(current_app.config['SQLALCHEMY_DATABASE_URI']).get_backend_name()
+        kind = 'advisory' if backend == 'postgresql' else 'file'
+    if kind == 'file' and fcntl is None:
+        kind = 'none'
+    return kind
+
+
+# ==================== API ====================
+@contextmanager
+def single_flight(name, timeout=None, blocking=True, process_lock=None):
+    """
+    Giành quyền tính lại cho key `name` (thread + process)
+
+    Args:
+        timeout: số giây chờ tối đa (None: SINGLEFLIGHT_TIMEOUT của app)
+        blocking: False -> không chờ, bận thì acquired = False ngay
+        process_lock: None -> khóa giữa các process theo SINGLEFLIGHT_LOCK,
+            False -> chỉ khóa giữa các thread của process,
+            hàm (name, blocking, deadline) -> context manager: khóa riêng của caller
+
+    Yields:
+        True nếu giành được khóa
+    """
+    if timeout is None and has_app_context():
+        timeout = current_app.config.get('SINGLEFLIGHT_TIMEOUT', 10)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    with _thread_lock(name, blocking, timeout) as acquired:
+        if not acquired:
+            yield False
+            return
+
+        if process_lock is None:
+            kind = _process_lock_kind()
+            if kind != 'none':
+                process_lock = _advisory_lock if kind == 'advisory' else _file_lock
+        if not process_lock:
+            yield True
+            return
+
+        with process_lock(name, blocking, deadline) as acquired:
+            yield acquired
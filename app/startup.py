@@ -0,0 +1,87 @@
+"""
+Đo thời gian khởi động ứng dụng
+
+- BootProfile: create_app() ghi thời gian từng giai đoạn vào
+  app.extensions['startup_profile']
+- profile_startup(): chạy create_app() trong process Python mới với
+  `-X importtime` -> thời gian import từng module + từng giai đoạn boot
+  (process mới để đo đúng cold start, không bị module đã nạp sẵn làm sai lệch)
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+done = time.perf_counter()
+from app.lazy import HEAVY_MODULES
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (done - imported) * 1000,
+    'total_ms': (done - start) * 1000,
+    'phases': app.extensions['startup_profile'].as_dict(),
+    'heavy_modules_loaded': [m for m in HEAVY_MODULES if m in sys.modules],
+}))
+"""
+
+
+class BootProfile:
+    """Ghi thời gian các giai đoạn của create_app()"""
+
+    def __init__(self):
+        self._last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name):
+        """Kết thúc giai đoạn `name` (tính từ lần mark trước)"""
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1000))
+        self._last = now
+
+    def as_dict(self):
+        return {name: round(ms, 2) for name, ms in self.phases}
+
+
+def parse_importtime(stderr):
+    """
+    Đọc output của `python -X importtime`
+    Returns: list (module, self_ms, cumulative_ms)
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+        except ValueError:
+            continue
+    return modules
+
+
+def profile_startup(root_path=None):
+    """
+    Đo cold start của create_app() trong process mới
+
+    Returns:
+        dict: total_ms, import_ms, create_app_ms, phases {giai đoạn: ms},
+              heavy_modules_loaded, modules [(module, self_ms, cumulative_ms)]
+    """
+    root_path = root_path or os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE],
+        cwd=root_path, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'create_app() lỗi khi đo khởi động:\n{result.stderr[-2000:]}')
+
+    # Dòng JSON cuối cùng trong stdout (bỏ qua log in ra khi khởi động)
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['modules'] = parse_importtime(result.stderr)
+    return report
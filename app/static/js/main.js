@@ -54,6 +54,70 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// ==================== SEARCH SUGGEST (TYPEAHEAD) ====================
+// Ô tìm kiếm có data-suggest-url -> gợi ý khi gõ (sản phẩm, danh mục, bài viết, dự án)
+document.addEventListener('DOMContentLoaded', function() {
+    const labels = { product: 'Sản phẩm', category: 'Danh mục', blog: 'Bài viết', project: 'Dự án' };
+
+    document.querySelectorAll('input[data-suggest-url]').forEach(input => {
+        const box = document.createElement('div');
+        box.className = 'list-group position-absolute w-100 shadow-sm d-none';
+        box.style.top = '100%';
+        box.style.zIndex = 1050;
+        input.parentElement.classList.add('position-relative');
+        input.parentElement.appendChild(box);
+        input.setAttribute('autocomplete', 'off');
+
+        let timer = null;
+        let controller = null;
+
+        function hide() {
+            box.classList.add('d-none');
+            box.innerHTML = '';
+        }
+
+        function render(items) {
+            box.innerHTML = '';
+            items.forEach(item => {
+                const link = document.createElement('a');
+                link.href = item.url;
+                link.className = 'list-group-item list-group-item-action d-flex justify-content-between';
+                link.textContent = item.title;
+                const badge = document.createElement('small');
+                badge.className = 'text-muted ms-2';
+                badge.textContent = labels[item.type] || '';
+                link.appendChild(badge);
+                box.appendChild(link);
+            });
+            box.classList.toggle('d-none', items.length === 0);
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const q = input.value.trim();
+            if (q.length < 2) {
+                hide();
+                return;
+            }
+            timer = setTimeout(() => {
+                if (controller) controller.abort();
+                controller = new AbortController();
+                fetch(input.dataset.suggestUrl + '?q=' + encodeURIComponent(q), { signal: controller.signal })
+                    .then(response => response.json())
+                    .then(data => render(data.items || []))
+                    .catch(() => {});
+            }, 150);
+        });
+
+        input.addEventListener('keydown', function(e) {
+            if (e.key === 'Escape') hide();
+        });
+        document.addEventListener('click', function(e) {
+            if (!input.parentElement.contains(e.target)) hide();
+        });
+    });
+});
+
 // ==================== IMAGE LAZY LOADING ====================
 if ('loading' in HTMLImageElement.prototype) {
     const images = document.querySelectorAll('img[data-src]');
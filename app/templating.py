@@ -0,0 +1,168 @@
+"""
+Jinja: bytecode cache trên đĩa + đo thời gian render từng template / block / include
+
+- Bytecode cache (FileSystemBytecodeCache): template compile 1 lần, các worker
+  và các lần deploy sau nạp bytecode từ TEMPLATE_CACHE_DIR thay vì parse lại.
+  Key = tên template, kèm checksum nội dung -> sửa template là tự compile lại
+- `flask templates-compile` compile sẵn toàn bộ template vào cache (chạy lúc
+  build/deploy; warm_up() khi preload cũng dùng cùng hàm)
+- Thời gian render: mỗi template (kể cả {% include %} / {% extends %}) và mỗi
+  block được đo riêng, tách thời gian "self" (không tính template con)
+    + header Server-Timing (xem trong DevTools > Network > Timing)
+    + log cảnh báo khi tổng render vượt TEMPLATE_SLOW_MS
+    + thống kê tích lũy trong process: `flask template-profile`
+"""
+import os
+import threading
+import time
+
+from flask import g, has_request_context
+from jinja2 import FileSystemBytecodeCache, Template
+
+_local = threading.local()
+_stats_lock = threading.Lock()
+
+# Thống kê tích lũy trong process: tên -> [số lần, tổng ms, self ms, max ms]
+_process_stats = {}
+
+
+# ==================== ĐO THỜI GIAN RENDER ====================
+def _record(name, total_ms, self_ms):
+    timings = g.setdefault('template_timings', {})
+    entry = timings.setdefault(name, [0, 0.0, 0.0])
+    entry[0] += 1
+    entry[1] += total_ms
+    entry[2] += self_ms
+
+    with _stats_lock:
+        entry = _process_stats.setdefault(name, [0, 0.0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += total_ms
+        entry[2] += self_ms
+        entry[3] = max(entry[3], total_ms)
+
+
+def _timed(name, render_func):
+    """
+    Bọc hàm render (generator) của template / block: render hết 1 lần rồi trả
+    lại từng đoạn -> chỉ đo 1 lần / lượt render (không đo từng đoạn output).
+    App không stream template nên không mất gì khi gom output trước.
+    """
+    def render(context, *args, **kwargs):
+        if not has_request_context():
+            yield from render_func(context, *args, **kwargs)
+            return
+
+        stack = _local.__dict__.setdefault('stack', [])
+        frame = [0.0]  # thời gian của template / block con render bên trong
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            chunks = list(render_func(context, *args, **kwargs))
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += elapsed
+            _record(name, elapsed * 1000, (elapsed - frame[0]) * 1000)
+        yield from chunks
+
+    return render
+
+
+class TimedTemplate(Template):
+    """Template có hàm render + các block được bọc bởi _timed()"""
+
+    @classmethod
+    def _from_namespace(cls, environment, namespace, globals):
+        template = super()._from_namespace(environment, namespace, globals)
+        name = template.name or '<string>'
+        template.root_render_func = _timed(name, template.root_render_func)
+        template.blocks = {block: _timed(f'{name}#{block}', func) for block, func in template.blocks.items()}
+        return template
+
+
+def request_timings():
+    """Thời gian render của request hiện tại: list (tên, số lần, tổng ms, self ms) - chậm nhất trước"""
+    timings = g.get('template_timings') or {}
+    return sorted(((name, count, total, self_ms) for name, (count, total, self_ms) in timings.items()),
+                  key=lambda item: item[3], reverse=True)
+
+
+def process_timings():
+    """Thống kê tích lũy của process: list (tên, số lần, tổng ms, self ms, max ms)"""
+    with _stats_lock:
+        items = [(name, *values) for name, values in _process_stats.items()]
+    return sorted(items, key=lambda item: item[3], reverse=True)
+
+
+def reset_process_timings():
+    with _stats_lock:
+        _process_stats.clear()
+
+
+def _reset_request_timings():
+    g.template_timings = {}
+
+
+def _server_timing(app):
+    def add_header(response):
+        timings = request_timings()
+        if not timings:
+            return response
+
+        # Tổng = template ngoài cùng (không nằm trong template nào khác) ~ tổng self
+        total_ms = sum(self_ms for _name, _count, _total, self_ms in timings)
+        limit = app.config.get('TEMPLATE_TIMING_HEADER_LIMIT', 8)
+        entries = [f'tpl;desc="render";dur={total_ms:.1f}']
+        for index, (name, count, _total, self_ms) in enumerate(timings[:limit]):
+            label = name.replace('"', "'") + (f' x{count}' if count > 1 else '')
+            entries.append(f'tpl{index};desc="{label}";dur={self_ms:.1f}')
+        response.headers.add('Server-Timing', ', '.join(entries))
+
+        slow_ms = app.config.get('TEMPLATE_SLOW_MS')
+        if slow_ms and total_ms > slow_ms:
+            app.logger.warning('Render chậm %.0f ms: %s', total_ms,
+                               ', '.join(f'{name} {self_ms:.0f}ms' for name, _c, _t, self_ms in timings[:limit]))
+        return response
+
+    return add_header
+
+
+# ==================== COMPILE SẴN ====================
+def compile_templates(app, extensions=('.html', '.xml', '.txt')):
+    """
+    Compile toàn bộ template (ghi vào bytecode cache nếu có)
+
+    Returns:
+        (list (tên, ms) sắp theo thời gian giảm dần, list (tên, lỗi))
+    """
+    compiled, errors = [], []
+    for name in app.jinja_env.list_templates():
+        if not name.endswith(extensions):
+            continue
+        start = time.perf_counter()
+        try:
+            app.jinja_env.get_template(name)
+            compiled.append((name, (time.perf_counter() - start) * 1000))
+        except Exception as e:
+            errors.append((name, str(e)))
+    compiled.sort(key=lambda item: item[1], reverse=True)
+    return compiled, errors
+
+
+def init_app(app):
+    """Gắn bytecode cache + đo thời gian render vào jinja_env (gọi trước khi render template nào)"""
+    env = app.jinja_env
+
+    cache_dir = app.config.get('TEMPLATE_CACHE_DIR')
+    if cache_dir is None:
+        cache_dir = os.path.join(app.instance_path, 'jinja_cache')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(cache_dir, pattern='__jinja_%s.cache')
+
+    if app.config.get('TEMPLATE_TIMING'):
+        env.template_class = TimedTemplate
+        app.before_request(_reset_request_timings)
+        app.after_request(_server_timing(app))
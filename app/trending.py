@@ -0,0 +1,319 @@
+"""
+Điểm xu hướng (trending) + thống kê lượt xem theo giờ / ngày cho sản phẩm, bài viết, dự án
+
+- track_view(): chỉ cộng vào bộ đệm trong bộ nhớ của worker, không query.
+  Lượt xem được gộp sẵn theo (loại, id, giờ) -> bộ đệm nhỏ dù nhiều lượt xem
+- Worker nền (app/background.py) ghi bộ đệm sau TRENDING_FLUSH_INTERVAL giây
+  hoặc khi bộ đệm đủ TRENDING_FLUSH_SIZE dòng: upsert cộng dồn vào
+  view_rollups_hourly + view_rollups_daily (nhiều worker ghi song song không
+  mất lượt), rồi tính lại điểm của các nội dung vừa có lượt xem
+- Điểm xu hướng theo forward decay, chu kỳ bán rã TRENDING_HALF_LIFE_HOURS:
+
+      trending_score = log2( Σ lượt xem · 2^((giờ xem − EPOCH) / bán rã) )
+
+  Điểm cũ không phải giảm dần theo thời gian: so 2 điểm tại cùng 1 thời điểm
+  tương đương so lượt xem đã suy giảm -> chỉ ghi điểm của nội dung vừa có lượt
+  xem, cột có index để ORDER BY. Điểm tính lại từ rollup (không cộng dồn) nên
+  chạy lại / chạy song song không sai
+- Rollup theo giờ chỉ giữ TRENDING_HOURLY_RETENTION_DAYS ngày, phần cũ hơn tính
+  từ rollup theo ngày. Dashboard đọc rollup theo ngày, không đọc log thô
+- Lượt xem còn trong bộ đệm mất nếu worker bị kill (chấp nhận được với số liệu
+  thống kê); tắt bình thường thì ghi nốt (atexit)
+- Đổi TRENDING_HALF_LIFE_HOURS -> chạy `flask trending-rebuild`
+"""
+import atexit
+import math
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, time
+
+from flask import current_app
+from sqlalchemy import bindparam, delete, func, insert, update
+
+from app import db
+from app.background import BackgroundWorker
+from app.models import Product, Blog, Project, ViewRollupHourly, ViewRollupDaily
+from app.utils import dialect_insert
+
+# Loại nội dung -> model (có cột trending_score)
+TRENDING_SOURCES = {
+    'product': Product,
+    'blog': Blog,
+    'project': Project,
+}
+
+# Mốc thời gian của điểm (đổi mốc = phải tính lại toàn bộ điểm)
+EPOCH = datetime(2026, 1, 1)
+
+
+# ==================== BỘ ĐỆM LƯỢT XEM ====================
+class _Buffer:
+    """{(loại, id, giờ UTC): số lượt} của process hiện tại"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.started_at = None  # Lúc có lượt xem đầu tiên chưa ghi
+        self.lock = threading.Lock()
+
+    def add(self, key, count=1):
+        with self.lock:
+            if not self.counts:
+                self.started_at = datetime.utcnow()
+            self.counts[key] += count
+            return len(self.counts)
+
+    def drain(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.started_at = None
+            return counts
+
+    def restore(self, counts):
+        """Trả lại lượt xem chưa ghi được (ghi lỗi -> thử lại lần sau)"""
+        with self.lock:
+            if not self.counts:
+                self.started_at = datetime.utcnow()
+            self.counts.update(counts)
+
+
+_buffer = _Buffer()
+
+
+def track_view(item_type, item_id):
+    """Ghi nhận 1 lượt xem (gọi sau khi commit request: worker có thể ghi ngay trong thread này)"""
+    hour = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    size = _buffer.add((item_type, item_id, hour))
+    if size == 1 or size >= current_app.config.get('TRENDING_FLUSH_SIZE', 500):
+        worker.wake()
+
+
+# ==================== GHI ROLLUP ====================
+def _utc_offset():
+    return timedelta(hours=current_app.config.get('VIEW_STATS_UTC_OFFSET', 7))
+
+
+def local_today():
+    return (datetime.utcnow() + _utc_offset()).date()
+
+
+def _upsert_views(table, bucket, counts):
+    """Cộng lượt xem vào rollup: counts {(loại, id, mốc giờ / ngày): số lượt}"""
+    rows = [{'item_type': item_type, 'item_id': item_id, bucket: value, 'views': views}
+            for (item_type, item_id, value), views in counts.items()]
+    stmt = dialect_insert(table)
+
+    if hasattr(stmt, 'on_conflict_do_update'):
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.item_type, table.c.item_id, table.c[bucket]],
+            set_={'views': table.c.views + stmt.excluded.views}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = db.session.execute(
+            update(table).where(
+                table.c.item_type == row['item_type'], table.c.item_id == row['item_id'],
+                table.c[bucket] == row[bucket]
+            ).values(views=table.c.views + row['views'])
+        )
+        if result.rowcount == 0:
+            db.session.execute(insert(table).values(**row))
+
+
+def _write_rollups(counts):
+    offset = _utc_offset()
+    daily = Counter()
+    for (item_type, item_id, hour), views in counts.items():
+        daily[(item_type, item_id, (hour + offset).date())] += views
+    _upsert_views(ViewRollupHourly.__table__, 'hour', counts)
+    _upsert_views(ViewRollupDaily.__table__, 'day', daily)
+
+
+def _hourly_cutoff():
+    """
+    (ngày địa phương, giờ UTC tương ứng) bắt đầu phần dùng rollup theo giờ
+    Trước mốc: rollup theo ngày -> 2 nguồn không chồng lên nhau
+    """
+    day = local_today() - timedelta(days=current_app.config.get('TRENDING_HOURLY_RETENTION_DAYS', 14))
+    return day, datetime.combine(day, time()) - _utc_offset()
+
+
+class _State:
+    def __init__(self):
+        self.pruned_at = None
+        self.exit_hook = False
+
+
+_state = _State()
+
+
+def _prune_hourly():
+    """Xóa rollup theo giờ quá hạn (tối đa 1 lần / giờ / process)"""
+    now = datetime.utcnow()
+    if _state.pruned_at is not None and now - _state.pruned_at < timedelta(hours=1):
+        return
+    _day, cutoff = _hourly_cutoff()
+    db.session.execute(delete(ViewRollupHourly.__table__).where(ViewRollupHourly.hour < cutoff))
+    _state.pruned_at = now
+
+
+def flush_views():
+    """Ghi toàn bộ bộ đệm vào rollup + tính lại điểm của nội dung vừa có lượt xem - trả về số lượt"""
+    counts = _buffer.drain()
+    if not counts:
+        return 0
+    try:
+        _write_rollups(counts)
+        refresh_scores({(item_type, item_id) for item_type, item_id, _hour in counts})
+        _prune_hourly()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        _buffer.restore(counts)
+        raise
+    return sum(counts.values())
+
+
+def _flush_interval():
+    return timedelta(seconds=current_app.config.get('TRENDING_FLUSH_INTERVAL', 30))
+
+
+def process_buffer():
+    """Ghi bộ đệm nếu đã đủ lâu / đủ lớn (worker nền)"""
+    started_at = _buffer.started_at
+    if started_at is None:
+        return 0
+    full = len(_buffer.counts) >= current_app.config.get('TRENDING_FLUSH_SIZE', 500)
+    if full or datetime.utcnow() >= started_at + _flush_interval():
+        return flush_views()
+    return 0
+
+
+def next_due_at():
+    """Lúc bộ đệm hiện tại đến hạn ghi (None nếu trống)"""
+    started_at = _buffer.started_at
+    return started_at + _flush_interval() if started_at is not None else None
+
+
+worker = BackgroundWorker('trending', process=process_buffer, next_due=next_due_at,
+                          async_config='TRENDING_ASYNC')
+
+
+# ==================== ĐIỂM XU HƯỚNG ====================
+def _log2_sum(terms):
+    """log2( Σ views · 2^exponent ) không tràn số: terms [(exponent, views)]"""
+    top = max(exponent for exponent, _views in terms)
+    return top + math.log2(sum(views * 2 ** (exponent - top) for exponent, views in terms))
+
+
+def compute_scores(item_type, item_ids=None):
+    """{id: trending_score} từ rollup (item_ids None: mọi nội dung có lượt xem)"""
+    half_life = current_app.config.get('TRENDING_HALF_LIFE_HOURS', 24) * 3600
+    cutoff_day, cutoff = _hourly_cutoff()
+    terms = defaultdict(list)
+
+    hourly = db.session.query(ViewRollupHourly.item_id, ViewRollupHourly.hour, ViewRollupHourly.views).filter(
+        ViewRollupHourly.item_type == item_type, ViewRollupHourly.hour >= cutoff)
+    daily = db.session.query(ViewRollupDaily.item_id, ViewRollupDaily.day, ViewRollupDaily.views).filter(
+        ViewRollupDaily.item_type == item_type, ViewRollupDaily.day < cutoff_day)
+    if item_ids is not None:
+        hourly = hourly.filter(ViewRollupHourly.item_id.in_(item_ids))
+        daily = daily.filter(ViewRollupDaily.item_id.in_(item_ids))
+
+    for item_id, hour, views in hourly:
+        terms[item_id].append(((hour - EPOCH).total_seconds() / half_life, views))
+    # Lượt xem cả ngày tính như xem lúc giữa trưa (giờ địa phương)
+    noon = timedelta(hours=12) - _utc_offset()
+    for item_id, day, views in daily:
+        terms[item_id].append(((datetime.combine(day, time()) + noon - EPOCH).total_seconds() / half_life, views))
+
+    return {item_id: _log2_sum(item_terms) for item_id, item_terms in terms.items() if item_terms}
+
+
+def _write_scores(model, scores):
+    # Giữ nguyên updated_at: điểm xu hướng không phải nội dung thay đổi (API delta sync, ETag)
+    table = model.__table__
+    stmt = update(table).where(table.c.id == bindparam('b_id')).values(
+        trending_score=bindparam('b_score'), updated_at=table.c.updated_at)
+    db.session.execute(stmt, [{'b_id': item_id, 'b_score': score} for item_id, score in scores.items()])
+
+
+def refresh_scores(items=None):
+    """
+    Tính lại trending_score (caller commit)
+
+    Args:
+        items: {(loại, id)} cần tính lại; None -> tính lại toàn bộ (nội dung không còn lượt xem nào -> 0)
+    """
+    ids_by_type = defaultdict(list)
+    for item_type, item_id in items or ():
+        ids_by_type[item_type].append(item_id)
+
+    total = 0
+    for item_type, model in TRENDING_SOURCES.items():
+        if items is not None and not ids_by_type.get(item_type):
+            continue
+        scores = compute_scores(item_type, None if items is None else ids_by_type[item_type])
+        if items is None:
+            table = model.__table__
+            db.session.execute(update(table).where(table.c.trending_score != 0).values(
+                trending_score=0, updated_at=table.c.updated_at))
+        if scores:
+            _write_scores(model, scores)
+        total += len(scores)
+    return total
+
+
+def recent_views(score, now=None):
+    """Lượt xem đã suy giảm tới thời điểm now (~ số lượt xem trong 1 chu kỳ bán rã gần đây)"""
+    if not score:
+        return 0
+    half_life = current_app.config.get('TRENDING_HALF_LIFE_HOURS', 24) * 3600
+    now_exponent = ((now or datetime.utcnow()) - EPOCH).total_seconds() / half_life
+    return 2 ** (score - now_exponent)
+
+
+# ==================== ĐỌC THỐNG KÊ ====================
+def daily_views(days=None):
+    """
+    Lượt xem theo ngày (giờ địa phương) từ rollup, gồm cả ngày không có lượt xem
+
+    Returns:
+        list (ngày, {loại: lượt xem}) từ cũ tới mới
+    """
+    days = days or current_app.config.get('VIEW_STATS_DAYS', 30)
+    today = local_today()
+    start = today - timedelta(days=days - 1)
+    totals = defaultdict(dict)
+    for day, item_type, views in db.session.query(
+        ViewRollupDaily.day, ViewRollupDaily.item_type, func.sum(ViewRollupDaily.views)
+    ).filter(ViewRollupDaily.day >= start).group_by(ViewRollupDaily.day, ViewRollupDaily.item_type):
+        totals[day][item_type] = int(views)
+    return [(start + timedelta(days=i), {item_type: totals[start + timedelta(days=i)].get(item_type, 0)
+                                         for item_type in TRENDING_SOURCES})
+            for i in range(days)]
+
+
+def top_trending(item_type, limit=5):
+    """Nội dung active có điểm xu hướng cao nhất"""
+    model = TRENDING_SOURCES[item_type]
+    return model.query.filter(model.is_active == True, model.trending_score > 0).order_by(
+        model.trending_score.desc()).limit(limit).all()
+
+
+def _flush_at_exit(app):
+    if not _buffer.counts:
+        return
+    with app.app_context():
+        try:
+            flush_views()
+        except Exception:
+            app.logger.exception('Không ghi được lượt xem còn trong bộ đệm')
+
+
+def init_app(app):
+    """Ghi nốt bộ đệm lượt xem khi process tắt bình thường"""
+    if not _state.exit_hook:
+        atexit.register(_flush_at_exit, app)
+        _state.exit_hook = True
@@ -1,11 +1,10 @@
 import os
 import re
 from datetime import datetime
-from PIL import Image
 from werkzeug.utils import secure_filename
 from flask import current_app
 from app import db
-import cloudinary.uploader
+from app.lazy import Image, cloudinary_uploader
 
 
 def allowed_file(filename):
@@ -154,8 +153,6 @@ def get_image_from_form(form_image_field, field_name, folder='uploads'):
 
 
 
-import cloudinary.uploader
-
 def save_upload_file(file, folder='general', album=None, alt_text=None, optimize=True):
     """
     Upload file lên Cloudinary thay vì lưu cục bộ.
@@ -177,7 +174,7 @@ def save_upload_file(file, folder='general', album=None, alt_text=None, optimize
 
     try:
         # Upload lên Cloudinary
-        upload_result = cloudinary.uploader.upload(
+        upload_result = cloudinary_uploader.upload(
             file,
             folder=cloud_folder,
             public_id=os.path.splitext(filename)[0],
@@ -212,97 +209,113 @@ def save_upload_file(file, folder='general', album=None, alt_text=None, optimize
 
 
 
-def delete_file(filepath):
-    """Xóa file khỏi Cloudinary hoặc local"""
-    try:
-        if not filepath or not isinstance(filepath, str):
-            print("[Delete Error]: Filepath rỗng hoặc không hợp lệ")
-            return False
+def parse_storage_path(filepath):
+    """
+    Đường dẫn media -> (storage, key)
+    - URL Cloudinary -> ('cloudinary', public_id)
+    - /static/... -> ('local', đường dẫn tương đối trong thư mục static)
+    - Không nhận dạng được -> (None, None)
+    """
+    if not filepath or not isinstance(filepath, str):
+        return None, None
 
-        # --- Xử lý Cloudinary ---
-        if "res.cloudinary.com" in filepath:
-            try:
-                # Tách public_id đúng định dạng
-                parts = filepath.split("/upload/")[-1]  # lấy phần sau /upload/
-                parts = parts.split("/")  # ['v1759825641', 'enterprise', 'general', 'cat-say-so-2-20251007152712.png']
+    if "res.cloudinary.com" in filepath:
+        # Phần sau /upload/, VD: ['v1759825641', 'enterprise', 'general', 'cat-say-so-2.png']
+        parts = filepath.split("?")[0].split("/upload/")[-1].split("/")
 
-                # Nếu phần đầu có version (v1234...) thì bỏ đi
-                if parts[0].startswith("v") and parts[0][1:].isdigit():
-                    parts = parts[1:]
+        # Có version (v1234...) thì bỏ nó và mọi transformation phía trước (w_300,c_fill/...)
+        for index, part in enumerate(parts[:-1]):
+            if part.startswith("v") and part[1:].isdigit():
+                parts = parts[index + 1:]
+                break
 
-                # Ghép lại, bỏ phần mở rộng (.jpg, .png,...)
-                path_no_ext = "/".join(parts)
-                public_id = os.path.splitext(path_no_ext)[0]
+        # Ghép lại, bỏ phần mở rộng (.jpg, .png,...)
+        return 'cloudinary', os.path.splitext("/".join(parts))[0]
 
-                print(f"[Debug] Cloudinary public_id: {public_id}")
+    if filepath.startswith('/static/'):
+        return 'local', filepath.split("?")[0].replace('/static/', '', 1).lstrip("\\/")
 
-                result = cloudinary.uploader.destroy(public_id)
-                print(f"[Cloudinary delete]: {public_id} -> {result}")
-                return result.get("result") == "ok"
+    return None, None
 
-            except Exception as e:
-                print(f"[Cloudinary Delete Error]: {e}")
-                return False
 
-        # --- Xử lý file local ---
-        elif filepath.startswith('/static/'):
-            rel_path = filepath.replace('/static/', '', 1).lstrip("\\/")
-            static_dir = os.path.join(os.path.dirname(__file__), 'static')
-            abs_path = os.path.abspath(os.path.join(static_dir, rel_path))
+def local_static_path(rel_path, static_dir=None):
+    """Đường dẫn tuyệt đối trong thư mục static - None nếu thoát ra ngoài static"""
+    static_dir = os.path.abspath(static_dir or os.path.join(os.path.dirname(__file__), 'static'))
+    abs_path = os.path.abspath(os.path.join(static_dir, rel_path))
+    if not abs_path.startswith(static_dir + os.sep):
+        return None
+    return abs_path
 
-            if not abs_path.startswith(static_dir):
-                print(f"[Security Warning]: Path không hợp lệ -> {abs_path}")
-                return False
 
+def delete_file(filepath):
+    """Xóa 1 file khỏi Cloudinary hoặc local (xóa nhiều file: app/media_cleanup.py)"""
+    storage, key = parse_storage_path(filepath)
+    try:
+        if storage == 'cloudinary':
+            result = cloudinary_uploader.destroy(key)
+            return result.get("result") == "ok"
+
+        if storage == 'local':
+            abs_path = local_static_path(key)
+            if not abs_path:
+                current_app.logger.warning('Đường dẫn không hợp lệ: %s', filepath)
+                return False
             if os.path.exists(abs_path):
                 os.remove(abs_path)
-                print(f"[Local delete]: {abs_path}")
                 return True
-            else:
-                print(f"[Delete Warning]: File không tồn tại -> {abs_path}")
-                return False
-
-        else:
-            print(f"[Delete Skipped]: Không nhận dạng được kiểu đường dẫn ({filepath})")
             return False
 
+        current_app.logger.warning('Không nhận dạng được kiểu đường dẫn: %s', filepath)
+        return False
+
     except Exception as e:
-        print(f"[Delete Error]: {e}")
+        current_app.logger.error('Lỗi xóa file %s: %s', filepath, e)
         return False
 
 
+def dialect_insert(table, bind=None):
+    """
+    Trả về câu INSERT hỗ trợ upsert (on_conflict_do_update) theo dialect đang dùng
+    - PostgreSQL / SQLite: insert của dialect tương ứng
+    - Dialect khác: insert chuẩn (không có on_conflict_do_update)
+    """
+    bind = bind or db.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif bind.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert
+    return insert(table)
+
 
+def increment_counter(obj, column='views'):
+    """
+    Tăng 1 cột đếm (lượt xem) bằng UPDATE col = col + 1 trên primary
+    - Không đọc-rồi-ghi: không mất lượt khi bản ghi được đọc từ replica / nhiều worker
+    - Giá trị trên object được cập nhật theo nhưng không đánh dấu thay đổi
+    - Nhận cả read-model trong cache (app/entity_cache.py): model lấy từ __model__
+    - Giữ nguyên updated_at: lượt xem không phải nội dung thay đổi (API delta sync, ETag)
+    """
+    from sqlalchemy.orm.attributes import set_committed_value
+
+    model = getattr(obj, '__model__', type(obj))
+    col = getattr(model, column)
+    values = {col: col + 1}
+    if hasattr(model, 'updated_at'):
+        values[model.updated_at] = model.updated_at  # Không để onupdate ghi đè
+    db.session.query(model).filter(model.id == obj.id).update(values, synchronize_session=False)
+    value = (getattr(obj, column) or 0) + 1
+    if hasattr(obj, '_sa_instance_state'):
+        set_committed_value(obj, column, value)
+    else:
+        setattr(obj, column, value)
 
 
 def get_albums():
-    """Lấy danh sách albums với số lượng file"""
-    from app.models import Media
-    from sqlalchemy import func
-
-    # Lấy albums từ DB
-    album_counts = db.session.query(
-        Media.album,
-        func.count(Media.id).label('count')
-    ).filter(
-        Media.album.isnot(None),
-        Media.album != ''
-    ).group_by(Media.album).all()
-
-    albums_dict = {album_name: count for album_name, count in album_counts}
-
-    # Lấy thư mục vật lý (kể cả rỗng)
-    albums_path = os.path.join(current_app.config['UPLOAD_FOLDER'], 'albums')
-    if os.path.exists(albums_path):
-        for folder_name in os.listdir(albums_path):
-            folder_path = os.path.join(albums_path, folder_name)
-            if os.path.isdir(folder_path) and folder_name not in albums_dict:
-                albums_dict[folder_name] = 0
-
-    # Convert sang list và sort
-    albums = [{'name': name, 'count': count} for name, count in albums_dict.items()]
-    albums.sort(key=lambda x: x['name'])
-
-    return albums
+    """Lấy danh sách albums với số lượng file (từ bảng albums)"""
+    from app.media_library import list_albums
+    return list_albums()
 
 
 def handle_image_upload(form_field, field_name, folder='general', alt_text=None):
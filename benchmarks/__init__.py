@@ -0,0 +1,13 @@
+"""
+Bộ benchmark / load-test cho website
+
+- dataset.py: sinh dữ liệu giả lập quy mô production bằng bulk insert
+- fakes.py: Cloudinary + Gemini giả lập (không gọi mạng, độ trễ cố định)
+- run.py: chạy mọi route của main_bp / admin_bp / chatbot_bp qua WSGI app,
+  đo p50/p95/p99, số query/request, RSS và lưu kết quả JSON để so sánh
+  giữa các commit
+
+Cách chạy:
+    python -m benchmarks.run --scale 1 --iterations 20
+    python -m benchmarks.run --compare benchmarks/results/<commit cũ>.json
+"""
@@ -0,0 +1,244 @@
+"""
+Sinh dữ liệu giả lập quy mô production cho benchmark
+
+- Ghi bằng bulk insert (executemany) theo lô, không qua ORM -> vài giây cho
+  hàng chục nghìn dòng
+- Số lượng mỗi bảng cấu hình được (DEFAULT_COUNTS * scale hoặc truyền trực tiếp)
+- Dữ liệu tiếng Việt có dấu, nội dung HTML dài tương tự bài viết thật
+- Dùng random.Random(seed) -> cùng seed cho cùng dữ liệu giữa các lần chạy
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import db
+from app.models import (User, Category, Product, Blog, Media, Project, Job, Settings, Contact,
+                        ProductImage, ProjectImage)
+from app.models_rbac import init_default_roles, init_default_permissions, assign_default_permissions
+
+# Số lượng mặc định (scale = 1) - xấp xỉ dữ liệu production
+DEFAULT_COUNTS = {
+    'categories': 20,
+    'products': 2000,
+    'blogs': 500,
+    'media': 3000,
+    'projects': 200,
+    'jobs': 50,
+    'settings': 80,
+    'contacts': 5000,
+}
+
+BENCHMARK_ADMIN_EMAIL = 'benchmark@example.com'
+BENCHMARK_ADMIN_PASSWORD = 'benchmark'
+
+BATCH_SIZE = 1000
+
+WORDS = ('sơn nước chống thấm ngoại thất nội thất bóng mờ cao cấp siêu trắng kháng khuẩn chịu nhiệt '
+         'bền màu lót kiềm gạch ốp lát men sứ thiết bị vệ sinh bồn cầu lavabo vòi sen gỗ sàn nhựa '
+         'keo chà ron xi măng bột trét tường trần thạch cao nhôm kính cửa cuốn mái tôn cách nhiệt').split()
+
+PROJECT_TYPES = ('Nhà ở', 'Văn phòng', 'Khách sạn', 'Nhà xưởng', 'Trường học', 'Bệnh viện')
+LOCATIONS = ('TP.HCM', 'Hà Nội', 'Đà Nẵng', 'Bình Dương', 'Đồng Nai', 'Cần Thơ')
+DEPARTMENTS = ('Kinh doanh', 'Kỹ thuật', 'Kế toán', 'Marketing', 'Kho vận')
+
+# Settings thật mà templates đọc mỗi request
+SETTING_VALUES = {
+    'website_name': ('general', 'Hoangvn'),
+    'hotline': ('contact', '098.422.6602'),
+    'contact_email': ('contact', 'info@hoang.vn'),
+    'main_url': ('general', 'https://hoang.vn'),
+    'logo_url': ('theme', '/static/img/logo.png'),
+    'zalo_url': ('contact', 'https://zalo.me/0984226602'),
+    'facebook_url': ('contact', 'https://facebook.com/hoangvn'),
+    'youtube_url': ('contact', 'https://youtube.com/@hoangvn'),
+    'tiktok_url': ('contact', 'https://tiktok.com/@hoangvn'),
+    'meta_title': ('seo', 'Hoangvn - Vật liệu xây dựng chính hãng'),
+    'meta_description': ('seo', 'Chuyên cung cấp sơn, gạch, thiết bị vệ sinh chính hãng'),
+    'primary_color': ('theme', '#ffc107'),
+    'address': ('contact', '982/l98/a1 Tân Bình, Tân Phú, Nhà Bè, TP.HCM'),
+    'working_hours': ('contact', '8:00 - 17:30 (Thứ 2 - Thứ 7)'),
+    'default_posts_per_page': ('general', '12'),
+    'login_attempt_limit': ('system', '5'),
+}
+
+
+def _sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n)).capitalize()
+
+
+def _html(rng, paragraphs):
+    return ''.join(f'<p>{_sentence(rng, rng.randint(40, 80))}.</p>' for _ in range(paragraphs))
+
+
+def _bulk_insert(model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start:start + BATCH_SIZE])
+
+
+def resolve_counts(scale=1.0, overrides=None):
+    """DEFAULT_COUNTS * scale, ghi đè bằng overrides {bảng: số lượng}"""
+    counts = {name: max(1, int(count * scale)) for name, count in DEFAULT_COUNTS.items()}
+    counts.update(overrides or {})
+    return counts
+
+
+def seed_dataset(counts, seed=42):
+    """
+    Tạo bảng + RBAC + admin benchmark + dữ liệu giả lập
+
+    Args:
+        counts: dict số lượng từng bảng (xem DEFAULT_COUNTS)
+        seed: seed cho random (dữ liệu lặp lại được)
+    """
+    from app.counters import reconcile_counters
+    from app.related import RELATED_SOURCES, rebuild_related
+
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+
+    def past(max_days=730):
+        return now - timedelta(days=rng.randint(0, max_days), seconds=rng.randint(0, 86400))
+
+    db.create_all()
+    init_default_roles()
+    init_default_permissions()
+    assign_default_permissions()
+
+    admin = User(username='benchmark', email=BENCHMARK_ADMIN_EMAIL)
+    admin.set_password(BENCHMARK_ADMIN_PASSWORD)
+    admin.assign_role('admin')
+    db.session.add(admin)
+    db.session.commit()
+
+    _bulk_insert(Category, [{
+        'name': f'{_sentence(rng, 2)} {i}',
+        'slug': f'danh-muc-{i}',
+        'description': _sentence(rng, 20),
+        'is_active': True,
+        'created_at': past(),
+    } for i in range(counts['categories'])])
+    category_ids = [cid for (cid,) in db.session.query(Category.id)]
+
+    albums = [f'Album_{i}' for i in range(max(1, counts['media'] // 100))]
+    _bulk_insert(Media, [{
+        'filename': f'anh-{i}.jpg',
+        'original_filename': f'IMG_{i}.jpg',
+        'filepath': f'https://res.cloudinary.com/benchmark/image/upload/v1/enterprise/general/anh-{i}.jpg',
+        'file_type': 'jpg',
+        'file_size': rng.randint(50_000, 2_000_000),
+        'width': 1200,
+        'height': 800,
+        'alt_text': _sentence(rng, 6),
+        'title': _sentence(rng, 4),
+        'album': rng.choice(albums),
+        'created_at': past(),
+        'updated_at': now,
+    } for i in range(counts['media'])])
+    image_urls = [f'https://res.cloudinary.com/benchmark/image/upload/v1/enterprise/general/anh-{i}.jpg'
+                  for i in range(min(counts['media'], 500))]
+
+    _bulk_insert(Product, [{
+        'name': f'{_sentence(rng, 4)} {i}',
+        'slug': f'san-pham-{i}',
+        'description': _html(rng, 3),
+        'price': rng.randint(50, 5000) * 1000,
+        'old_price': None,
+        'image': rng.choice(image_urls),
+        'is_featured': rng.random() < 0.05,
+        'is_active': rng.random() < 0.95,
+        'views': rng.randint(0, 10_000),
+        'category_id': rng.choice(category_ids),
+        'created_at': past(),
+        'updated_at': now,
+    } for i in range(counts['products'])])
+
+    _bulk_insert(Blog, [{
+        'title': f'{_sentence(rng, 8)} {i}',
+        'slug': f'bai-viet-{i}',
+        'excerpt': _sentence(rng, 30),
+        'content': _html(rng, 12),
+        'image': rng.choice(image_urls),
+        'author': 'Admin',
+        'is_featured': rng.random() < 0.05,
+        'is_active': True,
+        'views': rng.randint(0, 10_000),
+        'created_at': past(),
+        'updated_at': now,
+    } for i in range(counts['blogs'])])
+
+    _bulk_insert(Project, [{
+        'title': f'Dự án {_sentence(rng, 4)} {i}',
+        'slug': f'du-an-{i}',
+        'client': f'Công ty {_sentence(rng, 2)}',
+        'location': rng.choice(LOCATIONS),
+        'year': rng.randint(2015, now.year),
+        'description': _sentence(rng, 30),
+        'content': _html(rng, 6),
+        'image': rng.choice(image_urls),
+        'project_type': rng.choice(PROJECT_TYPES),
+        'area': f'{rng.randint(50, 20000)} m²',
+        'products_used': _sentence(rng, 10),
+        'is_featured': rng.random() < 0.1,
+        'is_active': True,
+        'view_count': rng.randint(0, 5000),
+        'created_at': past(),
+        'updated_at': now,
+    } for i in range(counts['projects'])])
+
+    # Gallery: 4 ảnh / sản phẩm, 6 ảnh / dự án (gắn media_id như build_gallery_images)
+    media_ids = dict(db.session.query(Media.filepath, Media.id).filter(Media.filepath.in_(image_urls)))
+    for model, owner, owner_column, size in ((ProductImage, Product, 'product_id', 4),
+                                             (ProjectImage, Project, 'project_id', 6)):
+        _bulk_insert(model, [{
+            owner_column: owner_id,
+            'media_id': media_ids.get(url),
+            'url': url,
+            'position': position,
+        } for (owner_id,) in db.session.query(owner.id).order_by(owner.id)
+            for position, url in enumerate(rng.sample(image_urls, min(size, len(image_urls))))])
+
+    _bulk_insert(Job, [{
+        'title': f'Nhân viên {rng.choice(DEPARTMENTS).lower()} {i}',
+        'slug': f'tuyen-dung-{i}',
+        'department': rng.choice(DEPARTMENTS),
+        'location': rng.choice(LOCATIONS),
+        'job_type': 'Full-time',
+        'level': rng.choice(('Junior', 'Senior', 'Manager')),
+        'salary': 'Thỏa thuận',
+        'experience': f'{rng.randint(0, 5)} năm',
+        'description': _html(rng, 3),
+        'requirements': _html(rng, 2),
+        'benefits': _html(rng, 2),
+        'deadline': now + timedelta(days=rng.randint(-30, 90)),
+        'contact_email': 'hr@hoang.vn',
+        'is_active': True,
+        'is_urgent': rng.random() < 0.2,
+        'view_count': rng.randint(0, 2000),
+        'created_at': past(180),
+        'updated_at': now,
+    } for i in range(counts['jobs'])])
+
+    settings = [{'key': key, 'group': group, 'value': value, 'description': '', 'updated_at': now}
+                for key, (group, value) in SETTING_VALUES.items()]
+    settings += [{'key': f'benchmark_setting_{i}', 'group': 'general', 'value': _sentence(rng, 5),
+                  'description': '', 'updated_at': now}
+                 for i in range(max(0, counts['settings'] - len(settings)))]
+    _bulk_insert(Settings, settings)
+
+    _bulk_insert(Contact, [{
+        'name': f'Khách hàng {i}',
+        'email': f'khach{i}@example.com',
+        'phone': f'09{rng.randint(10_000_000, 99_999_999)}',
+        'subject': _sentence(rng, 5),
+        'message': _sentence(rng, 40),
+        'is_read': rng.random() < 0.7,
+        'created_at': past(),
+    } for i in range(counts['contacts'])])
+
+    db.session.commit()
+
+    # Bulk insert không qua ORM events -> tính lại bộ đếm + nội dung liên quan
+    reconcile_counters()
+    for item_type in RELATED_SOURCES:
+        rebuild_related(item_type)
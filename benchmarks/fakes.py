@@ -0,0 +1,85 @@
+"""
+Cloudinary + Gemini giả lập cho benchmark
+
+Không gọi mạng: kết quả trả về cùng cấu trúc với SDK thật, có thể thêm độ
+trễ cố định (latency) để mô phỏng thời gian gọi API.
+"""
+import time
+from contextlib import contextmanager
+
+import cloudinary.api
+import cloudinary.uploader
+
+
+class FakeCloudinary:
+    """Thay cloudinary.uploader.upload / destroy + cloudinary.api.delete_resources"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.uploads = 0
+        self.destroys = 0
+
+    def upload(self, file, folder='', public_id='file', **options):
+        time.sleep(self.latency)
+        self.uploads += 1
+        data = file.read() if hasattr(file, 'read') else b''
+        return {
+            'secure_url': f'https://res.cloudinary.com/benchmark/image/upload/v1/{folder}/{public_id}.jpg',
+            'public_id': f'{folder}/{public_id}',
+            'width': 800,
+            'height': 600,
+            'bytes': len(data),
+            'format': 'jpg',
+        }
+
+    def destroy(self, public_id, **options):
+        time.sleep(self.latency)
+        self.destroys += 1
+        return {'result': 'ok'}
+
+    def delete_resources(self, public_ids, **options):
+        time.sleep(self.latency)
+        self.destroys += len(public_ids)
+        return {'deleted': {public_id: 'deleted' for public_id in public_ids}}
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Thay genai.GenerativeModel - chỉ cần generate_content()"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = 0
+
+    def generate_content(self, prompt, **options):
+        time.sleep(self.latency)
+        self.calls += 1
+        return _FakeResponse('Dạ, cảm ơn anh/chị đã quan tâm 😊 Anh/chị cần tư vấn sản phẩm nào ạ?')
+
+
+@contextmanager
+def install_fakes(app, latency=0.0):
+    """
+    Gắn Cloudinary + Gemini giả lập vào app trong phạm vi with
+    Trả về (FakeCloudinary, FakeGeminiModel) để đếm số lần gọi
+    """
+    from app.chatbot import routes as chatbot_routes
+
+    fake_cloudinary = FakeCloudinary(latency)
+    fake_gemini = FakeGeminiModel(latency)
+
+    original = (cloudinary.uploader.upload, cloudinary.uploader.destroy,
+                cloudinary.api.delete_resources, chatbot_routes.model)
+    cloudinary.uploader.upload = fake_cloudinary.upload
+    cloudinary.uploader.destroy = fake_cloudinary.destroy
+    cloudinary.api.delete_resources = fake_cloudinary.delete_resources
+    chatbot_routes.model = fake_gemini
+    try:
+        yield fake_cloudinary, fake_gemini
+    finally:
+        (cloudinary.uploader.upload, cloudinary.uploader.destroy,
+         cloudinary.api.delete_resources, chatbot_routes.model) = original
@@ -0,0 +1,378 @@
+"""
+Chạy benchmark toàn bộ route qua WSGI app (Flask test client)
+
+- Mỗi route của main_bp / admin_bp / chatbot_bp được gọi N lần (sau vài lần
+  warmup), đo độ trễ p50/p95/p99, số query SQL mỗi request và RSS của process
+- Route admin chạy với tài khoản admin benchmark (đã đăng nhập)
+- Route xóa / đăng xuất bị bỏ qua (làm thay đổi dữ liệu benchmark)
+- Kết quả lưu JSON (mặc định benchmarks/results/<git commit>.json), dùng
+  --compare để so sánh với kết quả của commit khác
+
+Cách chạy:
+    python -m benchmarks.run
+    python -m benchmarks.run --scale 0.2 --iterations 10 --only main.
+    python -m benchmarks.run --database-url postgresql://... --no-seed
+    python -m benchmarks.run --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from flask import url_for
+from sqlalchemy import event
+
+from app import create_app, db
+from app.config import Config
+from app.models import User, Category, Product, Blog, Media, Project, Job, Contact, Banner, FAQ
+from app.models_rbac import Role, Permission
+from benchmarks.dataset import (DEFAULT_COUNTS, BENCHMARK_ADMIN_EMAIL, BENCHMARK_ADMIN_PASSWORD,
+                                resolve_counts, seed_dataset)
+from benchmarks.fakes import install_fakes
+
+BLUEPRINTS = ('main', 'admin', 'chatbot')
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Route làm thay đổi dữ liệu / phiên đăng nhập -> không benchmark
+SKIP_PREFIXES = ('admin.delete_', 'admin.logout', 'admin.login', 'admin.bulk_edit_media', 'admin.create_album')
+
+# Model dùng để lấy giá trị cho tham số <id> / <slug> theo tên endpoint
+ENDPOINT_MODELS = (
+    ('role_permissions', Role), ('permission', Permission), ('role', Role), ('user', User),
+    ('product', Product), ('categor', Category), ('blog', Blog), ('media', Media),
+    ('project', Project), ('job', Job), ('career', Job), ('contact', Contact),
+    ('banner', Banner), ('faq', FAQ),
+)
+
+# Một pixel PNG để benchmark upload (qua Cloudinary giả lập)
+_PNG_PIXEL = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)
+
+# Request POST có kịch bản (endpoint -> hàm sinh kwargs cho client.open)
+POST_SCENARIOS = {
+    'chatbot.send_message': lambda: {'json': {'message': 'Cho tôi hỏi giá sơn chống thấm?'}},
+    'chatbot.reset_chat': lambda: {},
+    'main.contact': lambda: {'data': {'name': 'Benchmark', 'email': 'bench@example.com',
+                                      'message': 'Tin nhắn benchmark liên hệ báo giá'}},
+    'admin.check_lockout': lambda: {'json': {'email': BENCHMARK_ADMIN_EMAIL}},
+    'admin.api_check_blog_seo': lambda: {'json': {'title': 'Sơn chống thấm', 'content': '<p>Sơn</p>',
+                                                  'focus_keyword': 'sơn'}},
+    'admin.upload_media': lambda: {'data': {'files': (io.BytesIO(_PNG_PIXEL), 'benchmark.png'),
+                                            'album': 'Benchmark'},
+                                   'content_type': 'multipart/form-data'},
+}
+
+
+class BenchmarkConfig(Config):
+    """Cấu hình chạy benchmark: DB riêng, tắt CSRF, bỏ giới hạn chatbot"""
+    WTF_CSRF_ENABLED = False
+    CHATBOT_REQUEST_LIMIT = 10 ** 9
+    RELATED_REFRESH_ASYNC = False
+
+
+# ==================== ĐO LƯỜNG ====================
+def current_rss_mb():
+    """RSS hiện tại của process (MB) - Linux đọc /proc, nơi khác dùng ru_maxrss"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return round(pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024, 2)
+    except (OSError, ValueError, IndexError):
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+        return round(maxrss / divisor, 2)
+
+
+def percentile(values, pct):
+    """Percentile theo nội suy tuyến tính"""
+    if not values:
+        return 0
+    values = sorted(values)
+    k = (len(values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+class QueryCounter:
+    """Đếm số câu SQL gửi xuống DB (event before_cursor_execute)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+# ==================== DANH SÁCH ROUTE ====================
+def _model_for(endpoint):
+    name = endpoint.split('.', 1)[1]
+    for keyword, model in ENDPOINT_MODELS:
+        if keyword in name:
+            return model
+    return None
+
+
+def _sample_value(model, arg):
+    query = db.session.query(getattr(model, arg))
+    if hasattr(model, 'is_active'):
+        query = query.filter(model.is_active == True)
+    return query.order_by(model.id).limit(1).scalar()
+
+
+def resolve_url_args(endpoint, arguments):
+    """Lấy giá trị thật trong DB cho các tham số của route -> dict hoặc None"""
+    values = {}
+    for arg in arguments:
+        if arg == 'category_slug':
+            values[arg] = _sample_value(Category, 'slug')
+        elif arg == 'album_name':
+            values[arg] = db.session.query(Media.album).filter(Media.album.isnot(None)).limit(1).scalar()
+        else:
+            model = _model_for(endpoint)
+            values[arg] = _sample_value(model, arg) if model is not None and hasattr(model, arg) else None
+        if values[arg] is None:
+            return None
+    return values
+
+
+def collect_routes(app, only=None):
+    """
+    Liệt kê các request cần benchmark
+
+    Returns:
+        (routes, skipped): routes là list dict {name, endpoint, method, url, kwargs_fn},
+        skipped là list dict {name, reason}
+    """
+    routes, skipped = [], []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda r: (r.endpoint, r.rule)):
+        if rule.endpoint.split('.')[0] not in BLUEPRINTS:
+            continue
+        if only and not any(rule.endpoint.startswith(prefix) for prefix in only):
+            continue
+        name_base = f'{rule.endpoint} {rule.rule}'
+        if rule.endpoint.startswith(SKIP_PREFIXES):
+            skipped.append({'name': name_base, 'reason': 'thay đổi dữ liệu / phiên'})
+            continue
+
+        values = resolve_url_args(rule.endpoint, rule.arguments)
+        if values is None:
+            skipped.append({'name': name_base, 'reason': 'không có dữ liệu cho tham số'})
+            continue
+        with app.test_request_context():
+            url = url_for(rule.endpoint, **values)
+
+        methods = [m for m in ('GET', 'POST') if m in rule.methods]
+        for method in methods:
+            if method == 'POST' and rule.endpoint not in POST_SCENARIOS:
+                if 'GET' not in methods:
+                    skipped.append({'name': name_base, 'reason': 'POST chưa có kịch bản'})
+                continue
+            routes.append({
+                'name': f'{method} {rule.endpoint} {rule.rule}',
+                'endpoint': rule.endpoint,
+                'method': method,
+                'url': url,
+                'kwargs_fn': POST_SCENARIOS[rule.endpoint] if method == 'POST' else dict,
+            })
+    return routes, skipped
+
+
+# ==================== CHẠY BENCHMARK ====================
+def login(client):
+    response = client.post('/admin/login', data={'email': BENCHMARK_ADMIN_EMAIL,
+                                                 'password': BENCHMARK_ADMIN_PASSWORD})
+    if response.status_code not in (200, 302):
+        raise RuntimeError(f'Đăng nhập admin benchmark thất bại ({response.status_code})')
+
+
+def bench_route(app, client, route, iterations, warmup):
+    """Gọi 1 route nhiều lần -> dict thống kê"""
+    timings, queries, statuses, errors, last_error = [], [], {}, 0, None
+    rss_before = current_rss_mb()
+
+    for i in range(warmup + iterations):
+        with QueryCounter(db.engine) as counter:
+            start = time.perf_counter()
+            try:
+                response = client.open(route['url'], method=route['method'], **route['kwargs_fn']())
+                response.get_data()
+                status = response.status_code
+            except Exception as e:
+                status = 'exception'
+                last_error = repr(e)[:200]
+            elapsed = (time.perf_counter() - start) * 1000
+
+        if i < warmup:
+            continue
+        timings.append(elapsed)
+        queries.append(counter.count)
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+        if status == 'exception' or (isinstance(status, int) and status >= 500):
+            errors += 1
+
+    rss_after = current_rss_mb()
+    return {
+        'name': route['name'],
+        'url': route['url'],
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(statistics.fmean(timings), 3) if timings else 0,
+        'queries_per_request': round(statistics.fmean(queries), 2) if queries else 0,
+        'max_queries': max(queries) if queries else 0,
+        'rss_mb': rss_after,
+        'rss_delta_mb': round(rss_after - rss_before, 2),
+        'statuses': statuses,
+        'errors': errors,
+        'last_error': last_error,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run_benchmark(database_url, counts, iterations=20, warmup=2, seed=True, only=None,
+                  fake_latency=0.0, random_seed=42):
+    """Chạy toàn bộ benchmark -> dict kết quả (có thể ghi JSON)"""
+    BenchmarkConfig.SQLALCHEMY_DATABASE_URI = database_url
+    app = create_app(BenchmarkConfig)
+    # Lưu cài đặt / /sitemap.xml tạo lại sitemap.xml + robots.txt trong static_folder:
+    # ghi vào thư mục tạm, không ghi đè file thật bằng URL localhost + slug benchmark
+    static_dir = tempfile.mkdtemp(prefix='benchmark-static-')
+    app.static_folder = static_dir
+
+    seed_seconds = None
+    with app.app_context():
+        if seed:
+            start = time.perf_counter()
+            db.drop_all()
+            seed_dataset(counts, seed=random_seed)
+            seed_seconds = round(time.perf_counter() - start, 2)
+
+        routes, skipped = collect_routes(app, only)
+
+    results = []
+    try:
+        with install_fakes(app, latency=fake_latency) as (fake_cloudinary, fake_gemini):
+            client = app.test_client()
+            with app.app_context():
+                login(client)
+            for route in routes:
+                with app.app_context():
+                    results.append(bench_route(app, client, route, iterations, warmup))
+                print(f"  {results[-1]['p50_ms']:>9.2f} ms p50 {results[-1]['p95_ms']:>9.2f} ms p95 "
+                      f"{results[-1]['queries_per_request']:>7.1f} q  {route['name']}")
+    finally:
+        shutil.rmtree(static_dir, ignore_errors=True)
+
+    return {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'database': database_url.split(':', 1)[0],
+        'counts': counts,
+        'iterations': iterations,
+        'warmup': warmup,
+        'seed_seconds': seed_seconds,
+        'fake_calls': {'cloudinary_upload': fake_cloudinary.uploads, 'gemini': fake_gemini.calls},
+        'routes': results,
+        'skipped': skipped,
+    }
+
+
+# ==================== SO SÁNH KẾT QUẢ ====================
+def compare_results(old, new, threshold=0.2):
+    """
+    So sánh 2 kết quả theo route -> list dòng báo cáo
+    Route chậm hơn quá threshold (20%) hoặc tăng số query được đánh dấu ⚠
+    """
+    old_routes = {r['name']: r for r in old.get('routes', [])}
+    lines = []
+    for route in new.get('routes', []):
+        before = old_routes.get(route['name'])
+        if not before:
+            continue
+        change = (route['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0
+        query_change = route['queries_per_request'] - before['queries_per_request']
+        flag = '⚠' if change > threshold or query_change > 0 else ' '
+        lines.append(f"{flag} p95 {before['p95_ms']:>9.2f} -> {route['p95_ms']:>9.2f} ms ({change:+.0%})  "
+                     f"q {before['queries_per_request']:>6.1f} -> {route['queries_per_request']:>6.1f}  "
+                     f"{route['name']}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark toàn bộ route của website')
+    parser.add_argument('--database-url', help='DB dùng để benchmark (mặc định SQLite tạm)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Hệ số nhân DEFAULT_COUNTS')
+    for name in DEFAULT_COUNTS:
+        parser.add_argument(f'--{name}', type=int, help=f'Số {name} (ghi đè scale)')
+    parser.add_argument('--iterations', type=int, default=20, help='Số request đo mỗi route')
+    parser.add_argument('--warmup', type=int, default=2, help='Số request khởi động (không tính)')
+    parser.add_argument('--only', action='append', help='Chỉ chạy endpoint bắt đầu bằng prefix (VD: main.)')
+    parser.add_argument('--no-seed', action='store_true', help='Dùng dữ liệu có sẵn trong DB')
+    parser.add_argument('--fake-latency', type=float, default=0.0,
+                        help='Độ trễ giả lập (giây) cho Cloudinary/Gemini')
+    parser.add_argument('--random-seed', type=int, default=42)
+    parser.add_argument('--output', help='File JSON kết quả (mặc định benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='File JSON kết quả cũ để so sánh')
+    args = parser.parse_args(argv)
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'hoangvn-benchmark.db')
+
+    overrides = {name: getattr(args, name) for name in DEFAULT_COUNTS if getattr(args, name) is not None}
+    counts = resolve_counts(args.scale, overrides)
+
+    print(f"Benchmark trên {database_url} với {counts}")
+    result = run_benchmark(database_url, counts, iterations=args.iterations, warmup=args.warmup,
+                           seed=not args.no_seed, only=args.only, fake_latency=args.fake_latency,
+                           random_seed=args.random_seed)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"✓ Đã lưu kết quả {len(result['routes'])} route vào {output} "
+          f"(bỏ qua {len(result['skipped'])})")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            old = json.load(f)
+        print(f"So sánh với commit {old.get('commit')}:")
+        for line in compare_results(old, result):
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Cấu hình gunicorn cho production
+
+Chạy:
+    gunicorn wsgi:app            (tự đọc file này ở thư mục hiện tại)
+
+Biến môi trường:
+    PORT                    cổng lắng nghe (mặc định 10000 như Render)
+    WEB_CONCURRENCY         số worker (mặc định tính theo CPU + RAM)
+    GUNICORN_THREADS        số thread mỗi worker
+    WORKER_MEMORY_MB        RAM ước tính mỗi worker để tính số worker (180)
+    GUNICORN_MAX_REQUESTS   tái chế worker sau N request (1000)
+    WORKER_MAX_RSS_MB       tái chế worker khi RSS vượt ngưỡng (400, 0 = tắt)
+    GUNICORN_TIMEOUT        timeout request (60 giây)
+"""
+import os
+
+from app.server import worker_counts, freeze_heap, rss_exceeded
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '10000')}"
+
+# Tạo app + làm nóng 1 lần trong master (wsgi.py), worker fork ra dùng chung
+preload_app = True
+
+workers, threads = worker_counts()
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Tái chế worker theo số request (jitter để các worker không restart cùng lúc)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max(1, max_requests // 10)
+
+# Tái chế worker theo RSS - kiểm tra mỗi RSS_CHECK_EVERY request
+max_rss_mb = int(os.environ.get('WORKER_MAX_RSS_MB', 400))
+RSS_CHECK_EVERY = 20
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    """Master đã nạp app (preload), chưa fork worker -> đóng băng heap"""
+    freeze_heap()
+    server.log.info(f"Khởi động {workers} worker x {threads} thread ({worker_class}), "
+                    f"max_requests={max_requests}, max_rss={max_rss_mb} MB")
+
+
+def post_request(worker, req, environ, resp):
+    """Worker vượt ngưỡng RSS -> xử lý xong request hiện tại rồi thoát, master fork worker mới"""
+    worker.rss_check_counter = getattr(worker, 'rss_check_counter', 0) + 1
+    if worker.rss_check_counter % RSS_CHECK_EVERY:
+        return
+    if worker.alive and rss_exceeded(max_rss_mb):
+        worker.log.info(f"Worker {worker.pid} vượt {max_rss_mb} MB RSS, tái chế")
+        worker.alive = False
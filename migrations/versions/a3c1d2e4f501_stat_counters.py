@@ -0,0 +1,38 @@
+"""bảng bộ đếm thống kê stat_counters
+
+Revision ID: a3c1d2e4f501
+Revises: 1c1fe24cfb9a
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c1d2e4f501'
+down_revision = '1c1fe24cfb9a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stat_counters',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=150), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('stat_counters', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_stat_counters_key'), ['key'], unique=True)
+
+    # Số liệu ban đầu được tính bằng lệnh: flask reconcile-counters
+    # (hoặc tự tính ở lần mở dashboard đầu tiên)
+
+
+def downgrade():
+    with op.batch_alter_table('stat_counters', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_stat_counters_key'))
+
+    op.drop_table('stat_counters')
@@ -0,0 +1,30 @@
+"""related_items: unique (item_type, item_id, related_id)
+
+Revision ID: a7c3e9f1d5b2
+Revises: f3b9d2e7a1c5
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9f1d5b2'
+down_revision = 'f3b9d2e7a1c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Bỏ dòng trùng do 2 lần tính lại chạy chồng nhau (giữ dòng cũ nhất)
+    op.execute('DELETE FROM related_items WHERE id NOT IN ('
+               'SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM related_items '
+               'GROUP BY item_type, item_id, related_id) AS keep)')
+    with op.batch_alter_table('related_items', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_related_items_pair', ['item_type', 'item_id', 'related_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('related_items', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_related_items_pair', type_='unique')
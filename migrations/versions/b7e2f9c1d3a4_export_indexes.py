@@ -0,0 +1,42 @@
+"""index cho lọc/xuất liên hệ, sản phẩm, media
+
+Revision ID: b7e2f9c1d3a4
+Revises: a3c1d2e4f501
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2f9c1d3a4'
+down_revision = 'a3c1d2e4f501'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contacts', schema=None) as batch_op:
+        batch_op.create_index('ix_contacts_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_contacts_is_read_created_at', ['is_read', 'created_at'], unique=False)
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.create_index('ix_media_created_at', ['created_at'], unique=False)
+        batch_op.create_index('ix_media_album_created_at', ['album', 'created_at'], unique=False)
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.create_index('ix_products_created_at', ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_index('ix_products_created_at')
+
+    with op.batch_alter_table('media', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_album_created_at')
+        batch_op.drop_index('ix_media_created_at')
+
+    with op.batch_alter_table('contacts', schema=None) as batch_op:
+        batch_op.drop_index('ix_contacts_is_read_created_at')
+        batch_op.drop_index('ix_contacts_created_at')
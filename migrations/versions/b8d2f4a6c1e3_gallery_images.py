@@ -0,0 +1,105 @@
+"""bảng gallery product_images / project_images thay cột JSON
+
+Revision ID: b8d2f4a6c1e3
+Revises: a9c4e2f8d1b3
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d2f4a6c1e3'
+down_revision = 'a9c4e2f8d1b3'
+branch_labels = None
+depends_on = None
+
+# (bảng gallery, cột id chủ sở hữu, bảng chủ sở hữu, cột JSON cũ)
+GALLERIES = [
+    ('product_images', 'product_id', 'products', 'images'),
+    ('project_images', 'project_id', 'projects', 'gallery'),
+]
+
+
+def _parse_gallery(value):
+    """JSON cũ: list URL hoặc list dict {url/src, alt, title} -> list (url, alt, title)"""
+    try:
+        items = json.loads(value) if value else []
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(items, list):
+        return []
+
+    entries = []
+    for item in items:
+        if isinstance(item, str):
+            item = {'url': item}
+        if not isinstance(item, dict):
+            continue
+        url = (item.get('url') or item.get('src') or '').strip()
+        if url:
+            entries.append((url[:500], (item.get('alt_text') or item.get('alt') or '')[:255] or None,
+                            (item.get('title') or '')[:255] or None))
+    return entries
+
+
+def upgrade():
+    for table, owner_column, owner_table, _json_column in GALLERIES:
+        op.create_table(table,
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column(owner_column, sa.Integer(), nullable=False),
+        sa.Column('media_id', sa.Integer(), nullable=True),
+        sa.Column('url', sa.String(length=500), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('alt_text', sa.String(length=255), nullable=True),
+        sa.Column('title', sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint([owner_column], [f'{owner_table}.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['media_id'], ['media.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table}_{owner_column[:-3]}_position', [owner_column, 'position'], unique=False)
+            batch_op.create_index(batch_op.f(f'ix_{table}_media_id'), ['media_id'], unique=False)
+
+    # Chuyển dữ liệu từ cột JSON sang bảng gallery (gắn media_id theo filepath)
+    bind = op.get_bind()
+    media_ids = dict(bind.execute(sa.text('SELECT filepath, id FROM media')).fetchall())
+    for table, owner_column, owner_table, json_column in GALLERIES:
+        rows = []
+        for owner_id, value in bind.execute(sa.text(
+                f'SELECT id, {json_column} FROM {owner_table} WHERE {json_column} IS NOT NULL')):
+            for position, (url, alt_text, title) in enumerate(_parse_gallery(value)):
+                rows.append({owner_column: owner_id, 'media_id': media_ids.get(url), 'url': url,
+                             'position': position, 'alt_text': alt_text, 'title': title})
+        if rows:
+            gallery = sa.table(table, sa.column(owner_column), sa.column('media_id'), sa.column('url'),
+                               sa.column('position'), sa.column('alt_text'), sa.column('title'))
+            op.bulk_insert(gallery, rows)
+
+        with op.batch_alter_table(owner_table, schema=None) as batch_op:
+            batch_op.drop_column(json_column)
+    # Chỉ mục chỗ dùng media: chạy `flask media-gc --dry-run` để dựng lại với field 'gallery'
+
+
+def downgrade():
+    bind = op.get_bind()
+    for table, owner_column, owner_table, json_column in GALLERIES:
+        with op.batch_alter_table(owner_table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(json_column, sa.Text(), nullable=True))
+
+        galleries = {}
+        for owner_id, url in bind.execute(sa.text(
+                f'SELECT {owner_column}, url FROM {table} ORDER BY {owner_column}, position')):
+            galleries.setdefault(owner_id, []).append(url)
+        for owner_id, urls in galleries.items():
+            bind.execute(sa.text(f'UPDATE {owner_table} SET {json_column} = :value WHERE id = :id'),
+                         {'value': json.dumps(urls), 'id': owner_id})
+
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(batch_op.f(f'ix_{table}_media_id'))
+            batch_op.drop_index(f'ix_{table}_{owner_column[:-3]}_position')
+
+        op.drop_table(table)
@@ -0,0 +1,27 @@
+"""categories.updated_at (version danh mục cho fragment cache)
+
+Revision ID: c3e7a9b5d2f4
+Revises: b8d2f4a6c1e3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e7a9b5d2f4'
+down_revision = 'b8d2f4a6c1e3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+    op.execute('UPDATE categories SET updated_at = created_at')
+
+
+def downgrade():
+    with op.batch_alter_table('categories', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -0,0 +1,51 @@
+"""bảng nội dung liên quan + co-view
+
+Revision ID: c4d8a2f6e1b7
+Revises: b7e2f9c1d3a4
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d8a2f6e1b7'
+down_revision = 'b7e2f9c1d3a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('related_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_type', sa.String(length=20), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('related_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=True),
+    sa.Column('rank', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('related_items', schema=None) as batch_op:
+        batch_op.create_index('ix_related_items_lookup', ['item_type', 'item_id', 'rank'], unique=False)
+        batch_op.create_index('ix_related_items_reverse', ['item_type', 'related_id'], unique=False)
+
+    op.create_table('co_views',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_type', sa.String(length=20), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('other_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('item_type', 'item_id', 'other_id', name='uq_co_views_pair')
+    )
+
+
+def downgrade():
+    op.drop_table('co_views')
+    with op.batch_alter_table('related_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_related_items_reverse')
+        batch_op.drop_index('ix_related_items_lookup')
+
+    op.drop_table('related_items')
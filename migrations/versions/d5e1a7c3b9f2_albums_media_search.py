@@ -0,0 +1,62 @@
+"""danh mục albums + index tìm kiếm media
+
+Revision ID: d5e1a7c3b9f2
+Revises: c4d8a2f6e1b7
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e1a7c3b9f2'
+down_revision = 'c4d8a2f6e1b7'
+branch_labels = None
+depends_on = None
+
+# Phải khớp app.media_library.MEDIA_TSVECTOR_SQL
+MEDIA_TSVECTOR_SQL = ("to_tsvector('simple', coalesce(media.original_filename, '') || ' ' || "
+                      "coalesce(media.alt_text, '') || ' ' || coalesce(media.title, ''))")
+
+
+def upgrade():
+    op.create_table('albums',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('media_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('albums', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_albums_name'), ['name'], unique=True)
+
+    # Điền danh mục từ các album đang có trong bảng media
+    op.execute(
+        "INSERT INTO albums (name, media_count, created_at, updated_at) "
+        "SELECT album, count(*), CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM media "
+        "WHERE album IS NOT NULL AND album != '' GROUP BY album"
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # varchar_pattern_ops: LIKE 'abc%' dùng được index với mọi collation
+        op.execute('CREATE INDEX ix_media_original_filename_lower '
+                   'ON media (lower(original_filename) varchar_pattern_ops)')
+        op.execute('CREATE INDEX ix_media_alt_text_lower ON media (lower(alt_text) varchar_pattern_ops)')
+        op.execute(f'CREATE INDEX ix_media_search_fts ON media USING gin ({MEDIA_TSVECTOR_SQL})')
+    else:
+        op.execute('CREATE INDEX ix_media_original_filename_lower ON media (lower(original_filename))')
+        op.execute('CREATE INDEX ix_media_alt_text_lower ON media (lower(alt_text))')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_media_search_fts')
+    op.execute('DROP INDEX IF EXISTS ix_media_alt_text_lower')
+    op.execute('DROP INDEX IF EXISTS ix_media_original_filename_lower')
+
+    with op.batch_alter_table('albums', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_albums_name'))
+
+    op.drop_table('albums')
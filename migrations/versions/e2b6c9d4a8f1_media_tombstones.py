@@ -0,0 +1,42 @@
+"""tombstone xóa file media ở nền
+
+Revision ID: e2b6c9d4a8f1
+Revises: d5e1a7c3b9f2
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6c9d4a8f1'
+down_revision = 'd5e1a7c3b9f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('media_id', sa.Integer(), nullable=True),
+    sa.Column('filepath', sa.String(length=500), nullable=False),
+    sa.Column('storage', sa.String(length=20), nullable=False),
+    sa.Column('storage_key', sa.String(length=500), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('media_tombstones', schema=None) as batch_op:
+        batch_op.create_index('ix_media_tombstones_due', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('media_tombstones', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_tombstones_due')
+
+    op.drop_table('media_tombstones')
@@ -0,0 +1,49 @@
+"""catalog API: index (updated_at, id) cho cursor / delta sync + bảng catalog_tombstones
+
+Revision ID: e8c2a4f6b1d3
+Revises: d5f1b7c9e3a2
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c2a4f6b1d3'
+down_revision = 'd5f1b7c9e3a2'
+branch_labels = None
+depends_on = None
+
+CATALOG_TABLES = ('categories', 'products', 'blogs', 'projects', 'jobs')
+
+
+def upgrade():
+    for table in CATALOG_TABLES:
+        # Dòng cũ chưa có updated_at: cursor (updated_at, id) cần giá trị khác NULL
+        op.execute(f'UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) '
+                   f'WHERE updated_at IS NULL')
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table}_updated_at_id', ['updated_at', 'id'], unique=False)
+
+    op.create_table('catalog_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('resource', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('slug', sa.String(length=200), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('catalog_tombstones', schema=None) as batch_op:
+        batch_op.create_index('ix_catalog_tombstones_resource_deleted_at', ['resource', 'deleted_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('catalog_tombstones', schema=None) as batch_op:
+        batch_op.drop_index('ix_catalog_tombstones_resource_deleted_at')
+
+    op.drop_table('catalog_tombstones')
+
+    for table in reversed(CATALOG_TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_updated_at_id')
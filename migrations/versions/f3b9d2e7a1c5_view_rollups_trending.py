@@ -0,0 +1,65 @@
+"""thống kê lượt xem: view_rollups_hourly / view_rollups_daily + cột trending_score
+
+Revision ID: f3b9d2e7a1c5
+Revises: e8c2a4f6b1d3
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b9d2e7a1c5'
+down_revision = 'e8c2a4f6b1d3'
+branch_labels = None
+depends_on = None
+
+TRENDING_TABLES = ('products', 'blogs', 'projects')
+
+
+def upgrade():
+    op.create_table('view_rollups_hourly',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_type', sa.String(length=20), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('item_type', 'item_id', 'hour', name='uq_view_rollups_hourly_item_hour')
+    )
+    with op.batch_alter_table('view_rollups_hourly', schema=None) as batch_op:
+        batch_op.create_index('ix_view_rollups_hourly_hour', ['hour'], unique=False)
+
+    op.create_table('view_rollups_daily',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('item_type', sa.String(length=20), nullable=False),
+    sa.Column('item_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('views', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('item_type', 'item_id', 'day', name='uq_view_rollups_daily_item_day')
+    )
+    with op.batch_alter_table('view_rollups_daily', schema=None) as batch_op:
+        batch_op.create_index('ix_view_rollups_daily_day', ['day', 'item_type'], unique=False)
+
+    for table in TRENDING_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('trending_score', sa.Float(), nullable=False, server_default='0'))
+            batch_op.create_index(f'ix_{table}_trending_score', ['trending_score'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TRENDING_TABLES):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_trending_score')
+            batch_op.drop_column('trending_score')
+
+    with op.batch_alter_table('view_rollups_daily', schema=None) as batch_op:
+        batch_op.drop_index('ix_view_rollups_daily_day')
+
+    op.drop_table('view_rollups_daily')
+    with op.batch_alter_table('view_rollups_hourly', schema=None) as batch_op:
+        batch_op.drop_index('ix_view_rollups_hourly_hour')
+
+    op.drop_table('view_rollups_hourly')
@@ -0,0 +1,39 @@
+"""chỉ mục chỗ dùng media
+
+Revision ID: f7a3d1e5c2b8
+Revises: e2b6c9d4a8f1
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a3d1e5c2b8'
+down_revision = 'e2b6c9d4a8f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('media_references',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('media_key', sa.String(length=500), nullable=False),
+    sa.Column('owner_type', sa.String(length=30), nullable=False),
+    sa.Column('owner_id', sa.Integer(), nullable=False),
+    sa.Column('field', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('media_references', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_media_references_media_key'), ['media_key'], unique=False)
+        batch_op.create_index('ix_media_references_owner', ['owner_type', 'owner_id'], unique=False)
+    # Dữ liệu cũ: chạy `flask media-gc --dry-run` (dựng lại chỉ mục) sau khi migrate
+
+
+def downgrade():
+    with op.batch_alter_table('media_references', schema=None) as batch_op:
+        batch_op.drop_index('ix_media_references_owner')
+        batch_op.drop_index(batch_op.f('ix_media_references_media_key'))
+
+    op.drop_table('media_references')
@@ -0,0 +1,152 @@
+"""
+Fixture dùng chung cho test
+
+- Mỗi test 1 app mới: primary + replica là 2 file SQLite trong thư mục tạm
+  (cùng schema), upload / khóa / static ghi vào thư mục tạm
+- Worker nền chạy đồng bộ (các cờ *_ASYNC = False) -> kết quả có ngay sau request
+- Test chạy trong app context của app; request của client có context riêng
+- Cache / bộ đệm cấp process được làm mới cho từng test
+"""
+import contextvars
+import os
+import sys
+
+import pytest
+from flask.testing import FlaskClient
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db, page_cache, related, search_index, trending  # noqa: E402
+from app.cache import cache  # noqa: E402
+from app.config import Config  # noqa: E402
+from app.db_routing import REPLICA_BIND_KEY  # noqa: E402
+
+ADMIN_EMAIL = 'admin@example.com'
+ADMIN_PASSWORD = 'mat-khau-test'
+
+
+class IsolatedClient(FlaskClient):
+    """
+    Mỗi request chạy trong app context riêng (session DB riêng) như khi chạy thật,
+    không dùng lại app context của test -> đếm đủ câu SQL, không dính identity map
+    Response streaming được đọc hết ngay trong context đó (buffered)
+    """
+
+    def open(self, *args, **kwargs):
+        kwargs.setdefault('buffered', True)
+        return contextvars.Context().run(super().open, *args, **kwargs)
+
+
+def make_config(tmp_path, replica=True, **overrides):
+    """Class config cho test (tham số overrides: ghi đè key config)"""
+    attrs = {
+        'TESTING': True,
+        'WTF_CSRF_ENABLED': False,
+        'SECRET_KEY': 'test',
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "primary.db"}',
+        'DATABASE_REPLICA_URL': f'sqlite:///{tmp_path / "replica.db"}' if replica else None,
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'TEMPLATE_CACHE_DIR': '',
+        'SINGLEFLIGHT_LOCK_DIR': str(tmp_path / 'locks'),
+        'CACHE_REDIS_URL': None,
+        'GEMINI_API_KEY': None,
+        'CONTACT_NOTIFY_EMAILS': [],
+        'MAIL_SERVER': None,
+        'COUNTERS_RECONCILE_BACKGROUND': False,
+        'RELATED_REFRESH_ASYNC': False,
+        'MEDIA_DELETE_ASYNC': False,
+        'OUTBOX_ASYNC': False,
+        'TRENDING_ASYNC': False,
+    }
+    attrs.update(overrides)
+    return type('TestConfig', (Config,), attrs)
+
+
+@pytest.fixture
+def config_overrides():
+    """Test ghi đè fixture này để đổi config của app"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch, config_overrides):
+    # Trạng thái cấp process không được mang từ test này sang test khác
+    cache.clear()
+    page_cache.pages.clear()
+    monkeypatch.setattr(search_index, '_state', search_index._State())
+    monkeypatch.setattr(trending, '_buffer', trending._Buffer())
+    monkeypatch.setattr(related, '_pending', related._Pending())
+    monkeypatch.setattr(related, '_corpus', related._Corpus())
+
+    app = create_app(make_config(tmp_path, **config_overrides))
+    app.test_client_class = IsolatedClient
+    app.static_folder = str(tmp_path / 'static')
+    os.makedirs(app.static_folder, exist_ok=True)
+
+    with app.app_context():
+        db.create_all(bind_key=None)
+        replica = db.engines.get(REPLICA_BIND_KEY)
+        if replica is not None:
+            db.metadata.create_all(replica)
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def copy_to_replica():
+    """Sao chép toàn bộ dữ liệu primary sang replica (giả lập replica đã bắt kịp)"""
+    replica = db.engines.get(REPLICA_BIND_KEY)
+    if replica is None:
+        return
+    with db.engine.connect() as source, replica.begin() as target:
+        for table in reversed(db.metadata.sorted_tables):
+            target.execute(table.delete())
+        for table in db.metadata.sorted_tables:
+            rows = [dict(row._mapping) for row in source.execute(table.select())]
+            if rows:
+                target.execute(table.insert(), rows)
+
+
+@pytest.fixture
+def seed(app):
+    """Quyền mặc định, 1 admin, 1 danh mục và vài sản phẩm / bài viết / dự án / tin tuyển dụng / media / liên hệ"""
+    from app.models import User, Category, Product, Blog, Project, Job, Media, Contact
+    from app.models_rbac import init_default_roles, init_default_permissions, assign_default_permissions
+
+    init_default_roles()
+    init_default_permissions()
+    assign_default_permissions()
+
+    user = User(username='admin', email=ADMIN_EMAIL)
+    user.set_password(ADMIN_PASSWORD)
+    user.assign_role('admin')
+    db.session.add(user)
+
+    category = Category(name='Sơn nước', slug='son-nuoc')
+    db.session.add(category)
+    db.session.flush()
+    for i in range(5):
+        db.session.add(Product(name=f'Sơn {i}', slug=f'son-{i}', category_id=category.id, price=100 * i,
+                               description='Sơn chống thấm tốt'))
+        db.session.add(Blog(title=f'Bài {i}', slug=f'bai-{i}', content='<p>Nội dung sơn</p>'))
+        db.session.add(Project(title=f'Dự án {i}', slug=f'du-an-{i}', project_type='Nhà ở', year=2020 + i,
+                               location='TP.HCM', description='Thi công sơn chống thấm'))
+        db.session.add(Job(title=f'Job {i}', slug=f'job-{i}', department='Sales', location='HCM'))
+        db.session.add(Media(filename=f'f{i}.jpg', filepath=f'/static/uploads/f{i}.jpg', album='A', file_size=1000))
+        db.session.add(Contact(name='Khách', email='khach@example.com', message='Báo giá'))
+    db.session.commit()
+    copy_to_replica()
+    return {'category': category, 'admin': user}
+
+
+@pytest.fixture
+def admin_client(client, seed):
+    response = client.post('/admin/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    assert response.status_code in (302, 303)
+    return client
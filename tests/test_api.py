@@ -0,0 +1,101 @@
+"""Catalog JSON API (app/api): ETag / cache trang theo version, delta sync, dọn tombstone"""
+import time
+from datetime import datetime, timedelta
+
+from app import db
+from app.api.catalog import purge_tombstones
+from app.models import CatalogTombstone, Category, Product
+
+from conftest import copy_to_replica
+
+
+def products_by_slug(response):
+    return {item['slug']: item for item in response.get_json()['data']}
+
+
+def rename_category(slug, new_slug):
+    time.sleep(0.01)  # updated_at phải lớn hơn lần ghi trước
+    Category.query.filter_by(slug=slug).one().slug = new_slug
+    db.session.commit()
+    copy_to_replica()
+
+
+def test_products_etag_follows_category_slug(client, seed):
+    first = client.get('/api/v1/products')
+    assert products_by_slug(first)['son-1']['category'] == 'son-nuoc'
+    etag = first.headers['ETag']
+    assert client.get('/api/v1/products', headers={'If-None-Match': etag}).status_code == 304
+
+    rename_category('son-nuoc', 'son-nuoc-cao-cap')
+
+    # Sản phẩm không đổi nhưng field category đổi -> không được trả 304 / trang cache cũ
+    second = client.get('/api/v1/products', headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    assert products_by_slug(second)['son-1']['category'] == 'son-nuoc-cao-cap'
+
+
+def test_delta_sync_includes_products_of_changed_category(client, seed):
+    since = (datetime.utcnow() + timedelta(seconds=1)).isoformat() + 'Z'
+    time.sleep(1.1)
+    assert client.get(f'/api/v1/products?since={since}').get_json()['data'] == []
+
+    rename_category('son-nuoc', 'son-goc-nuoc')
+
+    synced = products_by_slug(client.get(f'/api/v1/products?since={since}'))
+    assert set(synced) == {f'son-{i}' for i in range(5)}
+    assert {item['category'] for item in synced.values()} == {'son-goc-nuoc'}
+
+
+def test_products_etag_follows_product_change(client, seed):
+    etag = client.get('/api/v1/products').headers['ETag']
+    time.sleep(0.01)
+    Product.query.filter_by(slug='son-2').one().price = 999
+    db.session.commit()
+    copy_to_replica()
+
+    response = client.get('/api/v1/products', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert products_by_slug(response)['son-2']['price'] == 999
+
+
+def test_deleted_product_in_delta_sync_until_purged(app, client, seed):
+    since = (datetime.utcnow() - timedelta(seconds=1)).isoformat() + 'Z'
+    db.session.delete(Product.query.filter_by(slug='son-3').one())
+    db.session.commit()
+    copy_to_replica()
+    assert [item['slug'] for item in client.get(f'/api/v1/products?since={since}').get_json()['deleted']] == ['son-3']
+
+    # Trong thời hạn đồng bộ: tombstone được giữ
+    assert purge_tombstones() == 0
+    assert CatalogTombstone.query.count() == 1
+
+    # Quá API_SYNC_HORIZON_DAYS + API_SYNC_OVERLAP -> bị xóa; tombstone mới hơn vẫn giữ
+    horizon = timedelta(days=app.config['API_SYNC_HORIZON_DAYS'], seconds=app.config['API_SYNC_OVERLAP'])
+    CatalogTombstone.query.update({'deleted_at': datetime.utcnow() - horizon - timedelta(minutes=1)})
+    db.session.delete(Product.query.filter_by(slug='son-4').one())
+    db.session.commit()
+    assert purge_tombstones() == 1
+    assert [tombstone.slug for tombstone in CatalogTombstone.query] == ['son-4']
+
+
+def test_since_older_than_horizon_requires_full_sync(app, client, seed):
+    too_old = datetime.utcnow() - timedelta(days=app.config['API_SYNC_HORIZON_DAYS'], minutes=1)
+    response = client.get(f'/api/v1/products?since={too_old.isoformat()}Z')
+    assert response.status_code == 410
+    assert 'error' in response.get_json()
+
+    recent = datetime.utcnow() - timedelta(days=app.config['API_SYNC_HORIZON_DAYS'] - 1)
+    assert client.get(f'/api/v1/products?since={recent.isoformat()}Z').status_code == 200
+
+
+def test_purge_command(app, seed):
+    db.session.delete(Product.query.filter_by(slug='son-3').one())
+    db.session.commit()
+    CatalogTombstone.query.update({'deleted_at': datetime(2000, 1, 1)})
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['api-purge-tombstones'])
+    assert result.exit_code == 0, result.output
+    assert 'Đã dọn 1' in result.output
+    assert CatalogTombstone.query.count() == 0
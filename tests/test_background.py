@@ -0,0 +1,38 @@
+"""Đánh thức worker nền khi process khởi động (app/background.py)"""
+import pytest
+
+from app.background import WARMUP_ENVIRON_KEY
+from app.media_cleanup import worker as media_worker
+from app.outbox import dispatcher
+
+
+@pytest.fixture
+def woken(monkeypatch):
+    calls = []
+    for worker in (dispatcher, media_worker):
+        monkeypatch.setattr(worker, '_started_pid', None)
+        monkeypatch.setattr(worker, 'wake', lambda app=None, name=worker.name: calls.append(name))
+    return calls
+
+
+@pytest.mark.parametrize('config_overrides', [{'OUTBOX_ASYNC': True, 'MEDIA_DELETE_ASYNC': True}])
+def test_first_request_wakes_workers_once(client, woken):
+    client.get('/gioi-thieu')
+    assert sorted(woken) == ['media-cleanup', 'outbox']
+
+    client.get('/gioi-thieu')
+    assert len(woken) == 2
+
+
+@pytest.mark.parametrize('config_overrides', [{'OUTBOX_ASYNC': True, 'MEDIA_DELETE_ASYNC': True}])
+def test_warmup_request_does_not_wake_workers(client, woken):
+    client.get('/gioi-thieu', environ_base={WARMUP_ENVIRON_KEY: True})
+    assert woken == []
+
+    client.get('/gioi-thieu')
+    assert sorted(woken) == ['media-cleanup', 'outbox']
+
+
+def test_sync_mode_does_not_wake_workers(client, woken):
+    client.get('/gioi-thieu')
+    assert woken == []
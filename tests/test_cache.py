@@ -0,0 +1,117 @@
+"""Single-flight của get_or_set (app/cache.py, app/singleflight.py)"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from app import singleflight
+from app.cache import LocalCache, get_or_set
+from app.singleflight import single_flight
+
+
+def run_threads(app, count, target):
+    errors = []
+
+    def run(index):
+        with app.app_context():
+            try:
+                target(index)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert errors == []
+
+
+@pytest.fixture
+def no_process_lock(monkeypatch):
+    """Cache của process không được dùng khóa file / advisory"""
+    def fail(*args, **kwargs):
+        raise AssertionError('Không được khóa giữa các process cho LocalCache')
+    monkeypatch.setattr(singleflight, '_file_lock', fail)
+    monkeypatch.setattr(singleflight, '_advisory_lock', fail)
+
+
+def test_local_cache_computes_once_per_key(app, no_process_lock):
+    backend = LocalCache()
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'giá trị'
+
+    run_threads(app, 8, lambda index: results.append(get_or_set('test', 'key', compute, ttl=60, backend=backend)))
+    assert len(calls) == 1
+    assert results == ['giá trị'] * 8
+
+
+def test_local_cache_different_keys_do_not_wait_for_each_other(app, no_process_lock):
+    # Hai key phải tính đồng thời được: khóa theo key, không theo bucket
+    barrier = threading.Barrier(2, timeout=2)
+
+    def compute():
+        barrier.wait()
+        return True
+
+    run_threads(app, 2, lambda index: get_or_set('test', f'key-{index}', compute, ttl=60, backend=LocalCache()))
+
+
+def test_stale_value_served_while_one_caller_recomputes(app, no_process_lock):
+    backend = LocalCache()
+    get_or_set('test', 'key', lambda: 'cũ', ttl=60, stale_ttl=60, backend=backend)
+    backend.invalidate('test')
+
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def slow_compute():
+        started.set()
+        release.wait(timeout=5)
+        return 'mới'
+
+    def recompute():
+        with app.app_context():
+            results.append(get_or_set('test', 'key', slow_compute, ttl=60, stale_ttl=60, backend=backend))
+
+    thread = threading.Thread(target=recompute)
+    thread.start()
+    assert started.wait(timeout=5)
+    assert get_or_set('test', 'key', slow_compute, ttl=60, stale_ttl=60, backend=backend) == 'cũ'
+    release.set()
+    thread.join(timeout=5)
+    assert results == ['mới']
+
+
+class SharedCache(LocalCache):
+    """Backend dùng chung (như RedisCache): có khóa riêng giữa các process"""
+
+    def __init__(self):
+        super().__init__()
+        self.locked = []
+
+    @contextmanager
+    def lock(self, name, blocking, deadline):
+        self.locked.append(name)
+        yield True
+
+
+def test_shared_backend_uses_its_own_lock(app, no_process_lock):
+    backend = SharedCache()
+    assert get_or_set('test', 'key', lambda: 1, ttl=60, backend=backend) == 1
+    assert backend.locked == ["test:'key'"]
+
+
+def test_single_flight_default_uses_process_lock(app):
+    # sitemap.xml: kết quả ghi ra đĩa, dùng chung -> khóa file giữa các worker
+    app.config['SINGLEFLIGHT_LOCK'] = 'file'
+    with single_flight('sitemap.xml') as acquired:
+        assert acquired
+        assert os.listdir(app.config['SINGLEFLIGHT_LOCK_DIR'])
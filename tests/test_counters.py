@@ -0,0 +1,117 @@
+"""Bộ đếm thống kê (app/counters.py): delta sau mỗi flush khớp với số đếm lại, reconcile không làm mất delta"""
+import threading
+
+from app import counters, db
+from app.counters import compute_counters, get_counters, reconcile_counters
+from app.models import Category, Contact, Product, StatCounter
+
+
+def assert_counters_match():
+    totals = compute_counters()
+    stored = get_counters(*totals)
+    assert {key: value for key, value in stored.items() if value or totals[key]} == \
+           {key: value for key, value in totals.items() if value or stored[key]}
+
+
+def load_product(slug):
+    """Nạp lại sản phẩm như 1 request sửa (sau commit object đã expire)"""
+    product = Product.query.filter_by(slug=slug).one()
+    db.session.refresh(product)
+    return product
+
+
+def test_insert_update_delete_deltas(app, seed):
+    category = Category(name='Sơn dầu', slug='son-dau')
+    db.session.add(category)
+    db.session.flush()
+    db.session.add(Product(name='Sơn dầu 1', slug='son-dau-1', category_id=category.id))
+    db.session.commit()
+    new_key, old_key = f'category_active_products:{category.id}', f'category_active_products:{seed["category"].id}'
+    assert get_counters(new_key, old_key, 'products') == {new_key: 1, old_key: 5, 'products': 6}
+    assert_counters_match()
+
+    # Ẩn sản phẩm -> bớt khỏi số active của danh mục, tổng không đổi
+    load_product('son-dau-1').is_active = False
+    db.session.commit()
+    assert get_counters(new_key, 'products') == {new_key: 0, 'products': 6}
+    assert_counters_match()
+
+    # Hiện lại + chuyển danh mục
+    product = load_product('son-dau-1')
+    product.is_active = True
+    product.category_id = seed['category'].id
+    db.session.commit()
+    assert get_counters(new_key, old_key) == {new_key: 0, old_key: 6}
+    assert_counters_match()
+
+    db.session.delete(load_product('son-dau-1'))
+    db.session.commit()
+    assert get_counters(old_key, 'products') == {old_key: 5, 'products': 5}
+    assert_counters_match()
+
+
+def test_unknown_old_value_marks_stale_until_reconcile(app, seed):
+    # Gán cột của object đã expire: không biết giá trị cũ -> không đoán delta, đánh dấu cần reconcile
+    product = Product.query.filter_by(slug='son-1').one()
+    db.session.expire(product)
+    product.is_active = False
+    db.session.commit()
+    assert get_counters(counters.RECONCILED_AT_KEY)[counters.RECONCILED_AT_KEY] == 0
+
+    reconcile_counters()
+    key = f'category_active_products:{seed["category"].id}'
+    assert get_counters(key)[key] == 4
+
+
+def test_contact_read_toggle(app, seed):
+    contact = Contact.query.first()
+    assert get_counters('contacts_unread')['contacts_unread'] == 5
+    contact.is_read = True
+    db.session.commit()
+    assert get_counters('contacts_unread')['contacts_unread'] == 4
+    assert_counters_match()
+
+
+def test_reconcile_fixes_drift(app, seed):
+    StatCounter.query.filter_by(key='products').update({'value': 42})
+    db.session.commit()
+    totals = reconcile_counters()
+    assert totals['products'] == 5
+    assert get_counters('products')['products'] == 5
+
+
+def test_concurrent_write_during_reconcile_is_not_lost(app, seed, monkeypatch):
+    counting, written = threading.Event(), threading.Event()
+    original = counters.compute_counters
+
+    def slow_compute():
+        totals = original()
+        counting.set()
+        written.wait(timeout=1)  # Writer không commit được trong lúc reconcile giữ khóa
+        return totals
+
+    monkeypatch.setattr(counters, 'compute_counters', slow_compute)
+    category_id = seed['category'].id
+    errors = []
+
+    def writer():
+        with app.app_context():
+            try:
+                counting.wait(timeout=5)
+                db.session.add(Product(name='Sơn mới', slug='son-moi', category_id=category_id))
+                db.session.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                written.set()
+                db.session.remove()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    reconcile_counters()
+    thread.join(timeout=10)
+
+    assert errors == []
+    db.session.expire_all()
+    assert Product.query.count() == 6
+    assert get_counters('products')['products'] == 6
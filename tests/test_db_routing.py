@@ -0,0 +1,186 @@
+"""Định tuyến primary / replica (app/db_routing.py) trên 2 file SQLite"""
+import time
+from contextlib import contextmanager
+
+import pytest
+from flask import g
+from sqlalchemy import event, select, update
+
+from app import db, db_routing
+from app.db_routing import PRIMARY_UNTIL_KEY, REPLICA_BIND_KEY, use_primary
+from app.models import Product
+
+
+@contextmanager
+def record_binds():
+    """Ghi lại (bind, câu SQL) của mọi câu lệnh chạy trên primary / replica"""
+    executed = []
+    listeners = []
+    for name, engine in (('primary', db.engine), ('replica', db.engines[REPLICA_BIND_KEY])):
+        def listener(conn, cursor, statement, parameters, context, executemany, name=name):
+            executed.append((name, statement))
+        event.listen(engine, 'before_cursor_execute', listener)
+        listeners.append((engine, listener))
+    try:
+        yield executed
+    finally:
+        for engine, listener in listeners:
+            event.remove(engine, 'before_cursor_execute', listener)
+
+
+def binds_for(executed, table):
+    return {name for name, statement in executed if f'FROM {table}' in statement and statement.startswith('SELECT')}
+
+
+# Không cache read-model: trang chi tiết đọc thẳng DB theo định tuyến của request
+NO_ENTITY_CACHE = {'ENTITY_CACHE': False}
+
+
+@pytest.fixture
+def diverged(seed):
+    """Replica chậm: tên sản phẩm son-1 chỉ mới đổi trên primary"""
+    db.session.execute(update(Product).where(Product.slug == 'son-1').values(name='Sơn mới trên primary'))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('config_overrides', [NO_ENTITY_CACHE])
+def test_public_get_reads_replica(client, diverged):
+    with record_binds() as executed:
+        response = client.get('/san-pham/son-1')
+
+    assert response.status_code == 200
+    assert binds_for(executed, 'products') == {'replica'}
+    assert 'Sơn mới trên primary' not in response.get_data(as_text=True)
+
+
+def test_admin_page_outside_replica_endpoints_reads_primary(admin_client, diverged):
+    with record_binds() as executed:
+        response = admin_client.get('/admin/products')
+
+    assert response.status_code == 200
+    assert binds_for(executed, 'products') == {'primary'}
+    assert 'Sơn mới trên primary' in response.get_data(as_text=True)
+
+
+def test_post_reads_primary(app, seed):
+    with app.test_request_context('/lien-he', method='POST'):
+        app.preprocess_request()
+        assert g.db_read_only is False
+        with record_binds() as executed:
+            db.session.execute(select(Product.id)).all()
+    assert binds_for(executed, 'products') == {'primary'}
+
+
+def test_write_pins_session_to_primary(app, seed):
+    with app.test_request_context('/san-pham'):
+        app.preprocess_request()
+        assert g.db_read_only is True
+        with record_binds() as executed:
+            db.session.execute(select(Product.id)).all()
+            db.session.execute(update(Product).where(Product.slug == 'son-2').values(views=5))
+            db.session.execute(select(Product.id)).all()
+        assert [name for name, statement in executed if 'products' in statement] == ['replica', 'primary', 'primary']
+        assert db.session.info.get(db_routing.PIN_PRIMARY_KEY) is True
+        assert g.db_wrote is True
+
+        # Hết transaction -> lại đọc replica
+        db.session.commit()
+        with record_binds() as executed:
+            db.session.execute(select(Product.id)).all()
+        assert binds_for(executed, 'products') == {'replica'}
+
+
+def test_flush_pins_session_to_primary(app, seed):
+    with app.test_request_context('/san-pham'):
+        app.preprocess_request()
+        product = db.session.execute(select(Product).where(Product.slug == 'son-3')).scalar_one()
+        product.name = 'Sơn 3 đổi tên'
+        with record_binds() as executed:
+            db.session.flush()
+            db.session.execute(select(Product.id)).all()
+        assert binds_for(executed, 'products') == {'primary'}
+        db.session.rollback()
+
+
+def test_select_for_update_uses_primary(app, seed):
+    with app.test_request_context('/san-pham'):
+        app.preprocess_request()
+        with record_binds() as executed:
+            db.session.execute(select(Product.id).with_for_update()).all()
+        assert binds_for(executed, 'products') == {'primary'}
+
+
+def test_use_primary(app, seed):
+    with app.test_request_context('/san-pham'):
+        app.preprocess_request()
+        with record_binds() as executed:
+            with use_primary():
+                db.session.execute(select(Product.id)).all()
+                assert g.db_read_only is False
+            db.session.execute(select(Product.id)).all()
+        assert [name for name, statement in executed if 'products' in statement] == ['primary', 'replica']
+        assert g.db_read_only is True
+
+
+def test_no_request_context_uses_primary(app, seed):
+    with record_binds() as executed:
+        db.session.execute(select(Product.id)).all()
+    assert binds_for(executed, 'products') == {'primary'}
+
+
+@pytest.mark.parametrize('config_overrides', [NO_ENTITY_CACHE])
+def test_read_your_writes_window(app, client, seed, monkeypatch):
+    response = client.post('/lien-he', data={'name': 'Khách mới', 'email': 'moi@example.com', 'message': 'Cần báo giá'})
+    assert response.status_code == 302
+    with client.session_transaction() as session:
+        until = session[PRIMARY_UNTIL_KEY]
+    assert until == pytest.approx(time.time() + app.config['DB_READ_YOUR_WRITES_SECONDS'], abs=5)
+
+    # Trong cửa sổ: vẫn đọc primary dù là GET của main_bp
+    with record_binds() as executed:
+        assert client.get('/san-pham/son-1').status_code == 200
+    assert binds_for(executed, 'products') == {'primary'}
+
+    # Hết cửa sổ -> quay lại replica
+    monkeypatch.setattr(db_routing.time, 'time', lambda: until + 1)
+    with record_binds() as executed:
+        assert client.get('/san-pham/son-1').status_code == 200
+    assert binds_for(executed, 'products') == {'replica'}
+
+
+def test_get_does_not_open_read_your_writes_window(client, seed):
+    client.get('/san-pham/son-1')  # Ghi lượt xem nhưng là GET
+    with client.session_transaction() as session:
+        assert PRIMARY_UNTIL_KEY not in session
+
+
+@pytest.mark.parametrize('config_overrides', [{'replica': False}])
+def test_without_replica_everything_uses_primary(app, client, seed):
+    assert REPLICA_BIND_KEY not in db.engines
+    response = client.get('/san-pham/son-1')
+    assert response.status_code == 200
+
+
+def test_cache_fill_reads_primary(client, diverged):
+    # Read-model được lưu cache -> tính trên primary dù request đang đọc replica
+    with record_binds() as executed:
+        response = client.get('/san-pham/son-1')
+    assert 'Sơn mới trên primary' in response.get_data(as_text=True)
+    assert 'replica' not in {name for name, statement in executed if 'FROM products' in statement
+                             and 'products.slug = ' in statement}
+
+
+def test_cache_refilled_from_primary_after_edit(client, seed):
+    # Nạp cache trang danh sách + read-model + facet
+    assert 'Sơn 2 bản mới' not in client.get('/san-pham').get_data(as_text=True)
+    assert 'Sơn 2 bản mới' not in client.get('/san-pham/son-2').get_data(as_text=True)
+
+    # Sửa trên primary, replica chưa bắt kịp (không copy_to_replica)
+    product = Product.query.filter_by(slug='son-2').one()
+    product.name = 'Sơn 2 bản mới'
+    db.session.commit()
+
+    # Bus xóa key lúc commit -> lần đọc sau nạp lại từ primary, không giữ bản cũ của replica tới hết TTL
+    assert 'Sơn 2 bản mới' in client.get('/san-pham').get_data(as_text=True)
+    assert 'Sơn 2 bản mới' in client.get('/san-pham/son-2').get_data(as_text=True)
+    assert 'Sơn 2 bản mới' in client.get('/api/v1/products/son-2').get_data(as_text=True)
@@ -0,0 +1,57 @@
+"""Xuất dữ liệu (app/exporter.py): chuỗi dạng công thức không được chạy khi mở bằng Excel"""
+import csv
+import io
+import json
+
+from openpyxl import load_workbook
+
+from app import db
+from app.models import Contact
+
+PAYLOADS = ['=HYPERLINK("http://x","y")', '+1+1', '-2+3', '@SUM(A1)', '\tA', '\rB']
+
+
+def add_contacts():
+    for payload in PAYLOADS:
+        db.session.add(Contact(name=payload, email='khach@example.com', message='Bình thường', subject=payload))
+    db.session.commit()
+
+
+def exported_names(response, fmt):
+    data = response.get_data()
+    if fmt == 'csv':
+        rows = list(csv.DictReader(io.StringIO(data.decode('utf-8-sig'))))
+        return {row['name'] for row in rows}, rows
+    sheet = load_workbook(io.BytesIO(data)).active
+    rows = list(sheet.iter_rows(values_only=True))
+    header = rows[0]
+    rows = [dict(zip(header, row)) for row in rows[1:]]
+    return {row['name'] for row in rows}, rows
+
+
+def test_csv_neutralizes_formulas(admin_client):
+    add_contacts()
+    names, rows = exported_names(admin_client.get('/admin/contacts/export?format=csv'), 'csv')
+    assert {"'" + payload for payload in PAYLOADS} <= names
+    assert 'Khách' in names
+    assert {row['message'] for row in rows} == {'Báo giá', 'Bình thường'}
+
+
+def test_xlsx_neutralizes_formulas(admin_client):
+    add_contacts()
+    response = admin_client.get('/admin/contacts/export?format=xlsx')
+    workbook = load_workbook(io.BytesIO(response.get_data()))
+    assert all(cell.data_type != 'f' for row in workbook.active.iter_rows() for cell in row)
+
+    names, rows = exported_names(response, 'xlsx')
+    # XML lưu \r thành \n
+    expected = {"'" + payload.replace('\r', '\n') for payload in PAYLOADS}
+    assert names - {'Khách'} == expected
+    assert all(isinstance(row['id'], int) for row in rows)  # Số vẫn là số
+
+
+def test_jsonl_keeps_original_values(admin_client):
+    add_contacts()
+    response = admin_client.get('/admin/contacts/export?format=jsonl')
+    names = {json.loads(line)['name'] for line in response.get_data(as_text=True).splitlines()}
+    assert set(PAYLOADS) <= names
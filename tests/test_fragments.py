@@ -0,0 +1,99 @@
+"""Cache fragment {% cache %} (app/fragments.py): version theo settings / danh mục, vary theo trang đang active"""
+import contextvars
+import re
+import time
+
+import pytest
+
+from app import db
+from app.models import Category, save_settings
+
+from conftest import copy_to_replica
+
+
+def fragment_renderer(app, source):
+    """
+    Hàm render template {% cache %} trong 1 request mới (app context riêng như IsolatedClient)
+    Trả (html, số lần thân fragment đã chạy)
+    """
+    template = app.jinja_env.from_string(source)
+    calls = []
+
+    def render():
+        calls.append(1)
+        return f'lần {len(calls)}'
+
+    def render_in_request(path):
+        with app.test_request_context(path):
+            return template.render(render=render), len(calls)
+
+    return lambda path='/': contextvars.Context().run(render_in_request, path)
+
+
+def test_fragment_invalidated_when_settings_change(app):
+    run = fragment_renderer(app, "{% cache 'test', 'settings' %}{{ render() }}{% endcache %}")
+    assert run() == ('lần 1', 1)
+    assert run() == ('lần 1', 1)
+
+    save_settings({'hotline': ('0900', 'general', '')})
+    assert run() == ('lần 2', 2)
+    assert run() == ('lần 2', 2)
+
+    # Lưu lại giá trị cũ -> không ghi, version không đổi -> fragment vẫn dùng được
+    save_settings({'hotline': ('0900', 'general', '')})
+    assert run() == ('lần 2', 2)
+
+
+def test_fragment_invalidated_when_category_changes(app, seed):
+    run = fragment_renderer(app, "{% cache 'test', 'categories' %}{{ render() }}{% endcache %}")
+    assert run() == ('lần 1', 1)
+    assert run() == ('lần 1', 1)
+
+    db.session.add(Category(name='Sơn dầu', slug='son-dau'))
+    db.session.commit()
+    assert run() == ('lần 2', 2)
+
+    # Sửa danh mục (updated_at đổi, số lượng không đổi)
+    time.sleep(0.01)
+    Category.query.filter_by(slug='son-dau').one().name = 'Sơn dầu cao cấp'
+    db.session.commit()
+    assert run() == ('lần 3', 3)
+
+    # Xóa -> danh mục trở lại đúng trạng thái ban đầu -> dùng lại fragment lần 1 (cùng dữ liệu)
+    db.session.delete(Category.query.filter_by(slug='son-dau').one())
+    db.session.commit()
+    assert run() == ('lần 1', 3)
+
+
+def test_vary_is_part_of_the_key(app):
+    run = fragment_renderer(app, "{% cache 'test', 'settings', vary=request.path %}{{ render() }}{% endcache %}")
+    assert run('/a') == ('lần 1', 1)
+    assert run('/b') == ('lần 2', 2)
+    assert run('/a') == ('lần 1', 2)
+
+
+def test_unknown_source_is_an_error(app):
+    run = fragment_renderer(app, "{% cache 'test', 'khong-co' %}{{ render() }}{% endcache %}")
+    with pytest.raises(ValueError):
+        run()
+
+
+def active_nav(response):
+    return re.findall(r'class="nav-link active fw-bold"\s+href="([^"]+)"', response.get_data(as_text=True))
+
+
+def test_cached_header_keeps_active_nav(client, seed):
+    # Header được cache theo vary=request.endpoint: mỗi trang vẫn đánh dấu đúng mục đang xem
+    for _ in range(2):
+        assert active_nav(client.get('/')) == ['/']
+        assert active_nav(client.get('/san-pham')) == ['/san-pham']
+        assert active_nav(client.get('/gioi-thieu')) == []
+        assert active_nav(client.get('/tuyen-dung')) == ['/tuyen-dung']
+
+
+def test_cached_header_follows_settings(client, seed):
+    header_hotline = 'Hotline: <strong>0909.000.000</strong>'
+    assert header_hotline not in client.get('/tuyen-dung').get_data(as_text=True)
+    save_settings({'hotline': ('0909.000.000', 'contact', '')})
+    copy_to_replica()
+    assert header_hotline in client.get('/tuyen-dung').get_data(as_text=True)
@@ -0,0 +1,123 @@
+"""Gallery sản phẩm / dự án: form admin ghi bảng gallery, chỉ mục media_refs, migration b8d2f4a6c1e3"""
+import importlib.util
+import json
+import os
+
+import sqlalchemy as sa
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+
+from app import db
+from app.media_refs import GALLERY_FIELD, media_key
+from app.models import MediaReference, Media, Product, ProductImage, Project
+
+MIGRATION = os.path.join(os.path.dirname(__file__), '..', 'migrations', 'versions', 'b8d2f4a6c1e3_gallery_images.py')
+
+
+def product_form(product, gallery):
+    return {'name': product.name, 'slug': product.slug, 'price': product.price,
+            'category_id': product.category_id, 'is_active': 'y', 'gallery': gallery}
+
+
+def gallery_refs(owner_type, owner_id):
+    return {ref.media_key for ref in MediaReference.query.filter_by(owner_type=owner_type, owner_id=owner_id,
+                                                                    field=GALLERY_FIELD)}
+
+
+def test_admin_gallery_saved_and_indexed(admin_client):
+    product = Product.query.filter_by(slug='son-1').one()
+    response = admin_client.post(f'/admin/products/edit/{product.id}',
+                                 data=product_form(product, '/static/uploads/f1.jpg\n\n/static/uploads/ngoai.jpg\n'))
+    assert response.status_code in (302, 303)
+
+    db.session.expire_all()
+    images = Product.query.filter_by(slug='son-1').one().gallery_images
+    f1 = Media.query.filter_by(filename='f1.jpg').one()
+    assert [(image.url, image.media_id, image.position) for image in images] == [
+        ('/static/uploads/f1.jpg', f1.id, 0), ('/static/uploads/ngoai.jpg', None, 1)]
+    assert gallery_refs('product', product.id) == {media_key('/static/uploads/f1.jpg'),
+                                                   media_key('/static/uploads/ngoai.jpg')}
+
+    # Form sửa hiện gallery hiện tại, mỗi dòng 1 URL
+    assert '/static/uploads/f1.jpg\n/static/uploads/ngoai.jpg' in \
+        admin_client.get(f'/admin/products/edit/{product.id}').get_data(as_text=True)
+
+    # Gỡ 1 ảnh -> dòng gallery và chỗ dùng media của ảnh đó bị xóa
+    admin_client.post(f'/admin/products/edit/{product.id}', data=product_form(product, '/static/uploads/ngoai.jpg'))
+    db.session.expire_all()
+    assert gallery_refs('product', product.id) == {media_key('/static/uploads/ngoai.jpg')}
+    assert ProductImage.query.filter_by(product_id=product.id).count() == 1
+
+
+def test_unchanged_gallery_keeps_alt_overrides(admin_client):
+    product = Product.query.filter_by(slug='son-2').one()
+    product.set_gallery_images([{'url': '/static/uploads/f2.jpg', 'alt_text': 'Ảnh riêng'}])
+    db.session.commit()
+
+    admin_client.post(f'/admin/products/edit/{product.id}', data=product_form(product, '/static/uploads/f2.jpg'))
+    db.session.expire_all()
+    assert [image.alt_text for image in Product.query.filter_by(slug='son-2').one().gallery_images] == ['Ảnh riêng']
+
+
+def test_project_gallery_indexed(seed):
+    project = Project.query.filter_by(slug='du-an-1').one()
+    project.set_gallery_images(['/static/uploads/f3.jpg'])
+    db.session.commit()
+    assert gallery_refs('project', project.id) == {media_key('/static/uploads/f3.jpg')}
+
+    db.session.delete(project)
+    db.session.commit()
+    assert gallery_refs('project', project.id) == set()
+
+
+def load_migration():
+    spec = importlib.util.spec_from_file_location('gallery_migration', MIGRATION)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_migration(step):
+    with db.engine.begin() as connection:
+        with Operations.context(MigrationContext.configure(connection)):
+            step()
+
+
+def test_migration_round_trip(seed):
+    migration = load_migration()
+    product = Product.query.filter_by(slug='son-1').one()
+    product.set_gallery_images(['/static/uploads/f1.jpg', '/static/uploads/ngoai.jpg'])
+    db.session.commit()
+    product_id, f4_id = product.id, Media.query.filter_by(filename='f4.jpg').one().id
+    project_id = Project.query.filter_by(slug='du-an-1').one().id
+    db.session.remove()
+
+    # Downgrade: gallery về lại cột JSON, bảng gallery bị xóa
+    run_migration(migration.downgrade)
+    inspector = sa.inspect(db.engine)
+    assert 'product_images' not in inspector.get_table_names()
+    with db.engine.begin() as connection:
+        assert json.loads(connection.scalar(sa.text('SELECT images FROM products WHERE id = :id'),
+                                            {'id': product_id})) == ['/static/uploads/f1.jpg', '/static/uploads/ngoai.jpg']
+        # Dữ liệu cũ dạng dict {src, alt} / JSON hỏng
+        connection.execute(sa.text('UPDATE projects SET gallery = :value WHERE id = :id'),
+                           {'value': json.dumps([{'src': '/static/uploads/f4.jpg', 'alt': 'Mặt tiền'}, 42]),
+                            'id': project_id})
+        connection.execute(sa.text("UPDATE products SET images = 'không phải JSON' WHERE id != :id"),
+                           {'id': product_id})
+
+    # Upgrade: JSON chép sang bảng gallery (media_id theo filepath), cột JSON bị xóa
+    run_migration(migration.upgrade)
+    inspector = sa.inspect(db.engine)
+    assert 'images' not in {column['name'] for column in inspector.get_columns('products')}
+    assert 'gallery' not in {column['name'] for column in inspector.get_columns('projects')}
+    with db.engine.connect() as connection:
+        assert connection.execute(sa.text(
+            'SELECT product_id, url, position FROM product_images ORDER BY position')).fetchall() == [
+            (product_id, '/static/uploads/f1.jpg', 0), (product_id, '/static/uploads/ngoai.jpg', 1)]
+        assert connection.execute(sa.text(
+            'SELECT project_id, media_id, url, position, alt_text FROM project_images')).fetchall() == [
+            (project_id, f4_id, '/static/uploads/f4.jpg', 0, 'Mặt tiền')]
+
+    assert [image.url for image in db.session.get(Product, product_id).gallery_images] == \
+        ['/static/uploads/f1.jpg', '/static/uploads/ngoai.jpg']
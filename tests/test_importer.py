@@ -0,0 +1,82 @@
+"""Import sản phẩm (app/importer.py): ghi bulk vẫn xóa cache, cập nhật index gợi ý / liên quan / bộ đếm"""
+import io
+
+import pytest
+
+from app import db, importer
+from app.counters import get_counters
+from app.importer import import_products, unique_slug
+from app.models import Product, RelatedItem
+
+from conftest import copy_to_replica
+
+
+def run_import(rows, mode='insert', **kwargs):
+    lines = ['name,slug,price,category_slug'] + [','.join(row) for row in rows]
+    report = import_products(io.BytesIO('\n'.join(lines).encode()), 'csv', mode=mode, **kwargs)
+    copy_to_replica()
+    return report
+
+
+def test_insert_renames_duplicate_slugs(app, seed):
+    report = run_import([('Sơn 1', 'son-1', '10', 'son-nuoc'),
+                         ('Sơn mới', 'son-moi', '20', 'son-nuoc'),
+                         ('Sơn mới', 'son-moi', '30', 'son-nuoc'),
+                         ('Sai', 'sai', '1', 'khong-co')])
+    assert (report['created'], report['updated'], report['failed']) == (3, 0, 1)
+    assert {'son-1-2', 'son-moi', 'son-moi-2'} <= {slug for (slug,) in db.session.query(Product.slug)}
+    assert get_counters('products')['products'] == 8
+
+
+def test_unique_slug():
+    assert unique_slug('son', {'son', 'son-2'}) == 'son-3'
+    assert unique_slug('', set()) == 'san-pham'
+
+
+def test_import_invalidates_caches(app, client, seed):
+    # Nạp cache: trang danh sách, read-model, index gợi ý
+    assert 'Sơn chống rêu' not in client.get('/san-pham').get_data(as_text=True)
+    assert 'Sơn 1 cũ' not in client.get('/san-pham/son-1').get_data(as_text=True)
+    assert client.get('/tim-kiem/goi-y?q=chong reu').get_json()['items'] == []
+
+    report = run_import([('Sơn 1 cũ', 'son-1', '10', 'son-nuoc'),
+                         ('Sơn chống rêu', 'son-chong-reu', '20', 'son-nuoc')], mode='upsert')
+    assert (report['created'], report['updated']) == (1, 1)
+
+    assert 'Sơn chống rêu' in client.get('/san-pham').get_data(as_text=True)
+    assert 'Sơn 1 cũ' in client.get('/san-pham/son-1').get_data(as_text=True)
+    items = client.get('/tim-kiem/goi-y?q=chong reu').get_json()['items']
+    assert [item['title'] for item in items] == ['Sơn chống rêu']
+
+    new_id = Product.query.filter_by(slug='son-chong-reu').one().id
+    assert RelatedItem.query.filter_by(item_type='product', item_id=new_id).count() > 0
+
+
+def test_large_import_invalidates_whole_namespace(app, client, seed, monkeypatch):
+    monkeypatch.setattr(importer, 'MAX_PUBLISHED_KEYS', 1)
+    client.get('/san-pham/son-2')
+    assert client.get('/tim-kiem/goi-y?q=son lot').get_json()['items'] == []
+
+    run_import([('Sơn 2 mới', 'son-2', '10', 'son-nuoc'), ('Sơn lót', 'son-lot', '20', 'son-nuoc')], mode='upsert')
+
+    assert 'Sơn 2 mới' in client.get('/san-pham/son-2').get_data(as_text=True)
+    assert [item['title'] for item in client.get('/tim-kiem/goi-y?q=son lot').get_json()['items']] == ['Sơn lót']
+
+
+def test_upsert_rejects_duplicate_slug_in_file(app, seed):
+    report = run_import([('Sơn mới A', 'son-moi', '1', 'son-nuoc'), ('Sơn mới B', 'son-moi', '2', 'son-nuoc')], mode='upsert')
+    assert (report['created'], report['failed']) == (1, 1)
+
+
+def test_upsert_requires_on_conflict_support(app, seed, monkeypatch):
+    from sqlalchemy import insert
+    monkeypatch.setattr(importer, 'dialect_insert', lambda table, bind=None: insert(table))
+    with pytest.raises(ValueError):
+        run_import([('Sơn 1', 'son-1', '10', 'son-nuoc')], mode='upsert')
+    assert Product.query.filter_by(slug='son-1').one().name == 'Sơn 1'
+
+
+def test_dry_run_writes_nothing(app, seed):
+    report = run_import([('Sơn mới', 'son-moi', '20', 'son-nuoc')], dry_run=True)
+    assert report['created'] == 1
+    assert Product.query.filter_by(slug='son-moi').first() is None
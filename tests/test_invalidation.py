@@ -0,0 +1,127 @@
+"""Bus xóa cache giữa các worker (app/invalidation.py): publish trong transaction, TableTransport, warm-up"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db, invalidation
+from app.background import WARMUP_ENVIRON_KEY
+from app.cache import cache
+from app.invalidation import NotifyTransport, TableTransport, publish
+from app.models import CacheInvalidation, Contact
+
+OTHER_WORKER = 'may-khac:1'
+
+
+@pytest.fixture
+def received(monkeypatch):
+    """Các key mà subscriber của topic 'test' nhận được"""
+    keys = []
+    monkeypatch.setattr(invalidation, '_subscribers', {'test': [keys.append]})
+    return keys
+
+
+def add_contact():
+    db.session.add(Contact(name='Khách', email='khach@example.com', message='Hỏi giá'))
+
+
+def test_publish_applies_after_commit(app, received):
+    cache.set('test', 'k', 1)
+    publish(db.session, 'test', 'k')
+    add_contact()
+    db.session.flush()
+    assert cache.get('test', 'k') == 1  # Chưa commit -> chưa xóa
+    db.session.commit()
+
+    assert cache.get('test', 'k') is None
+    assert received == ['k']
+    rows = CacheInvalidation.query.filter_by(topic='test').all()
+    assert [(row.key, row.source) for row in rows] == [('k', invalidation._source())]
+
+
+def test_rollback_discards_events(app, received):
+    cache.set('test', 'k', 1)
+    publish(db.session, 'test', 'k')
+    add_contact()
+    db.session.flush()
+    db.session.rollback()
+    db.session.commit()  # Commit sau đó không gửi lại sự kiện đã bỏ
+
+    assert cache.get('test', 'k') == 1
+    assert received == []
+    assert CacheInvalidation.query.filter_by(topic='test').count() == 0
+
+
+def test_publish_outside_flush_sent_on_commit(app, received):
+    publish(db.session, 'test')
+    db.session.commit()
+    assert received == [None]
+    assert CacheInvalidation.query.filter_by(topic='test', key=None).count() == 1
+
+
+def insert_event(topic, key, source=OTHER_WORKER, created_at=None):
+    db.session.add(CacheInvalidation(topic=topic, key=key, source=source,
+                                     created_at=created_at or datetime.utcnow()))
+    db.session.commit()
+
+
+def test_table_transport_applies_other_workers_events(app, received):
+    transport = TableTransport(app)
+    cache.set('test', 'cu', 1)
+    transport.poll()  # Lần đầu: lấy mốc id, bỏ cache của process (có thể đã lỡ sự kiện)
+    assert cache.get('test', 'cu') is None
+    assert received == [None]
+
+    cache.set('test', 'a', 1)
+    cache.set('test', 'b', 1)
+    insert_event('test', 'a')
+    insert_event('test', 'b', source=invalidation._source())  # Của chính worker: đã áp lúc commit
+    transport.poll()
+    assert cache.get('test', 'a') is None
+    assert cache.get('test', 'b') == 1
+    assert received == [None, 'a']
+
+    transport.poll()  # Không có dòng mới
+    assert received == [None, 'a']
+
+
+def test_table_transport_poll_interval(app, received):
+    transport = TableTransport(app)
+    transport.poll_interval = 60
+    transport.poll()
+    insert_event('test', 'a')
+    transport.poll()
+    assert received == [None]
+
+
+def test_table_transport_purges_old_rows(app):
+    insert_event('test', 'cu', created_at=datetime.utcnow() - timedelta(seconds=app.config['INVALIDATION_RETENTION'] + 60))
+    insert_event('test', 'moi')
+    TableTransport(app).poll()
+    assert [row.key for row in CacheInvalidation.query.all()] == ['moi']
+
+
+def test_notify_transport_splits_large_payloads(app):
+    class Connection:
+        def __init__(self):
+            self.payloads = []
+
+        def execute(self, statement, params):
+            self.payloads.append(params['payload'])
+
+    connection = Connection()
+    items = [('entities:product', 'san-pham-' + 'x' * 100 + str(i)) for i in range(200)]
+    NotifyTransport(app).send(connection, items)
+
+    assert len(connection.payloads) > 1
+    assert all(len(payload.encode()) < 8000 for payload in connection.payloads)
+    assert sum(payload.count('san-pham-') for payload in connection.payloads) == 200
+
+
+def test_poll_skipped_during_warm_up(app, client, monkeypatch):
+    polls = []
+    monkeypatch.setattr(app.extensions['invalidation_bus'], 'poll', lambda: polls.append(1))
+
+    client.get('/gioi-thieu', environ_base={WARMUP_ENVIRON_KEY: True})
+    assert polls == []
+    client.get('/gioi-thieu')
+    assert polls == [1]
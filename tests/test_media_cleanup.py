@@ -0,0 +1,129 @@
+"""Xóa media hàng loạt + worker dọn file (app/media_cleanup.py) với storage giả trong thư mục tạm"""
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.cache import get_backend
+from app.counters import get_counter
+from app.entity_cache import get_entity
+from app.media_cleanup import (LocalStorage, bulk_delete_media, process_pending, register_storage,
+                               retry_failed, tombstone_stats)
+from app.models import Media, MediaTombstone, Product
+
+CLOUDINARY_URL = 'https://res.cloudinary.com/demo/image/upload/v1759825641/enterprise/general/{name}.jpg'
+
+
+class FailingStorage:
+    """Storage luôn lỗi (mất kết nối, hết quota...)"""
+    batch_size = 100
+
+    def __init__(self):
+        self.calls = 0
+
+    def delete_many(self, keys):
+        self.calls += 1
+        return {key: 'Hết quota' for key in keys}
+
+
+@pytest.fixture
+def storages(app, tmp_path):
+    """Local -> thư mục static tạm của app, Cloudinary -> thư mục tạm khác"""
+    cloud_root = tmp_path / 'fake-cloud'
+    register_storage(app, 'local', LocalStorage(app.static_folder))
+    register_storage(app, 'cloudinary', LocalStorage(str(cloud_root)))
+    return {'local': tmp_path / 'static', 'cloudinary': cloud_root}
+
+
+def add_media(storages, name, album='A', cloud=False, size=1000):
+    if cloud:
+        path = storages['cloudinary'] / 'enterprise' / 'general' / name
+        filepath = CLOUDINARY_URL.format(name=name)
+    else:
+        path = storages['local'] / 'uploads' / f'{name}.jpg'
+        filepath = f'/static/uploads/{name}.jpg'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    media = Media(filename=f'{name}.jpg', filepath=filepath, album=album, file_size=size)
+    db.session.add(media)
+    db.session.commit()
+    return media, path
+
+
+def test_bulk_delete_by_ids_removes_rows_and_files(app, storages):
+    first, first_path = add_media(storages, 'anh-1')
+    second, second_path = add_media(storages, 'anh-2', cloud=True)
+    kept, kept_path = add_media(storages, 'anh-3')
+    assert get_counter('media') == 3
+
+    assert bulk_delete_media(ids=[first.id, second.id]) == 2
+
+    assert [media.id for media in Media.query.all()] == [kept.id]
+    assert not first_path.exists() and not second_path.exists()
+    assert kept_path.exists()
+    assert tombstone_stats() == {'pending': 0, 'done': 2, 'failed': 0}
+    assert get_counter('media') == 1
+    assert get_counter('media_size') == 1000
+    assert get_counter('album_media:A') == 1
+
+
+def test_bulk_delete_album(app, storages):
+    add_media(storages, 'a-1', album='Dự án')
+    add_media(storages, 'a-2', album='Dự án')
+    other, _ = add_media(storages, 'b-1', album='Khác')
+
+    assert bulk_delete_media(album='Dự án') == 2
+    assert [media.id for media in Media.query.all()] == [other.id]
+    assert get_counter('album_media:Dự án') == 0
+
+
+def test_bulk_delete_requires_ids_or_album(app):
+    with pytest.raises(ValueError):
+        bulk_delete_media()
+    assert bulk_delete_media(ids=[]) == 0
+
+
+def test_storage_errors_back_off_then_fail(app, storages):
+    app.config['MEDIA_DELETE_MAX_ATTEMPTS'] = 2
+    failing = FailingStorage()
+    register_storage(app, 'local', failing)
+    media, path = add_media(storages, 'loi')
+
+    bulk_delete_media(ids=[media.id])
+
+    # Lần 1 lỗi -> chờ backoff, Media vẫn bị xóa khỏi DB
+    tombstone = MediaTombstone.query.one()
+    assert (tombstone.status, tombstone.attempts, tombstone.last_error) == ('pending', 1, 'Hết quota')
+    assert tombstone.next_attempt_at > datetime.utcnow()
+    assert Media.query.count() == 0 and path.exists()
+
+    # Đến hạn lần 2 -> quá số lần thử -> failed
+    tombstone.next_attempt_at = datetime.utcnow()
+    db.session.commit()
+    process_pending()
+    assert MediaTombstone.query.one().status == 'failed'
+    assert failing.calls == 2
+
+    # Đối soát: storage chạy lại được -> xóa xong
+    register_storage(app, 'local', LocalStorage(app.static_folder))
+    assert retry_failed() == 1
+    process_pending()
+    assert tombstone_stats() == {'pending': 0, 'done': 1, 'failed': 0}
+    assert not path.exists()
+
+
+def test_bulk_delete_invalidates_entity_cache(app, seed, storages):
+    media, _ = add_media(storages, 'anh-san-pham')
+    product = Product.query.filter_by(slug='son-1').one()
+    product.image = media.filepath
+    db.session.commit()
+
+    assert get_entity('product', 'son-1') is not None
+    assert get_backend().get('entities:product', 'son-1') is not None
+    get_entity('product', 'son-2')
+
+    bulk_delete_media(ids=[media.id])
+
+    assert get_backend().get('entities:product', 'son-1') is None
+    # Sản phẩm không dùng ảnh vẫn giữ cache
+    assert get_backend().get('entities:product', 'son-2') is not None
@@ -0,0 +1,211 @@
+"""Outbox thông báo liên hệ (app/outbox.py) gửi qua SMTP sink chạy local"""
+import email
+import email.policy
+import socket
+import socketserver
+import threading
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.models import Contact, OutboxMessage
+from app.outbox import dispatch_pending, enqueue, outbox_stats, retry_failed
+
+NOTIFY_EMAILS = ['sales@example.com', 'giamdoc@example.com']
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Đủ lệnh SMTP cho smtplib: EHLO, MAIL, RCPT, DATA, RSET, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply('220 smtp-sink')
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                mail_from, recipients = command.split(':', 1)[1].strip().strip('<>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command.split(':', 1)[1].strip().strip('<>')
+                if address in sink.rejected:
+                    self.reply('550 Mailbox unavailable')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line == b'.\r\n':
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                message = email.message_from_bytes(b''.join(lines), policy=email.policy.default)
+                sink.messages.append((mail_from, recipients, message))
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SmtpSink:
+    """SMTP server trên 127.0.0.1 (cổng ngẫu nhiên), giữ lại mọi thư nhận được"""
+
+    def __init__(self):
+        self.messages = []
+        self.rejected = set()
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _SinkHandler)
+        self.server.daemon_threads = True
+        self.server.sink = self
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def sink():
+    sink = SmtpSink()
+    yield sink
+    sink.stop()
+
+
+@pytest.fixture
+def config_overrides(sink):
+    return {'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': sink.port, 'MAIL_USE_TLS': False,
+            'CONTACT_NOTIFY_EMAILS': NOTIFY_EMAILS, 'MAIL_DEFAULT_SENDER': 'no-reply@hoangvn.test'}
+
+
+def post_contact(client, **data):
+    form = {'name': 'Nguyễn Văn A', 'email': 'khach@example.com', 'subject': 'Báo giá sơn',
+            'message': 'Cần báo giá 100 thùng'}
+    form.update(data)
+    return client.post('/lien-he', data=form)
+
+
+def make_due():
+    OutboxMessage.query.filter_by(status='pending').update({'next_attempt_at': datetime.utcnow()})
+    db.session.commit()
+
+
+def test_contact_notification_delivered(client, sink):
+    assert post_contact(client).status_code == 302
+
+    assert sorted(recipients[0] for _sender, recipients, _message in sink.messages) == sorted(NOTIFY_EMAILS)
+    _sender, _recipients, message = sink.messages[0]
+    assert message['Subject'] == '[Liên hệ mới] Báo giá sơn'
+    assert message['Message-ID'].endswith('@hoangvn.test>')
+    assert 'Cần báo giá 100 thùng' in message.get_content()
+    assert outbox_stats() == {'pending': 0, 'sent': 2, 'failed': 0}
+
+
+def test_rejected_recipient_retried_alone(client, sink):
+    sink.rejected.add('giamdoc@example.com')
+    post_contact(client)
+
+    assert [recipients for _sender, recipients, _message in sink.messages] == [['sales@example.com']]
+    failed = OutboxMessage.query.filter_by(status='pending').one()
+    assert failed.recipient == 'giamdoc@example.com'
+    assert failed.last_error.startswith('SMTP:')
+    assert failed.next_attempt_at > datetime.utcnow()
+
+    # Hộp thư nhận lại được -> lần retry chỉ gửi thư còn thiếu
+    sink.rejected.clear()
+    make_due()
+    assert dispatch_pending() == (1, 0)
+    assert len(sink.messages) == 2
+    assert outbox_stats() == {'pending': 0, 'sent': 2, 'failed': 0}
+
+
+def test_smtp_down_keeps_contact_and_retries_same_message_id(app, client, sink):
+    app.config['MAIL_PORT'] = closed_port()
+    assert post_contact(client).status_code == 302
+
+    # Liên hệ vẫn được lưu, thông báo chờ retry
+    assert Contact.query.count() == 1
+    assert outbox_stats() == {'pending': 2, 'sent': 0, 'failed': 0}
+    assert sink.messages == []
+
+    app.config['MAIL_PORT'] = sink.port
+    make_due()
+    assert dispatch_pending() == (2, 0)
+
+    # Gửi lại nhiều lần -> cùng Message-ID (client mail gộp lại, không thành thư mới)
+    first_ids = {message['Message-ID'] for _sender, _recipients, message in sink.messages}
+    OutboxMessage.query.update({'status': 'pending', 'next_attempt_at': datetime.utcnow()})
+    db.session.commit()
+    dispatch_pending()
+    assert {message['Message-ID'] for _sender, _recipients, message in sink.messages[2:]} == first_ids
+
+
+def test_max_attempts_then_retry_failed(app, sink):
+    app.config['OUTBOX_MAX_ATTEMPTS'] = 1
+    sink.rejected.add('sales@example.com')
+    enqueue('test:1', 'email', 'sales@example.com', 'Tiêu đề', 'Nội dung')
+    db.session.commit()
+
+    dispatch_pending()
+    assert outbox_stats() == {'pending': 0, 'sent': 0, 'failed': 1}
+
+    sink.rejected.clear()
+    assert retry_failed() == 1
+    dispatch_pending()
+    assert outbox_stats() == {'pending': 0, 'sent': 1, 'failed': 0}
+
+
+def test_newline_in_subject_stays_in_subject(client, sink):
+    assert post_contact(client, subject='x\r\nBcc: attacker@example.com').status_code == 302
+
+    assert sorted(recipients[0] for _sender, recipients, _message in sink.messages) == sorted(NOTIFY_EMAILS)
+    _sender, _recipients, message = sink.messages[0]
+    assert message['Subject'] == '[Liên hệ mới] x Bcc: attacker@example.com'
+    assert message['Bcc'] is None
+    assert outbox_stats() == {'pending': 0, 'sent': 2, 'failed': 0}
+
+
+def test_unbuildable_message_fails_alone(app, sink):
+    # Dòng cũ ghi trước khi enqueue() gộp tiêu đề: lỗi dựng email chỉ tính cho thư đó
+    db.session.add(OutboxMessage(idempotency_key='test:bad', channel='email', recipient='sales@example.com',
+                                 subject='x\r\nBcc: attacker@example.com', body='Nội dung', status='pending',
+                                 attempts=0, next_attempt_at=datetime.utcnow()))
+    enqueue('test:good', 'email', 'giamdoc@example.com', 'Tiêu đề', 'Nội dung')
+    db.session.commit()
+
+    assert dispatch_pending() == (1, 1)
+    assert [recipients for _sender, recipients, _message in sink.messages] == [['giamdoc@example.com']]
+    bad = OutboxMessage.query.filter_by(idempotency_key='test:bad').one()
+    assert bad.status == 'pending'
+    assert bad.last_error.startswith('Email không hợp lệ')
+    assert OutboxMessage.query.filter_by(idempotency_key='test:good').one().status == 'sent'
+
+
+def test_rollback_discards_notification(app, sink):
+    enqueue('test:rollback', 'email', 'sales@example.com', 'Tiêu đề', 'Nội dung')
+    db.session.rollback()
+    assert OutboxMessage.query.count() == 0
+    assert dispatch_pending() == (0, 0)
+    assert sink.messages == []
@@ -0,0 +1,88 @@
+"""Số câu SQL mỗi trang (app/query_budget.py): trong ngân sách QUERY_BUDGETS và không tăng theo số dòng"""
+import pytest
+
+from app import db
+from app.models import Product, Blog, Project, Job, Contact, User
+from app.query_budget import assert_max_queries, count_queries
+
+from conftest import copy_to_replica
+
+PUBLIC_PATHS = [
+    '/', '/gioi-thieu', '/cau-hoi-thuong-gap',
+    '/san-pham', '/san-pham/son-1', '/tin-tuc', '/tin-tuc/bai-1',
+    '/du-an', '/du-an/du-an-1', '/tuyen-dung', '/tuyen-dung/job-1',
+    '/tim-kiem/goi-y?q=son', '/api/v1/products', '/api/v1/products/son-1',
+]
+ADMIN_PATHS = [
+    '/admin/dashboard', '/admin/products', '/admin/categories', '/admin/blogs', '/admin/projects',
+    '/admin/jobs', '/admin/contacts', '/admin/permissions', '/admin/users', '/admin/roles',
+]
+
+# Trang danh sách: N+1 -> số câu tăng theo số dòng
+LIST_PATHS = ['/', '/san-pham', '/tin-tuc', '/du-an', '/tuyen-dung', '/api/v1/products', '/api/v1/blogs',
+              '/admin/dashboard', '/admin/products', '/admin/blogs', '/admin/projects', '/admin/jobs',
+              '/admin/contacts', '/admin/users', '/admin/roles']
+
+
+def budget_for(app, path):
+    endpoint, _args = app.url_map.bind('localhost').match(path.split('?')[0])
+    budget = app.config['QUERY_BUDGETS'].get(endpoint)
+    assert budget is not None, f'{endpoint} chưa có trong QUERY_BUDGETS'
+    return budget
+
+
+def test_every_budgeted_endpoint_is_tested(app):
+    tested = {app.url_map.bind('localhost').match(path.split('?')[0])[0] for path in PUBLIC_PATHS + ADMIN_PATHS}
+    assert set(app.config['QUERY_BUDGETS']) <= tested
+
+
+@pytest.mark.parametrize('path', PUBLIC_PATHS)
+def test_public_page_within_budget(app, client, seed, path):
+    # Lần đầu: cache trống (settings, read-model, trang...) - trường hợp tốn nhất
+    with assert_max_queries(budget_for(app, path), label=path):
+        response = client.get(path)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('path', ADMIN_PATHS)
+def test_admin_page_within_budget(app, admin_client, path):
+    with assert_max_queries(budget_for(app, path), label=path):
+        response = admin_client.get(path)
+    assert response.status_code == 200
+
+
+def add_rows(seed, count):
+    category_id = seed['category'].id
+    for i in range(count):
+        db.session.add(Product(name=f'Sơn thêm {i}', slug=f'son-them-{i}', category_id=category_id, price=1000 + i,
+                               description='Sơn lót'))
+        db.session.add(Blog(title=f'Bài thêm {i}', slug=f'bai-them-{i}', content='<p>Nội dung</p>'))
+        db.session.add(Project(title=f'Dự án thêm {i}', slug=f'du-an-them-{i}', project_type='Nhà xưởng',
+                               year=2024, location='Bình Dương', description='Sơn epoxy'))
+        db.session.add(Job(title=f'Job thêm {i}', slug=f'job-them-{i}', department='Kỹ thuật', location='HN'))
+        db.session.add(Contact(name='Khách thêm', email=f'khach{i}@example.com', message='Hỏi giá'))
+        user = User(username=f'nhanvien{i}', email=f'nhanvien{i}@example.com')
+        user.set_password('x')
+        user.assign_role('editor')
+        db.session.add(user)
+    db.session.commit()
+    copy_to_replica()
+
+
+def query_counts(client, paths):
+    counts = {}
+    for path in paths:
+        with count_queries() as statements:
+            assert client.get(path).status_code == 200
+        counts[path] = len(statements)
+    return counts
+
+
+def test_query_count_does_not_grow_with_rows(app, admin_client, seed):
+    # Đăng nhập admin -> không có cache trang, mỗi lần đều render lại
+    before = query_counts(admin_client, LIST_PATHS)
+    add_rows(seed, 15)
+    after = query_counts(admin_client, LIST_PATHS)
+
+    grown = {path: (before[path], after[path]) for path in LIST_PATHS if after[path] > before[path]}
+    assert grown == {}
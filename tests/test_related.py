@@ -0,0 +1,91 @@
+"""Nội dung liên quan (app/related.py): điểm TF-IDF / nhóm / co-view, corpus cập nhật tại chỗ, ghi co-view"""
+import pytest
+
+from app import db, related
+from app.models import CoView, Product, RelatedItem
+from app.related import CorpusIndex, compute_neighbours, get_corpus, refresh_related, tokenize
+
+
+def corpus(texts, groups=None):
+    groups = groups or {}
+    return CorpusIndex({doc_id: (tokenize(text), groups.get(doc_id)) for doc_id, text in texts.items()})
+
+
+def test_tokenize_folds_accents_and_adds_bigrams():
+    assert tokenize('<p>Sơn chống thấm của nhà</p>') == ['son', 'chong', 'tham', 'nha',
+                                                         'son chong', 'chong tham', 'tham nha']
+    assert tokenize('') == []
+
+
+def test_text_scores_rank_similar_documents_first():
+    index = corpus({1: 'sơn chống thấm ngoại thất', 2: 'sơn chống thấm trần nhà', 3: 'gạch lát nền',
+                    4: 'keo dán gạch', 5: 'ống nước', 6: 'đèn led'})
+    scores = index.text_scores(1)
+    assert scores[2] > 0
+    assert 3 not in scores
+    assert index.text_scores(3)[4] > 0
+
+
+def test_neighbours_combine_text_group_and_coviews(app):
+    index = corpus({1: 'sơn chống thấm', 2: 'sơn chống thấm tốt', 3: 'gạch men', 4: 'đèn led', 5: 'ống nhựa'},
+                   groups={1: 'a', 3: 'a'})
+    neighbours = [doc_id for _score, doc_id in compute_neighbours(index, 1, {}, top_n=8)]
+    assert neighbours == [2, 3]  # text 0.6 * cos > nhóm 0.25
+
+    # Co-view chỉ tính tài liệu còn trong corpus
+    neighbours = compute_neighbours(index, 1, {1: {4: 10, 99: 5}}, top_n=8)
+    assert [doc_id for _score, doc_id in neighbours] == [2, 3, 4]
+    assert neighbours[2][0] == pytest.approx(app.config['RELATED_WEIGHT_COVIEW'])
+
+
+def test_update_replaces_vectors_in_place():
+    index = corpus({1: 'sơn chống thấm', 2: 'gạch men', 3: 'đèn led', 4: 'ống nhựa'}, groups={1: 'a', 2: 'a'})
+    assert 2 not in index.text_scores(1)
+
+    index.update({2: (tokenize('sơn chống thấm gốc nước'), 'b')}, removed=[3])
+    assert index.text_scores(1)[2] > 0
+    assert index.same_group(1) == set()
+    assert 3 not in index
+    assert all(3 not in postings for postings in index.postings.values())
+    assert 'gach' not in index.df  # term của bản cũ đã bỏ
+
+
+def test_refresh_reads_only_changed_documents(app, seed, monkeypatch):
+    related.rebuild_related('product')
+
+    def no_full_load(item_type):
+        raise AssertionError('Không được đọc lại toàn bộ corpus')
+
+    monkeypatch.setattr(related, 'load_corpus', no_full_load)
+    product = Product.query.filter_by(slug='son-4').one()
+    product.name = 'Gạch men cao cấp'
+    product.description = 'Gạch men lát nền'
+    db.session.commit()
+
+    with related._corpus.lock:
+        index = get_corpus('product')
+    assert 'gach men' in index.vectors[product.id]
+    assert RelatedItem.query.filter_by(item_type='product', item_id=product.id).count() > 0
+
+
+def test_change_from_other_worker_is_reloaded(app, seed):
+    with related._corpus.lock:
+        get_corpus('product')
+    product_id = Product.query.filter_by(slug='son-3').one().id
+    # Worker khác sửa trực tiếp (không qua session của process này) rồi phát sự kiện qua bus
+    Product.query.filter_by(id=product_id).update({'description': 'Keo chít mạch'})
+    db.session.commit()
+    related._on_corpus_change(f'product:{product_id}')
+
+    with related._corpus.lock:
+        index = get_corpus('product')
+    assert 'keo chit' in index.vectors[product_id]
+
+
+def test_record_view_counts_pairs(client, seed):
+    for slug in ('son-1', 'son-2', 'son-1'):
+        assert client.get(f'/san-pham/{slug}').status_code == 200
+
+    ids = {p.slug: p.id for p in Product.query.filter(Product.slug.in_(['son-1', 'son-2']))}
+    pairs = {(row.item_id, row.other_id): row.count for row in CoView.query.filter_by(item_type='product')}
+    assert pairs == {(ids['son-2'], ids['son-1']): 2, (ids['son-1'], ids['son-2']): 2}
@@ -0,0 +1,57 @@
+"""Gợi ý tìm kiếm (app/search_index.py): tìm theo tiền tố, xếp hạng, cập nhật từng phần"""
+from app import db
+from app.models import Product
+from app.search_index import PrefixIndex, suggest
+
+ENTRIES = {
+    'product:1': ('product', 'Sơn chống thấm ngoại thất', 'son-chong-tham', 10),
+    'product:2': ('product', 'Keo chống thấm', 'keo-chong-tham', 50),
+    'product:3': ('product', 'Chống thấm gốc xi măng', 'chong-tham-goc', 5),
+    'category:1': ('category', 'Chống nóng', 'chong-nong', 5),
+}
+
+
+def titles(results):
+    return [entry[1] for entry in results]
+
+
+def test_search_folds_accents_and_matches_any_word():
+    index = PrefixIndex.build(ENTRIES)
+    assert titles(index.search('son ch')) == ['Sơn chống thấm ngoại thất']
+    assert titles(index.search('NGOẠI')) == ['Sơn chống thấm ngoại thất']
+    assert index.search('xyz') == []
+    assert index.search('  ') == []
+
+
+def test_ranking_start_of_title_then_weight_then_length():
+    index = PrefixIndex.build(ENTRIES)
+    # Khớp từ đầu tiêu đề trước (cùng trọng số -> tiêu đề ngắn hơn), rồi khớp giữa tiêu đề theo lượt xem
+    assert titles(index.search('chong')) == ['Chống nóng', 'Chống thấm gốc xi măng',
+                                             'Keo chống thấm', 'Sơn chống thấm ngoại thất']
+    assert titles(index.search('chong', limit=2)) == ['Chống nóng', 'Chống thấm gốc xi măng']
+
+
+def test_with_entries_returns_new_index():
+    index = PrefixIndex.build(ENTRIES)
+    updated = index.with_entries({'product:2': ('product', 'Keo dán gạch', 'keo-dan-gach', 50),
+                                  'blog:1': ('blog', 'Cách chống thấm', 'cach-chong-tham', 1)},
+                                 removed=['product:3'])
+
+    assert titles(updated.search('chong')) == ['Chống nóng', 'Sơn chống thấm ngoại thất', 'Cách chống thấm']
+    assert titles(updated.search('keo')) == ['Keo dán gạch']
+    assert updated.keys == sorted(updated.keys)
+    assert 'product:3' not in updated.entries
+    # Bản cũ (request đang đọc) không đổi
+    assert titles(index.search('keo')) == ['Keo chống thấm']
+    assert 'product:3' in index.entries
+
+
+def test_edit_reloads_entry_from_primary(client, seed):
+    assert suggest('son 1')[0]['title'] == 'Sơn 1'
+    product = Product.query.filter_by(slug='son-1').one()
+    product.name = 'Sơn 1 phủ bóng'
+    db.session.commit()
+
+    # Replica chưa bắt kịp (không copy_to_replica): gợi ý trong request công khai vẫn thấy tên mới
+    items = client.get('/tim-kiem/goi-y?q=phu bong').get_json()['items']
+    assert [item['title'] for item in items] == ['Sơn 1 phủ bóng']
@@ -0,0 +1,65 @@
+"""Lưu settings (app/models.py save_settings): chỉ ghi key thay đổi, version tăng nguyên tử"""
+import threading
+
+from app import db, models
+from app.models import Settings, get_settings_version, save_settings
+
+
+def updated_at(key):
+    db.session.expire_all()
+    return Settings.query.filter_by(key=key).one().updated_at
+
+
+def test_only_changed_keys_are_written(app):
+    assert save_settings({'site_name': ('Hoàng VN', 'general', ''), 'hotline': ('0900', 'general', '')}) == \
+        {'site_name', 'hotline'}
+    assert get_settings_version() == 1
+    before = updated_at('hotline')
+
+    # Không đổi gì -> không ghi, version giữ nguyên
+    assert save_settings({'site_name': ('Hoàng VN', 'general', ''), 'hotline': ('0900', 'general', '')}) == set()
+    assert get_settings_version() == 1
+
+    assert save_settings({'site_name': ('Hoàng VN 2', 'general', ''), 'hotline': ('0900', 'general', '')}) == \
+        {'site_name'}
+    assert get_settings_version() == 2
+    assert updated_at('hotline') == before
+
+
+def test_metadata_tuple_is_stored_as_url(app):
+    save_settings({'logo': (('/static/logo.png', {'alt': 'Logo'}), 'theme', 'Logo')})
+    setting = Settings.query.filter_by(key='logo').one()
+    assert setting.value == '/static/logo.png'
+    assert 'Metadata' in setting.description
+
+
+def test_concurrent_saves_both_bump_version(app, monkeypatch):
+    save_settings({'site_name': ('Hoàng VN', 'general', '')})
+    barrier = threading.Barrier(2, timeout=5)
+    original = models._setting_value
+
+    def value_after_both_read(value):
+        barrier.wait()  # Cả 2 request đã đọc settings hiện có trước khi ghi
+        return original(value)
+
+    monkeypatch.setattr(models, '_setting_value', value_after_both_read)
+    errors = []
+
+    def save(key):
+        with app.app_context():
+            try:
+                save_settings({key: ('mới', 'general', '')})
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=save, args=(key,)) for key in ('hotline', 'email')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert errors == []
+    db.session.expire_all()
+    assert get_settings_version() == 3
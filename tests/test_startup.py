@@ -0,0 +1,45 @@
+"""Khởi động (app/startup.py, `flask startup-profile`): không nạp SDK nặng, trong ngân sách thời gian"""
+import json
+
+import pytest
+
+from app.lazy import HEAVY_MODULES
+from app.startup import profile_startup
+
+# Ngân sách cold start (ms) - rộng để không chập chờn trên máy CI chậm, vẫn bắt được
+# lỗi nạp SDK nặng (google.generativeai / cloudinary / PIL: vài trăm ms mỗi gói)
+CREATE_APP_BUDGET_MS = 1500
+TOTAL_BUDGET_MS = 4000
+
+PHASES = ['config', 'extensions', 'blueprints', 'counters_commands', 'template_filters']
+
+
+@pytest.fixture
+def boot_env(tmp_path, monkeypatch):
+    """Process đo khởi động dùng SQLite tạm (không cần PostgreSQL / driver)"""
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "boot.db"}')
+    monkeypatch.delenv('DATABASE_REPLICA_URL', raising=False)
+    monkeypatch.setenv('TEMPLATE_CACHE_DIR', str(tmp_path / 'jinja_cache'))
+
+
+def test_cold_start_skips_heavy_modules_within_budget(boot_env):
+    report = profile_startup()
+    assert report['heavy_modules_loaded'] == []
+    # Cả module con (cloudinary.uploader, PIL.Image...) theo -X importtime
+    assert [name for name, _self_ms, _cumulative_ms in report['modules'] if name.startswith(HEAVY_MODULES)] == []
+    assert list(report['phases']) == PHASES
+    assert report['create_app_ms'] < CREATE_APP_BUDGET_MS
+    assert report['total_ms'] < TOTAL_BUDGET_MS
+
+
+def test_startup_profile_command(app, boot_env):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['startup-profile', '--json', '--top', '5'])
+    assert result.exit_code == 0, result.output
+    report = json.loads(result.output)
+    assert len(report['modules']) == 5
+    assert report['heavy_modules_loaded'] == []
+
+    result = runner.invoke(args=['startup-profile', '--max-ms', '1'])
+    assert result.exit_code != 0
+    assert 'vượt ngưỡng' in result.output
@@ -0,0 +1,11 @@
+"""
+Entry point production: gunicorn wsgi:app (cấu hình trong gunicorn.conf.py)
+
+Với preload_app, module này chạy 1 lần trong master: tạo app + làm nóng,
+sau đó các worker được fork ra dùng chung bộ nhớ đã nạp.
+"""
+from app import create_app
+from app.server import warm_up
+
+app = create_app()
+warm_up(app)